@@ -0,0 +1,87 @@
+"""
+SolarMail REST API - HTTP Caching
+Conditional requests: ETag / Last-Modified and 304 Not Modified
+"""
+
+from fastapi import Request, Response
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+import hashlib
+
+
+def make_etag(*parts) -> str:
+    """
+    Сильный ETag из версии данных
+    
+    Args:
+        parts: Значения, от которых зависит ответ (версия кэша, id и т.п.)
+    """
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def http_date(timestamp: Optional[str]) -> Optional[str]:
+    """
+    Переводит SQLite CURRENT_TIMESTAMP (UTC, 'YYYY-MM-DD HH:MM:SS') в HTTP-дату
+    
+    Returns:
+        Строка для Last-Modified или None
+    """
+    if not timestamp:
+        return None
+    
+    try:
+        moment = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+    
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+def cache_headers(etag: str, last_modified: Optional[str] = None) -> Dict[str, str]:
+    """
+    Заголовки валидаторов ответа
+    
+    no-cache: браузер хранит ответ, но перед использованием переспрашивает
+    сервер с If-None-Match - при неизменном кэше это дешевый 304.
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache"
+    }
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[str] = None) -> bool:
+    """
+    Проверяет условные заголовки запроса
+    
+    If-None-Match имеет приоритет над If-Modified-Since (RFC 9110, 13.2.2)
+    и сравнивается слабо: W/"x" совпадает с "x".
+    
+    Returns:
+        True если клиенту можно ответить 304 Not Modified
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    
+    return False
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """Ответ 304 Not Modified с теми же валидаторами"""
+    return Response(status_code=304, headers=headers)
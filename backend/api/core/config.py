@@ -34,6 +34,7 @@ class APISettings(BaseSettings):
     cors_allow_credentials: bool = True
     cors_allow_methods: list = ["*"]
     cors_allow_headers: list = ["*"]
+    cors_expose_headers: list = ["ETag", "Last-Modified", "X-Next-Cursor", "Link"]
     
     # API Settings
     api_prefix: str = "/api/v1"
@@ -45,6 +46,24 @@ class APISettings(BaseSettings):
     ai_model_name: str = "distilbert-base-uncased-finetuned-sst-2-english"
     ai_use_gpu: bool = False
     ai_fallback_to_mock: bool = True
+    ai_batch_size: int = 16  # последовательностей в одном forward pass
+    ai_backend: str = "torch"  # torch | onnx (ONNX Runtime, CPU)
+    ai_onnx_quantize: bool = True
+    ai_onnx_threads: int = 0  # 0 - по числу ядер
+    ai_category_method: str = "zero-shot"  # zero-shot | embedding (прототипы эмбеддингов)
+    ai_embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    ai_cascade: bool = False  # эвристика AIParser первой, модель - для неуверенных писем
+    ai_cascade_threshold: float = 0.8
+    ai_cascade_margin: int = 1
+    
+    # Микробатчинг запросов анализа (InferenceScheduler)
+    ai_batch_max_size: int = 64
+    ai_batch_max_wait_ms: float = 5.0
+    
+    # Кэш результатов анализа по содержимому письма (AnalysisCache, таблица analysis_cache в db_path)
+    ai_cache_enabled: bool = True
+    ai_cache_memory_size: int = 4096
+    ai_cache_max_entries: int = 100_000
     
     # Rate Limiting (будущее)
     rate_limit_enabled: bool = False
@@ -61,9 +80,12 @@ class APISettings(BaseSettings):
     log_level: str = "INFO"
     log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     
-    # Database (для будущих этапов)
+    # Database
     db_path: str = "../../core/sync/solar_api.db"
     
+    # Sync (POST /sync/trigger)
+    sync_enable_ai: bool = False
+    
     class Config:
         env_prefix = "SOLARMAIL_"
         case_sensitive = False
@@ -127,8 +149,10 @@ if __name__ == "__main__":
     
     print(f"\n🧠 AI Model:")
     print(f"   Model: {settings.ai_model_name}")
+    print(f"   Backend: {settings.ai_backend}")
     print(f"   GPU: {settings.ai_use_gpu}")
     print(f"   Fallback: {settings.ai_fallback_to_mock}")
+    print(f"   Analysis Cache: {settings.ai_cache_enabled}")
     
     print(f"\n🔐 Security:")
     print(f"   Auth Enabled: {settings.auth_enabled}")
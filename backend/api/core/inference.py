@@ -0,0 +1,198 @@
+"""
+SolarMail REST API - Inference Scheduler
+Micro-batching of concurrent analyze requests on a dedicated worker thread
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+# Письмо для анализа: (тема, тело)
+EmailText = Tuple[str, str]
+
+# Сигнал остановки воркера
+_STOP = object()
+
+
+class InferenceScheduler:
+    """
+    Планировщик инференса с микробатчингом
+    
+    Запросы из async endpoints кладутся в очередь и сразу возвращают future.
+    Воркер (отдельный поток) берет первый запрос, ждет еще до max_wait_ms
+    или до max_batch_size запросов и прогоняет их одним батчем через
+    analyze_batch. Forward pass не блокирует event loop, а конкурентные
+    запросы делят один проход модели вместо очереди по одному.
+    """
+    
+    def __init__(
+        self,
+        analyze_batch: Callable[[List[EmailText]], List[Dict[str, Any]]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0
+    ):
+        """
+        Инициализация InferenceScheduler
+        
+        Args:
+            analyze_batch: Функция анализа списка писем (AIParserTransformer.analyze_emails)
+            max_batch_size: Максимум писем в одном батче
+            max_wait_ms: Сколько ждать попутные запросы после первого (мс)
+        """
+        self.analyze_batch = analyze_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        
+        self.stats = {
+            'requests': 0,
+            'batches': 0,
+            'largest_batch': 0,
+            'busy_seconds': 0.0
+        }
+    
+    # ==================== Public API ====================
+    
+    async def submit(self, subject: str, body: str) -> Dict[str, Any]:
+        """
+        Анализирует письмо в составе ближайшего батча
+        
+        Returns:
+            Словарь с AI-метаданными
+        """
+        return (await self.submit_many([(subject, body)]))[0]
+    
+    async def submit_many(self, emails: List[EmailText]) -> List[Dict[str, Any]]:
+        """
+        Анализирует несколько писем (они могут попасть в батчи вместе с чужими запросами)
+        
+        Returns:
+            Список словарей с AI-метаданными в порядке emails
+        """
+        self._ensure_worker()
+        
+        loop = asyncio.get_running_loop()
+        futures = []
+        for email in emails:
+            future = loop.create_future()
+            self._queue.put((email, future, loop))
+            futures.append(future)
+        
+        return list(await asyncio.gather(*futures))
+    
+    def close(self, timeout: float = 5.0):
+        """Останавливает воркер после уже поставленных в очередь запросов"""
+        with self._lock:
+            worker = self._worker
+            self._worker = None
+        
+        if worker is not None:
+            self._queue.put(_STOP)
+            worker.join(timeout)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика: запросы, батчи, средний размер батча"""
+        stats = dict(self.stats)
+        stats['average_batch'] = stats['requests'] / stats['batches'] if stats['batches'] else 0.0
+        stats['max_batch_size'] = self.max_batch_size
+        stats['max_wait_ms'] = self.max_wait * 1000
+        return stats
+    
+    # ==================== Worker ====================
+    
+    def _ensure_worker(self):
+        """Запускает воркер при первом запросе"""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+                self._worker.start()
+    
+    def _run(self):
+        """Цикл воркера: собрать батч → анализ → разрешить futures"""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            
+            batch = [item]
+            stop = self._collect(batch)
+            self._process(batch)
+            
+            if stop:
+                return
+    
+    def _collect(self, batch: List[tuple]) -> bool:
+        """
+        Добирает запросы в батч до max_batch_size или до истечения max_wait
+        
+        Returns:
+            True если во время сбора пришел сигнал остановки
+        """
+        deadline = time.monotonic() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return False
+            
+            if item is _STOP:
+                return True
+            batch.append(item)
+        
+        return False
+    
+    def _process(self, batch: List[tuple]):
+        """Прогоняет батч через модель и передает результаты в event loop запросов"""
+        # Запросы, отмененные клиентом (разрыв соединения), не считаем
+        batch = [item for item in batch if not item[1].cancelled()]
+        if not batch:
+            return
+        
+        start = time.perf_counter()
+        try:
+            results = self.analyze_batch([email for email, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"analyze_batch returned {len(results)} results for {len(batch)} emails")
+        except Exception as e:
+            logger.error(f"❌ Batch inference failed: {str(e)}")
+            for _, future, loop in batch:
+                self._dispatch(loop, future, None, e)
+            return
+        finally:
+            self.stats['busy_seconds'] += time.perf_counter() - start
+        
+        self.stats['requests'] += len(batch)
+        self.stats['batches'] += 1
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+        
+        for (_, future, loop), result in zip(batch, results):
+            self._dispatch(loop, future, result, None)
+    
+    def _dispatch(self, loop: asyncio.AbstractEventLoop, future: asyncio.Future, result: Any, error: Optional[Exception]):
+        """Передает результат в event loop запроса (loop мог уже закрыться)"""
+        try:
+            loop.call_soon_threadsafe(self._resolve, future, result, error)
+        except RuntimeError:
+            pass
+    
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any, error: Optional[Exception]):
+        """Разрешает future в его event loop (если запрос еще ждет)"""
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
@@ -4,7 +4,7 @@ Sprint 0.3.2: FastAPI REST API for AI Email Analysis
 
 Run with:
     uvicorn main:app --reload
-    
+
 Or:
     python main.py
 """
@@ -20,6 +20,8 @@ import logging
 from core.config import settings
 from routes import analyze
 from routes import status
+from routes import emails
+from routes import sync
 from models.email_analysis import ErrorResponse
 
 
@@ -45,6 +47,7 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    analyze.shutdown_scheduler()
     logger.info(f"🛑 Shutting down {settings.app_name}")
 
 
@@ -67,6 +70,7 @@ app.add_middleware(
     allow_credentials=settings.cors_allow_credentials,
     allow_methods=settings.cors_allow_methods,
     allow_headers=settings.cors_allow_headers,
+    expose_headers=settings.cors_expose_headers,
 )
 
 
@@ -141,6 +145,16 @@ app.include_router(
     prefix=settings.api_prefix
 )
 
+app.include_router(
+    emails.router,
+    prefix=settings.api_prefix
+)
+
+app.include_router(
+    sync.router,
+    prefix=settings.api_prefix
+)
+
 
 # Root endpoint
 @app.get("/", include_in_schema=False)
@@ -185,6 +199,10 @@ async def api_info():
             "analyze": f"{settings.api_prefix}/analyze",
             "batch_analyze": f"{settings.api_prefix}/analyze/batch",
             "model_info": f"{settings.api_prefix}/analyze/model-info",
+            "emails": f"{settings.api_prefix}/emails",
+            "email_search": f"{settings.api_prefix}/emails/search",
+            "sync_status": f"{settings.api_prefix}/sync/status",
+            "sync_trigger": f"{settings.api_prefix}/sync/trigger",
             "health": f"{settings.api_prefix}/status",
             "detailed_status": f"{settings.api_prefix}/status/detailed",
             "ping": f"{settings.api_prefix}/status/ping"
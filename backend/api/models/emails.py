@@ -0,0 +1,176 @@
+"""
+SolarMail REST API - Email Cache Models
+Request/Response schemas for cached emails
+"""
+
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+
+class EmailResponse(BaseModel):
+    """
+    Письмо из кэша (AI-поля заполнены, если письмо проанализировано)
+    """
+    id: int = Field(
+        ...,
+        description="ID письма в кэше"
+    )
+    
+    uid: str = Field(
+        ...,
+        description="Ключ письма в кэше"
+    )
+    
+    sender: str = Field(
+        ...,
+        description="Отправитель"
+    )
+    
+    subject: Optional[str] = Field(
+        default=None,
+        description="Тема письма"
+    )
+    
+    date: str = Field(
+        ...,
+        description="Дата письма (ISO 8601)"
+    )
+    
+    body_preview: Optional[str] = Field(
+        default=None,
+        description="Начало текста письма"
+    )
+    
+    account_email: Optional[str] = Field(
+        default=None,
+        description="Аккаунт"
+    )
+    
+    folder: Optional[str] = Field(
+        default=None,
+        description="IMAP-папка"
+    )
+    
+    flags: Optional[str] = Field(
+        default=None,
+        description="IMAP-флаги через пробел"
+    )
+    
+    sentiment: Optional[str] = Field(default=None, description="Тональность")
+    sentiment_score: Optional[float] = Field(default=None, description="Уверенность в тональности")
+    priority: Optional[str] = Field(default=None, description="Приоритет")
+    priority_score: Optional[float] = Field(default=None, description="Уверенность в приоритете")
+    category: Optional[str] = Field(default=None, description="Категория")
+    category_confidence: Optional[float] = Field(default=None, description="Уверенность в категории")
+    entities_json: Optional[str] = Field(default=None, description="Сущности (JSON)")
+    keywords_json: Optional[str] = Field(default=None, description="Ключевые слова (JSON)")
+    ai_model: Optional[str] = Field(default=None, description="Модель анализа")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": 42,
+                "uid": "user@example.com:INBOX:1234",
+                "sender": "billing@company.com",
+                "subject": "Счет №123",
+                "date": "2025-10-25T12:00:00",
+                "body_preview": "Оплатите счет до пятницы",
+                "account_email": "user@example.com",
+                "folder": "INBOX",
+                "flags": "\\Seen",
+                "priority": "high",
+                "category": "Docs"
+            }
+        }
+
+
+class EmailSearchResult(BaseModel):
+    """
+    Письмо, найденное полнотекстовым поиском
+    """
+    id: int = Field(
+        ...,
+        description="ID письма в кэше"
+    )
+    
+    uid: str = Field(
+        ...,
+        description="Ключ письма в кэше"
+    )
+    
+    sender: str = Field(
+        ...,
+        description="Отправитель"
+    )
+    
+    subject: Optional[str] = Field(
+        default=None,
+        description="Тема письма"
+    )
+    
+    date: str = Field(
+        ...,
+        description="Дата письма (ISO 8601)"
+    )
+    
+    folder: Optional[str] = Field(
+        default=None,
+        description="IMAP-папка"
+    )
+    
+    snippet: str = Field(
+        ...,
+        description="Фрагмент с совпадением (HTML): текст письма экранирован, найденные слова выделены <b></b>"
+    )
+    
+    score: float = Field(
+        ...,
+        description="Релевантность bm25 (чем меньше, тем релевантнее)"
+    )
+
+
+class EmailSearchResponse(BaseModel):
+    """
+    Ответ полнотекстового поиска
+    """
+    query: str = Field(
+        ...,
+        description="Строка поиска"
+    )
+    
+    results: List[EmailSearchResult] = Field(
+        ...,
+        description="Найденные письма по убыванию релевантности"
+    )
+    
+    count: int = Field(
+        ...,
+        description="Количество писем в ответе"
+    )
+    
+    processing_time_ms: float = Field(
+        ...,
+        description="Время поиска в миллисекундах",
+        ge=0
+    )
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "query": "счет",
+                "results": [
+                    {
+                        "id": 42,
+                        "uid": "user@example.com:INBOX:1234",
+                        "sender": "billing@company.com",
+                        "subject": "Счет №123",
+                        "date": "2025-10-25T12:00:00",
+                        "folder": "INBOX",
+                        "snippet": "<b>Счет</b> №123",
+                        "score": -7.8
+                    }
+                ],
+                "count": 1,
+                "processing_time_ms": 1.2
+            }
+        }
@@ -0,0 +1,82 @@
+"""
+SolarMail REST API - Sync Models
+Request/Response schemas for synchronization status
+"""
+
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class SyncStatusResponse(BaseModel):
+    """
+    Статус синхронизации аккаунта
+    """
+    account_email: str = Field(
+        ...,
+        description="Email аккаунта"
+    )
+    
+    last_sync_date: Optional[str] = Field(
+        default=None,
+        description="Дата последней синхронизации (ISO 8601)"
+    )
+    
+    last_sync_success: bool = Field(
+        ...,
+        description="Успешна ли последняя синхронизация"
+    )
+    
+    total_emails_synced: int = Field(
+        ...,
+        description="Всего синхронизировано писем"
+    )
+    
+    last_batch_count: int = Field(
+        default=0,
+        description="Писем в последней синхронизации"
+    )
+    
+    last_error_message: Optional[str] = Field(
+        default=None,
+        description="Ошибка последней синхронизации"
+    )
+    
+    updated_at: Optional[str] = Field(
+        default=None,
+        description="Время обновления статуса (UTC)"
+    )
+    
+    running: bool = Field(
+        default=False,
+        description="Выполняется ли сейчас синхронизация, запущенная через API"
+    )
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "account_email": "user@example.com",
+                "last_sync_date": "2025-10-25T12:00:00",
+                "last_sync_success": True,
+                "total_emails_synced": 1234,
+                "last_batch_count": 12,
+                "last_error_message": None,
+                "updated_at": "2025-10-25 09:00:05",
+                "running": False
+            }
+        }
+
+
+class SyncTriggerResponse(BaseModel):
+    """
+    Ответ на запуск синхронизации
+    """
+    status: str = Field(
+        ...,
+        description="started - запущена, running - уже выполняется",
+        examples=["started", "running"]
+    )
+    
+    message: str = Field(
+        ...,
+        description="Описание"
+    )
@@ -5,6 +5,7 @@ Sprint 0.3.2: AI Email Analysis Endpoints
 
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import JSONResponse
+from typing import Optional
 import sys
 import os
 import json
@@ -20,6 +21,8 @@ except ImportError:
     TRANSFORMER_AVAILABLE = False
     print("⚠️  AIParserTransformer not available")
 
+from analysis_cache import AnalysisCache
+
 from models.email_analysis import (
     EmailAnalysisRequest,
     EmailAnalysisResponse,
@@ -28,6 +31,8 @@ from models.email_analysis import (
     ErrorResponse
 )
 from core.config import get_settings, APISettings
+from core.inference import InferenceScheduler
+from routes.emails import get_db, DatabaseManager
 
 
 # Создаем router
@@ -44,6 +49,12 @@ router = APIRouter(
 # Глобальный экземпляр анализатора (инициализируется при старте)
 _ai_parser: AIParserTransformer = None
 
+# Планировщик микробатчей поверх _ai_parser
+_scheduler: InferenceScheduler = None
+
+# Кэш результатов анализа (память процесса + таблица analysis_cache)
+_analysis_cache: AnalysisCache = None
+
 
 def get_ai_parser(settings: APISettings = Depends(get_settings)) -> AIParserTransformer:
     """
@@ -63,7 +74,16 @@ def get_ai_parser(settings: APISettings = Depends(get_settings)) -> AIParserTran
             _ai_parser = AIParserTransformer(
                 model_name=settings.ai_model_name,
                 use_gpu=settings.ai_use_gpu,
-                fallback_to_mock=settings.ai_fallback_to_mock
+                fallback_to_mock=settings.ai_fallback_to_mock,
+                batch_size=settings.ai_batch_size,
+                backend=settings.ai_backend,
+                onnx_quantize=settings.ai_onnx_quantize,
+                onnx_threads=settings.ai_onnx_threads or None,
+                category_method=settings.ai_category_method,
+                embedding_model=settings.ai_embedding_model,
+                cascade=settings.ai_cascade,
+                cascade_threshold=settings.ai_cascade_threshold,
+                cascade_margin=settings.ai_cascade_margin
             )
             print(f"✅ AIParserTransformer initialized: {_ai_parser.get_model_info()['type']}")
         except Exception as e:
@@ -75,6 +95,63 @@ def get_ai_parser(settings: APISettings = Depends(get_settings)) -> AIParserTran
     return _ai_parser
 
 
+def get_analysis_cache(
+    db: DatabaseManager = Depends(get_db),
+    settings: APISettings = Depends(get_settings)
+) -> Optional[AnalysisCache]:
+    """
+    Dependency для получения кэша анализа (None, если кэш выключен)
+    Постоянный уровень - таблица analysis_cache в БД писем
+    """
+    global _analysis_cache
+    
+    if _analysis_cache is None and settings.ai_cache_enabled:
+        _analysis_cache = AnalysisCache(
+            db,
+            memory_size=settings.ai_cache_memory_size,
+            max_entries=settings.ai_cache_max_entries
+        )
+    
+    return _analysis_cache
+
+
+def get_scheduler(
+    ai_parser: AIParserTransformer = Depends(get_ai_parser),
+    analysis_cache: Optional[AnalysisCache] = Depends(get_analysis_cache),
+    settings: APISettings = Depends(get_settings)
+) -> InferenceScheduler:
+    """
+    Dependency для получения планировщика инференса
+    Конкурентные запросы анализа объединяются в батчи на его воркере;
+    письма, уже найденные в кэше анализа, в модель не попадают
+    """
+    global _scheduler
+    
+    if _scheduler is None:
+        if analysis_cache is not None:
+            analyze_batch = lambda emails: analysis_cache.analyze(emails, ai_parser)
+        else:
+            analyze_batch = ai_parser.analyze_emails
+        
+        _scheduler = InferenceScheduler(
+            analyze_batch,
+            max_batch_size=settings.ai_batch_max_size,
+            max_wait_ms=settings.ai_batch_max_wait_ms
+        )
+    
+    return _scheduler
+
+
+def shutdown_scheduler():
+    """Останавливает воркер планировщика и отпускает кэш анализа (при остановке приложения)"""
+    global _scheduler, _analysis_cache
+    
+    if _scheduler is not None:
+        _scheduler.close()
+        _scheduler = None
+    _analysis_cache = None
+
+
 @router.post(
     "",
     response_model=EmailAnalysisResponse,
@@ -84,7 +161,7 @@ def get_ai_parser(settings: APISettings = Depends(get_settings)) -> AIParserTran
 )
 async def analyze_email(
     request: EmailAnalysisRequest,
-    ai_parser: AIParserTransformer = Depends(get_ai_parser)
+    scheduler: InferenceScheduler = Depends(get_scheduler)
 ) -> EmailAnalysisResponse:
     """
     ## Анализ письма с помощью AI
@@ -121,11 +198,8 @@ async def analyze_email(
     ```
     """
     try:
-        # Выполняем AI-анализ
-        analysis_result = ai_parser.analyze_email(
-            subject=request.subject,
-            body=request.body
-        )
+        # AI-анализ в ближайшем батче планировщика (event loop не блокируется)
+        analysis_result = await scheduler.submit(request.subject, request.body)
         
         # Парсим JSON из результата
         entities = json.loads(analysis_result.get('entities_json', '{}'))
@@ -147,7 +221,7 @@ async def analyze_email(
         )
         
         return response
-        
+    
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -164,7 +238,7 @@ async def analyze_email(
 )
 async def batch_analyze_emails(
     request: BatchEmailAnalysisRequest,
-    ai_parser: AIParserTransformer = Depends(get_ai_parser)
+    scheduler: InferenceScheduler = Depends(get_scheduler)
 ) -> BatchEmailAnalysisResponse:
     """
     ## Пакетный анализ писем
@@ -191,13 +265,12 @@ async def batch_analyze_emails(
         start_time = time.time()
         results = []
         
-        # Анализируем каждое письмо
-        for email_request in request.emails:
-            analysis_result = ai_parser.analyze_email(
-                subject=email_request.subject,
-                body=email_request.body
-            )
-            
+        # Все письма запроса уходят в планировщик сразу и анализируются батчами
+        analysis_results = await scheduler.submit_many(
+            [(email_request.subject, email_request.body) for email_request in request.emails]
+        )
+        
+        for email_request, analysis_result in zip(request.emails, analysis_results):
             # Парсим JSON
             entities = json.loads(analysis_result.get('entities_json', '{}'))
             keywords = json.loads(analysis_result.get('keywords_json', '{}'))
@@ -232,7 +305,7 @@ async def batch_analyze_emails(
         )
         
         return batch_response
-        
+    
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -270,6 +343,10 @@ async def get_model_info(
     """
     try:
         model_info = ai_parser.get_model_info()
+        if _scheduler is not None:
+            model_info['scheduler'] = _scheduler.get_stats()
+        if _analysis_cache is not None:
+            model_info['analysis_cache'] = _analysis_cache.get_stats()
         return model_info
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,212 @@
+"""
+SolarMail REST API - Email Routes
+Доступ к кэшу синхронизированных писем
+"""
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from typing import List, Optional
+import sys
+import os
+import time
+
+# Добавляем путь к core/sync для импорта DatabaseManager
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../core/sync'))
+
+from db_manager import DatabaseManager
+
+from models.emails import EmailResponse, EmailSearchResponse, EmailSearchResult
+from models.email_analysis import ErrorResponse
+from core.config import get_settings, APISettings
+from core.caching import make_etag, http_date, cache_headers, is_not_modified, not_modified
+
+
+# Создаем router
+router = APIRouter(
+    prefix="/emails",
+    tags=["Emails"],
+    responses={
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+        422: {"model": ErrorResponse, "description": "Validation Error"}
+    }
+)
+
+
+# Глобальный менеджер БД (подключения живут все время работы API)
+_db: DatabaseManager = None
+
+
+def get_db(settings: APISettings = Depends(get_settings)) -> DatabaseManager:
+    """
+    Dependency для получения DatabaseManager
+    Инициализируется один раз при первом запросе
+    """
+    global _db
+    
+    if _db is None:
+        try:
+            _db = DatabaseManager(settings.db_path)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to open database: {str(e)}"
+            )
+    
+    return _db
+
+
+# Обычная функция: FastAPI выполняет ее в пуле потоков, запрос к SQLite не блокирует event loop
+@router.get(
+    "/search",
+    response_model=EmailSearchResponse,
+    summary="Search Emails",
+    description="Полнотекстовый поиск по теме, отправителю и тексту писем в кэше",
+    response_description="Найденные письма по убыванию релевантности"
+)
+def search_emails(
+    q: str = Query(..., min_length=1, max_length=500, description="Строка поиска, \"слово*\" - префикс"),
+    limit: int = Query(20, ge=1, le=100, description="Максимум результатов"),
+    offset: int = Query(0, ge=0, description="Смещение"),
+    prefix: bool = Query(False, description="Искать все слова как префиксы (поиск по мере ввода)"),
+    db: DatabaseManager = Depends(get_db)
+) -> EmailSearchResponse:
+    """
+    ## Полнотекстовый поиск писем
+    
+    Поиск идет по FTS5-индексу (русский и английский текст, без учета регистра,
+    "ё" = "е"), все слова запроса должны встретиться в письме.
+    Совпадение в теме ранжируется выше, чем в тексте.
+    
+    ### Example Request:
+    `GET /api/v1/emails/search?q=счет оплат*&limit=10`
+    
+    ### Example Response:
+    ```json
+    {
+      "query": "счет оплат*",
+      "results": [
+        {
+          "id": 42,
+          "uid": "user@example.com:INBOX:1234",
+          "sender": "billing@company.com",
+          "subject": "Счет №123",
+          "date": "2025-10-25T12:00:00",
+          "folder": "INBOX",
+          "snippet": "<b>Счет</b> №123 - <b>оплата</b> до пятницы",
+          "score": -7.8
+        }
+      ],
+      "count": 1,
+      "processing_time_ms": 1.2
+    }
+    ```
+    """
+    try:
+        start_time = time.perf_counter()
+        rows = db.search(q, limit=limit, offset=offset, prefix=prefix)
+        processing_time_ms = (time.perf_counter() - start_time) * 1000
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Search failed: {str(e)}"
+        )
+    
+    results = [EmailSearchResult(**row) for row in rows]
+    return EmailSearchResponse(
+        query=q,
+        results=results,
+        count=len(results),
+        processing_time_ms=processing_time_ms
+    )
+
+
+def cache_validators(db: DatabaseManager, *parts) -> dict:
+    """
+    Заголовки ETag / Last-Modified по версии кэша писем
+    
+    Args:
+        db: DatabaseManager
+        parts: Что еще отличает ответ (id письма и т.п.)
+    """
+    version = db.get_cache_version()
+    etag = make_etag(version['version'], *parts)
+    return cache_headers(etag, http_date(version['updated_at']))
+
+
+@router.get(
+    "",
+    response_model=List[EmailResponse],
+    summary="List Emails",
+    description="Письма из кэша от новых к старым с keyset-пагинацией",
+    response_description="Страница писем; курсор следующей - в заголовке X-Next-Cursor"
+)
+def list_emails(
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100, description="Писем на странице"),
+    cursor: Optional[str] = Query(None, max_length=500, description="X-Next-Cursor предыдущей страницы"),
+    with_meta: bool = Query(False, description="Добавить AI-метаданные"),
+    db: DatabaseManager = Depends(get_db)
+):
+    """
+    ## Список писем
+    
+    Страницы отдаются по курсору (date, id): следующая страница стоит
+    одинаково в начале и в конце ящика, новые письма не сдвигают страницы.
+    Курсор следующей страницы - в заголовке `X-Next-Cursor` (и `Link: rel="next"`),
+    на последней странице заголовка нет.
+    
+    Ответ содержит `ETag` и `Last-Modified`: при неизменном кэше запрос
+    с `If-None-Match` получает `304 Not Modified` без чтения писем.
+    
+    ### Example Request:
+    `GET /api/v1/emails?limit=20&cursor=WyIyMDI1LTEwLTI1VDEyOjAwOjAwIiwgNDJd`
+    """
+    headers = cache_validators(db)
+    if is_not_modified(request, headers["ETag"], headers.get("Last-Modified")):
+        return not_modified(headers)
+    
+    try:
+        page = db.get_emails_page(limit=limit, cursor=cursor, with_meta=with_meta)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    response.headers.update(headers)
+    if page['next_cursor']:
+        response.headers["X-Next-Cursor"] = page['next_cursor']
+        next_url = request.url.include_query_params(cursor=page['next_cursor'])
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    
+    return page['emails']
+
+
+@router.get(
+    "/{email_id}",
+    response_model=EmailResponse,
+    summary="Get Email",
+    description="Письмо из кэша вместе с AI-метаданными",
+    responses={404: {"model": ErrorResponse, "description": "Email not found"}}
+)
+def get_email(
+    email_id: int,
+    request: Request,
+    response: Response,
+    db: DatabaseManager = Depends(get_db)
+):
+    """
+    ## Письмо по ID
+    
+    Поддерживает `If-None-Match` / `If-Modified-Since` (304 Not Modified).
+    """
+    headers = cache_validators(db, email_id)
+    if is_not_modified(request, headers["ETag"], headers.get("Last-Modified")):
+        return not_modified(headers)
+    
+    email = db.get_email(email_id)
+    if email is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Email {email_id} not found"
+        )
+    
+    response.headers.update(headers)
+    return email
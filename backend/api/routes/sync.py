@@ -0,0 +1,163 @@
+"""
+SolarMail REST API - Sync Routes
+Статус синхронизации и запуск SolarSync в фоне
+"""
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from typing import Callable
+import logging
+import sys
+import os
+import threading
+
+# Добавляем путь к core/sync для импорта SolarSync
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../../core/sync'))
+
+from solar_sync import SolarSync
+
+from models.sync import SyncStatusResponse, SyncTriggerResponse
+from models.email_analysis import ErrorResponse
+from core.config import get_settings, APISettings
+from core.caching import make_etag, http_date, cache_headers, is_not_modified, not_modified
+from routes.emails import get_db, DatabaseManager
+
+
+logger = logging.getLogger(__name__)
+
+
+# Создаем router
+router = APIRouter(
+    prefix="/sync",
+    tags=["Sync"],
+    responses={
+        500: {"model": ErrorResponse, "description": "Internal Server Error"}
+    }
+)
+
+
+# Фоновая синхронизация: одновременно выполняется не больше одной
+_sync_lock = threading.Lock()
+_sync_thread: threading.Thread = None
+
+
+def get_sync_factory(
+    settings: APISettings = Depends(get_settings),
+    db: DatabaseManager = Depends(get_db)
+) -> Callable[[], SolarSync]:
+    """
+    Dependency: фабрика SolarSync, пишущего в тот же кэш, что читает API
+    
+    Учетные данные IMAP берутся из core/sync/config.py (как у SolarSync по умолчанию).
+    """
+    return lambda: SolarSync(enable_ai=settings.sync_enable_ai, db=db)
+
+
+def is_sync_running() -> bool:
+    """Выполняется ли сейчас синхронизация, запущенная через API"""
+    return _sync_thread is not None and _sync_thread.is_alive()
+
+
+def _run_sync(factory: Callable[[], SolarSync]):
+    """Тело фонового потока: smart_sync сам пишет результат и ошибку в sync_status"""
+    try:
+        factory().smart_sync()
+        logger.info("✅ Background sync finished")
+    except Exception as e:
+        logger.error(f"❌ Background sync failed: {str(e)}", exc_info=True)
+
+
+@router.get(
+    "/status",
+    response_model=SyncStatusResponse,
+    summary="Sync Status",
+    description="Статус синхронизации аккаунта",
+    responses={404: {"model": ErrorResponse, "description": "Account not found"}}
+)
+def get_sync_status(
+    request: Request,
+    response: Response,
+    email: str = Query(..., min_length=3, max_length=320, description="Email аккаунта"),
+    db: DatabaseManager = Depends(get_db)
+):
+    """
+    ## Статус синхронизации
+    
+    Дашборд опрашивает этот endpoint постоянно: ответ содержит `ETag` и
+    `Last-Modified` (по `sync_status.updated_at`), при неизменном статусе
+    запрос с `If-None-Match` получает `304 Not Modified`.
+    
+    ### Example Response:
+    ```json
+    {
+      "account_email": "user@example.com",
+      "last_sync_date": "2025-10-25T12:00:00",
+      "last_sync_success": true,
+      "total_emails_synced": 1234,
+      "last_batch_count": 12,
+      "last_error_message": null,
+      "updated_at": "2025-10-25 09:00:05",
+      "running": false
+    }
+    ```
+    """
+    status = db.get_sync_status(email)
+    if status is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No sync status for {email}"
+        )
+    
+    running = is_sync_running()
+    headers = cache_headers(
+        make_etag(email, status['updated_at'], running),
+        http_date(status['updated_at'])
+    )
+    if is_not_modified(request, headers["ETag"], headers.get("Last-Modified")):
+        return not_modified(headers)
+    
+    response.headers.update(headers)
+    return SyncStatusResponse(
+        account_email=status['account_email'],
+        last_sync_date=status['last_sync_date'],
+        last_sync_success=bool(status['last_sync_success']),
+        total_emails_synced=status['total_emails_synced'] or 0,
+        last_batch_count=status['last_batch_count'] or 0,
+        last_error_message=status['last_error_message'],
+        updated_at=status['updated_at'],
+        running=running
+    )
+
+
+@router.post(
+    "/trigger",
+    response_model=SyncTriggerResponse,
+    status_code=202,
+    summary="Trigger Sync",
+    description="Запускает SolarSync.smart_sync в фоне и сразу отвечает"
+)
+def trigger_sync(
+    factory: Callable[[], SolarSync] = Depends(get_sync_factory)
+) -> SyncTriggerResponse:
+    """
+    ## Запуск синхронизации
+    
+    Синхронизация идет в фоновом потоке, ответ `202 Accepted` приходит сразу.
+    Если синхронизация уже выполняется, новая не запускается (`status: running`).
+    Ход и результат видны в `GET /sync/status` (`running`, `last_sync_success`).
+    """
+    global _sync_thread
+    
+    with _sync_lock:
+        if is_sync_running():
+            return SyncTriggerResponse(
+                status="running",
+                message="Синхронизация уже выполняется"
+            )
+        
+        _sync_thread = threading.Thread(target=_run_sync, args=(factory,), name="solar-sync", daemon=True)
+        _sync_thread.start()
+    
+    return SyncTriggerResponse(
+        status="started",
+        message="Синхронизация запущена"
+    )
@@ -12,12 +12,27 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from main import app
+from routes import analyze
+from routes.emails import get_db, DatabaseManager
+from analysis_cache import AnalysisCache
 
 
 # Test client
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def db(tmp_path):
+    """Временная БД (таблица analysis_cache) вместо settings.db_path"""
+    database = DatabaseManager(str(tmp_path / "test_analyze.db"))
+    app.dependency_overrides[get_db] = lambda: database
+    yield database
+    app.dependency_overrides.clear()
+    # Планировщик и кэш держат ссылку на БД теста
+    analyze.shutdown_scheduler()
+    database.close()
+
+
 class TestAnalyzeEndpoint:
     """Тесты для /api/v1/analyze endpoint"""
     
@@ -225,6 +240,86 @@ class TestModelInfoEndpoint:
         assert data["type"] in ["transformer-ml", "mock-fallback"]
 
 
+class FakeAnalyzer:
+    """Анализатор с заданной версией модели, считающий вызовы"""
+    
+    def __init__(self, model: str, version: str):
+        self.identity = (model, version)
+        self.analyzed = 0
+    
+    def get_cache_identity(self):
+        return self.identity
+    
+    def analyze_emails(self, emails):
+        self.analyzed += len(emails)
+        return [{'category': 'News', 'ai_model': self.identity[0], 'processing_time_ms': 5} for _ in emails]
+
+
+class TestAnalysisCache:
+    """Тесты кэша результатов анализа"""
+    
+    def test_repeated_email_hits_cache(self):
+        """Повтор письма (с другими пробелами) берется из кэша"""
+        first = client.post("/api/v1/analyze", json={"subject": "Weekly digest", "body": "Top stories\nof the week"})
+        second = client.post("/api/v1/analyze", json={"subject": "Weekly digest ", "body": "Top stories of  the week"})
+        
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert second.json()["category"] == first.json()["category"]
+        assert second.json()["processing_time_ms"] == 0
+        
+        stats = client.get("/api/v1/analyze/model-info").json()["analysis_cache"]
+        assert stats["misses"] == 1
+        assert stats["memory_hits"] == 1
+    
+    def test_cache_survives_restart(self, db):
+        """Результаты переживают перезапуск через таблицу analysis_cache"""
+        email = {"subject": "Build #42 passed", "body": "All checks have passed"}
+        assert client.post("/api/v1/analyze", json=email).status_code == 200
+        assert db.get_cached_analyses_count() == 1
+        
+        # Новый процесс: память кэша пуста
+        analyze.shutdown_scheduler()
+        response = client.post("/api/v1/analyze/batch", json={"emails": [email, email]})
+        assert response.status_code == 200
+        
+        stats = client.get("/api/v1/analyze/model-info").json()["analysis_cache"]
+        assert stats["db_hits"] == 1
+        assert stats["duplicates"] == 1
+        assert stats["misses"] == 0
+    
+    def test_model_upgrade_invalidates_only_that_model(self, db):
+        """Новая версия модели удаляет только записи этой модели"""
+        cache = AnalysisCache(db)
+        emails = [("Newsletter", "Issue 1"), ("Newsletter", "Issue 2")]
+        cache.analyze(emails, FakeAnalyzer("sentiment-model", "v1"))
+        cache.analyze(emails, FakeAnalyzer("other-model", "v1"))
+        assert db.get_cached_analyses_count() == 4
+        
+        upgraded = FakeAnalyzer("sentiment-model", "v2")
+        cache.analyze(emails[:1], upgraded)
+        assert upgraded.analyzed == 1
+        assert db.get_cached_analyses_count() == 3
+        
+        other = FakeAnalyzer("other-model", "v1")
+        cache.analyze(emails, other)
+        assert other.analyzed == 0
+    
+    def test_size_based_eviction(self, db):
+        """Сверх max_entries вытесняются давно не использованные записи"""
+        cache = AnalysisCache(db, memory_size=0, max_entries=10)
+        analyzer = FakeAnalyzer("model", "v1")
+        for i in range(25):
+            cache.analyze([(f"Alert {i}", "CPU usage is high")], analyzer)
+        
+        assert db.get_cached_analyses_count() <= 10
+        assert cache.get_stats()["evicted"] >= 15
+        
+        # Последнее письмо осталось в кэше
+        cache.analyze([("Alert 24", "CPU usage is high")], analyzer)
+        assert analyzer.analyzed == 25
+
+
 def test_api_info():
     """Тест корневого endpoint API"""
     response = client.get("/api/v1")
@@ -0,0 +1,280 @@
+"""
+SolarMail REST API - Email Endpoint Tests
+Testing access to the email cache
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+import sys
+import os
+
+# Добавляем путь к API
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from main import app
+from routes.emails import get_db, DatabaseManager
+
+
+# Test client
+client = TestClient(app)
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Временный кэш писем вместо settings.db_path"""
+    database = DatabaseManager(str(tmp_path / "test_emails.db"))
+    database.insert_emails_bulk([
+        {
+            "uid": "me@example.com:INBOX:1",
+            "sender": "billing@company.com",
+            "subject": "Счёт №123",
+            "date": "2025-10-25T12:00:00",
+            "body_preview": "Оплатите счёт до пятницы",
+            "folder": "INBOX"
+        },
+        {
+            "uid": "me@example.com:INBOX:2",
+            "sender": "manager@company.com",
+            "subject": "Meeting tomorrow",
+            "date": "2025-10-24T09:00:00",
+            "body_preview": "Don't forget the meeting, invoice attached",
+            "folder": "INBOX"
+        }
+    ])
+    
+    app.dependency_overrides[get_db] = lambda: database
+    yield database
+    app.dependency_overrides.clear()
+    database.close()
+
+
+class TestSearchEndpoint:
+    """Тесты для /api/v1/emails/search endpoint"""
+    
+    def test_search_russian(self, db):
+        """Тест поиска по-русски: без учета регистра, "е" находит "ё" """
+        response = client.get("/api/v1/emails/search", params={"q": "СЧЕТ"})
+        
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert data["count"] == 1
+        assert data["results"][0]["subject"] == "Счёт №123"
+        assert "<b>" in data["results"][0]["snippet"]
+    
+    def test_search_ranks_subject_first(self, db):
+        """Тест ранжирования: совпадение в теме выше совпадения в тексте"""
+        db.insert_emails_bulk([{
+            "uid": "me@example.com:INBOX:3",
+            "sender": "hr@company.com",
+            "subject": "Отпуск",
+            "date": "2025-10-26T10:00:00",
+            "body_preview": "Напоминаю про meeting в пятницу"
+        }])
+        
+        response = client.get("/api/v1/emails/search", params={"q": "meeting"})
+        
+        assert response.status_code == 200
+        
+        uids = [result["uid"] for result in response.json()["results"]]
+        assert uids == ["me@example.com:INBOX:2", "me@example.com:INBOX:3"]
+    
+    def test_search_prefix(self, db):
+        """Тест префиксного поиска"""
+        response = client.get("/api/v1/emails/search", params={"q": "invo*"})
+        assert response.json()["count"] == 1
+        
+        response = client.get("/api/v1/emails/search", params={"q": "опла пятн", "prefix": True})
+        assert response.json()["count"] == 1
+        
+        response = client.get("/api/v1/emails/search", params={"q": "invo"})
+        assert response.json()["count"] == 0
+    
+    def test_search_sender(self, db):
+        """Тест поиска по адресу отправителя"""
+        response = client.get("/api/v1/emails/search", params={"q": "billing@company.com"})
+        
+        assert response.status_code == 200
+        assert response.json()["results"][0]["uid"] == "me@example.com:INBOX:1"
+    
+    def test_search_fts_syntax_is_literal(self, db):
+        """Тест запроса с синтаксисом FTS5 (не должно быть ошибки)"""
+        response = client.get("/api/v1/emails/search", params={"q": 'meeting OR "NEAR(x'})
+        
+        assert response.status_code == 200
+        assert response.json()["count"] == 0
+    
+    def test_search_after_delete(self, db):
+        """Тест удаления письма из индекса"""
+        db.clear_database()
+        
+        response = client.get("/api/v1/emails/search", params={"q": "meeting"})
+        
+        assert response.status_code == 200
+        assert response.json()["count"] == 0
+    
+    def test_search_snippet_escapes_html(self, db):
+        """Тест snippet: HTML из письма экранируется, <b> только вокруг совпадений"""
+        db.insert_emails_bulk([{
+            "uid": "me@example.com:INBOX:3",
+            "sender": "attacker@example.com",
+            "subject": "Payment",
+            "date": "2025-10-26T10:00:00",
+            "body_preview": "<img src=x onerror=alert(1)> invoice paid & <script>done</script>"
+        }])
+        
+        response = client.get("/api/v1/emails/search", params={"q": "paid"})
+        
+        assert response.status_code == 200
+        snippet = response.json()["results"][0]["snippet"]
+        assert "<img" not in snippet and "<script>" not in snippet
+        assert snippet == (
+            "&lt;img src=x onerror=alert(1)&gt; invoice <b>paid</b> &amp; "
+            "&lt;script&gt;done&lt;/script&gt;"
+        )
+    
+    def test_search_empty_query(self, db):
+        """Тест с пустым запросом (должна быть ошибка)"""
+        response = client.get("/api/v1/emails/search", params={"q": ""})
+        
+        assert response.status_code == 422
+
+
+
+class TestListEndpoint:
+    """Тесты для /api/v1/emails endpoint"""
+    
+    def test_list_newest_first(self, db):
+        """Тест списка писем от новых к старым"""
+        response = client.get("/api/v1/emails")
+        
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert [email["subject"] for email in data] == ["Счёт №123", "Meeting tomorrow"]
+        assert "X-Next-Cursor" not in response.headers
+    
+    def test_list_pagination(self, db):
+        """Тест постраничного обхода по курсору"""
+        db.insert_emails_bulk([
+            {
+                "uid": f"me@example.com:INBOX:{100 + i}",
+                "sender": "news@company.com",
+                "subject": f"Newsletter #{i}",
+                "date": f"2025-10-{10 + i:02d}T08:00:00",
+                "body_preview": "Weekly news"
+            }
+            for i in range(5)
+        ])
+        
+        seen = []
+        params = {"limit": 3}
+        while True:
+            response = client.get("/api/v1/emails", params=params)
+            assert response.status_code == 200
+            seen.extend(email["id"] for email in response.json())
+            
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            assert 'rel="next"' in response.headers["Link"]
+            params = {"limit": 3, "cursor": cursor}
+        
+        assert len(seen) == 7
+        assert len(set(seen)) == 7
+    
+    def test_list_invalid_cursor(self, db):
+        """Тест с поврежденным курсором (должна быть ошибка)"""
+        response = client.get("/api/v1/emails", params={"cursor": "not-a-cursor"})
+        
+        assert response.status_code == 400
+    
+    def test_list_not_modified(self, db):
+        """Тест ETag: повторный запрос без изменений получает 304"""
+        response = client.get("/api/v1/emails")
+        etag = response.headers["ETag"]
+        
+        response = client.get("/api/v1/emails", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        
+        # Новое письмо меняет версию кэша
+        db.insert_emails_bulk([{
+            "uid": "me@example.com:INBOX:3",
+            "sender": "hr@company.com",
+            "subject": "Отпуск",
+            "date": "2025-10-26T10:00:00",
+            "body_preview": ""
+        }])
+        
+        response = client.get("/api/v1/emails", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+    
+    def test_list_modified_by_folder_changes(self, db):
+        """Тест ETag: флаги и EXPUNGE delta-синхронизации меняют версию кэша"""
+        db.insert_emails_bulk([{
+            "uid": "me@example.com:INBOX:3",
+            "sender": "hr@company.com",
+            "subject": "Отпуск",
+            "date": "2025-10-26T10:00:00",
+            "account_email": "me@example.com",
+            "folder": "INBOX",
+            "imap_uid": 3,
+            "flags": ""
+        }])
+        etag = client.get("/api/v1/emails").headers["ETag"]
+        
+        # Флаги меняются без новых писем и без sync_status
+        db.apply_folder_changes("me@example.com", "INBOX", {3: "\\Seen"}, [])
+        response = client.get("/api/v1/emails", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        
+        response = client.get("/api/v1/emails", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        
+        # Удаление письма на сервере (EXPUNGE)
+        db.apply_folder_changes("me@example.com", "INBOX", {}, [3])
+        response = client.get("/api/v1/emails", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+
+
+class TestGetEmailEndpoint:
+    """Тесты для /api/v1/emails/{id} endpoint"""
+    
+    def test_get_email_with_meta(self, db):
+        """Тест письма с AI-метаданными"""
+        email_id = db.get_all_emails()[0]["id"]
+        db.insert_email_meta(email_id, {
+            "sentiment": "neutral",
+            "sentiment_score": 0.5,
+            "priority": "high",
+            "priority_score": 0.9,
+            "category": "Docs",
+            "category_confidence": 0.8
+        })
+        
+        response = client.get(f"/api/v1/emails/{email_id}")
+        
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert data["id"] == email_id
+        assert data["priority"] == "high"
+        assert data["category"] == "Docs"
+        
+        response = client.get(f"/api/v1/emails/{email_id}", headers={"If-None-Match": response.headers["ETag"]})
+        assert response.status_code == 304
+    
+    def test_get_email_not_found(self, db):
+        """Тест несуществующего письма"""
+        response = client.get("/api/v1/emails/999999")
+        
+        assert response.status_code == 404
+
+
+if __name__ == "__main__":
+    # Запуск тестов
+    pytest.main([__file__, "-v"])
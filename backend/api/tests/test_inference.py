@@ -0,0 +1,88 @@
+"""
+SolarMail REST API - Inference Scheduler Tests
+Testing micro-batching of concurrent analyze requests
+"""
+
+import pytest
+import asyncio
+import threading
+import sys
+import os
+
+# Добавляем путь к API
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.inference import InferenceScheduler
+
+
+class FakeModel:
+    """Модель-заглушка: запоминает размеры батчей и поток, в котором считает"""
+    
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.threads = set()
+        self.fail = fail
+    
+    def __call__(self, emails):
+        self.batches.append(len(emails))
+        self.threads.add(threading.current_thread().name)
+        if self.fail:
+            raise ValueError("model broke")
+        return [{'subject': subject, 'length': len(body)} for subject, body in emails]
+
+
+def run_concurrently(scheduler, count):
+    """count одновременных запросов submit"""
+    async def main():
+        return await asyncio.gather(*(scheduler.submit(f"email {i}", "x" * i) for i in range(count)))
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_batches():
+    """Тест: конкурентные запросы объединяются в батчи, результаты не путаются"""
+    model = FakeModel()
+    scheduler = InferenceScheduler(model, max_batch_size=8, max_wait_ms=50)
+    
+    results = run_concurrently(scheduler, 20)
+    scheduler.close()
+    
+    assert [result['subject'] for result in results] == [f"email {i}" for i in range(20)]
+    assert [result['length'] for result in results] == list(range(20))
+    assert sum(model.batches) == 20
+    assert max(model.batches) == 8
+    assert len(model.batches) < 20
+    assert model.threads == {"inference-scheduler"}
+    
+    stats = scheduler.get_stats()
+    assert stats['requests'] == 20
+    assert stats['largest_batch'] == 8
+
+
+def test_submit_many_keeps_order():
+    """Тест пакетного запроса: порядок результатов совпадает с порядком писем"""
+    model = FakeModel()
+    scheduler = InferenceScheduler(model, max_batch_size=4, max_wait_ms=1)
+    
+    emails = [(f"email {i}", "") for i in range(10)]
+    results = asyncio.run(scheduler.submit_many(emails))
+    scheduler.close()
+    
+    assert [result['subject'] for result in results] == [subject for subject, _ in emails]
+
+
+def test_model_error_fails_whole_batch():
+    """Тест: ошибка модели передается каждому запросу батча, воркер продолжает работу"""
+    model = FakeModel(fail=True)
+    scheduler = InferenceScheduler(model, max_batch_size=8, max_wait_ms=10)
+    
+    with pytest.raises(ValueError):
+        run_concurrently(scheduler, 3)
+    
+    model.fail = False
+    assert asyncio.run(scheduler.submit("after", ""))['subject'] == "after"
+    scheduler.close()
+
+
+if __name__ == "__main__":
+    # Запуск тестов
+    pytest.main([__file__, "-v"])
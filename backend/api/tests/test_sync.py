@@ -0,0 +1,131 @@
+"""
+SolarMail REST API - Sync Endpoint Tests
+Testing sync status and background sync trigger
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+import sys
+import os
+import threading
+
+# Добавляем путь к API
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from main import app
+from routes.emails import get_db, DatabaseManager
+from routes.sync import get_sync_factory
+
+
+# Test client
+client = TestClient(app)
+
+
+class FakeSync:
+    """SolarSync без IMAP: smart_sync ждет сигнала и пишет статус"""
+    
+    def __init__(self, db, release):
+        self.db = db
+        self.release = release
+    
+    def smart_sync(self):
+        self.release.wait(5)
+        self.db.update_sync_status("me@example.com", "2025-10-25T12:00:00", {"total": 2, "new": 2})
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Временный кэш с аккаунтом me@example.com"""
+    database = DatabaseManager(str(tmp_path / "test_sync.db"))
+    database.init_sync_status("me@example.com")
+    
+    app.dependency_overrides[get_db] = lambda: database
+    yield database
+    app.dependency_overrides.clear()
+    database.close()
+
+
+class TestSyncStatusEndpoint:
+    """Тесты для /api/v1/sync/status endpoint"""
+    
+    def test_sync_status(self, db):
+        """Тест статуса синхронизации"""
+        response = client.get("/api/v1/sync/status", params={"email": "me@example.com"})
+        
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert data["account_email"] == "me@example.com"
+        assert data["last_sync_success"] is False
+        assert data["total_emails_synced"] == 0
+        assert data["running"] is False
+    
+    def test_sync_status_not_modified(self, db):
+        """Тест ETag / Last-Modified: опрос без изменений получает 304"""
+        response = client.get("/api/v1/sync/status", params={"email": "me@example.com"})
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+        
+        response = client.get(
+            "/api/v1/sync/status",
+            params={"email": "me@example.com"},
+            headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        
+        response = client.get(
+            "/api/v1/sync/status",
+            params={"email": "me@example.com"},
+            headers={"If-Modified-Since": last_modified}
+        )
+        assert response.status_code == 304
+    
+    def test_sync_status_unknown_account(self, db):
+        """Тест неизвестного аккаунта"""
+        response = client.get("/api/v1/sync/status", params={"email": "nobody@example.com"})
+        
+        assert response.status_code == 404
+
+
+class TestSyncTriggerEndpoint:
+    """Тесты для /api/v1/sync/trigger endpoint"""
+    
+    def test_trigger_runs_in_background(self, db):
+        """Тест фонового запуска: ответ сразу, повторный запуск не дублирует синхронизацию"""
+        release = threading.Event()
+        started = []
+        
+        def factory():
+            started.append(True)
+            return FakeSync(db, release)
+        
+        app.dependency_overrides[get_sync_factory] = lambda: factory
+        
+        response = client.post("/api/v1/sync/trigger")
+        assert response.status_code == 202
+        assert response.json()["status"] == "started"
+        
+        response = client.post("/api/v1/sync/trigger")
+        assert response.json()["status"] == "running"
+        
+        status = client.get("/api/v1/sync/status", params={"email": "me@example.com"})
+        assert status.json()["running"] is True
+        
+        release.set()
+        from routes import sync
+        sync._sync_thread.join(5)
+        
+        status = client.get(
+            "/api/v1/sync/status",
+            params={"email": "me@example.com"},
+            headers={"If-None-Match": status.headers["ETag"]}
+        )
+        assert status.status_code == 200
+        assert status.json()["running"] is False
+        assert status.json()["last_sync_success"] is True
+        assert len(started) == 1
+
+
+if __name__ == "__main__":
+    # Запуск тестов
+    pytest.main([__file__, "-v"])
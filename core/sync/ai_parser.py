@@ -4,12 +4,45 @@ SolarMail - AI Parser Module
 Sprint 0.2: Mock-анализ на основе эвристики и ключевых слов
 """
 
-import re
+import os
 import json
 import time
-from typing import Dict, List, Any, Optional
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
 from datetime import datetime
 
+from keyword_matcher import KeywordMatcher
+from analysis_context import AnalysisContext
+
+
+# Частые ложные срабатывания поиска имен
+PERSON_STOP_WORDS = {'Subject', 'From', 'To', 'Date', 'Best Regards', 'Thank You'}
+
+# Писем в одной задаче пула процессов (analyze_parallel): достаточно, чтобы
+# передача писем и результатов между процессами была малой долей анализа
+PARALLEL_CHUNK_SIZE = 1000
+
+# Задач в работе на процесс: пока основной процесс записывает результаты,
+# у каждого процесса есть следующая пачка, а поток писем не читается целиком
+PARALLEL_PREFETCH = 2
+
+# Анализатор процесса пула (копия родительского, передается в initializer)
+_worker_parser: Optional['AIParser'] = None
+
+
+def _init_worker(parser: 'AIParser'):
+    """Initializer процесса пула: запоминает анализатор"""
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _analyze_chunk(emails: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Задача пула: анализ пачки пар (тема, тело) в процессе-работнике"""
+    return _worker_parser.analyze_emails(emails)
+
 
 class AIParser:
     """Интеллектуальный анализатор писем"""
@@ -87,6 +120,13 @@ class AIParser:
             ]
         }
         
+        # Все словари одним автоматом: один проход по тексту вместо `kw in text` по каждому слову
+        self.keyword_matcher = KeywordMatcher({
+            'priority': self.priority_keywords,
+            'category': self.category_keywords,
+            'sentiment': self.sentiment_keywords
+        })
+    
     def analyze_email(self, subject: str, body: str) -> Dict[str, Any]:
         """
         Анализирует письмо и возвращает JSON-структуру метаданных
@@ -100,23 +140,27 @@ class AIParser:
         """
         start_time = time.time()
         
-        # Объединяем тему и тело для анализа
-        full_text = f"{subject or ''} {body or ''}".lower()
+        # Объединяем тему и тело и разбиваем на слова один раз для всех под-анализов
+        context = AnalysisContext(subject, body)
+        full_text = context.lower
+        
+        # Совпадения ключевых слов всех словарей за один проход
+        counts = self._keyword_counts(full_text, context.words)
         
         # Анализируем приоритет
-        priority, priority_score = self._analyze_priority(full_text)
+        priority, priority_score = self._analyze_priority(full_text, counts)
         
         # Анализируем категорию
-        category, category_confidence = self._analyze_category(full_text)
+        category, category_confidence = self._analyze_category(full_text, counts)
         
         # Анализируем тональность
-        sentiment, sentiment_score = self._analyze_sentiment(full_text)
+        sentiment, sentiment_score = self._analyze_sentiment(full_text, counts)
         
         # Извлекаем сущности
-        entities = self._extract_entities(subject or '', body or '')
+        entities = self._extract_entities(context)
         
         # Извлекаем ключевые слова
-        keywords = self._extract_keywords(full_text)
+        keywords = self._extract_keywords(context)
         
         # Вычисляем время обработки
         processing_time_ms = int((time.time() - start_time) * 1000)
@@ -134,15 +178,30 @@ class AIParser:
             'processing_time_ms': processing_time_ms
         }
     
-    def _analyze_priority(self, text: str) -> tuple[str, float]:
+    def _keyword_counts(self, text: str, words: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Число совпавших ключевых слов по словарям (priority, category, sentiment) и классам
+        
+        Args:
+            text: Текст письма в нижнем регистре
+            words: Слова текста (AnalysisContext.words), если уже есть
+        """
+        return self.keyword_matcher.count(text, words)
+    
+    def _analyze_priority(self, text: str, counts: Optional[Dict[str, Dict[str, int]]] = None) -> tuple[str, float]:
         """
         Определяет приоритет письма
         
+        Args:
+            text: Текст письма в нижнем регистре
+            counts: Результат _keyword_counts(text), если уже посчитан
+        
         Returns:
             Tuple (priority, score)
         """
-        high_count = sum(1 for kw in self.priority_keywords['high'] if kw in text)
-        medium_count = sum(1 for kw in self.priority_keywords['medium'] if kw in text)
+        priority_counts = (counts or self._keyword_counts(text))['priority']
+        high_count = priority_counts['high']
+        medium_count = priority_counts['medium']
         
         if high_count > 0:
             score = min(0.7 + (high_count * 0.1), 1.0)
@@ -153,19 +212,18 @@ class AIParser:
         else:
             return 'low', 0.3
     
-    def _analyze_category(self, text: str) -> tuple[str, float]:
+    def _analyze_category(self, text: str, counts: Optional[Dict[str, Dict[str, int]]] = None) -> tuple[str, float]:
         """
         Определяет категорию письма
         
+        Args:
+            text: Текст письма в нижнем регистре
+            counts: Результат _keyword_counts(text), если уже посчитан
+        
         Returns:
             Tuple (category, confidence)
         """
-        category_scores = {}
-        
-        for category, keywords in self.category_keywords.items():
-            score = sum(1 for kw in keywords if kw in text)
-            if score > 0:
-                category_scores[category] = score
+        category_scores = self._category_scores(text, counts)
         
         if not category_scores:
             return 'General', 0.5
@@ -179,15 +237,34 @@ class AIParser:
         
         return best_category, confidence
     
-    def _analyze_sentiment(self, text: str) -> tuple[str, float]:
+    def _category_scores(self, text: str, counts: Optional[Dict[str, Dict[str, int]]] = None) -> Dict[str, int]:
+        """
+        Считает совпадения ключевых слов по категориям
+        
+        Args:
+            text: Текст письма в нижнем регистре
+            counts: Результат _keyword_counts(text), если уже посчитан
+        
+        Returns:
+            Словарь {категория: число совпадений} только для совпавших категорий
+        """
+        category_counts = (counts or self._keyword_counts(text))['category']
+        return {category: score for category, score in category_counts.items() if score > 0}
+    
+    def _analyze_sentiment(self, text: str, counts: Optional[Dict[str, Dict[str, int]]] = None) -> tuple[str, float]:
         """
         Определяет тональность письма
         
+        Args:
+            text: Текст письма в нижнем регистре
+            counts: Результат _keyword_counts(text), если уже посчитан
+        
         Returns:
             Tuple (sentiment, score)
         """
-        positive_count = sum(1 for kw in self.sentiment_keywords['positive'] if kw in text)
-        negative_count = sum(1 for kw in self.sentiment_keywords['negative'] if kw in text)
+        sentiment_counts = (counts or self._keyword_counts(text))['sentiment']
+        positive_count = sentiment_counts['positive']
+        negative_count = sentiment_counts['negative']
         
         # Вычисляем баланс
         total = positive_count + negative_count
@@ -204,46 +281,26 @@ class AIParser:
         else:
             return 'neutral', 0.5
     
-    def _extract_entities(self, subject: str, body: str) -> Dict[str, List[str]]:
+    def _extract_entities(self, context: AnalysisContext) -> Dict[str, List[str]]:
         """
         Извлекает сущности из письма (эмейлы, даты, имена)
         
+        Args:
+            context: Разобранный текст письма
+        
         Returns:
             Словарь с типами сущностей
         """
-        text = f"{subject} {body}"
-        
         entities = {
-            'emails': [],
-            'dates': [],
-            'urls': [],
+            'emails': list(set(context.emails())),
+            'dates': context.dates(),
+            'urls': list(set(context.urls())),
             'persons': []
         }
         
-        # Извлекаем email адреса
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        entities['emails'] = list(set(re.findall(email_pattern, text)))
-        
-        # Извлекаем даты (простые форматы)
-        date_patterns = [
-            r'\d{4}-\d{2}-\d{2}',  # 2025-10-25
-            r'\d{2}\.\d{2}\.\d{4}',  # 25.10.2025
-            r'\d{1,2}/\d{1,2}/\d{4}'  # 10/25/2025
-        ]
-        for pattern in date_patterns:
-            entities['dates'].extend(re.findall(pattern, text))
-        
-        # Извлекаем URLs
-        url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-        entities['urls'] = list(set(re.findall(url_pattern, text)))
-        
-        # Извлекаем имена (капитализированные слова, простая эвристика)
-        # Ищем слова с большой буквы, которые идут подряд (имя + фамилия)
-        name_pattern = r'\b[A-ZА-ЯЁ][a-zа-яё]+(?:\s+[A-ZА-ЯЁ][a-zа-яё]+)\b'
-        potential_names = re.findall(name_pattern, text)
+        # Имена: слова с большой буквы подряд (имя + фамилия), простая эвристика
         # Фильтруем частые ложные срабатывания
-        stop_words = {'Subject', 'From', 'To', 'Date', 'Best Regards', 'Thank You'}
-        entities['persons'] = [name for name in potential_names if name not in stop_words][:5]
+        entities['persons'] = [name for name in context.names() if name not in PERSON_STOP_WORDS][:5]
         
         # Ограничиваем количество сущностей
         for key in entities:
@@ -251,32 +308,18 @@ class AIParser:
         
         return entities
     
-    def _extract_keywords(self, text: str) -> Dict[str, List[str]]:
+    def _extract_keywords(self, context: AnalysisContext) -> Dict[str, List[str]]:
         """
         Извлекает ключевые слова из текста
         
+        Args:
+            context: Разобранный текст письма
+        
         Returns:
             Словарь с ключевыми словами
         """
-        # Удаляем стоп-слова и извлекаем значимые слова
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'from', 'is', 'was', 'are', 'were', 'been',
-            'в', 'и', 'на', 'с', 'по', 'для', 'от', 'к', 'из', 'это', 'быть'
-        }
-        
-        # Разбиваем на слова и фильтруем
-        words = re.findall(r'\b\w+\b', text.lower())
-        
-        # Подсчитываем частоту слов (исключая стоп-слова и короткие)
-        word_freq = {}
-        for word in words:
-            if len(word) > 3 and word not in stop_words:
-                word_freq[word] = word_freq.get(word, 0) + 1
-        
-        # Берем топ-10 наиболее частых слов
-        top_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:10]
-        keywords_list = [word for word, freq in top_keywords]
+        # Топ-10 наиболее частых значимых слов (без стоп-слов и коротких)
+        keywords_list = context.top_words(10)
         
         return {
             'keywords': keywords_list,
@@ -306,16 +349,20 @@ class AIParser:
         
         return topics[:3]  # Максимум 3 темы
     
-    def batch_analyze(self, emails: List[Dict]) -> List[Dict]:
+    def batch_analyze(self, emails: List[Dict], workers: Optional[int] = 1) -> List[Dict]:
         """
         Пакетный анализ писем для ускорения обработки
         
         Args:
             emails: Список словарей с полями 'subject' и 'body_preview'
+            workers: Процессов анализа (1 - в текущем процессе, 0/None - по числу ядер)
         
         Returns:
             Список словарей с AI-метаданными
         """
+        if workers != 1:
+            return [meta for _, chunk_results in self.analyze_parallel(emails, workers) for meta in chunk_results]
+        
         results = []
         
         for email in emails:
@@ -327,6 +374,88 @@ class AIParser:
         
         return results
     
+    def analyze_emails(self, emails: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Анализирует список писем (тот же интерфейс, что у AIParserTransformer)
+        
+        Args:
+            emails: Список пар (тема, тело)
+        
+        Returns:
+            Список словарей с AI-метаданными в порядке emails
+        """
+        return [self.analyze_email(subject, body) for subject, body in emails]
+    
+    def analyze_parallel(
+        self,
+        emails: Iterable[Dict],
+        workers: Optional[int] = None,
+        chunk_size: int = PARALLEL_CHUNK_SIZE
+    ) -> Iterator[Tuple[List[Dict], List[Dict[str, Any]]]]:
+        """
+        Анализирует поток писем пачками в пуле процессов
+        
+        Эвристика - чистый Python, и в одном процессе ее ограничивает GIL.
+        Поток писем режется на пачки по chunk_size, пачки анализируются в
+        workers процессах (у каждого своя копия анализатора), результаты
+        отдаются в порядке писем по мере готовности - их можно сразу
+        записывать (DatabaseManager.upsert_email_meta_bulk). В работе не
+        больше PARALLEL_PREFETCH пачек на процесс, поэтому поток читается
+        постепенно, а не целиком.
+        
+        Args:
+            emails: Итерируемые словари с полями 'subject' и 'body_preview'
+                    (остальные поля, например id, в процессы не передаются)
+            workers: Количество процессов (None/0 - по числу ядер, 1 - без пула)
+            chunk_size: Писем в пачке
+        
+        Returns:
+            Итератор пар (пачка писем, AI-метаданные пачки в том же порядке)
+        """
+        workers = workers or os.cpu_count() or 1
+        emails = iter(emails)
+        chunks = iter(lambda: list(islice(emails, chunk_size)), [])
+        
+        if workers == 1:
+            for chunk in chunks:
+                yield chunk, self.analyze_emails(self._email_texts(chunk))
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append((chunk, executor.submit(_analyze_chunk, self._email_texts(chunk))))
+                if len(pending) >= workers * PARALLEL_PREFETCH:
+                    chunk, future = pending.popleft()
+                    yield chunk, future.result()
+            
+            while pending:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+    
+    @staticmethod
+    def _email_texts(emails: List[Dict]) -> List[Tuple[str, str]]:
+        """Пары (тема, тело) из словарей писем"""
+        return [(email.get('subject', ''), email.get('body_preview', '')) for email in emails]
+    
+    def get_cache_identity(self) -> Tuple[str, str]:
+        """
+        Модель и версия для кэша анализа (AnalysisCache)
+        
+        Версия включает хэш словарей ключевых слов: после их правки
+        закэшированные результаты эвристики пересчитываются.
+        
+        Returns:
+            Tuple (model, version)
+        """
+        source = json.dumps(
+            [self.priority_keywords, self.category_keywords, self.sentiment_keywords],
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        keywords_hash = hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+        return self.model_name, f"{self.get_stats()['version']}+{keywords_hash}"
+    
     def get_stats(self) -> Dict[str, Any]:
         """
         Возвращает статистику анализатора
@@ -4,7 +4,9 @@ ML-анализ писем на базе Hugging Face transformers
 Sprint 0.3: Real neural network models for email analysis
 """
 
+import hashlib
 import json
+import math
 import time
 import warnings
 from typing import Dict, List, Any, Optional, Tuple
@@ -21,13 +23,35 @@ except ImportError:
     TRANSFORMERS_AVAILABLE = False
     print("⚠️  transformers not installed, using mock fallback")
 
-# Fallback to mock parser if transformers unavailable
-if not TRANSFORMERS_AVAILABLE:
-    try:
-        from ai_parser import AIParser as MockParser
-        MOCK_AVAILABLE = True
-    except ImportError:
-        MOCK_AVAILABLE = False
+# ONNX Runtime backend (опционально, CPU)
+from onnx_backend import OnnxClassifier, OnnxEncoder, ONNX_AVAILABLE
+
+# Категоризация по эмбеддингам (опционально, нужен numpy)
+from embedding_classifier import EmbeddingCategoryClassifier, mean_pooling, NUMPY_AVAILABLE
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+# Поиск ключевых слов приоритета за один проход
+from keyword_matcher import KeywordMatcher
+from analysis_context import AnalysisContext
+
+# Fallback to mock parser if models unavailable
+try:
+    from ai_parser import AIParser as MockParser
+    MOCK_AVAILABLE = True
+except ImportError:
+    MOCK_AVAILABLE = False
+
+# Бэкенды инференса
+BACKENDS = ('torch', 'onnx')
+
+# Способы категоризации
+CATEGORY_METHODS = ('zero-shot', 'embedding')
+
+# Уровни каскада (префикс ai_model)
+CASCADE_HEURISTIC = 'cascade:heuristic'
+CASCADE_TRANSFORMER = 'cascade:transformer'
 
 
 class AIParserTransformer:
@@ -38,13 +62,26 @@ class AIParserTransformer:
     - Sentiment analysis (тональность)
     - Text classification (категоризация)
     - Zero-shot classification (гибкая категоризация)
+    - Embedding classification (категории по прототипам эмбеддингов)
     """
     
     def __init__(
         self,
         model_name: str = "distilbert-base-uncased-finetuned-sst-2-english",
         use_gpu: bool = False,
-        fallback_to_mock: bool = True
+        fallback_to_mock: bool = True,
+        batch_size: int = 16,
+        zero_shot_model: str = "facebook/bart-large-mnli",
+        backend: str = "torch",
+        onnx_quantize: bool = True,
+        onnx_threads: Optional[int] = None,
+        onnx_dir: Optional[str] = None,
+        category_method: str = "zero-shot",
+        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+        category_examples: Optional[Dict[str, List[str]]] = None,
+        cascade: bool = False,
+        cascade_threshold: float = 0.8,
+        cascade_margin: int = 1
     ):
         """
         Инициализация transformer анализатора
@@ -53,21 +90,64 @@ class AIParserTransformer:
             model_name: Название модели от Hugging Face
             use_gpu: Использовать GPU (если доступен)
             fallback_to_mock: Использовать mock при ошибке загрузки модели
+            batch_size: Число последовательностей в одном forward pass
+            zero_shot_model: NLI-модель для zero-shot категоризации
+            backend: 'torch' (pipelines transformers) или 'onnx' (ONNX Runtime, CPU)
+            onnx_quantize: Для backend='onnx' - int8 dynamic quantization
+            onnx_threads: Для backend='onnx' - потоков на forward pass (None - по числу ядер)
+            onnx_dir: Для backend='onnx' - каталог кэша экспортированных моделей
+            category_method: 'zero-shot' (NLI по каждой категории) или 'embedding' (прототипы)
+            embedding_model: Sentence-энкодер для category_method='embedding'
+            category_examples: Примеры писем по категориям для прототипов (None - встроенные)
+            cascade: Сначала эвристика AIParser, transformer только для неуверенных писем
+            cascade_threshold: Минимальный category_confidence эвристики (0.8 - от 2 ключевых слов)
+            cascade_margin: Минимальный отрыв лучшей категории от второй (в ключевых словах)
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend} (expected one of {BACKENDS})")
+        if category_method not in CATEGORY_METHODS:
+            raise ValueError(f"Unknown category method: {category_method} (expected one of {CATEGORY_METHODS})")
+        
         self.model_name = model_name
         self.use_gpu = use_gpu and torch.cuda.is_available() if TRANSFORMERS_AVAILABLE else False
         self.fallback_to_mock = fallback_to_mock
+        self.batch_size = max(1, batch_size)
+        self.zero_shot_model = zero_shot_model
+        self.backend = backend
+        self.onnx_quantize = onnx_quantize
+        self.onnx_threads = onnx_threads
+        self.onnx_dir = onnx_dir
+        self.category_method = category_method
+        self.embedding_model = embedding_model
+        self.category_examples = category_examples
+        self.cascade = cascade
+        self.cascade_threshold = cascade_threshold
+        self.cascade_margin = cascade_margin
         
         # Статус инициализации
         self.transformer_ready = False
         self.mock_parser = None
         
-        # Pipelines для разных задач
+        # Pipelines для разных задач (или OnnxClassifier при backend='onnx')
         self.sentiment_pipeline = None
         self.zero_shot_pipeline = None
+        self.embedding_pipeline = None
+        self.category_classifier = None
+        
+        # Эвристика первого уровня каскада
+        self.heuristic_parser = MockParser() if cascade and MOCK_AVAILABLE else None
+        self.cascade_stats = {
+            'heuristic': 0,
+            'transformer': 0
+        }
         
-        # Инициализируем модели
-        self._init_models()
+        # Статистика батчей: forward passes и доля паддинга
+        self.inference_stats = {
+            'forward_passes': 0,
+            'sequences': 0,
+            'tokens': 0,
+            'padding_tokens': 0
+        }
         
         # Категории для zero-shot classification
         self.categories = [
@@ -88,6 +168,25 @@ class AIParserTransformer:
             "news and updates": "News",
             "spam and promotions": "Spam"
         }
+        
+        # Шаблон гипотезы NLI (по умолчанию zero-shot pipeline)
+        self.hypothesis_template = "This example is {}."
+        
+        # Ключевые слова приоритета (гибридный анализ вместе с sentiment)
+        self.priority_keywords = {
+            'high': [
+                'urgent', 'срочно', 'важно', 'critical', 'asap',
+                'deadline', 'дедлайн', 'emergency', 'immediately'
+            ],
+            'medium': [
+                'важный', 'нужно', 'требуется', 'необходимо',
+                'action required', 'please review'
+            ]
+        }
+        self.keyword_matcher = KeywordMatcher({'priority': self.priority_keywords})
+        
+        # Инициализируем модели
+        self._init_models()
     
     def _init_models(self):
         """Инициализация transformer моделей"""
@@ -96,38 +195,80 @@ class AIParserTransformer:
             self._init_fallback()
             return
         
+        if self.backend == 'onnx' and not ONNX_AVAILABLE:
+            print("⚠️  onnxruntime not installed, using torch backend")
+            self.backend = 'torch'
+        
         try:
-            print(f"🧠 Загрузка transformer модели: {self.model_name}")
-            
-            # Определяем device
-            device = 0 if self.use_gpu else -1
+            print(f"🧠 Загрузка transformer модели: {self.model_name} (backend: {self.backend})")
             
             # Sentiment analysis pipeline
-            self.sentiment_pipeline = pipeline(
-                "sentiment-analysis",
-                model=self.model_name,
-                device=device
-            )
+            self.sentiment_pipeline = self._load_model("sentiment-analysis", self.model_name)
             
-            # Zero-shot classification для категорий
-            try:
-                self.zero_shot_pipeline = pipeline(
-                    "zero-shot-classification",
-                    model="facebook/bart-large-mnli",
-                    device=device
-                )
-                print("✅ Zero-shot classification загружен")
-            except Exception as e:
-                print(f"⚠️  Zero-shot недоступен: {e}")
-                self.zero_shot_pipeline = None
+            # Категоризация: прототипы эмбеддингов или zero-shot classification
+            if self.category_method == 'embedding':
+                try:
+                    self._init_embedding_classifier()
+                    print("✅ Embedding classification загружен")
+                except Exception as e:
+                    print(f"⚠️  Embedding classification недоступен: {e}")
+                    self.embedding_pipeline = None
+                    self.category_classifier = None
+            else:
+                try:
+                    self.zero_shot_pipeline = self._load_model("zero-shot-classification", self.zero_shot_model)
+                    print("✅ Zero-shot classification загружен")
+                except Exception as e:
+                    print(f"⚠️  Zero-shot недоступен: {e}")
+                    self.zero_shot_pipeline = None
             
             self.transformer_ready = True
             print(f"✅ Transformer модели готовы (GPU: {self.use_gpu})")
-            
+        
         except Exception as e:
             print(f"❌ Ошибка загрузки transformer: {e}")
             self._init_fallback()
     
+    @property
+    def model_label(self) -> str:
+        """Значение ai_model в результатах: модель и бэкенд, если это не torch"""
+        if self.backend == 'onnx':
+            return f"{self.model_name} ({'onnx-int8' if self.onnx_quantize else 'onnx'})"
+        return self.model_name
+    
+    def _load_model(self, task: str, model_name: str):
+        """
+        Загружает модель задачи в выбранном бэкенде
+        
+        Returns:
+            Pipeline transformers (torch) или OnnxClassifier / OnnxEncoder (onnx)
+        """
+        if self.backend == 'onnx':
+            onnx_class = OnnxEncoder if task == 'feature-extraction' else OnnxClassifier
+            return onnx_class(
+                model_name,
+                cache_dir=self.onnx_dir,
+                quantize=self.onnx_quantize,
+                threads=self.onnx_threads
+            )
+        
+        # Определяем device
+        device = 0 if self.use_gpu else -1
+        return pipeline(task, model=model_name, device=device)
+    
+    def _init_embedding_classifier(self):
+        """Sentence-энкодер и классификатор по прототипам категорий"""
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy not installed")
+        
+        self.embedding_pipeline = self._load_model("feature-extraction", self.embedding_model)
+        self.category_classifier = EmbeddingCategoryClassifier(
+            lambda texts: self._embed_texts(texts, self.batch_size),
+            self.category_mapping,
+            model_name=self.embedding_model,
+            examples=self.category_examples
+        )
+    
     def _init_fallback(self):
         """Инициализация fallback на mock parser"""
         if self.fallback_to_mock and MOCK_AVAILABLE:
@@ -147,135 +288,368 @@ class AIParserTransformer:
         Returns:
             Словарь с AI-метаданными (совместимый с Sprint 0.2)
         """
-        start_time = time.time()
+        return self.analyze_emails([(subject, body)])[0]
+    
+    def analyze_emails(self, emails: List[Tuple[str, str]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Анализирует несколько писем одним проходом моделей
+        
+        Тексты всех писем токенизируются вместе, раскладываются по бакетам
+        близкой длины и считаются батчами по batch_size: один forward pass
+        на бакет вместо прохода на каждое письмо (и каждую гипотезу zero-shot).
+        
+        Args:
+            emails: Список пар (тема, тело)
+            batch_size: Размер батча для forward pass (по умолчанию self.batch_size)
+        
+        В режиме cascade письма, которые эвристика AIParser относит к категории
+        уверенно, в модели не попадают; ai_model результата начинается с
+        уровня, который ответил (cascade:heuristic / cascade:transformer).
         
+        Returns:
+            Список словарей с AI-метаданными в порядке emails
+        """
         # Если transformer недоступен, используем fallback
         if not self.transformer_ready:
             if self.mock_parser:
-                result = self.mock_parser.analyze_email(subject, body)
-                result['ai_model'] = f"{self.model_name} (mock-fallback)"
-                return result
+                results = []
+                for subject, body in emails:
+                    result = self.mock_parser.analyze_email(subject, body)
+                    result['ai_model'] = f"{self.model_name} (mock-fallback)"
+                    results.append(result)
+                return results
             else:
-                return self._generate_empty_result()
+                return [self._generate_empty_result() for _ in emails]
+        
+        if not self.heuristic_parser:
+            return self._analyze_transformer(emails, batch_size)
         
-        # Объединяем тему и тело для анализа
-        full_text = f"{subject or ''} {body or ''}"
+        # Каскад: уверенные ответы эвристики, остальное - одним батчем в модели
+        results = [self._heuristic_tier(subject, body) for subject, body in emails]
+        pending = [i for i, result in enumerate(results) if result is None]
         
-        # Ограничиваем длину текста (BERT max 512 tokens)
-        full_text = full_text[:2000]  # примерно 500 tokens
+        if pending:
+            for i, result in zip(pending, self._analyze_transformer([emails[i] for i in pending], batch_size)):
+                result['ai_model'] = f"{CASCADE_TRANSFORMER}/{result['ai_model']}"
+                results[i] = result
         
-        # Анализируем тональность
-        sentiment, sentiment_score = self._analyze_sentiment_transformer(full_text)
+        self.cascade_stats['heuristic'] += len(emails) - len(pending)
+        self.cascade_stats['transformer'] += len(pending)
+        return results
+    
+    def _heuristic_tier(self, subject: str, body: str) -> Optional[Dict[str, Any]]:
+        """
+        Первый уровень каскада: результат AIParser, если категория уверенная
         
-        # Анализируем категорию
-        category, category_confidence = self._analyze_category_transformer(full_text)
+        Returns:
+            Словарь с AI-метаданными или None (письмо нужно передать модели)
+        """
+        result = self.heuristic_parser.analyze_email(subject, body)
+        if result['category'] == 'General' or result['category_confidence'] < self.cascade_threshold:
+            return None
+        
+        # Ничья или почти ничья категорий - решает модель
+        text = f"{subject or ''} {body or ''}".lower()
+        scores = sorted(self.heuristic_parser._category_scores(text).values(), reverse=True)
+        if len(scores) > 1 and scores[0] - scores[1] < self.cascade_margin:
+            return None
+        
+        result['ai_model'] = f"{CASCADE_HEURISTIC}/{result['ai_model']}"
+        return result
+    
+    def _analyze_transformer(self, emails: List[Tuple[str, str]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Анализ писем моделями (sentiment + категория) батчами по длине
         
-        # Определяем приоритет (эвристика + sentiment)
-        priority, priority_score = self._analyze_priority_hybrid(full_text, sentiment_score)
+        Returns:
+            Список словарей с AI-метаданными в порядке emails
+        """
+        start_time = time.time()
         
-        # Извлекаем сущности (используем базовые regex паттерны)
-        entities = self._extract_entities(subject or '', body or '')
+        # Объединяем тему и тело; ограничиваем длину текста (BERT max 512 tokens)
+        texts = [f"{subject or ''} {body or ''}"[:2000] for subject, body in emails]  # примерно 500 tokens
+        batch_size = batch_size or self.batch_size
         
-        # Извлекаем ключевые слова
-        keywords = self._extract_keywords(full_text)
+        # Модели - батчами по всем письмам
+        sentiments = self._analyze_sentiment_batch(texts, batch_size)
+        categories = self._analyze_category_batch(texts, batch_size)
         
-        # Вычисляем время обработки
-        processing_time_ms = int((time.time() - start_time) * 1000)
+        # Время forward pass делится между письмами батча
+        processing_time_ms = int((time.time() - start_time) * 1000 / max(len(texts), 1))
         
-        return {
-            'sentiment': sentiment,
-            'sentiment_score': sentiment_score,
-            'priority': priority,
-            'priority_score': priority_score,
-            'category': category,
-            'category_confidence': category_confidence,
-            'entities_json': json.dumps(entities, ensure_ascii=False),
-            'keywords_json': json.dumps(keywords, ensure_ascii=False),
-            'ai_model': self.model_name,
-            'processing_time_ms': processing_time_ms
-        }
+        results = []
+        for (subject, body), (sentiment, sentiment_score), (category, category_confidence) in zip(
+            emails, sentiments, categories
+        ):
+            # Текст письма целиком разбирается один раз для эвристик ниже
+            context = AnalysisContext(subject, body)
+            
+            # Определяем приоритет (эвристика + sentiment)
+            priority, priority_score = self._analyze_priority_hybrid(context, sentiment_score)
+            
+            # Извлекаем сущности (используем базовые regex паттерны) и ключевые слова
+            entities = self._extract_entities(context)
+            keywords = self._extract_keywords(context)
+            
+            results.append({
+                'sentiment': sentiment,
+                'sentiment_score': sentiment_score,
+                'priority': priority,
+                'priority_score': priority_score,
+                'category': category,
+                'category_confidence': category_confidence,
+                'entities_json': json.dumps(entities, ensure_ascii=False),
+                'keywords_json': json.dumps(keywords, ensure_ascii=False),
+                'ai_model': self.model_label,
+                'processing_time_ms': processing_time_ms
+            })
+        
+        return results
     
-    def _analyze_sentiment_transformer(self, text: str) -> Tuple[str, float]:
+    def _analyze_sentiment_batch(self, texts: List[str], batch_size: int) -> List[Tuple[str, float]]:
         """
-        Анализ тональности с помощью transformer
+        Анализ тональности списка текстов батчами по длине
         
         Returns:
-            Tuple (sentiment, score)
+            Список (sentiment, score) в порядке texts
         """
-        if not text.strip():
-            return 'neutral', 0.5
+        results = [('neutral', 0.5)] * len(texts)
+        indices = [i for i, text in enumerate(texts) if text.strip()]
+        if not indices:
+            return results
         
         try:
-            result = self.sentiment_pipeline(text)[0]
-            label = result['label'].lower()
-            score = result['score']
-            
-            # Маппинг POSITIVE/NEGATIVE на наши категории
-            if label == 'positive':
-                return 'positive', score
-            elif label == 'negative':
-                return 'negative', 1.0 - score  # инвертируем score для negative
-            else:
-                return 'neutral', 0.5
-                
+            probabilities = self._forward_buckets(
+                self.sentiment_pipeline,
+                [texts[i] for i in indices],
+                batch_size=batch_size
+            )
         except Exception as e:
             print(f"⚠️  Ошибка sentiment analysis: {e}")
+            return results
+        
+        id2label = self._model_config(self.sentiment_pipeline).id2label
+        for i, row in zip(indices, probabilities):
+            best = max(range(len(row)), key=row.__getitem__)
+            results[i] = self._map_sentiment({'label': id2label[best], 'score': row[best]})
+        return results
+    
+    def _map_sentiment(self, result: Dict[str, Any]) -> Tuple[str, float]:
+        """Маппинг POSITIVE/NEGATIVE на наши категории"""
+        label = result['label'].lower()
+        score = result['score']
+        
+        if label == 'positive':
+            return 'positive', score
+        elif label == 'negative':
+            return 'negative', 1.0 - score  # инвертируем score для negative
+        else:
             return 'neutral', 0.5
     
-    def _analyze_category_transformer(self, text: str) -> Tuple[str, float]:
+    def _analyze_category_batch(self, texts: List[str], batch_size: int) -> List[Tuple[str, float]]:
         """
-        Анализ категории с помощью zero-shot classification
+        Zero-shot категоризация списка текстов
+        
+        Каждое письмо дает len(categories) пар (текст, гипотеза). Все пары
+        токенизируются вместе и считаются батчами по длине; вероятность
+        категории - softmax логитов entailment по гипотезам письма
+        (как у zero-shot pipeline с multi_label=False).
         
         Returns:
-            Tuple (category, confidence)
+            Список (category, confidence) в порядке texts
         """
-        if not self.zero_shot_pipeline or not text.strip():
-            return 'General', 0.5
+        results = [('General', 0.5)] * len(texts)
+        indices = [i for i, text in enumerate(texts) if text.strip()]
+        if self.category_classifier and indices:
+            return self._analyze_category_embedding(texts, indices, batch_size)
+        if not self.zero_shot_pipeline or not indices:
+            return results
+        
+        labels = self.categories
+        hypotheses = [self.hypothesis_template.format(label) for label in labels]
         
         try:
-            result = self.zero_shot_pipeline(
-                text,
-                candidate_labels=self.categories,
-                multi_label=False
+            logits = self._forward_buckets(
+                self.zero_shot_pipeline,
+                [texts[i] for i in indices for _ in labels],
+                hypotheses * len(indices),
+                batch_size=batch_size,
+                softmax=False
             )
-            
-            # Получаем лучшую категорию
-            best_category_raw = result['labels'][0]
-            confidence = result['scores'][0]
-            
-            # Маппим на наши стандартные категории
-            category = self.category_mapping.get(best_category_raw, 'General')
-            
-            return category, confidence
-            
         except Exception as e:
             print(f"⚠️  Ошибка category analysis: {e}")
-            return 'General', 0.5
+            return results
+        
+        entailment_id = self._entailment_id()
+        for n, i in enumerate(indices):
+            entailment = [row[entailment_id] for row in logits[n * len(labels):(n + 1) * len(labels)]]
+            scores = self._softmax(entailment)
+            best = max(range(len(labels)), key=scores.__getitem__)
+            # Лучшая категория, смапленная на наши стандартные
+            results[i] = (self.category_mapping.get(labels[best], 'General'), scores[best])
+        return results
     
-    def _analyze_priority_hybrid(self, text: str, sentiment_score: float) -> Tuple[str, float]:
+    def _analyze_category_embedding(self, texts: List[str], indices: List[int], batch_size: int) -> List[Tuple[str, float]]:
         """
-        Гибридный анализ приоритета (ключевые слова + sentiment)
+        Категоризация по прототипам: один forward pass энкодера на письмо
         
         Returns:
-            Tuple (priority, score)
+            Список (category, confidence) в порядке texts
         """
-        text_lower = text.lower()
+        results = [('General', 0.5)] * len(texts)
         
-        # Ключевые слова высокого приоритета
-        high_priority_words = [
-            'urgent', 'срочно', 'важно', 'critical', 'asap',
-            'deadline', 'дедлайн', 'emergency', 'immediately'
-        ]
+        try:
+            embeddings = self._embed_texts([texts[i] for i in indices], batch_size)
+            categories = self.category_classifier.classify(embeddings)
+        except Exception as e:
+            print(f"⚠️  Ошибка category analysis: {e}")
+            return results
         
-        # Ключевые слова среднего приоритета
-        medium_priority_words = [
-            'важный', 'нужно', 'требуется', 'необходимо',
-            'action required', 'please review'
-        ]
+        for i, category in zip(indices, categories):
+            results[i] = category
+        return results
+    
+    def embed_emails(self, emails: List[Tuple[str, str]], batch_size: Optional[int] = None) -> "np.ndarray":
+        """
+        Нормированные эмбеддинги писем (те же, что использует категоризация)
+        
+        Косинусная близость двух писем - скалярное произведение строк, поэтому
+        эмбеддинги можно использовать для семантического поиска.
+        
+        Args:
+            emails: Список пар (тема, тело)
+            batch_size: Размер батча для forward pass (по умолчанию self.batch_size)
+        
+        Returns:
+            Матрица float32 (len(emails) × d)
+        
+        Raises:
+            RuntimeError: Если sentence-энкодер не загружен (category_method != 'embedding')
+        """
+        if self.embedding_pipeline is None:
+            raise RuntimeError("Embedding model not loaded (category_method='embedding' required)")
+        
+        texts = [f"{subject or ''} {body or ''}"[:2000] for subject, body in emails]
+        return self._embed_texts(texts, batch_size or self.batch_size)
+    
+    def _embed_texts(self, texts: List[str], batch_size: int) -> "np.ndarray":
+        """Эмбеддинги текстов батчами по длине"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        rows = self._forward_buckets(self.embedding_pipeline, texts, batch_size=batch_size, softmax=False)
+        return np.asarray(rows, dtype=np.float32)
+    
+    def _forward_buckets(
+        self,
+        pipe,
+        texts: List[str],
+        pairs: Optional[List[str]] = None,
+        batch_size: int = 16,
+        softmax: bool = True
+    ) -> List[List[float]]:
+        """
+        Прогоняет тексты через модель pipeline батчами одинаковой длины
+        
+        Все тексты токенизируются одним вызовом без паддинга, сортируются по
+        числу токенов и режутся на бакеты по batch_size. Каждый бакет
+        дополняется только до своей самой длинной последовательности и
+        считается одним forward pass.
+        
+        Args:
+            pipe: Pipeline (или OnnxClassifier / OnnxEncoder), чьи tokenizer и model используются
+            texts: Тексты (premise для zero-shot)
+            pairs: Вторые тексты пар (hypothesis для zero-shot) или None
+            batch_size: Максимум последовательностей в forward pass
+            softmax: Вернуть вероятности вместо логитов
+        
+        Returns:
+            Строки логитов/вероятностей по классам (или эмбеддинги энкодера) в порядке texts
+        """
+        tokenizer = pipe.tokenizer
+        
+        if pairs is None:
+            encoding = tokenizer(texts, truncation=True)
+        else:
+            encoding = tokenizer(texts, pairs, truncation='only_first')
+        
+        lengths = [len(ids) for ids in encoding['input_ids']]
+        rows: List[List[float]] = [None] * len(texts)
+        
+        for bucket in self._length_buckets(lengths, batch_size):
+            batch = tokenizer.pad({key: [encoding[key][i] for i in bucket] for key in encoding.keys()})
+            
+            for i, row in zip(bucket, self._model_outputs(pipe, batch)):
+                rows[i] = self._softmax(row) if softmax else row
+            
+            padded = len(bucket) * max(lengths[i] for i in bucket)
+            real = sum(lengths[i] for i in bucket)
+            self.inference_stats['forward_passes'] += 1
+            self.inference_stats['sequences'] += len(bucket)
+            self.inference_stats['tokens'] += real
+            self.inference_stats['padding_tokens'] += padded - real
+        
+        return rows
+    
+    def _model_outputs(self, pipe, batch: Dict[str, List[List[int]]]) -> List[List[float]]:
+        """
+        Один forward pass паддингованного батча в бэкенде модели
+        
+        Returns:
+            Логиты классификатора или эмбеддинги энкодера (mean pooling)
+        """
+        if isinstance(pipe, OnnxClassifier):
+            return pipe.run(batch)
+        
+        tensors = {key: torch.tensor(values, device=pipe.device) for key, values in batch.items()}
+        with torch.no_grad():
+            outputs = pipe.model(**tensors)
+            if pipe is self.embedding_pipeline:
+                return mean_pooling(outputs.last_hidden_state, tensors['attention_mask']).tolist()
+            return outputs.logits.tolist()
+    
+    @staticmethod
+    def _model_config(pipe):
+        """Конфиг модели (id2label / label2id) для pipeline или OnnxClassifier"""
+        return pipe.config if isinstance(pipe, OnnxClassifier) else pipe.model.config
+    
+    @staticmethod
+    def _length_buckets(lengths: List[int], batch_size: int) -> List[List[int]]:
+        """
+        Бакеты индексов последовательностей близкой длины
+        
+        Returns:
+            Списки индексов (не больше batch_size в каждом), от коротких к длинным
+        """
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+        batch_size = max(1, batch_size)
+        return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+    
+    def _entailment_id(self) -> int:
+        """Индекс класса entailment NLI-модели (как его ищет zero-shot pipeline)"""
+        for label, index in self._model_config(self.zero_shot_pipeline).label2id.items():
+            if label.lower().startswith('entail'):
+                return index
+        return -1
+    
+    @staticmethod
+    def _softmax(values: List[float]) -> List[float]:
+        """Softmax списка логитов"""
+        peak = max(values)
+        exps = [math.exp(value - peak) for value in values]
+        total = sum(exps)
+        return [value / total for value in exps]
+    
+    def _analyze_priority_hybrid(self, context: AnalysisContext, sentiment_score: float) -> Tuple[str, float]:
+        """
+        Гибридный анализ приоритета (ключевые слова + sentiment)
         
-        # Считаем совпадения
-        high_count = sum(1 for word in high_priority_words if word in text_lower)
-        medium_count = sum(1 for word in medium_priority_words if word in text_lower)
+        Returns:
+            Tuple (priority, score)
+        """
+        # Совпадения ключевых слов high / medium за один проход по словам письма
+        counts = self.keyword_matcher.count(context.lower, context.words)['priority']
+        high_count = counts['high']
+        medium_count = counts['medium']
         
         # Учитываем негативную тональность (проблемы = высокий приоритет)
         negative_boost = 0.2 if sentiment_score < 0.4 else 0.0
@@ -289,73 +663,27 @@ class AIParserTransformer:
         else:
             return 'low', 0.3
     
-    def _extract_entities(self, subject: str, body: str) -> Dict[str, List[str]]:
+    def _extract_entities(self, context: AnalysisContext) -> Dict[str, List[str]]:
         """
         Извлечение сущностей (базовые regex паттерны)
         
         В будущем можно интегрировать NER модели
         """
-        import re
-        
-        text = f"{subject} {body}"
-        
-        entities = {
-            'emails': [],
-            'dates': [],
-            'urls': [],
+        return {
+            'emails': list(set(context.emails()))[:10],
+            'dates': list(set(context.dates()))[:10],
+            'urls': list(set(context.urls()))[:10],
             'persons': []
         }
-        
-        # Email адреса
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        entities['emails'] = list(set(re.findall(email_pattern, text)))[:10]
-        
-        # Даты
-        date_patterns = [
-            r'\d{4}-\d{2}-\d{2}',
-            r'\d{2}\.\d{2}\.\d{4}',
-            r'\d{1,2}/\d{1,2}/\d{4}'
-        ]
-        for pattern in date_patterns:
-            entities['dates'].extend(re.findall(pattern, text))
-        entities['dates'] = list(set(entities['dates']))[:10]
-        
-        # URLs
-        url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-        entities['urls'] = list(set(re.findall(url_pattern, text)))[:10]
-        
-        return entities
     
-    def _extract_keywords(self, text: str) -> Dict[str, List[str]]:
+    def _extract_keywords(self, context: AnalysisContext) -> Dict[str, List[str]]:
         """
         Извлечение ключевых слов (простая эвристика)
         
         В будущем можно использовать TF-IDF или KeyBERT
         """
-        import re
-        
-        # Стоп-слова
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'from', 'is', 'was', 'are', 'were', 'been',
-            'в', 'и', 'на', 'с', 'по', 'для', 'от', 'к', 'из', 'это', 'быть'
-        }
-        
-        # Извлекаем слова
-        words = re.findall(r'\b\w+\b', text.lower())
-        
-        # Фильтруем и подсчитываем
-        word_freq = {}
-        for word in words:
-            if len(word) > 3 and word not in stop_words:
-                word_freq[word] = word_freq.get(word, 0) + 1
-        
-        # Топ-10 слов
-        top_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:10]
-        keywords_list = [word for word, freq in top_keywords]
-        
         return {
-            'keywords': keywords_list,
+            'keywords': context.top_words(10),
             'topics': []  # В будущем можно добавить topic modeling
         }
     
@@ -374,26 +702,21 @@ class AIParserTransformer:
             'processing_time_ms': 0
         }
     
-    def batch_analyze(self, emails: List[Dict]) -> List[Dict]:
+    def batch_analyze(self, emails: List[Dict], batch_size: Optional[int] = None) -> List[Dict]:
         """
-        Пакетный анализ писем
+        Пакетный анализ писем батчами forward pass (см. analyze_emails)
         
         Args:
             emails: Список словарей с полями 'subject' и 'body_preview'
+            batch_size: Размер батча для forward pass (по умолчанию self.batch_size)
         
         Returns:
             Список словарей с AI-метаданными
         """
-        results = []
-        
-        for email in emails:
-            subject = email.get('subject', '')
-            body = email.get('body_preview', '')
-            
-            meta = self.analyze_email(subject, body)
-            results.append(meta)
-        
-        return results
+        return self.analyze_emails(
+            [(email.get('subject', ''), email.get('body_preview', '')) for email in emails],
+            batch_size=batch_size
+        )
     
     def get_model_info(self) -> Dict[str, Any]:
         """
@@ -406,13 +729,58 @@ class AIParserTransformer:
             'transformer_ready': self.transformer_ready,
             'transformers_available': TRANSFORMERS_AVAILABLE,
             'model_name': self.model_name,
+            'zero_shot_model': self.zero_shot_model,
+            'category_method': self.category_method,
+            'embedding_model': self.embedding_model if self.category_method == 'embedding' else None,
+            'backend': self.backend,
+            'onnx_quantized': self.onnx_quantize if self.backend == 'onnx' else None,
             'gpu_enabled': self.use_gpu,
             'sentiment_pipeline': self.sentiment_pipeline is not None,
             'zero_shot_pipeline': self.zero_shot_pipeline is not None,
+            'embedding_pipeline': self.embedding_pipeline is not None,
             'mock_fallback': self.mock_parser is not None,
+            'batch_size': self.batch_size,
+            'inference_stats': dict(self.inference_stats),
+            'cascade': self.heuristic_parser is not None,
+            'cascade_stats': dict(self.cascade_stats) if self.heuristic_parser else None,
             'version': '0.3.0',
             'type': 'transformer-ml' if self.transformer_ready else 'mock-fallback'
         }
+    
+    def get_cache_identity(self) -> Optional[Tuple[str, str]]:
+        """
+        Модель и версия для кэша анализа (AnalysisCache)
+        
+        Модель - значение ai_model (модель и бэкенд); версия - хэш всего, от
+        чего еще зависит результат: версии анализатора, моделей категорий и
+        их ревизий в Hugging Face Hub, категорий и настроек каскада.
+        
+        Returns:
+            Tuple (model, version) или None, если моделей и fallback нет
+        """
+        if not self.transformer_ready:
+            if not self.mock_parser:
+                return None
+            _, version = self.mock_parser.get_cache_identity()
+            return f"{self.model_name} (mock-fallback)", version
+        
+        pipes = [self.sentiment_pipeline, self.zero_shot_pipeline, self.embedding_pipeline]
+        source = json.dumps({
+            'version': self.get_model_info()['version'],
+            'category_method': self.category_method,
+            'category_model': self.embedding_model if self.category_classifier else self.zero_shot_model,
+            'revisions': [getattr(self._model_config(pipe), '_commit_hash', None) for pipe in pipes if pipe is not None],
+            'categories': self.category_mapping,
+            'hypothesis_template': self.hypothesis_template,
+            'priority_keywords': self.priority_keywords,
+            'category_examples': self.category_examples,
+            'cascade': [
+                self.heuristic_parser.get_cache_identity(),
+                self.cascade_threshold,
+                self.cascade_margin
+            ] if self.heuristic_parser else None
+        }, ensure_ascii=False, sort_keys=True)
+        return self.model_label, hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
 
 
 def demo_transformer():
@@ -0,0 +1,260 @@
+"""
+SolarMail - Analysis Cache
+Кэш результатов AI-анализа по содержимому письма
+
+Рассылки, уведомления и письма CI приходят снова и снова с теми же темой и
+телом. Результат анализа кэшируется по хэшу нормализованных темы и тела
+вместе с моделью и ее версией: в памяти процесса (LRU) и в SQLite (таблица
+analysis_cache, общая для SolarSync и API). Новая версия модели удаляет
+только записи этой модели.
+"""
+
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Письмо для анализа: (тема, тело)
+EmailText = Tuple[str, str]
+
+# Записей в памяти процесса и в SQLite по умолчанию
+DEFAULT_MEMORY_SIZE = 4096
+DEFAULT_MAX_ENTRIES = 100_000
+
+# Доля записей, вытесняемых из SQLite при переполнении (чтобы не чистить на каждой вставке)
+EVICT_FRACTION = 0.1
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Нормализация для ключа: Unicode NFC, пробельные символы схлопнуты (регистр важен для сущностей)"""
+    return ' '.join(unicodedata.normalize('NFC', text or '').split())
+
+
+def content_key(subject: Optional[str], body: Optional[str], model: str, version: str) -> str:
+    """
+    Ключ кэша анализа
+    
+    Returns:
+        sha256 модели, версии и нормализованных темы и тела (hex)
+    """
+    source = '\x1f'.join([model, version, normalize_text(subject), normalize_text(body)])
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Двухуровневый кэш результатов AI-анализа
+    
+    Анализатор (AIParser или AIParserTransformer) сообщает модель и версию
+    через get_cache_identity(). Первый уровень - LRU в памяти процесса,
+    второй - таблица analysis_cache в БД DatabaseManager с вытеснением
+    давно не использованных записей сверх max_entries. При первой встрече
+    новой версии модели записи ее прежних версий удаляются; записи других
+    моделей остаются.
+    """
+    
+    def __init__(
+        self,
+        db=None,
+        memory_size: int = DEFAULT_MEMORY_SIZE,
+        max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        """
+        Инициализация AnalysisCache
+        
+        Args:
+            db: DatabaseManager для постоянного уровня (None - только память)
+            memory_size: Записей в LRU процесса (0 - без уровня в памяти)
+            max_entries: Записей в SQLite, сверх которых вытесняются самые старые
+        """
+        self.db = db
+        self.memory_size = max(0, memory_size)
+        self.max_entries = max(1, max_entries)
+        
+        # key → (model, version, result)
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Версии моделей, прежние записи которых уже удалены
+        self._checked = set()
+        
+        # Примерное число записей в SQLite (считается один раз, дальше по вставкам)
+        self._db_entries: Optional[int] = None
+        
+        self.stats = {
+            'requests': 0,
+            'memory_hits': 0,
+            'db_hits': 0,
+            'duplicates': 0,
+            'misses': 0,
+            'evicted': 0,
+            'invalidated': 0
+        }
+    
+    def analyze(self, emails: List[EmailText], analyzer) -> List[Dict[str, Any]]:
+        """
+        Анализирует письма, пропуская через модель только отсутствующие в кэше
+        
+        Одинаковые письма внутри одного вызова анализируются один раз.
+        У результатов из кэша processing_time_ms = 0.
+        
+        Args:
+            emails: Список пар (тема, тело)
+            analyzer: Объект с analyze_emails(emails) и get_cache_identity()
+        
+        Returns:
+            Список словарей с AI-метаданными в порядке emails
+        """
+        identity = analyzer.get_cache_identity()
+        if identity is None or not emails:
+            # Анализатор без моделей (пустые результаты) не кэшируем
+            return analyzer.analyze_emails(emails)
+        
+        model, version = identity
+        self._check_version(model, version)
+        
+        keys = [content_key(subject, body, model, version) for subject, body in emails]
+        unique = list(dict.fromkeys(keys))
+        found = self.get_many(unique)
+        
+        missing = {}
+        for key, email in zip(keys, emails):
+            if key not in found and key not in missing:
+                missing[key] = email
+        
+        computed = {}
+        if missing:
+            computed = dict(zip(missing, analyzer.analyze_emails(list(missing.values()))))
+            self.put_many(model, version, computed)
+        
+        self.stats['requests'] += len(emails)
+        self.stats['misses'] += len(missing)
+        self.stats['duplicates'] += len(keys) - len(unique)
+        
+        results = []
+        for key in keys:
+            if key in computed and key not in found:
+                # Первое вхождение посчитанного письма; повторы - как из кэша
+                found[key] = computed[key]
+                results.append(computed[key])
+            else:
+                results.append(dict(found[key], processing_time_ms=0))
+        return results
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Результаты из кэша: сначала память, затем SQLite (найденное там поднимается в память)
+        
+        Returns:
+            Словарь ключ → копия результата; ключей без записи в нем нет
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = dict(entry[2])
+        self.stats['memory_hits'] += len(found)
+        
+        rest = [key for key in keys if key not in found]
+        if rest and self.db is not None:
+            rows = self.db.get_cached_analyses(rest)
+            if rows:
+                self.db.touch_cached_analyses(list(rows), time.time())
+                with self._lock:
+                    for key, row in rows.items():
+                        self._remember(key, row['model'], row['version'], row['result'])
+                        found[key] = dict(row['result'])
+            self.stats['db_hits'] += len(rows)
+        
+        return found
+    
+    def put_many(self, model: str, version: str, results: Dict[str, Dict[str, Any]]):
+        """
+        Сохраняет результаты анализа в оба уровня
+        
+        Args:
+            model: Модель анализатора
+            version: Версия модели
+            results: Ключ → словарь с AI-метаданными
+        """
+        if not results:
+            return
+        
+        with self._lock:
+            for key, result in results.items():
+                self._remember(key, model, version, dict(result))
+        
+        if self.db is None:
+            return
+        
+        self.db.save_cached_analyses(model, version, results, time.time())
+        if self._db_entries is None:
+            self._db_entries = self.db.get_cached_analyses_count()
+        else:
+            self._db_entries += len(results)
+        
+        if self._db_entries > self.max_entries:
+            evicted = self.db.evict_cached_analyses(int(self.max_entries * (1 - EVICT_FRACTION)))
+            self._db_entries -= evicted
+            self.stats['evicted'] += evicted
+    
+    def invalidate_model(self, model: str, keep_version: Optional[str] = None) -> int:
+        """
+        Удаляет записи модели (кроме keep_version) из памяти и SQLite
+        
+        Returns:
+            Количество удаленных записей SQLite
+        """
+        with self._lock:
+            stale = [
+                key for key, (entry_model, entry_version, _) in self._memory.items()
+                if entry_model == model and entry_version != keep_version
+            ]
+            for key in stale:
+                del self._memory[key]
+        
+        deleted = 0
+        if self.db is not None:
+            deleted = self.db.invalidate_cached_analyses(model, keep_version)
+            if self._db_entries is not None:
+                self._db_entries = max(0, self._db_entries - deleted)
+        
+        self.stats['invalidated'] += deleted
+        return deleted
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика: попадания по уровням, промахи, размеры уровней"""
+        stats = dict(self.stats)
+        hits = stats['requests'] - stats['misses']
+        stats['hits'] = hits
+        stats['hit_rate'] = hits / stats['requests'] if stats['requests'] else 0.0
+        stats['memory_entries'] = len(self._memory)
+        stats['memory_size'] = self.memory_size
+        stats['db_entries'] = self._db_entries
+        stats['max_entries'] = self.max_entries if self.db is not None else None
+        return stats
+    
+    def _check_version(self, model: str, version: str):
+        """При первой встрече версии модели удаляет записи ее прежних версий"""
+        if (model, version) in self._checked:
+            return
+        
+        deleted = self.invalidate_model(model, keep_version=version)
+        self._checked.add((model, version))
+        if deleted:
+            print(f"🧹 Кэш анализа: удалено {deleted} записей прежних версий {model}")
+    
+    def _remember(self, key: str, model: str, version: str, result: Dict[str, Any]):
+        """Кладет запись в LRU (вызывается под self._lock)"""
+        if not self.memory_size:
+            return
+        
+        self._memory[key] = (model, version, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
@@ -0,0 +1,107 @@
+"""
+SolarMail - Analysis Context
+Текст письма, разобранный один раз для всех под-анализов
+
+Приоритет, категория, тональность, сущности и ключевые слова раньше каждый
+заново склеивали тему с телом, приводили к нижнему регистру и прогоняли свои
+регулярные выражения. AnalysisContext делает это один раз на письмо: хранит
+исходный текст, текст в нижнем регистре и поток слов (\\w+), а регулярные
+выражения сущностей скомпилированы здесь при импорте модуля.
+"""
+
+import re
+from typing import Dict, FrozenSet, List
+
+
+# Слово: непрерывная последовательность \w (то же, что \b\w+\b)
+WORD_RE = re.compile(r'\w+')
+
+# Сущности
+EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+DATE_RES = (
+    re.compile(r'\d{4}-\d{2}-\d{2}'),  # 2025-10-25
+    re.compile(r'\d{2}\.\d{2}\.\d{4}'),  # 25.10.2025
+    re.compile(r'\d{1,2}/\d{1,2}/\d{4}')  # 10/25/2025
+)
+URL_RE = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+# Имя + фамилия: два слова с большой буквы подряд
+NAME_RE = re.compile(r'\b[A-ZА-ЯЁ][a-zа-яё]+(?:\s+[A-ZА-ЯЁ][a-zа-яё]+)\b')
+
+# Любая дата из DATE_RES содержит цифру, разделитель и цифру: без такого места
+# три прохода по датам не нужны (в большинстве писем дат нет)
+DATE_HINT_RE = re.compile(r'\d[-./]\d')
+
+# Стоп-слова для ключевых слов
+STOP_WORDS: FrozenSet[str] = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'is', 'was', 'are', 'were', 'been',
+    'в', 'и', 'на', 'с', 'по', 'для', 'от', 'к', 'из', 'это', 'быть'
+})
+
+
+class AnalysisContext:
+    """
+    Письмо, подготовленное для анализа
+    
+    Атрибуты:
+        text: Тема и тело через пробел (исходный регистр - для сущностей)
+        lower: text в нижнем регистре (для ключевых слов словарей)
+        words: Слова lower по порядку (общий поток для KeywordMatcher и
+               извлечения ключевых слов)
+    
+    Методы поиска сущностей пропускают проход регулярного выражения, если в
+    тексте заведомо нет совпадений (нет '@', '://', цифры с разделителем).
+    """
+    
+    __slots__ = ('text', 'lower', 'words')
+    
+    def __init__(self, subject: str, body: str):
+        """
+        Инициализация AnalysisContext
+        
+        Args:
+            subject: Тема письма (None - пустая)
+            body: Тело письма или preview (None - пустое)
+        """
+        self.text = f"{subject or ''} {body or ''}"
+        self.lower = self.text.lower()
+        self.words = WORD_RE.findall(self.lower)
+    
+    def emails(self) -> List[str]:
+        """Email адреса в порядке появления (с повторами)"""
+        return EMAIL_RE.findall(self.text) if '@' in self.text else []
+    
+    def dates(self) -> List[str]:
+        """Даты: сначала все ГГГГ-ММ-ДД, затем ДД.ММ.ГГГГ, затем ММ/ДД/ГГГГ"""
+        if DATE_HINT_RE.search(self.text) is None:
+            return []
+        return [date for pattern in DATE_RES for date in pattern.findall(self.text)]
+    
+    def urls(self) -> List[str]:
+        """URL (http/https) в порядке появления (с повторами)"""
+        return URL_RE.findall(self.text) if '://' in self.text else []
+    
+    def names(self) -> List[str]:
+        """Пары слов с большой буквы (кандидаты в имена)"""
+        # Без заглавных букв текст совпадает со своим нижним регистром
+        return NAME_RE.findall(self.text) if self.text != self.lower else []
+    
+    def top_words(self, limit: int = 10, min_length: int = 4) -> List[str]:
+        """
+        Самые частые слова без стоп-слов
+        
+        Args:
+            limit: Сколько слов вернуть
+            min_length: Минимальная длина слова
+        
+        Returns:
+            Слова по убыванию частоты (при равной частоте - по первому появлению)
+        """
+        frequencies: Dict[str, int] = {}
+        get = frequencies.get
+        for word in self.words:
+            if len(word) >= min_length and word not in STOP_WORDS:
+                frequencies[word] = get(word, 0) + 1
+        
+        ranked = sorted(frequencies.items(), key=lambda item: item[1], reverse=True)
+        return [word for word, _ in ranked[:limit]]
@@ -0,0 +1,662 @@
+"""
+SolarMail - Async Sync
+asyncio-версия движка синхронизации: connect, select, UID SEARCH, пачечный FETCH, IDLE
+
+Один event loop обслуживает тысячи IMAP-соединений без потока на каждое.
+Разбор писем и словари для кэша общие с SolarSync, запись в SQLite
+выполняется в пуле потоков (asyncio.to_thread), чтобы не блокировать loop.
+"""
+
+import asyncio
+import re
+import ssl
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from imap_tools import AND, MailMessage
+from imap_tools.utils import encode_folder
+
+from delta_sync import FETCH_FLAGS_RE, FETCH_UID_RE, normalize_flags
+from partial_fetch import (
+    HEADER_ITEMS,
+    build_partial_message,
+    decode_section_texts,
+    group_text_sections,
+    parse_fetch_response,
+    section_items,
+)
+import config
+
+
+# Разбор ответов сервера
+LITERAL_RE = re.compile(rb'\{(\d+)\}\r\n$')
+UNTAGGED_RE = re.compile(rb'^\* (?:(\d+) )?([A-Z-]+)(?: (.*))?$', re.S)
+RESPONSE_CODE_RE = re.compile(rb'\[([A-Z-]+) (\d+)\]')
+STATUS_ITEM_RE = re.compile(rb'([A-Z]+) (\d+)')
+
+
+class IMAPCommandError(Exception):
+    """Сервер ответил NO/BAD на команду"""
+
+
+class AsyncIMAPClient:
+    """
+    Минимальный асинхронный IMAP4rev1 клиент на asyncio streams
+    
+    Ответы FETCH возвращаются в формате imaplib (bytes и кортежи с
+    литералами), поэтому их разбирают те же MailMessage и parse_fetch_response.
+    """
+    
+    def __init__(self, host: str, port: int = 993, use_ssl: bool = True, timeout: float = 60.0):
+        """
+        Инициализация AsyncIMAPClient
+        
+        Args:
+            host: IMAP сервер
+            port: Порт
+            use_ssl: Подключаться через TLS
+            timeout: Таймаут ожидания ответа на команду (секунды)
+        """
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.capabilities: List[str] = []
+        
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._tag = 0
+        self._lock = asyncio.Lock()
+    
+    # ==================== Transport ====================
+    
+    async def connect(self):
+        """Открывает соединение, читает приветствие и CAPABILITY"""
+        ssl_context = ssl.create_default_context() if self.use_ssl else None
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl_context),
+            self.timeout
+        )
+        
+        greeting = await self._read_line()
+        if not greeting[-1].startswith(b'* OK') and not greeting[-1].startswith(b'* PREAUTH'):
+            raise IMAPCommandError(f'Unexpected greeting: {greeting[-1]!r}')
+        
+        await self.capability()
+    
+    async def _read_line(self) -> List[Any]:
+        """
+        Читает одну логическую строку ответа вместе с литералами
+        
+        Returns:
+            Список кусков как в imaplib: (заголовок с {n}, литерал) и bytes
+        """
+        items = []
+        line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+        if not line:
+            raise ConnectionError('IMAP connection closed')
+        
+        while True:
+            match = LITERAL_RE.search(line)
+            if not match:
+                items.append(line.rstrip(b'\r\n'))
+                return items
+            
+            literal = await asyncio.wait_for(self._reader.readexactly(int(match.group(1))), self.timeout)
+            items.append((line.rstrip(b'\r\n'), literal))
+            line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+    
+    async def _send(self, data: bytes):
+        """Отправляет строку команды"""
+        self._writer.write(data)
+        await self._writer.drain()
+    
+    async def command(self, name: str, *args: str) -> Tuple[str, List[Tuple[str, List[Any]]], bytes]:
+        """
+        Выполняет команду и собирает untagged-ответы до tagged-ответа
+        
+        Args:
+            name: Имя команды (например, 'UID FETCH')
+            args: Аргументы в готовом IMAP-синтаксисе
+        
+        Returns:
+            Tuple (статус, [(тип, данные в формате imaplib)], текст tagged-ответа)
+        """
+        async with self._lock:
+            self._tag += 1
+            tag = f'A{self._tag:04d}'.encode()
+            await self._send(b' '.join([tag, name.encode()] + [arg.encode() for arg in args]) + b'\r\n')
+            
+            untagged = []
+            while True:
+                items = await self._read_line()
+                first = items[0][0] if isinstance(items[0], tuple) else items[0]
+                
+                if first.startswith(tag + b' '):
+                    status, _, text = first[len(tag) + 1:].partition(b' ')
+                    return status.decode(), untagged, text
+                
+                if first.startswith(b'* '):
+                    untagged.append(self._split_untagged(items))
+    
+    @staticmethod
+    def _split_untagged(items: List[Any]) -> Tuple[str, List[Any]]:
+        """
+        Убирает '* ' и тип ответа: '* 12 FETCH (...' → ('FETCH', [b'12 (...', ...])
+        """
+        first = items[0][0] if isinstance(items[0], tuple) else items[0]
+        match = UNTAGGED_RE.match(first)
+        if not match:
+            return 'UNKNOWN', items
+        
+        number, kind, rest = match.groups()
+        head = b' '.join(part for part in (number, rest) if part is not None)
+        if isinstance(items[0], tuple):
+            items = [(head, items[0][1])] + items[1:]
+        else:
+            items = [head] + items[1:]
+        return kind.decode(), items
+    
+    async def _check(self, name: str, *args: str) -> List[Tuple[str, List[Any]]]:
+        """Выполняет команду и проверяет статус OK"""
+        status, untagged, text = await self.command(name, *args)
+        if status != 'OK':
+            raise IMAPCommandError(f'{name} failed: {status} {text.decode(errors="replace")}')
+        return untagged
+    
+    # ==================== Commands ====================
+    
+    async def capability(self) -> List[str]:
+        """Запрашивает CAPABILITY сервера"""
+        untagged = await self._check('CAPABILITY')
+        for kind, items in untagged:
+            if kind == 'CAPABILITY':
+                self.capabilities = items[0].decode().upper().split()
+        return self.capabilities
+    
+    async def login(self, user: str, password: str):
+        """Авторизация LOGIN"""
+        await self._check('LOGIN', quote(user), quote(password))
+    
+    async def select(self, folder: str, readonly: bool = True) -> Dict[str, int]:
+        """
+        Выбирает папку (EXAMINE для readonly)
+        
+        Returns:
+            Словарь EXISTS, UIDVALIDITY, UIDNEXT (и HIGHESTMODSEQ, если есть)
+        """
+        untagged = await self._check('EXAMINE' if readonly else 'SELECT', encode_folder(folder).decode())
+        
+        state = {}
+        for kind, items in untagged:
+            line = items[0] if isinstance(items[0], bytes) else items[0][0]
+            if kind == 'EXISTS':
+                state['EXISTS'] = int(line)
+            elif kind == 'OK':
+                for key, value in RESPONSE_CODE_RE.findall(line):
+                    state[key.decode()] = int(value)
+        return state
+    
+    async def status(self, folder: str, items: List[str]) -> Dict[str, int]:
+        """STATUS папки (UIDVALIDITY, UIDNEXT, ...)"""
+        untagged = await self._check('STATUS', encode_folder(folder).decode(), f"({' '.join(items)})")
+        for kind, data in untagged:
+            if kind == 'STATUS':
+                line = data[-1] if isinstance(data[-1], bytes) else data[-1][0]
+                return {
+                    key.decode(): int(value)
+                    for key, value in STATUS_ITEM_RE.findall(line.split(b'(')[-1])
+                }
+        return {}
+    
+    async def uid_search(self, criteria: str) -> List[int]:
+        """UID SEARCH: список UID по критерию"""
+        untagged = await self._check('UID SEARCH', criteria)
+        uids = []
+        for kind, items in untagged:
+            if kind == 'SEARCH':
+                line = items[0] if isinstance(items[0], bytes) else items[0][0]
+                uids.extend(int(uid) for uid in line.split())
+        return uids
+    
+    async def uid_fetch(self, uid_set: str, items: str) -> List[List[Any]]:
+        """
+        UID FETCH
+        
+        Returns:
+            Список ответов по письмам, каждый - данные в формате imaplib
+        """
+        untagged = await self._check('UID FETCH', uid_set, items)
+        return [data for kind, data in untagged if kind == 'FETCH']
+    
+    async def idle(self, timeout: float) -> List[bytes]:
+        """
+        IDLE до первого уведомления сервера или таймаута
+        
+        Returns:
+            Список untagged-строк (например, b'* 5 EXISTS')
+        """
+        async with self._lock:
+            self._tag += 1
+            tag = f'A{self._tag:04d}'.encode()
+            await self._send(tag + b' IDLE\r\n')
+            
+            continuation = await self._read_line()
+            if not continuation[-1].startswith(b'+'):
+                raise IMAPCommandError(f'IDLE rejected: {continuation[-1]!r}')
+            
+            responses = []
+            try:
+                responses.append(self._first(await asyncio.wait_for(self._reader.readline(), timeout)))
+            except asyncio.TimeoutError:
+                pass
+            
+            await self._send(b'DONE\r\n')
+            while True:
+                items = await self._read_line()
+                first = self._first(items[0])
+                if first.startswith(tag + b' '):
+                    break
+                responses.append(first)
+            return [line.rstrip(b'\r\n') for line in responses if line]
+    
+    @staticmethod
+    def _first(item: Any) -> bytes:
+        """Первая строка куска ответа"""
+        return item[0] if isinstance(item, tuple) else item
+    
+    async def logout(self):
+        """LOGOUT и закрытие соединения"""
+        try:
+            await self.command('LOGOUT')
+        except (ConnectionError, asyncio.TimeoutError, IMAPCommandError):
+            pass
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+def quote(value: str) -> str:
+    """Строка в кавычках для аргумента команды"""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def compact_uid_set(uids: List[int]) -> str:
+    """Сжимает список UID в sequence-set: [1, 2, 3, 7] → '1:3,7'"""
+    ranges = []
+    for uid in sorted(uids):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ','.join(str(start) if start == end else f'{start}:{end}' for start, end in ranges)
+
+
+class AsyncSolarSync:
+    """
+    Асинхронный движок синхронизации поверх SolarSync
+    
+    Использует настройки аккаунта, кэш и построение словарей писем
+    экземпляра SolarSync, но весь IMAP-обмен идет через AsyncIMAPClient.
+    Результаты smart_sync совпадают с SolarSync.smart_sync.
+    """
+    
+    def __init__(self, sync, chunk_size: int = config.ASYNC_FETCH_CHUNK):
+        """
+        Инициализация AsyncSolarSync
+        
+        Args:
+            sync: Экземпляр SolarSync (аккаунт, db, fetch_mode, AI)
+            chunk_size: Количество UID в одной команде FETCH
+        """
+        self.sync = sync
+        self.db = sync.db
+        self.chunk_size = chunk_size
+    
+    async def connect(self) -> AsyncIMAPClient:
+        """Подключается и авторизуется (без выбора папки)"""
+        client = AsyncIMAPClient(self.sync.imap_host, self.sync.imap_port, self.sync.use_ssl)
+        await client.connect()
+        await client.login(self.sync.email, self.sync.password)
+        return client
+    
+    # ==================== Fetch ====================
+    
+    async def fetch_messages(
+        self,
+        client: AsyncIMAPClient,
+        uids: List[int],
+        folder: Optional[str] = None
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Загружает письма выбранной папки пачками по chunk_size
+        
+        Args:
+            client: Клиент с выбранной папкой
+            uids: UID для загрузки
+            folder: Папка IMAP (для UID-ключей)
+        
+        Yields:
+            Пачки словарей писем (тот же формат, что у SolarSync.fetch_messages)
+        """
+        for start in range(0, len(uids), self.chunk_size):
+            chunk = uids[start:start + self.chunk_size]
+            if self.sync.fetch_mode == 'partial':
+                yield await self._fetch_partial(client, chunk, folder)
+            else:
+                yield await self._fetch_full(client, chunk, folder)
+    
+    async def _fetch_full(self, client: AsyncIMAPClient, uids: List[int], folder: Optional[str]) -> List[Dict]:
+        """Полная загрузка RFC822 (как MailBox.fetch)"""
+        responses = await client.uid_fetch(compact_uid_set(uids), '(UID FLAGS BODY.PEEK[])')
+        return [
+            self.sync._message_to_dict(MailMessage(data), folder)
+            for data in responses
+            if any(isinstance(item, tuple) for item in data)
+        ]
+    
+    async def _fetch_partial(self, client: AsyncIMAPClient, uids: List[int], folder: Optional[str]) -> List[Dict]:
+        """ENVELOPE + начало текстовой части (как PartialFetcher)"""
+        responses = await client.uid_fetch(compact_uid_set(uids), HEADER_ITEMS)
+        headers, sections = group_text_sections(parse_fetch_response(flatten(responses)))
+        
+        texts = {}
+        for section, parts in sections.items():
+            uid_set = ','.join(uid for uid, _ in parts)
+            data = await client.uid_fetch(uid_set, section_items(section, self.sync.partial_fetcher.preview_bytes))
+            texts.update(decode_section_texts(parse_fetch_response(flatten(data)), parts))
+        
+        emails = []
+        for uid in map(str, uids):
+            if uid in headers:
+                item = build_partial_message(uid, headers[uid], texts.get(uid, ''))
+                emails.append(self.sync._build_email_dict(
+                    item['uid'], item['sender'], item['subject'], item['date'],
+                    item['text'], item['flags'], folder
+                ))
+        return emails
+    
+    # ==================== Store ====================
+    
+    def _store_chunk(self, emails: List[Dict]) -> Dict[str, int]:
+        """Записывает пачку в кэш и анализирует новые письма (в потоке)"""
+        stats, new_emails = self.sync.store_emails(emails)
+        if new_emails and self.sync.enable_ai:
+            self.sync.analyze_emails_with_ai(new_emails)
+        return stats
+    
+    # ==================== Sync Modes ====================
+    
+    async def smart_sync(self) -> Dict[str, int]:
+        """
+        Асинхронный аналог SolarSync.smart_sync
+        
+        Returns:
+            Словарь со статистикой синхронизации
+        """
+        sync_start_time = datetime.now()
+        stats = {'total': 0, 'new': 0, 'skipped': 0}
+        client = None
+        
+        try:
+            client = await self.connect()
+            selected = await client.select(config.SYNC_FOLDER, readonly=True)
+            
+            # Checkpoint прерванной синхронизации (или новый), как в SolarSync.smart_sync
+            checkpoint = await asyncio.to_thread(self.sync.load_smart_checkpoint, selected['UIDVALIDITY'])
+            criteria = str(AND(date_gte=checkpoint['since_date'].date()))
+            if checkpoint['last_uid']:
+                criteria += f" UID {checkpoint['last_uid'] + 1}:*"
+            uids = [uid for uid in await client.uid_search(criteria) if uid > checkpoint['last_uid']]
+            
+            uncommitted = 0
+            async for emails in self.fetch_messages(client, uids, config.SYNC_FOLDER):
+                chunk_stats = await asyncio.to_thread(self._store_chunk, emails)
+                for key in stats:
+                    stats[key] += chunk_stats[key]
+                
+                # Пачка записана и проанализирована целиком - можно сдвигать checkpoint
+                uncommitted += len(emails)
+                if emails and uncommitted >= config.CHECKPOINT_EVERY:
+                    uncommitted = 0
+                    await asyncio.to_thread(
+                        self.sync.save_smart_checkpoint,
+                        checkpoint,
+                        max(email['imap_uid'] for email in emails),
+                        stats['total']
+                    )
+            
+            await asyncio.to_thread(
+                self.db.update_sync_status, self.sync.email, sync_start_time.isoformat(), stats, True
+            )
+            await asyncio.to_thread(self.db.clear_sync_checkpoint, self.sync.email, config.SYNC_FOLDER)
+            return stats
+        
+        except Exception as e:
+            # last_sync_date не сдвигаем - следующий запуск продолжит с checkpoint
+            last_sync_date = await asyncio.to_thread(self.sync.get_last_sync_date)
+            await asyncio.to_thread(
+                self.db.update_sync_status,
+                self.sync.email,
+                last_sync_date,
+                stats,
+                False,
+                str(e)
+            )
+            raise
+        finally:
+            if client is not None:
+                await client.logout()
+    
+    async def fetch_incremental(self, client: AsyncIMAPClient, folder: str) -> Tuple[List[Dict], Dict]:
+        """
+        Асинхронный аналог SolarSync.fetch_emails_incremental
+        
+        Returns:
+            Tuple (список писем, новый checkpoint {'uidvalidity', 'last_uid', 'reset'})
+        """
+        status = await client.status(folder, ['UIDVALIDITY', 'UIDNEXT'])
+        state = await asyncio.to_thread(self.db.get_folder_sync_state, self.sync.email, folder)
+        reset = bool(state) and state['uidvalidity'] != status['UIDVALIDITY']
+        if reset:
+            state = None
+        
+        last_uid = state['last_uid'] if state else 0
+        await client.select(folder, readonly=True)
+        
+        if state:
+            uids = [uid for uid in await client.uid_search(f'UID {last_uid + 1}:*') if uid > last_uid]
+        else:
+            since_date = datetime.now() - timedelta(days=self.sync.sync_days)
+            uids = await client.uid_search(str(AND(date_gte=since_date.date())))
+        
+        emails = []
+        async for chunk in self.fetch_messages(client, uids, folder):
+            emails.extend(chunk)
+        
+        max_uid = max([last_uid] + [email['imap_uid'] for email in emails])
+        checkpoint = {
+            'uidvalidity': status['UIDVALIDITY'],
+            'last_uid': max(max_uid, status['UIDNEXT'] - 1),
+            'reset': reset
+        }
+        return emails, checkpoint
+    
+    async def uid_sync(self, folder: str = config.SYNC_FOLDER, client: Optional[AsyncIMAPClient] = None) -> Dict[str, int]:
+        """
+        Асинхронная UID-синхронизация одной папки
+        
+        Args:
+            folder: Папка IMAP
+            client: Уже авторизованный клиент (иначе создается новый)
+        
+        Returns:
+            Словарь со статистикой синхронизации
+        """
+        own_client = client is None
+        client = client or await self.connect()
+        try:
+            emails, checkpoint = await self.fetch_incremental(client, folder)
+            return await asyncio.to_thread(self.sync.store_incremental, emails, folder, checkpoint)
+        finally:
+            if own_client:
+                await client.logout()
+    
+    async def delta_sync(self, client: AsyncIMAPClient, folder: str = config.SYNC_FOLDER) -> Dict[str, Any]:
+        """
+        Асинхронный аналог DeltaSync.sync_folder: флаги и удаления закэшированных писем
+        
+        Режимы condstore (UID FETCH ... (CHANGEDSINCE modseq)) и uid (полный
+        список флагов). QRESYNC не включается: серверы с QRESYNC поддерживают
+        и CONDSTORE, удаления находятся сравнением UID SEARCH с кэшем.
+        
+        Args:
+            client: Авторизованный клиент
+            folder: Папка IMAP
+        
+        Returns:
+            Словарь со статистикой (mode, flags_updated, vanished)
+        """
+        stats = {'mode': 'none', 'flags_updated': 0, 'vanished': 0}
+        
+        state = await asyncio.to_thread(self.db.get_folder_sync_state, self.sync.email, folder)
+        if not state or not state['last_uid']:
+            # Кэш папки пуст - сверять нечего
+            return stats
+        
+        mode = 'condstore' if 'CONDSTORE' in client.capabilities else 'uid'
+        items = ['UIDVALIDITY', 'UIDNEXT'] + (['HIGHESTMODSEQ'] if mode != 'uid' else [])
+        status = await client.status(folder, items)
+        
+        if status.get('UIDVALIDITY') != state['uidvalidity']:
+            # Полную ресинхронизацию выполнит uid_sync
+            await asyncio.to_thread(self.db.reset_folder, self.sync.email, folder)
+            stats['mode'] = 'reset'
+            return stats
+        
+        if mode != 'uid' and 'HIGHESTMODSEQ' not in status:
+            mode = 'uid'
+        
+        stats['mode'] = mode
+        last_uid = state['last_uid']
+        known_modseq = state.get('highest_modseq')
+        await client.select(folder, readonly=True)
+        
+        fetch_items = '(UID FLAGS)'
+        if mode == 'condstore' and known_modseq is not None:
+            fetch_items += f' (CHANGEDSINCE {known_modseq})'
+        
+        server_flags = {}
+        for data in await client.uid_fetch(f'1:{last_uid}', fetch_items):
+            line = data[0][0] if isinstance(data[0], tuple) else data[0]
+            uid_match = FETCH_UID_RE.search(line)
+            flags_match = FETCH_FLAGS_RE.search(line)
+            if uid_match and flags_match:
+                server_flags[int(uid_match.group(1))] = normalize_flags(flags_match.group(1).split())
+        
+        server_uids = set(await client.uid_search(f'UID 1:{last_uid}'))
+        cached_uids = await asyncio.to_thread(self.db.get_folder_uids, self.sync.email, folder)
+        vanished = sorted(cached_uids - server_uids)
+        
+        cached_flags = await asyncio.to_thread(
+            self.db.get_folder_flags, self.sync.email, folder, server_flags
+        )
+        flag_updates = {
+            uid: flags for uid, flags in server_flags.items()
+            if uid in cached_flags and cached_flags[uid] != flags
+        }
+        
+        result = await asyncio.to_thread(
+            self.db.apply_folder_changes,
+            self.sync.email,
+            folder,
+            flag_updates,
+            vanished,
+            status.get('HIGHESTMODSEQ')
+        )
+        stats.update(result)
+        return stats
+    
+    async def idle_sync(
+        self,
+        folder: str = config.SYNC_FOLDER,
+        with_delta: bool = True,
+        idle_timeout: float = config.IDLE_TIMEOUT,
+        stop_event: Optional[asyncio.Event] = None
+    ):
+        """
+        Асинхронный push-режим через IMAP IDLE
+        
+        Как SolarSync.idle_sync: на EXISTS загружает новые UID через uid_sync,
+        на EXPUNGE/VANISHED/FETCH - применяет delta_sync. При обрыве
+        соединения переподключается с экспоненциальной задержкой (до 5 минут).
+        
+        Args:
+            folder: Папка IMAP
+            with_delta: Обрабатывать EXPUNGE и изменения флагов
+            idle_timeout: Период перезапуска IDLE в секундах
+            stop_event: Событие для остановки
+        """
+        stop_event = stop_event or asyncio.Event()
+        reconnect_delay = 1
+        
+        while not stop_event.is_set():
+            client = None
+            try:
+                client = await self.connect()
+                
+                # Догоняем всё, что пришло пока соединения не было
+                if with_delta:
+                    await self.delta_sync(client, folder)
+                await self.uid_sync(folder, client)
+                reconnect_delay = 1
+                
+                while not stop_event.is_set():
+                    responses = await client.idle(idle_timeout)
+                    if not responses:
+                        continue  # Таймаут - просто перезапускаем IDLE
+                    
+                    if with_delta and any(
+                        b'EXPUNGE' in line or b'VANISHED' in line or b'FETCH' in line
+                        for line in responses
+                    ):
+                        await self.delta_sync(client, folder)
+                    
+                    if any(line.endswith(b'EXISTS') for line in responses):
+                        await self.uid_sync(folder, client)
+            except (ConnectionError, asyncio.TimeoutError, IMAPCommandError, OSError) as e:
+                print(f"⚠️  Async IDLE {self.sync.email}: {e}. Переподключение через {reconnect_delay} с")
+                try:
+                    await asyncio.wait_for(stop_event.wait(), reconnect_delay)
+                except asyncio.TimeoutError:
+                    pass
+                reconnect_delay = min(reconnect_delay * 2, 300)
+            finally:
+                if client is not None:
+                    await client.logout()
+
+
+def flatten(responses: List[List[Any]]) -> List[Any]:
+    """Склеивает ответы FETCH по письмам в один список (формат imaplib)"""
+    return [item for data in responses for item in data]
+
+
+async def sync_accounts(syncs: List[AsyncSolarSync], concurrency: int = 100) -> List[Any]:
+    """
+    Запускает smart_sync множества аккаунтов в одном event loop
+    
+    Args:
+        syncs: Движки аккаунтов
+        concurrency: Максимум одновременных IMAP-соединений
+    
+    Returns:
+        Статистика или исключение по каждому аккаунту (в порядке syncs)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run(engine: AsyncSolarSync):
+        async with semaphore:
+            return await engine.smart_sync()
+    
+    return await asyncio.gather(*(run(engine) for engine in syncs), return_exceptions=True)
@@ -0,0 +1,131 @@
+"""
+SolarMail - Async Sync Benchmark
+Сравнение блокирующего SolarSync.smart_sync и AsyncSolarSync на локальном IMAP-сервере
+
+Запуск:
+    python benchmark_async.py --accounts 50 --messages 200 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.header import Header
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr, format_datetime
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+from async_sync import AsyncSolarSync, sync_accounts
+from db_manager import DatabaseManager
+from fixtures import StandInIMAPServer
+from solar_sync import SolarSync
+
+
+def build_message(index: int) -> bytes:
+    """Простое письмо для бенчмарка (текст + HTML)"""
+    msg = MIMEMultipart('alternative')
+    msg['From'] = formataddr((str(Header('Отправитель', 'utf-8')), f'sender{index % 17}@example.com'))
+    msg['To'] = 'me@example.com'
+    msg['Subject'] = Header(f'Письмо №{index}: отчет за неделю', 'utf-8').encode()
+    msg['Date'] = format_datetime(datetime.now(timezone.utc) - timedelta(minutes=index))
+    msg['Message-ID'] = f'<bench-{index}@example.com>'
+    text = f'Добрый день! Отправляю отчет №{index}. ' * 40
+    msg.attach(MIMEText(text, 'plain', 'utf-8'))
+    msg.attach(MIMEText(f'<p>{text}</p>', 'html', 'utf-8'))
+    return msg.as_bytes()
+
+
+def make_sync(server: StandInIMAPServer, workdir: str, index: int, fetch_mode: str) -> SolarSync:
+    """SolarSync аккаунта с отдельной базой"""
+    host, port = server.address
+    db = DatabaseManager(os.path.join(workdir, f'account_{index}.db'))
+    return SolarSync(
+        fetch_mode=fetch_mode,
+        email=f'user{index}@example.com',
+        password='password',
+        imap_host=host,
+        imap_port=port,
+        use_ssl=False,
+        db=db
+    )
+
+
+def cached_rows(sync: SolarSync) -> List[tuple]:
+    """Содержимое кэша для сравнения результатов (без ключа uid: он включает аккаунт)"""
+    return sorted(
+        (row['imap_uid'], row['sender'], row['subject'], row['date'], row['body_preview'])
+        for row in sync.db.iter_emails()
+    )
+
+
+def measure(name: str, run: Callable[[], None], messages: int) -> Dict:
+    """Запускает вариант синхронизации и считает время"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run()
+    elapsed = time.perf_counter() - start
+    return {'name': name, 'seconds': elapsed, 'msgs_per_sec': messages / elapsed if elapsed else 0}
+
+
+def main():
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description='SolarSync vs AsyncSolarSync')
+    parser.add_argument('--accounts', type=int, default=20, help='Количество аккаунтов')
+    parser.add_argument('--messages', type=int, default=200, help='Писем в INBOX')
+    parser.add_argument('--latency', type=float, default=0.01, help='Задержка ответа сервера (с)')
+    parser.add_argument('--threads', type=int, default=8, help='Потоков для блокирующего варианта')
+    parser.add_argument('--mode', choices=['full', 'partial'], default='full', help='Режим загрузки')
+    args = parser.parse_args()
+    
+    with StandInIMAPServer(latency=args.latency) as server, tempfile.TemporaryDirectory() as workdir:
+        for index in range(args.messages):
+            server.add_message('INBOX', build_message(index))
+        
+        total = args.accounts * args.messages
+        results = []
+        
+        blocking = [make_sync(server, workdir, i, args.mode) for i in range(args.accounts)]
+        results.append(measure(
+            'SolarSync (последовательно)',
+            lambda: [sync.smart_sync() for sync in blocking],
+            total
+        ))
+        
+        threaded = [make_sync(server, workdir, 1000 + i, args.mode) for i in range(args.accounts)]
+        
+        def run_threaded():
+            with ThreadPoolExecutor(max_workers=args.threads) as executor:
+                list(executor.map(lambda sync: sync.smart_sync(), threaded))
+        
+        results.append(measure(f'SolarSync ({args.threads} потоков)', run_threaded, total))
+        
+        engines = [AsyncSolarSync(make_sync(server, workdir, 2000 + i, args.mode)) for i in range(args.accounts)]
+        
+        def run_async():
+            outcomes = asyncio.run(sync_accounts(engines, concurrency=args.accounts))
+            errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+            if errors:
+                raise errors[0]
+        
+        results.append(measure('AsyncSolarSync (1 event loop)', run_async, total))
+        
+        same = cached_rows(blocking[0]) == cached_rows(engines[0].sync)
+    
+    print("📊 Бенчмарк синхронизации")
+    print(f"   • Аккаунтов: {args.accounts}, писем в папке: {args.messages}, "
+          f"задержка: {args.latency * 1000:.0f} мс, режим: {args.mode}")
+    print("-" * 60)
+    for result in results:
+        print(f"   {result['name']:<32} {result['seconds']:>8.2f} с  {result['msgs_per_sec']:>9.0f} писем/с")
+    print("-" * 60)
+    print(f"   Результаты async и блокирующей синхронизации совпадают: {'да' if same else 'НЕТ'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+SolarMail - ONNX Backend Benchmark
+Точность и задержка AIParserTransformer: PyTorch против ONNX Runtime (fp32 / int8)
+
+Письма берутся из MailGenerator (категория письма известна). Для каждого
+варианта бэкенда меряется задержка одиночного анализа (как POST /analyze) и
+пропускная способность пакетного (как POST /analyze/batch по 100 писем).
+Точность - совпадение меток с PyTorch-вариантом, разброс scores и доля
+угаданных категорий генератора.
+
+Запуск:
+    python benchmark_onnx.py --emails 200 --threads 1 2 4
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import time
+from typing import Dict, List, Optional, Tuple
+
+from imap_tools import MailMessage
+
+from ai_parser_transformer import AIParserTransformer
+from fixtures import MailGenerator
+
+
+# Категории генератора → наши стандартные категории
+EXPECTED_CATEGORY = {
+    'meeting': 'Work',
+    'invoice': 'Docs',
+    'task': 'Tasks',
+    'newsletter': 'News',
+    'alert': 'Work',
+    'personal': 'People',
+    'promo': 'Spam',
+}
+
+# Размер запроса POST /analyze/batch
+API_BATCH = 100
+
+
+def load_emails(count: int, seed: int, ru_ratio: float) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Синтетические письма в том виде, в каком их видит анализатор
+    
+    Returns:
+        (список пар (тема, body_preview), ожидаемые категории)
+    """
+    generator = MailGenerator(seed=seed, ru_ratio=ru_ratio)
+    emails, expected = [], []
+    
+    for item in generator.iter_messages(count):
+        msg = MailMessage.from_bytes(item['raw'])
+        # body_preview как в кэше SolarSync: первые 200 символов текста
+        body_preview = (msg.text or msg.html or '')[:200].replace('\n', ' ').strip()
+        emails.append((msg.subject, body_preview))
+        expected.append(EXPECTED_CATEGORY[item['category']])
+    
+    return emails, expected
+
+
+def build_parser(args, backend: str, quantize: bool = True, threads: Optional[int] = None) -> AIParserTransformer:
+    """AIParserTransformer варианта бенчмарка (без логов загрузки)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = AIParserTransformer(
+            model_name=args.model,
+            zero_shot_model=args.zero_shot_model,
+            batch_size=args.batch_size,
+            fallback_to_mock=False,
+            backend=backend,
+            onnx_quantize=quantize,
+            onnx_threads=threads,
+            onnx_dir=args.onnx_dir,
+            category_method=args.category_method,
+            embedding_model=args.embedding_model
+        )
+    
+    categories_ready = parser.zero_shot_pipeline is not None or parser.category_classifier is not None
+    if not parser.transformer_ready or parser.backend != backend or not categories_ready:
+        raise SystemExit(f"❌ Бэкенд {backend} недоступен (нужны transformers, torch и onnxruntime)")
+    return parser
+
+
+def measure(name: str, parser: AIParserTransformer, emails: List[Tuple[str, str]], singles: int) -> Dict:
+    """
+    Задержка одиночного анализа и пропускная способность пакетного
+    
+    Returns:
+        Словарь с метриками и результатами анализа
+    """
+    # Прогрев (первый forward pass выделяет память и строит планы)
+    parser.analyze_emails(emails[:parser.batch_size])
+    
+    latencies = []
+    for subject, body in emails[:singles]:
+        start = time.perf_counter()
+        parser.analyze_email(subject, body)
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    results = []
+    start = time.perf_counter()
+    for offset in range(0, len(emails), API_BATCH):
+        results.extend(parser.analyze_emails(emails[offset:offset + API_BATCH]))
+    elapsed = time.perf_counter() - start
+    
+    return {
+        'name': name,
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0],
+        'emails_per_sec': len(emails) / elapsed if elapsed else 0,
+        'results': results
+    }
+
+
+def compare(row: Dict, reference: Dict, expected: List[str]):
+    """Метрики точности варианта относительно PyTorch и категорий генератора"""
+    pairs = list(zip(row['results'], reference['results']))
+    
+    row['sentiment_agree'] = sum(a['sentiment'] == b['sentiment'] for a, b in pairs) / len(pairs)
+    row['category_agree'] = sum(a['category'] == b['category'] for a, b in pairs) / len(pairs)
+    row['max_score_diff'] = max(
+        max(abs(a['sentiment_score'] - b['sentiment_score']), abs(a['category_confidence'] - b['category_confidence']))
+        for a, b in pairs
+    )
+    row['category_accuracy'] = sum(
+        result['category'] == category for result, category in zip(row['results'], expected)
+    ) / len(expected)
+
+
+def print_report(rows: List[Dict], args):
+    """Таблица accuracy vs latency"""
+    reference = rows[0]
+    
+    print("\n" + "=" * 104)
+    category_model = args.embedding_model if args.category_method == 'embedding' else args.zero_shot_model
+    print(f"📊 {args.emails} писем, batch_size={args.batch_size}, модели: {args.model} + {category_model}")
+    print("=" * 104)
+    print(f"{'Вариант':22} | {'p50 ms':>8} | {'p95 ms':>8} | {'писем/с':>8} | {'x torch':>7} | "
+          f"{'sent=':>6} | {'cat=':>6} | {'max Δscore':>10} | {'cat acc':>7}")
+    print("-" * 104)
+    
+    for row in rows:
+        print(f"{row['name']:22} | {row['p50_ms']:8.1f} | {row['p95_ms']:8.1f} | {row['emails_per_sec']:8.1f} | "
+              f"{row['emails_per_sec'] / reference['emails_per_sec']:6.2f}x | "
+              f"{row['sentiment_agree']:6.1%} | {row['category_agree']:6.1%} | "
+              f"{row['max_score_diff']:10.4f} | {row['category_accuracy']:7.1%}")
+    
+    print("\nsent= / cat= - совпадение меток с PyTorch; cat acc - категория генератора писем")
+
+
+def main():
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description='AIParserTransformer: PyTorch vs ONNX Runtime')
+    parser.add_argument('--emails', type=int, default=200, help='Количество писем')
+    parser.add_argument('--singles', type=int, default=30, help='Писем для замера одиночной задержки')
+    parser.add_argument('--batch-size', type=int, default=16, help='Последовательностей в forward pass')
+    parser.add_argument('--threads', type=int, nargs='+', default=[0], help='Потоки ONNX Runtime (0 - по числу ядер)')
+    parser.add_argument('--model', default='distilbert-base-uncased-finetuned-sst-2-english', help='Модель тональности')
+    parser.add_argument('--zero-shot-model', default='facebook/bart-large-mnli', help='NLI-модель категорий')
+    parser.add_argument('--category-method', choices=['zero-shot', 'embedding'], default='zero-shot',
+                        help='Категоризация: zero-shot NLI или прототипы эмбеддингов')
+    parser.add_argument('--embedding-model', default='sentence-transformers/all-MiniLM-L6-v2', help='Sentence-энкодер')
+    parser.add_argument('--onnx-dir', default=None, help='Каталог кэша ONNX-моделей')
+    parser.add_argument('--ru-ratio', type=float, default=0.0, help='Доля писем на русском (модели англоязычные)')
+    parser.add_argument('--seed', type=int, default=1, help='Зерно генератора писем')
+    args = parser.parse_args()
+    
+    emails, expected = load_emails(args.emails, args.seed, args.ru_ratio)
+    print(f"📬 Писем: {len(emails)}")
+    
+    variants = [('torch fp32', 'torch', False, None), ('onnx fp32', 'onnx', False, None)]
+    variants += [(f"onnx int8 ({threads or 'auto'} thr)", 'onnx', True, threads or None) for threads in args.threads]
+    
+    rows = []
+    for name, backend, quantize, threads in variants:
+        print(f"⏱️  {name}...")
+        rows.append(measure(name, build_parser(args, backend, quantize, threads), emails, args.singles))
+    
+    for row in rows:
+        compare(row, rows[0], expected)
+    
+    print_report(rows, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+SolarMail - AIParser Microbenchmark
+Время под-анализов AIParser.analyze_email: до и после общего AnalysisContext
+
+"До" - прежний путь, воспроизведенный здесь: каждый под-анализ сам склеивает
+тему с телом, приводит к нижнему регистру, разбивает на слова и прогоняет
+регулярные выражения, заданные строками внутри функции. "После" - письмо
+разбирается один раз (AnalysisContext), под-анализы берут из него текст и
+поток слов. Результаты обоих путей сверяются.
+
+С --workers меряется пакетный режим: AIParser.analyze_parallel в пуле
+процессов, результаты - сразу в email_meta временной БД
+(upsert_email_meta_bulk). Ускорение ограничено числом ядер и записью в
+SQLite, которая идет в одном процессе.
+
+Запуск:
+    python benchmark_parser.py --emails 2000 --repeat 5
+    python benchmark_parser.py --emails 20000 --workers 1 2 4 8
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+from imap_tools import MailMessage
+
+from ai_parser import AIParser
+from analysis_context import AnalysisContext
+from db_manager import DatabaseManager
+from fixtures import MailGenerator
+
+
+def load_emails(count: int, seed: int, ru_ratio: float) -> List[Tuple[str, str]]:
+    """Синтетические письма в том виде, в каком их видит анализатор: (тема, body_preview)"""
+    generator = MailGenerator(seed=seed, ru_ratio=ru_ratio)
+    emails = []
+    for item in generator.iter_messages(count):
+        msg = MailMessage.from_bytes(item['raw'])
+        # body_preview как в кэше SolarSync: первые 200 символов текста
+        body_preview = (msg.text or msg.html or '')[:200].replace('\n', ' ').strip()
+        emails.append((msg.subject, body_preview))
+    return emails
+
+
+def legacy_entities(subject: str, body: str) -> Dict[str, List[str]]:
+    """Прежний _extract_entities: текст собирается заново, шаблоны - строками"""
+    text = f"{subject} {body}"
+    entities = {'emails': [], 'dates': [], 'urls': [], 'persons': []}
+    entities['emails'] = list(set(re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)))
+    for pattern in [r'\d{4}-\d{2}-\d{2}', r'\d{2}\.\d{2}\.\d{4}', r'\d{1,2}/\d{1,2}/\d{4}']:
+        entities['dates'].extend(re.findall(pattern, text))
+    entities['urls'] = list(set(re.findall(r'https?://[^\s<>"{}|\\^`\[\]]+', text)))
+    potential_names = re.findall(r'\b[A-ZА-ЯЁ][a-zа-яё]+(?:\s+[A-ZА-ЯЁ][a-zа-яё]+)\b', text)
+    stop_words = {'Subject', 'From', 'To', 'Date', 'Best Regards', 'Thank You'}
+    entities['persons'] = [name for name in potential_names if name not in stop_words][:5]
+    for key in entities:
+        entities[key] = entities[key][:10]
+    return entities
+
+
+def legacy_keywords(text: str) -> List[str]:
+    """Прежний _extract_keywords без тем: повторный lower() и re.findall"""
+    stop_words = {
+        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+        'of', 'with', 'by', 'from', 'is', 'was', 'are', 'were', 'been',
+        'в', 'и', 'на', 'с', 'по', 'для', 'от', 'к', 'из', 'это', 'быть'
+    }
+    word_freq = {}
+    for word in re.findall(r'\b\w+\b', text.lower()):
+        if len(word) > 3 and word not in stop_words:
+            word_freq[word] = word_freq.get(word, 0) + 1
+    return [word for word, _ in sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:10]]
+
+
+def best_of(function: Callable, items: List, repeat: int) -> float:
+    """Лучшее из repeat прогонов время на один элемент, мкс"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        best = min(best, (time.perf_counter() - start) / len(items))
+    return best * 1e6
+
+
+def check_equal(parser: AIParser, emails: List[Tuple[str, str]]):
+    """Сущности и ключевые слова обоих путей совпадают"""
+    for subject, body in emails:
+        context = AnalysisContext(subject, body)
+        assert parser._extract_entities(context) == legacy_entities(subject or '', body or ''), subject
+        assert parser._extract_keywords(context)['keywords'] == legacy_keywords(context.lower), subject
+
+
+def measure_workers(parser: AIParser, emails: List[Tuple[str, str]], workers: List[int], chunk_size: int):
+    """Пропускная способность analyze_parallel + upsert_email_meta_bulk по числу процессов"""
+    print("\n" + "=" * 68)
+    print(f"{'Процессов':>9} | {'писем/с':>10} | {'анализ + запись, с':>18} | {'ускорение':>9}")
+    print("-" * 68)
+    
+    baseline = None
+    for count in workers:
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, 'benchmark.db'))
+            rows = [
+                {'uid': f"benchmark/{index}", 'sender': 'benchmark@example.com', 'subject': subject,
+                 'date': '2025-01-01', 'body_preview': body}
+                for index, (subject, body) in enumerate(emails)
+            ]
+            new_ids = db.insert_emails_bulk(rows)['new_ids']
+            for row in rows:
+                row['id'] = new_ids[row['uid']]
+            
+            start = time.perf_counter()
+            written = 0
+            for chunk, results in parser.analyze_parallel(rows, workers=count, chunk_size=chunk_size):
+                written += db.upsert_email_meta_bulk(
+                    (email['id'], meta_data) for email, meta_data in zip(chunk, results)
+                )
+            elapsed = time.perf_counter() - start
+            db.close()
+        
+        assert written == len(emails)
+        rate = len(emails) / elapsed
+        baseline = baseline or rate
+        print(f"{count:9} | {rate:10.0f} | {elapsed:18.2f} | {rate / baseline:8.2f}x")
+    print("=" * 68)
+    print(f"Ядер: {os.cpu_count()}")
+
+
+def main():
+    """Точка входа бенчмарка"""
+    arg_parser = argparse.ArgumentParser(description='AIParser: под-анализы до и после AnalysisContext')
+    arg_parser.add_argument('--emails', type=int, default=2000, help='Количество писем')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='Прогонов на замер (берется лучший)')
+    arg_parser.add_argument('--ru-ratio', type=float, default=0.5, help='Доля писем на русском')
+    arg_parser.add_argument('--seed', type=int, default=1, help='Зерно генератора писем')
+    arg_parser.add_argument('--workers', type=int, nargs='+', default=None,
+                            help='Числа процессов для замера пакетного режима (вместо под-анализов)')
+    arg_parser.add_argument('--chunk-size', type=int, default=1000, help='Писем в пачке пакетного режима')
+    args = arg_parser.parse_args()
+    
+    emails = load_emails(args.emails, args.seed, args.ru_ratio)
+    parser = AIParser()
+    if args.workers:
+        print(f"📬 Писем: {len(emails)}, пачка: {args.chunk_size}")
+        measure_workers(parser, emails, args.workers, args.chunk_size)
+        return
+    
+    print(f"📬 Писем: {len(emails)}, прогонов: {args.repeat}")
+    
+    check_equal(parser, emails)
+    print("✅ Сущности и ключевые слова совпадают с прежним путем")
+    
+    contexts = [AnalysisContext(subject, body) for subject, body in emails]
+    lowered = [context.lower for context in contexts]
+    matcher = parser.keyword_matcher
+    # Прогрев кэша слов KeywordMatcher (в работе он заполнен)
+    for context in contexts:
+        matcher.count(context.lower, context.words)
+    
+    def legacy_email(email: Tuple[str, str]):
+        subject, body = email
+        full_text = f"{subject or ''} {body or ''}".lower()
+        counts = matcher.count(full_text)
+        parser._analyze_priority(full_text, counts)
+        parser._analyze_category(full_text, counts)
+        parser._analyze_sentiment(full_text, counts)
+        entities = legacy_entities(subject or '', body or '')
+        keywords = legacy_keywords(full_text)
+        json.dumps(entities, ensure_ascii=False)
+        json.dumps({'keywords': keywords, 'topics': parser._infer_topics(keywords)}, ensure_ascii=False)
+    
+    stages = [
+        # (этап, до, данные до, после, данные после)
+        ('разбор текста', lambda email: f"{email[0] or ''} {email[1] or ''}".lower(), emails,
+         lambda email: AnalysisContext(*email), emails),
+        ('ключевые слова словарей', matcher.count, lowered,
+         lambda context: matcher.count(context.lower, context.words), contexts),
+        ('сущности', lambda email: legacy_entities(email[0] or '', email[1] or ''), emails,
+         parser._extract_entities, contexts),
+        ('ключевые слова письма', legacy_keywords, lowered,
+         parser._extract_keywords, contexts),
+        ('analyze_email целиком', legacy_email, emails,
+         lambda email: parser.analyze_email(*email), emails),
+    ]
+    
+    print("\n" + "=" * 68)
+    print(f"{'Этап':26} | {'до, мкс':>9} | {'после, мкс':>10} | {'ускорение':>9}")
+    print("-" * 68)
+    for name, before, before_items, after, after_items in stages:
+        before_us = best_of(before, before_items, args.repeat)
+        after_us = best_of(after, after_items, args.repeat)
+        print(f"{name:26} | {before_us:9.1f} | {after_us:10.1f} | {before_us / after_us:8.2f}x")
+    print("=" * 68)
+    print("Разбор текста 'после' включает разбиение на слова, которое дальше общее для всех этапов")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,460 @@
+"""
+SolarMail - Sync Benchmark
+Сравнение режимов синхронизации на локальном IMAP-сервере с синтетической почтой
+
+Для каждого режима (run, smart_sync, uid_sync, multi_folder_sync, delta sync,
+AsyncSolarSync) выводятся писем/с, байт/с от сервера и пиковый RSS; для
+IDLE-режимов - задержка от изменения ящика на сервере до обновления кэша.
+Каждый режим запускается в отдельном процессе с пустым кэшем, поэтому
+пиковый RSS не смешивается между режимами; сервер и письма живут в
+родительском процессе и в RSS режима не входят.
+
+Запуск:
+    python benchmark_sync.py --messages 2000 --latency 0.005
+    python benchmark_sync.py --scenarios smart_sync uid_sync_partial --sizes large
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import statistics
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from fixtures import MailGenerator, StandInIMAPServer
+
+
+# Профили размеров текста писем для MailGenerator: (вес, мин. байт, макс. байт)
+SIZE_PROFILES = {
+    'small': [(1.0, 300, 2_000)],
+    'default': None,  # DEFAULT_SIZE_DISTRIBUTION генератора
+    'large': [(0.5, 20_000, 120_000), (0.5, 120_000, 500_000)],
+}
+
+# Дополнительные папки для multi_folder_sync (заполняются как INBOX)
+EXTRA_FOLDERS = ['Archive', 'Sent']
+
+# IDLE-режимы: событий каждого вида (новое письмо, флаги, удаление),
+# период перезапуска IDLE и сколько ждать обновления кэша (с)
+IDLE_EVENTS = 10
+IDLE_RESTART = 1
+IDLE_WAIT_TIMEOUT = 30
+
+
+# ==================== Scenarios (worker process) ====================
+
+def count_cached(sync) -> int:
+    """Количество писем в кэше после синхронизации"""
+    return sync.db.get_emails_count()
+
+
+def sync_method(method: str) -> Callable:
+    """Запуск метода SolarSync, результат - количество писем в кэше"""
+    def run(sync) -> int:
+        getattr(sync, method)()
+        return count_cached(sync)
+    return run
+
+
+def run_multi_folder(sync) -> int:
+    """multi_folder_sync по INBOX и EXTRA_FOLDERS (ошибка папки - ошибка бенчмарка)"""
+    results = sync.multi_folder_sync(['INBOX'] + EXTRA_FOLDERS)
+    errors = {folder: result['error'] for folder, result in results.items() if 'error' in result}
+    if errors:
+        raise RuntimeError(f'multi_folder_sync failed: {errors}')
+    return count_cached(sync)
+
+
+def run_delta(sync) -> int:
+    """uid_sync с delta-синхронизацией флагов и удалений закэшированных писем"""
+    checked = count_cached(sync)
+    sync.uid_sync(with_delta=True)
+    return checked
+
+
+def async_method(method: str) -> Callable:
+    """Запуск метода AsyncSolarSync в собственном event loop"""
+    def run(sync) -> int:
+        from async_sync import AsyncSolarSync
+        engine = AsyncSolarSync(sync)
+        asyncio.run(getattr(engine, method)())
+        return count_cached(sync)
+    return run
+
+
+def start_idle(sync, engine: str) -> Callable[[], None]:
+    """
+    Запускает idle_sync SolarSync ('sync') или AsyncSolarSync ('async') в фоновом потоке
+    
+    Returns:
+        Функция остановки IDLE-сессии
+    """
+    if engine == 'sync':
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=sync.idle_sync,
+            kwargs={'idle_timeout': IDLE_RESTART, 'stop_event': stop_event},
+            daemon=True
+        )
+        stop = stop_event.set
+    else:
+        from async_sync import AsyncSolarSync
+        running = {'ready': threading.Event()}
+        
+        async def serve():
+            running['loop'] = asyncio.get_running_loop()
+            running['stop'] = asyncio.Event()
+            running['ready'].set()
+            await AsyncSolarSync(sync).idle_sync(idle_timeout=IDLE_RESTART, stop_event=running['stop'])
+        
+        thread = threading.Thread(target=asyncio.run, args=(serve(),), daemon=True)
+        
+        def stop():
+            running['ready'].wait()
+            running['loop'].call_soon_threadsafe(running['stop'].set)
+    
+    thread.start()
+    
+    def shutdown():
+        stop()
+        thread.join(timeout=IDLE_RESTART * 10)
+    return shutdown
+
+
+def wait_cached(sync, event: Dict) -> float:
+    """
+    Ждет, пока кэш отразит изменение ящика
+    
+    Args:
+        event: {'at': время изменения (time.time()), 'present': [UID], 'absent': [UID], 'flags': {UID: флаги}}
+    
+    Returns:
+        Задержка от изменения на сервере до обновления кэша (мс)
+    """
+    flags = {int(uid): value for uid, value in event['flags'].items()}
+    uids = set(event['present']) | set(event['absent']) | set(flags)
+    deadline = time.time() + IDLE_WAIT_TIMEOUT
+    while True:
+        cached = sync.db.get_folder_flags(sync.email, 'INBOX', uids)
+        if (all(uid in cached for uid in event['present'])
+                and not any(uid in cached for uid in event['absent'])
+                and all(cached.get(uid) == value for uid, value in flags.items())):
+            return (time.time() - event['at']) * 1000
+        if time.time() > deadline:
+            raise RuntimeError(f'IDLE: cache did not reflect {event} in {IDLE_WAIT_TIMEOUT} s')
+        time.sleep(0.002)
+
+
+def idle_method(engine: str) -> Callable:
+    """
+    IDLE-сессия: на каждое изменение ящика от родителя (строка JSON в stdin)
+    ждет обновления кэша и подтверждает его строкой OK; DONE - конец
+    """
+    def run(sync) -> Dict:
+        shutdown = start_idle(sync, engine)
+        latencies = []
+        try:
+            for line in iter(sys.stdin.readline, ''):
+                if line.strip() == 'DONE':
+                    break
+                latencies.append(wait_cached(sync, json.loads(line)))
+                sys.__stdout__.write('OK\n')
+                sys.__stdout__.flush()
+        finally:
+            shutdown()
+        return {'messages': len(latencies), 'latency_ms': latencies}
+    return run
+
+
+# Режимы бенчмарка: prepare - подготовка кэша (не измеряется),
+# run - измеряемая синхронизация, возвращает количество обработанных писем
+# (или словарь с messages и дополнительными метриками).
+# delta_sync и IDLE-режимы меняют почтовый ящик, поэтому идут последними.
+SCENARIOS = {
+    'run': {'fetch_mode': 'full', 'run': sync_method('run')},
+    'smart_sync': {'fetch_mode': 'full', 'run': sync_method('smart_sync')},
+    'smart_sync_partial': {'fetch_mode': 'partial', 'run': sync_method('smart_sync')},
+    'uid_sync': {'fetch_mode': 'full', 'run': sync_method('uid_sync')},
+    'uid_sync_partial': {'fetch_mode': 'partial', 'run': sync_method('uid_sync')},
+    'multi_folder_sync': {'fetch_mode': 'partial', 'run': run_multi_folder},
+    'async_smart_sync': {'fetch_mode': 'full', 'run': async_method('smart_sync')},
+    'async_uid_sync': {'fetch_mode': 'partial', 'run': async_method('uid_sync')},
+    'delta_sync': {
+        'fetch_mode': 'partial',
+        'prepare': lambda sync: sync.uid_sync(),
+        'mutate': True,
+        'run': run_delta,
+    },
+    'idle_sync': {
+        'fetch_mode': 'partial',
+        'prepare': lambda sync: sync.uid_sync(),
+        'push': True,
+        'run': idle_method('sync'),
+    },
+    'async_idle_sync': {
+        'fetch_mode': 'partial',
+        'prepare': lambda sync: sync.uid_sync(),
+        'push': True,
+        'run': idle_method('async'),
+    },
+}
+
+
+def reset_peak_rss():
+    """Сбрасывает пиковый RSS процесса (Linux: /proc/self/clear_refs), чтобы не учитывать prepare"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_kb() -> int:
+    """
+    Пиковый RSS процесса в КБ
+    
+    На Linux читается VmHWM (учитывает reset_peak_rss), иначе - ru_maxrss.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # macOS считает в байтах
+
+
+def worker(args):
+    """
+    Процесс одного режима: prepare → READY → ждет GO → run → JSON с результатом
+    
+    Весь вывод SolarSync подавляется, протокол идет через исходный stdout.
+    """
+    from db_manager import DatabaseManager
+    from solar_sync import SolarSync
+    
+    protocol = sys.__stdout__
+    scenario = SCENARIOS[args.worker]
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        sync = SolarSync(
+            fetch_mode=scenario['fetch_mode'],
+            email='bench@example.com',
+            password='password',
+            imap_host=args.host,
+            imap_port=args.port,
+            use_ssl=False,
+            db=DatabaseManager(os.path.join(args.workdir, f'{args.worker}.db'))
+        )
+        if 'prepare' in scenario:
+            scenario['prepare'](sync)
+    
+    reset_peak_rss()
+    protocol.write('READY\n')
+    protocol.flush()
+    sys.stdin.readline()
+    
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        outcome = scenario['run'](sync)
+    elapsed = time.perf_counter() - start
+    
+    result = outcome if isinstance(outcome, dict) else {'messages': outcome}
+    result.update({'seconds': elapsed, 'peak_rss_kb': peak_rss_kb()})
+    protocol.write(json.dumps(result) + '\n')
+    protocol.flush()
+
+
+# ==================== Harness (parent process) ====================
+
+def mutate_mailbox(server: StandInIMAPServer, folder: str = 'INBOX') -> Dict[str, int]:
+    """Изменения для delta_sync: флаги у каждого 10-го письма, удаление каждого 20-го"""
+    uids = [message.uid for message in server.folders[folder]['messages']]
+    flagged = uids[::10]
+    for uid in flagged:
+        server.set_flags(folder, uid, ['\\Seen', '\\Flagged'])
+    expunged = server.expunge(folder, uids[5::20])
+    return {'flagged': len(flagged), 'expunged': len(expunged)}
+
+
+def push_events(server: StandInIMAPServer, count: int, folder: str = 'INBOX'):
+    """
+    Изменения для IDLE-режимов по очереди: новое письмо, флаги, удаление
+    
+    Yields:
+        Пары (изменение ящика, ожидаемое состояние кэша для wait_cached)
+    """
+    uids = [message.uid for message in server.folders[folder]['messages']]
+    raw = server.folders[folder]['messages'][0].raw
+    count = min(count, len(uids) // 2)
+    
+    for index in range(count):
+        uid = server.folders[folder]['uidnext']
+        yield (lambda: server.add_message(folder, raw)), {'present': [uid], 'absent': [], 'flags': {}}
+        
+        flagged = uids[2 * index]
+        flags = ['\\Seen', f'$Bench{index}']
+        yield (lambda: server.set_flags(folder, flagged, flags)), \
+            {'present': [], 'absent': [], 'flags': {flagged: ' '.join(sorted(flags))}}
+        
+        expunged = uids[2 * index + 1]
+        yield (lambda: server.expunge(folder, [expunged])), {'present': [], 'absent': [expunged], 'flags': {}}
+
+
+def drive_idle(process: subprocess.Popen, server: StandInIMAPServer, count: int):
+    """
+    Меняет ящик по одному событию, пока сессия режима в IDLE, и ждет подтверждения кэша
+    
+    Время изменения (time.time()) передается в worker: задержку считает он.
+    """
+    for mutate, expected in push_events(server, count):
+        deadline = time.time() + IDLE_WAIT_TIMEOUT
+        while not server.idling():
+            if time.time() > deadline:
+                raise RuntimeError('IDLE session did not start')
+            time.sleep(0.001)
+        
+        at = time.time()
+        mutate()
+        process.stdin.write(json.dumps(dict(expected, at=at)) + '\n')
+        process.stdin.flush()
+        if process.stdout.readline().strip() != 'OK':
+            raise RuntimeError('IDLE worker failed')
+    
+    process.stdin.write('DONE\n')
+    process.stdin.flush()
+
+
+def run_scenario(name: str, server: StandInIMAPServer, workdir: str, idle_events: int = IDLE_EVENTS) -> Dict:
+    """
+    Запускает режим в отдельном процессе и считает трафик сервера за измеряемую часть
+    
+    Returns:
+        Словарь: name, messages, seconds, bytes, peak_rss_kb
+    """
+    host, port = server.address
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--worker', name,
+         '--host', host, '--port', str(port), '--workdir', workdir],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    try:
+        if process.stdout.readline().strip() != 'READY':
+            raise RuntimeError(f'{name}: worker failed during prepare')
+        
+        if SCENARIOS[name].get('mutate'):
+            mutate_mailbox(server)
+        
+        bytes_before = server.bytes_sent
+        process.stdin.write('GO\n')
+        process.stdin.flush()
+        if SCENARIOS[name].get('push'):
+            drive_idle(process, server, idle_events)
+        line = process.stdout.readline()
+        bytes_sent = server.bytes_sent - bytes_before
+    finally:
+        process.stdin.close()
+        process.wait()
+    
+    if process.returncode != 0 or not line:
+        raise RuntimeError(f'{name}: worker exited with code {process.returncode}')
+    
+    result = json.loads(line)
+    result.update({'name': name, 'bytes': bytes_sent})
+    return result
+
+
+def print_report(results: List[Dict], args, mailbox_bytes: int):
+    """Таблица результатов"""
+    print("📊 Бенчмарк режимов синхронизации")
+    print(f"   • Писем в папке: {args.messages} ({mailbox_bytes / 1024 / 1024:.1f} МБ), "
+          f"задержка: {args.latency * 1000:.0f} мс, сервер: {args.capabilities}")
+    print("-" * 78)
+    print(f"   {'Режим':<20} {'писем':>7} {'время, с':>9} {'писем/с':>9} {'МБ/с':>8} {'трафик, МБ':>11} {'RSS, МБ':>8}")
+    for result in results:
+        seconds = result['seconds'] or 1e-9
+        print(f"   {result['name']:<20} {result['messages']:>7} {seconds:>9.2f} "
+              f"{result['messages'] / seconds:>9.0f} {result['bytes'] / seconds / 1024 / 1024:>8.2f} "
+              f"{result['bytes'] / 1024 / 1024:>11.2f} {result['peak_rss_kb'] / 1024:>8.1f}")
+    print("-" * 78)
+    
+    for result in results:
+        latencies = result.get('latency_ms')
+        if latencies:
+            print(f"   ⚡ {result['name']}: изменение на сервере → кэш за "
+                  f"{statistics.median(latencies):.1f} мс (медиана), {max(latencies):.1f} мс (макс), "
+                  f"событий: {len(latencies)}")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description='Бенчмарк режимов SolarSync')
+    parser.add_argument('--messages', type=int, default=1000, help='Писем в каждой папке')
+    parser.add_argument('--latency', type=float, default=0.005, help='Задержка ответа сервера (с)')
+    parser.add_argument('--capabilities', choices=['plain', 'condstore', 'qresync'], default='qresync',
+                        help='Расширения сервера для delta-синхронизации')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help='Режимы для измерения')
+    parser.add_argument('--sizes', choices=list(SIZE_PROFILES), default='default', help='Профиль размеров писем')
+    parser.add_argument('--attachment-ratio', type=float, default=0.15, help='Доля писем с вложениями')
+    parser.add_argument('--html-ratio', type=float, default=0.6, help='Доля писем с HTML-версией')
+    parser.add_argument('--ru-ratio', type=float, default=0.5, help='Доля писем на русском')
+    parser.add_argument('--seed', type=int, default=1, help='Зерно генератора писем')
+    parser.add_argument('--idle-events', type=int, default=IDLE_EVENTS,
+                        help='IDLE-режимы: событий каждого вида (новое письмо, флаги, удаление)')
+    # Внутренний режим: процесс одного сценария
+    parser.add_argument('--worker', choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument('--host', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    
+    if args.worker:
+        worker(args)
+        return
+    
+    generator = MailGenerator(
+        seed=args.seed,
+        ru_ratio=args.ru_ratio,
+        html_ratio=args.html_ratio,
+        attachment_ratio=args.attachment_ratio,
+        size_distribution=SIZE_PROFILES[args.sizes]
+    )
+    server = StandInIMAPServer(
+        latency=args.latency,
+        condstore=args.capabilities == 'condstore',
+        qresync=args.capabilities == 'qresync'
+    )
+    
+    print(f"📬 Генерация {args.messages} писем x {1 + len(EXTRA_FOLDERS)} папки...")
+    for index, folder in enumerate(['INBOX'] + EXTRA_FOLDERS):
+        server.populate(folder, args.messages, generator, start=index * args.messages)
+    mailbox_bytes = sum(len(message.raw) for message in server.folders['INBOX']['messages'])
+    
+    # Порядок SCENARIOS сохраняется: delta_sync и IDLE-режимы меняют ящик и идут последними
+    names = [name for name in SCENARIOS if name in args.scenarios]
+    results = []
+    with server, tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            print(f"⏱️  {name}...")
+            results.append(run_scenario(name, server, workdir, args.idle_events))
+    
+    print_report(results, args, mailbox_bytes)
+
+
+if __name__ == "__main__":
+    main()
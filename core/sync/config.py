@@ -10,6 +10,10 @@ SolarMail - Configuration
 # Gmail IMAP Settings
 IMAP_HOST = "imap.gmail.com"
 
+# Порт и шифрование IMAP (993 + SSL для всех популярных провайдеров)
+IMAP_PORT = 993
+IMAP_SSL = True
+
 # Ваши учетные данные
 # ВАЖНО: Для Gmail используйте App Password, а не основной пароль
 # Как создать App Password: https://support.google.com/accounts/answer/185833
@@ -38,3 +42,80 @@ SYNC_DAYS = 3
 
 # Папка для синхронизации (по умолчанию: INBOX)
 SYNC_FOLDER = "INBOX"
+
+# Папки для multi_folder_sync (имена зависят от сервера)
+# Gmail: ["INBOX", "[Gmail]/Sent Mail", "[Gmail]/All Mail"]
+# Outlook: ["INBOX", "Sent Items", "Archive"]
+SYNC_FOLDERS = [SYNC_FOLDER]
+
+# Количество одновременных IMAP-соединений при синхронизации папок
+# (Gmail допускает до 15 соединений на аккаунт)
+SYNC_POOL_SIZE = 4
+
+# Режим загрузки писем:
+#   "full"    - полный RFC822 (включая вложения) через imap_tools
+#   "partial" - только ENVELOPE + первые PREVIEW_BYTES байт текстовой части
+FETCH_MODE = "full"
+
+# Сколько байт текстовой части загружать в режиме "partial"
+# (с запасом на base64/quoted-printable и кириллицу для превью в 200 символов)
+PREVIEW_BYTES = 2048
+
+# Потоковая синхронизация (smart_sync): размер пачки записи в кэш
+# и емкость очередей между загрузкой, записью и AI-анализом
+PIPELINE_BATCH_SIZE = 100
+PIPELINE_QUEUE_SIZE = 500
+
+# Как часто smart_sync сохраняет checkpoint (через сколько писем):
+# после обрыва синхронизация продолжается с последнего сохраненного UID
+CHECKPOINT_EVERY = 500
+
+# Кэш AI-анализа по содержимому письма (AnalysisCache): записей в памяти
+# процесса и в таблице analysis_cache (сверх лимита вытесняются самые старые)
+ANALYSIS_CACHE_MEMORY_SIZE = 4096
+ANALYSIS_CACHE_MAX_ENTRIES = 100_000
+
+# Фоновый переанализ кэша (ReanalysisJob, python reanalysis.py): писем в пачке,
+# процессов эвристики (0 - по числу ядер), лимит писем в секунду (0 - без лимита)
+# и как часто печатать прогресс (секунды)
+REANALYSIS_BATCH_SIZE = 500
+REANALYSIS_WORKERS = 1
+REANALYSIS_MAX_RATE = 0
+REANALYSIS_PROGRESS_INTERVAL = 10
+
+# Количество UID в одной команде FETCH асинхронного движка (AsyncSolarSync)
+ASYNC_FETCH_CHUNK = 200
+
+# Период перезапуска IMAP IDLE в секундах
+# (RFC 2177: сервер может разорвать IDLE через 30 минут, перезапускаем раньше)
+IDLE_TIMEOUT = 25 * 60
+
+# ==========================================
+# Multi-Account Scheduler
+# ==========================================
+
+# Аккаунты для SyncScheduler (по умолчанию - единственный аккаунт выше)
+# Пример: {"email": "a@gmail.com", "password": "app-password",
+#          "imap_host": "imap.gmail.com", "folders": ["INBOX"], "connections": 1}
+ACCOUNTS = [
+    {"email": EMAIL, "password": PASSWORD, "imap_host": IMAP_HOST}
+]
+
+# Лимит одновременных IMAP-соединений на сервер (на все аккаунты процесса)
+HOST_CONNECTION_LIMITS = {
+    "imap.gmail.com": 10,
+    "outlook.office365.com": 8,
+    "imap.mail.yahoo.com": 5,
+}
+
+# Лимит для серверов, которых нет в HOST_CONNECTION_LIMITS
+DEFAULT_HOST_CONNECTIONS = 4
+
+# Интервал между синхронизациями аккаунта в секундах
+SYNC_INTERVAL = 5 * 60
+
+# Случайный разброс интервала (0.2 = ±20%), чтобы аккаунты не синхронизировались разом
+SYNC_JITTER = 0.2
+
+# Количество потоков планировщика (аккаунтов, синхронизируемых одновременно)
+SCHEDULER_WORKERS = 32
@@ -3,36 +3,101 @@ SolarMail - Database Manager
 Управление локальным кэш-хранилищем SQLite для синхронизации писем
 """
 
+import base64
+import html
+import re
 import sqlite3
 import json
-from typing import List, Dict, Optional, Any
+from typing import Iterable, Iterator, List, Dict, Optional, Any, Set, Tuple
 from datetime import datetime
 
+from storage import SQLiteStorage
+
+
+# Вставка письма (общая для insert_email и insert_emails_bulk)
+INSERT_EMAIL_SQL = """
+    INSERT INTO emails (
+        uid, sender, subject, date, body_preview,
+        account_email, folder, imap_uid, flags
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Запись AI-метаданных (общая для insert_email_meta и upsert_email_meta_bulk):
+# у письма одна запись, повторная запись ее заменяет
+INSERT_META_SQL = """
+    INSERT INTO email_meta (
+        email_id, sentiment, sentiment_score, priority, priority_score,
+        category, category_confidence, entities_json, keywords_json,
+        ai_model, processing_time_ms, ai_version
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(email_id) DO UPDATE SET
+        sentiment = excluded.sentiment,
+        sentiment_score = excluded.sentiment_score,
+        priority = excluded.priority,
+        priority_score = excluded.priority_score,
+        category = excluded.category,
+        category_confidence = excluded.category_confidence,
+        entities_json = excluded.entities_json,
+        keywords_json = excluded.keywords_json,
+        ai_model = excluded.ai_model,
+        processing_time_ms = excluded.processing_time_ms,
+        ai_version = excluded.ai_version,
+        analyzed_at = CURRENT_TIMESTAMP
+"""
+
+# AI-метаданные, присоединяемые к письму (email_meta m)
+META_COLUMNS = """
+    m.sentiment, m.sentiment_score,
+    m.priority, m.priority_score,
+    m.category, m.category_confidence,
+    m.entities_json, m.keywords_json,
+    m.ai_model, m.processing_time_ms
+"""
+
+# Колонки полнотекстового индекса и их веса в ранжировании bm25
+FTS_COLUMNS = ('subject', 'sender', 'body_preview')
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Токенизатор unicode61 приводит к нижнему регистру кириллицу и латиницу,
+# но не считает "ё" и "е" одной буквой - нормализуем и индекс, и запрос
+FTS_NORMALIZE = "replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+# Маркеры совпадений в snippet(): текст письма экранируется, и только потом
+# маркеры заменяются на <b>/</b> (иначе HTML из письма попал бы в выдачу)
+SNIPPET_OPEN = '\x02'
+SNIPPET_CLOSE = '\x03'
+
 
 class DatabaseManager:
     """Менеджер базы данных для хранения синхронизированных писем"""
     
-    def __init__(self, db_path: str = "solar_cache.db"):
+    def __init__(self, db_path: str = "solar_cache.db", readers: int = 4):
         """
         Инициализация менеджера БД
         
         Args:
             db_path: Путь к файлу базы данных
+            readers: Размер пула подключений для чтения
         """
         self.db_path = db_path
+        self.storage = SQLiteStorage(db_path, readers=readers)
         self.init_database()
     
-    def get_connection(self) -> sqlite3.Connection:
-        """Создает подключение к БД"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Для доступа к полям по имени
-        return conn
+    def close(self):
+        """Закрывает подключения к БД"""
+        self.storage.close()
     
     def init_database(self):
         """Инициализирует базу данных и создает таблицы"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+        with self.storage.write() as conn:
+            self._create_schema(conn.cursor())
+        print(f"✅ База данных инициализирована: {self.db_path}")
+        print(f"   📊 Таблицы: emails (+ emails_fts), email_meta, sync_status, folder_sync_status, sync_checkpoints, reanalysis_jobs, analysis_cache, cache_version")
+    
+    def _create_schema(self, cursor: sqlite3.Cursor):
+        """Создает таблицы и индексы (и добавляет колонки в старые БД)"""
         # Создаем таблицу emails
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS emails (
@@ -51,10 +116,12 @@ class DatabaseManager:
             CREATE INDEX IF NOT EXISTS idx_uid ON emails(uid)
         """)
         
-        # Создаем индекс на date для сортировки
+        # Составной индекс для сортировки по дате и keyset-пагинации по (date, id);
+        # заменяет прежний idx_date(date)
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_date ON emails(date)
+            CREATE INDEX IF NOT EXISTS idx_emails_date_id ON emails(date, id)
         """)
+        cursor.execute("DROP INDEX IF EXISTS idx_date")
         
         # ==================== Sprint 0.2: AI & Smart Cache ====================
         
@@ -83,9 +150,7 @@ class DatabaseManager:
         """)
         
         # Индексы для email_meta
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_email_meta_email_id ON email_meta(email_id)
-        """)
+        self._ensure_unique_email_meta(cursor)
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_email_meta_category ON email_meta(category)
         """)
@@ -96,6 +161,12 @@ class DatabaseManager:
             CREATE INDEX IF NOT EXISTS idx_email_meta_sentiment ON email_meta(sentiment)
         """)
         
+        # Модель и версия анализатора ("model:version"): записи другой версии
+        # (и старые записи без версии) переанализирует ReanalysisJob
+        self._ensure_columns(cursor, 'email_meta', {
+            'ai_version': 'TEXT'
+        })
+        
         # Создаем таблицу sync_status для умного кэша
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS sync_status (
@@ -125,10 +196,249 @@ class DatabaseManager:
             CREATE INDEX IF NOT EXISTS idx_sync_status_last_sync ON sync_status(last_sync_date)
         """)
         
-        conn.commit()
-        conn.close()
-        print(f"✅ База данных инициализирована: {self.db_path}")
-        print(f"   📊 Таблицы: emails, email_meta, sync_status")
+        # ==================== UID Sync: checkpoints per folder ====================
+        
+        # Колонки для UID-синхронизации (добавляются к существующим БД)
+        self._ensure_columns(cursor, 'emails', {
+            'account_email': 'TEXT',
+            'folder': 'TEXT',
+            'imap_uid': 'INTEGER',
+            'flags': 'TEXT'
+        })
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_emails_folder_uid
+            ON emails(account_email, folder, imap_uid)
+        """)
+        
+        # sync_status уникален по account_email, поэтому состояние папок
+        # (UIDVALIDITY + последний синхронизированный UID) хранится отдельно
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS folder_sync_status (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_email TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                
+                uidvalidity INTEGER,
+                last_uid INTEGER DEFAULT 0,
+                
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                
+                UNIQUE (account_email, folder)
+            )
+        """)
+        
+        # HIGHESTMODSEQ для delta-синхронизации флагов (RFC 7162)
+        self._ensure_columns(cursor, 'folder_sync_status', {
+            'highest_modseq': 'INTEGER'
+        })
+        
+        # ==================== Resumable Sync: checkpoints ====================
+        
+        # Прогресс незавершенной smart-синхронизации: после обрыва
+        # следующий запуск продолжает с last_uid + 1 того же since_date
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_checkpoints (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_email TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                
+                uidvalidity INTEGER,
+                since_date TEXT NOT NULL,
+                last_uid INTEGER DEFAULT 0,
+                emails_committed INTEGER DEFAULT 0,
+                
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                
+                UNIQUE (account_email, folder)
+            )
+        """)
+        
+        # Прогресс фонового переанализа (ReanalysisJob): письма с id <= last_email_id
+        # уже проанализированы версией ai_version
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS reanalysis_jobs (
+                name TEXT PRIMARY KEY,
+                ai_version TEXT NOT NULL,
+                last_email_id INTEGER DEFAULT 0,
+                processed INTEGER DEFAULT 0,
+                
+                started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                finished_at TEXT
+            )
+        """)
+        
+        # ==================== Analysis Cache ====================
+        
+        # Результаты AI-анализа по хэшу содержимого письма (AnalysisCache):
+        # key = sha256(модель, версия, нормализованные тема и тело)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                version TEXT NOT NULL,
+                result_json TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_analysis_cache_model ON analysis_cache(model, version)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used ON analysis_cache(last_used)
+        """)
+        
+        # ==================== Full-text search ====================
+        
+        self._create_fts(cursor)
+        
+        # ==================== HTTP cache version ====================
+        
+        self._create_cache_version(cursor)
+    
+    def _ensure_unique_email_meta(self, cursor: sqlite3.Cursor):
+        """
+        Создает уникальный индекс email_meta(email_id)
+        
+        В старых БД индекс был неуникальным, и у письма могло остаться
+        несколько записей: перед созданием индекса остается только
+        последняя (с наибольшим id).
+        """
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_email_meta_email_id_unique'"
+        )
+        if cursor.fetchone() is not None:
+            return
+        
+        cursor.execute("""
+            DELETE FROM email_meta
+            WHERE id NOT IN (SELECT MAX(id) FROM email_meta GROUP BY email_id)
+        """)
+        if cursor.rowcount > 0:
+            print(f"🧹 Удалено дублей email_meta: {cursor.rowcount}")
+        
+        cursor.execute("DROP INDEX IF EXISTS idx_email_meta_email_id")
+        cursor.execute("""
+            CREATE UNIQUE INDEX idx_email_meta_email_id_unique ON email_meta(email_id)
+        """)
+    
+    def _create_fts(self, cursor: sqlite3.Cursor):
+        """
+        Создает FTS5-индекс по emails и триггеры, поддерживающие его в актуальном виде
+        
+        Индекс external content: текст хранится только в emails, emails_fts
+        содержит лишь токены (rowid = emails.id). prefix='2 3' ускоряет
+        префиксные запросы. Для существующей БД индекс строится при первом запуске.
+        
+        В индекс попадает текст после FTS_NORMALIZE, поэтому штатная команда
+        FTS5 'rebuild' (индексирует колонки emails как есть) не подходит -
+        используйте rebuild_search_index().
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails_fts'")
+        fts_exists = cursor.fetchone() is not None
+        
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+                {', '.join(FTS_COLUMNS)},
+                content = 'emails',
+                content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+        
+        columns = ', '.join(FTS_COLUMNS)
+        new_values = ', '.join(FTS_NORMALIZE.format(column=f'new.{column}') for column in FTS_COLUMNS)
+        old_values = ', '.join(FTS_NORMALIZE.format(column=f'old.{column}') for column in FTS_COLUMNS)
+        
+        # Для external content удаление из индекса требует прежних значений колонок
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS emails_fts_insert AFTER INSERT ON emails BEGIN
+                INSERT INTO emails_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS emails_fts_delete AFTER DELETE ON emails BEGIN
+                INSERT INTO emails_fts (emails_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END
+        """)
+        # Обновление флагов (delta-синхронизация) индекс не трогает
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS emails_fts_update AFTER UPDATE OF {columns} ON emails BEGIN
+                INSERT INTO emails_fts (emails_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO emails_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        """)
+        
+        if not fts_exists:
+            self._fill_fts(cursor)
+    
+    def _create_cache_version(self, cursor: sqlite3.Cursor):
+        """
+        Создает счетчик версии кэша и триггеры, увеличивающие его при каждой записи
+        
+        Любая вставка, изменение или удаление в emails и email_meta (новые
+        письма, флаги delta-синхронизации, EXPUNGE, AI-метаданные) увеличивает
+        version - ETag ответов API меняется, даже если запись не трогает
+        sync_status и не добавляет новых писем.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cache_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO cache_version (id) VALUES (1)")
+        
+        for table in ('emails', 'email_meta'):
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                        UPDATE cache_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP;
+                    END
+                """)
+    
+    def _fill_fts(self, cursor: sqlite3.Cursor):
+        """Заполняет пустой FTS-индекс из таблицы emails"""
+        values = ', '.join(FTS_NORMALIZE.format(column=column) for column in FTS_COLUMNS)
+        cursor.execute(f"""
+            INSERT INTO emails_fts (rowid, {', '.join(FTS_COLUMNS)})
+            SELECT id, {values} FROM emails
+        """)
+    
+    def _ensure_columns(self, cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]):
+        """
+        Добавляет недостающие колонки в существующую таблицу
+        
+        Args:
+            cursor: Курсор открытого подключения
+            table: Имя таблицы
+            columns: Словарь {имя колонки: SQL-тип}
+        """
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        
+        for name, sql_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+    
+    @staticmethod
+    def make_uid(account_email: str, folder: str, imap_uid: int) -> str:
+        """
+        Формирует уникальный ключ письма для UID-синхронизации
+        
+        IMAP UID уникален только внутри папки (и UIDVALIDITY),
+        поэтому ключ включает аккаунт и папку.
+        
+        Returns:
+            Строка вида "user@example.com:INBOX:1234"
+        """
+        return f"{account_email}:{folder}:{imap_uid}"
     
     def insert_email(self, data: Dict) -> bool:
         """
@@ -140,32 +450,72 @@ class DatabaseManager:
         Returns:
             True если письмо добавлено, False если уже существует
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("""
-                INSERT INTO emails (uid, sender, subject, date, body_preview)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                data.get('uid'),
-                data.get('sender'),
-                data.get('subject'),
-                data.get('date'),
-                data.get('body_preview')
-            ))
-            conn.commit()
-            conn.close()
+            with self.storage.write() as conn:
+                conn.execute(INSERT_EMAIL_SQL, self._email_params(data))
             return True
         except sqlite3.IntegrityError:
             # Письмо с таким UID уже существует
-            conn.close()
             return False
         except Exception as e:
             print(f"❌ Ошибка при вставке письма: {e}")
-            conn.close()
             return False
     
+    def insert_emails_bulk(self, emails: Iterable[Dict]) -> Dict[str, Any]:
+        """
+        Вставляет пачку писем одной транзакцией
+        
+        Дубли по UID пропускаются через ON CONFLICT DO NOTHING (без исключений),
+        RETURNING сообщает id только действительно добавленных писем.
+        sqlite3.executemany не отдает строки RETURNING, поэтому выражение
+        выполняется построчно - оно подготовлено один раз и берется из кэша.
+        
+        Args:
+            emails: Итерируемые словари писем (как для insert_email)
+        
+        Returns:
+            Словарь: total, new, skipped и new_ids {uid: id} добавленных писем
+        """
+        new_ids = {}
+        total = 0
+        
+        try:
+            with self.storage.write() as conn:
+                for data in emails:
+                    total += 1
+                    rows = conn.execute(
+                        INSERT_EMAIL_SQL + " ON CONFLICT (uid) DO NOTHING RETURNING id, uid",
+                        self._email_params(data)
+                    ).fetchall()
+                    for row_id, uid in rows:
+                        new_ids[uid] = row_id
+        except Exception as e:
+            # Транзакция откачена целиком - пачку можно повторить
+            print(f"❌ Ошибка при пакетной вставке писем: {e}")
+            raise
+        
+        return {
+            'total': total,
+            'new': len(new_ids),
+            'skipped': total - len(new_ids),
+            'new_ids': new_ids
+        }
+    
+    @staticmethod
+    def _email_params(data: Dict) -> tuple:
+        """Параметры INSERT_EMAIL_SQL из словаря письма"""
+        return (
+            data.get('uid'),
+            data.get('sender'),
+            data.get('subject'),
+            data.get('date'),
+            data.get('body_preview'),
+            data.get('account_email'),
+            data.get('folder'),
+            data.get('imap_uid'),
+            data.get('flags')
+        )
+    
     def get_all_emails(self, limit: Optional[int] = None) -> List[Dict]:
         """
         Получает все письма из базы данных
@@ -176,21 +526,62 @@ class DatabaseManager:
         Returns:
             Список словарей с данными писем
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        query = "SELECT * FROM emails ORDER BY date DESC"
+        query = "SELECT * FROM emails ORDER BY date DESC, id DESC"
+        params = ()
         if limit:
-            query += f" LIMIT {limit}"
+            # LIMIT параметром: один текст SQL - одно подготовленное выражение в кэше
+            query += " LIMIT ?"
+            params = (limit,)
         
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        conn.close()
+        with self.storage.read() as conn:
+            rows = conn.execute(query, params).fetchall()
         
         # Преобразуем Row объекты в словари
         emails = [dict(row) for row in rows]
         return emails
     
+    def get_emails_by_uids(self, uids: List[str]) -> List[Dict]:
+        """
+        Получает письма по списку UID (ключей кэша)
+        
+        Args:
+            uids: Список UID писем
+        
+        Returns:
+            Список словарей с данными писем
+        """
+        if not uids:
+            return []
+        
+        placeholders = ','.join('?' * len(uids))
+        with self.storage.read() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM emails WHERE uid IN ({placeholders}) ORDER BY date DESC",
+                list(uids)
+            ).fetchall()
+        
+        return [dict(row) for row in rows]
+    
+    def get_email(self, email_id: int) -> Optional[Dict]:
+        """
+        Получает письмо по id вместе с AI-метаданными (если есть)
+        
+        Args:
+            email_id: ID письма в кэше
+        
+        Returns:
+            Словарь с данными письма или None
+        """
+        with self.storage.read() as conn:
+            row = conn.execute(f"""
+                SELECT e.*, {META_COLUMNS}
+                FROM emails e
+                LEFT JOIN email_meta m ON e.id = m.email_id
+                WHERE e.id = ?
+            """, (email_id,)).fetchone()
+        
+        return dict(row) if row else None
+    
     def email_exists(self, uid: str) -> bool:
         """
         Проверяет существование письма по UID
@@ -201,41 +592,245 @@ class DatabaseManager:
         Returns:
             True если письмо существует, иначе False
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM emails WHERE uid = ?", (uid,))
-        count = cursor.fetchone()[0]
-        conn.close()
+        with self.storage.read() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM emails WHERE uid = ?", (uid,)).fetchone()[0]
         
         return count > 0
     
     def get_emails_count(self) -> int:
         """Возвращает общее количество писем в базе"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM emails")
-        count = cursor.fetchone()[0]
-        conn.close()
+        with self.storage.read() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
         
         return count
     
     def clear_database(self):
         """Очищает все письма из базы данных"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM emails")
-        conn.commit()
-        conn.close()
+        with self.storage.write() as conn:
+            conn.execute("DELETE FROM emails")
         print("🗑️ База данных очищена")
     
+    # ==================== Keyset pagination ====================
+    
+    @staticmethod
+    def encode_cursor(date: str, email_id: int) -> str:
+        """
+        Курсор страницы: позиция последнего отданного письма (date, id)
+        
+        Returns:
+            Непрозрачная строка (URL-safe base64), пригодная для query-параметра
+        """
+        raw = json.dumps([date, email_id], ensure_ascii=False).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, int]:
+        """
+        Разбирает курсор encode_cursor
+        
+        Returns:
+            Tuple (date, id)
+        
+        Raises:
+            ValueError: Курсор поврежден или создан не encode_cursor
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            date, email_id = json.loads(raw)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Некорректный курсор: {cursor!r}") from e
+        
+        if not isinstance(date, str) or not isinstance(email_id, int):
+            raise ValueError(f"Некорректный курсор: {cursor!r}")
+        return date, email_id
+    
+    def get_emails_page(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        with_meta: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Страница писем от новых к старым (keyset-пагинация по (date, id))
+        
+        В отличие от OFFSET, следующая страница ищется по индексу
+        idx_emails_date_id от позиции курсора, поэтому стоит одинаково
+        в начале и в конце ящика, а новые письма не сдвигают страницы.
+        
+        Args:
+            limit: Писем на странице
+            cursor: next_cursor предыдущей страницы (None - первая страница)
+            with_meta: Присоединить AI-метаданные (как get_emails_with_meta)
+        
+        Returns:
+            Словарь: emails - письма страницы, next_cursor - курсор следующей
+            страницы или None, если это последняя
+        
+        Raises:
+            ValueError: Некорректный курсор или limit < 1
+        """
+        if limit < 1:
+            raise ValueError(f"limit должен быть положительным: {limit}")
+        
+        if with_meta:
+            query = f"SELECT e.*, {META_COLUMNS} FROM emails e LEFT JOIN email_meta m ON e.id = m.email_id"
+        else:
+            query = "SELECT e.* FROM emails e"
+        
+        params: List[Any] = []
+        if cursor:
+            query += " WHERE (e.date, e.id) < (?, ?)"
+            params.extend(self.decode_cursor(cursor))
+        
+        # Лишняя строка показывает, есть ли следующая страница
+        query += " ORDER BY e.date DESC, e.id DESC LIMIT ?"
+        params.append(limit + 1)
+        
+        with self.storage.read() as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        emails = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = emails[-1]
+            next_cursor = self.encode_cursor(last['date'], last['id'])
+        
+        return {'emails': emails, 'next_cursor': next_cursor}
+    
+    def iter_emails(self, chunk_size: int = 500, with_meta: bool = False) -> Iterator[Dict]:
+        """
+        Все письма от новых к старым порциями по chunk_size
+        
+        Каждая порция - отдельный запрос get_emails_page, подключение между
+        порциями возвращается в пул: память постоянна при любом размере ящика.
+        
+        Args:
+            chunk_size: Писем в одном запросе к БД
+            with_meta: Присоединить AI-метаданные
+        
+        Yields:
+            Словари с данными писем
+        """
+        cursor = None
+        while True:
+            page = self.get_emails_page(limit=chunk_size, cursor=cursor, with_meta=with_meta)
+            yield from page['emails']
+            
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+    
+    # ==================== Full-text search ====================
+    
+    @staticmethod
+    def build_fts_query(query: str, prefix: bool = False) -> str:
+        """
+        Преобразует пользовательский запрос в выражение FTS5 MATCH
+        
+        Каждое слово запроса становится фразой в кавычках (синтаксис FTS5 в
+        запросе не интерпретируется), слова объединяются через AND.
+        "слово*" - префиксный поиск; prefix=True делает префиксными все слова.
+        
+        Args:
+            query: Строка поиска
+            prefix: Искать все слова как префиксы
+        
+        Returns:
+            Выражение MATCH или пустая строка, если в запросе нет слов
+        """
+        terms = []
+        for word in query.replace('ё', 'е').replace('Ё', 'Е').split():
+            if not re.search(r'\w', word):
+                continue
+            
+            phrase = '"' + word.rstrip('*').replace('"', '""') + '"'
+            if prefix or word.endswith('*'):
+                phrase += '*'
+            terms.append(phrase)
+        
+        return ' '.join(terms)
+    
+    def rebuild_search_index(self):
+        """Перестраивает полнотекстовый индекс с нуля (например, после правки emails в обход триггеров)"""
+        with self.storage.write() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO emails_fts (emails_fts) VALUES ('delete-all')")
+            self._fill_fts(cursor)
+            cursor.execute("INSERT INTO emails_fts (emails_fts) VALUES ('optimize')")
+        print("🔍 Поисковый индекс перестроен")
+    
+    @staticmethod
+    def highlight_snippet(snippet: Optional[str]) -> str:
+        """
+        Превращает snippet() с маркерами SNIPPET_OPEN/SNIPPET_CLOSE в безопасный HTML
+        
+        Args:
+            snippet: Фрагмент текста письма с маркерами совпадений
+        
+        Returns:
+            Экранированный текст, совпадения обернуты в <b></b>
+        """
+        escaped = html.escape(snippet or '')
+        return escaped.replace(SNIPPET_OPEN, '<b>').replace(SNIPPET_CLOSE, '</b>')
+    
+    def search(self, query: str, limit: int = 20, offset: int = 0, prefix: bool = False) -> List[Dict]:
+        """
+        Полнотекстовый поиск по теме, отправителю и тексту писем
+        
+        Результаты ранжируются bm25 (совпадение в теме весит больше, чем в тексте).
+        
+        Args:
+            query: Строка поиска (см. build_fts_query)
+            limit: Максимальное количество результатов
+            offset: Смещение для постраничного вывода
+            prefix: Искать все слова как префиксы (поиск по мере ввода)
+        
+        Returns:
+            Список словарей: поля письма, snippet (HTML: экранированный текст
+            с выделенными <b>совпадениями</b>) и score (чем меньше, тем релевантнее)
+        """
+        match = self.build_fts_query(query, prefix=prefix)
+        if not match:
+            return []
+        
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        with self.storage.read() as conn:
+            # Сначала ранжируем только rowid: JOIN и snippet для всех совпадений
+            # (а их могут быть сотни тысяч) считались бы до сортировки
+            ranked = conn.execute(f"""
+                SELECT rowid, bm25(emails_fts, {weights}) AS score
+                FROM emails_fts
+                WHERE emails_fts MATCH ?
+                ORDER BY score
+                LIMIT ? OFFSET ?
+            """, (match, limit, offset)).fetchall()
+            if not ranked:
+                return []
+            
+            scores = {row['rowid']: row['score'] for row in ranked}
+            placeholders = ','.join('?' * len(scores))
+            rows = conn.execute(f"""
+                SELECT
+                    e.id, e.uid, e.sender, e.subject, e.date,
+                    e.account_email, e.folder, e.flags,
+                    snippet(emails_fts, -1, ?, ?, '…', 12) AS snippet
+                FROM emails_fts
+                JOIN emails e ON e.id = emails_fts.rowid
+                WHERE emails_fts MATCH ? AND emails_fts.rowid IN ({placeholders})
+            """, [SNIPPET_OPEN, SNIPPET_CLOSE, match] + list(scores)).fetchall()
+        
+        results = [
+            dict(row, snippet=self.highlight_snippet(row['snippet']), score=scores[row['id']])
+            for row in rows
+        ]
+        results.sort(key=lambda result: result['score'])
+        return results
+    
     # ==================== Sprint 0.2: AI Meta Methods ====================
     
     def insert_email_meta(self, email_id: int, meta_data: Dict[str, Any]) -> bool:
         """
-        Вставляет AI-метаданные для письма
+        Вставляет AI-метаданные для письма (или заменяет прежние)
         
         Args:
             email_id: ID письма в таблице emails
@@ -244,38 +839,59 @@ class DatabaseManager:
         Returns:
             True если метаданные добавлены успешно
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("""
-                INSERT INTO email_meta (
-                    email_id, sentiment, sentiment_score, priority, priority_score,
-                    category, category_confidence, entities_json, keywords_json,
-                    ai_model, processing_time_ms
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                email_id,
-                meta_data.get('sentiment'),
-                meta_data.get('sentiment_score'),
-                meta_data.get('priority'),
-                meta_data.get('priority_score'),
-                meta_data.get('category'),
-                meta_data.get('category_confidence'),
-                meta_data.get('entities_json'),
-                meta_data.get('keywords_json'),
-                meta_data.get('ai_model'),
-                meta_data.get('processing_time_ms')
-            ))
-            conn.commit()
-            conn.close()
+            with self.storage.write() as conn:
+                conn.execute(INSERT_META_SQL, self._meta_params(email_id, meta_data))
             return True
         except Exception as e:
             print(f"❌ Ошибка при вставке метаданных: {e}")
-            conn.close()
             return False
     
+    def upsert_email_meta_bulk(self, rows: Iterable[Tuple[int, Dict[str, Any]]]) -> int:
+        """
+        Записывает AI-метаданные пачки писем одной транзакцией (executemany)
+        
+        У письма одна запись email_meta: прежняя обновляется на месте
+        (ON CONFLICT(email_id)); читатели до коммита видят прежние метаданные (WAL).
+        
+        Args:
+            rows: Пары (ID письма, словарь с AI-метаданными)
+        
+        Returns:
+            Количество записанных записей
+        """
+        params = [self._meta_params(email_id, meta_data) for email_id, meta_data in rows]
+        if not params:
+            return 0
+        
+        try:
+            with self.storage.write() as conn:
+                conn.executemany(INSERT_META_SQL, params)
+        except Exception as e:
+            # Транзакция откачена целиком - пачку можно повторить
+            print(f"❌ Ошибка при пакетной записи метаданных: {e}")
+            raise
+        
+        return len(params)
+    
+    @staticmethod
+    def _meta_params(email_id: int, meta_data: Dict[str, Any]) -> tuple:
+        """Параметры INSERT_META_SQL из словаря AI-метаданных"""
+        return (
+            email_id,
+            meta_data.get('sentiment'),
+            meta_data.get('sentiment_score'),
+            meta_data.get('priority'),
+            meta_data.get('priority_score'),
+            meta_data.get('category'),
+            meta_data.get('category_confidence'),
+            meta_data.get('entities_json'),
+            meta_data.get('keywords_json'),
+            meta_data.get('ai_model'),
+            meta_data.get('processing_time_ms'),
+            meta_data.get('ai_version')
+        )
+    
     def get_email_meta(self, email_id: int) -> Optional[Dict]:
         """
         Получает AI-метаданные для письма
@@ -286,12 +902,8 @@ class DatabaseManager:
         Returns:
             Словарь с метаданными или None
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM email_meta WHERE email_id = ?", (email_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.storage.read() as conn:
+            row = conn.execute("SELECT * FROM email_meta WHERE email_id = ?", (email_id,)).fetchone()
         
         if row:
             return dict(row)
@@ -307,28 +919,20 @@ class DatabaseManager:
         Returns:
             Список писем с метаданными
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        query = """
-            SELECT 
-                e.*,
-                m.sentiment, m.sentiment_score,
-                m.priority, m.priority_score,
-                m.category, m.category_confidence,
-                m.entities_json, m.keywords_json,
-                m.ai_model, m.processing_time_ms
+        query = f"""
+            SELECT e.*, {META_COLUMNS}
             FROM emails e
             LEFT JOIN email_meta m ON e.id = m.email_id
-            ORDER BY e.date DESC
+            ORDER BY e.date DESC, e.id DESC
         """
+        params = ()
         
         if limit:
-            query += f" LIMIT {limit}"
+            query += " LIMIT ?"
+            params = (limit,)
         
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        conn.close()
+        with self.storage.read() as conn:
+            rows = conn.execute(query, params).fetchall()
         
         return [dict(row) for row in rows]
     
@@ -343,9 +947,6 @@ class DatabaseManager:
         Returns:
             Список писем данной категории
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         query = """
             SELECT e.*, m.*
             FROM emails e
@@ -354,12 +955,13 @@ class DatabaseManager:
             ORDER BY e.date DESC
         """
         
+        params = (category,)
         if limit:
-            query += f" LIMIT {limit}"
+            query += " LIMIT ?"
+            params += (limit,)
         
-        cursor.execute(query, (category,))
-        rows = cursor.fetchall()
-        conn.close()
+        with self.storage.read() as conn:
+            rows = conn.execute(query, params).fetchall()
         
         return [dict(row) for row in rows]
     
@@ -374,9 +976,6 @@ class DatabaseManager:
         Returns:
             Список писем данного приоритета
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         query = """
             SELECT e.*, m.*
             FROM emails e
@@ -385,12 +984,13 @@ class DatabaseManager:
             ORDER BY m.priority_score DESC, e.date DESC
         """
         
+        params = (priority,)
         if limit:
-            query += f" LIMIT {limit}"
+            query += " LIMIT ?"
+            params += (limit,)
         
-        cursor.execute(query, (priority,))
-        rows = cursor.fetchall()
-        conn.close()
+        with self.storage.read() as conn:
+            rows = conn.execute(query, params).fetchall()
         
         return [dict(row) for row in rows]
     
@@ -407,20 +1007,15 @@ class DatabaseManager:
         Returns:
             True если запись создана
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("""
-                INSERT INTO sync_status (account_email, sync_days)
-                VALUES (?, ?)
-            """, (account_email, sync_days))
-            conn.commit()
-            conn.close()
+            with self.storage.write() as conn:
+                conn.execute("""
+                    INSERT INTO sync_status (account_email, sync_days)
+                    VALUES (?, ?)
+                """, (account_email, sync_days))
             return True
         except sqlite3.IntegrityError:
             # Запись уже существует
-            conn.close()
             return False
     
     def get_last_sync_date(self, account_email: str) -> Optional[str]:
@@ -433,15 +1028,11 @@ class DatabaseManager:
         Returns:
             ISO дата последней синхронизации или None
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT last_sync_date FROM sync_status WHERE account_email = ?",
-            (account_email,)
-        )
-        row = cursor.fetchone()
-        conn.close()
+        with self.storage.read() as conn:
+            row = conn.execute(
+                "SELECT last_sync_date FROM sync_status WHERE account_email = ?",
+                (account_email,)
+            ).fetchone()
         
         if row and row[0]:
             return row[0]
@@ -468,61 +1059,57 @@ class DatabaseManager:
         Returns:
             True если обновлено успешно
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # Проверяем существование записи
-            cursor.execute(
-                "SELECT total_emails_synced FROM sync_status WHERE account_email = ?",
-                (account_email,)
-            )
-            row = cursor.fetchone()
-            
-            if row:
-                # Обновляем существующую запись
-                total_synced = row[0] + stats.get('new', 0)
+            with self.storage.write() as conn:
+                cursor = conn.cursor()
                 
-                cursor.execute("""
-                    UPDATE sync_status
-                    SET last_sync_date = ?,
-                        last_sync_success = ?,
-                        last_error_message = ?,
-                        total_emails_synced = ?,
-                        last_batch_count = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE account_email = ?
-                """, (
-                    last_sync_date,
-                    1 if success else 0,
-                    error_message,
-                    total_synced,
-                    stats.get('total', 0),
-                    account_email
-                ))
-            else:
-                # Создаем новую запись
-                cursor.execute("""
-                    INSERT INTO sync_status (
-                        account_email, last_sync_date, last_sync_success,
-                        last_error_message, total_emails_synced, last_batch_count
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    account_email,
-                    last_sync_date,
-                    1 if success else 0,
-                    error_message,
-                    stats.get('new', 0),
-                    stats.get('total', 0)
-                ))
-            
-            conn.commit()
-            conn.close()
+                # Проверяем существование записи
+                cursor.execute(
+                    "SELECT total_emails_synced FROM sync_status WHERE account_email = ?",
+                    (account_email,)
+                )
+                row = cursor.fetchone()
+                
+                if row:
+                    # Обновляем существующую запись
+                    total_synced = row[0] + stats.get('new', 0)
+                    
+                    cursor.execute("""
+                        UPDATE sync_status
+                        SET last_sync_date = ?,
+                            last_sync_success = ?,
+                            last_error_message = ?,
+                            total_emails_synced = ?,
+                            last_batch_count = ?,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE account_email = ?
+                    """, (
+                        last_sync_date,
+                        1 if success else 0,
+                        error_message,
+                        total_synced,
+                        stats.get('total', 0),
+                        account_email
+                    ))
+                else:
+                    # Создаем новую запись
+                    cursor.execute("""
+                        INSERT INTO sync_status (
+                            account_email, last_sync_date, last_sync_success,
+                            last_error_message, total_emails_synced, last_batch_count
+                        )
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (
+                        account_email,
+                        last_sync_date,
+                        1 if success else 0,
+                        error_message,
+                        stats.get('new', 0),
+                        stats.get('total', 0)
+                    ))
             return True
         except Exception as e:
             print(f"❌ Ошибка при обновлении sync_status: {e}")
-            conn.close()
             return False
     
     def get_sync_status(self, account_email: str) -> Optional[Dict]:
@@ -535,20 +1122,32 @@ class DatabaseManager:
         Returns:
             Словарь со статусом или None
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT * FROM sync_status WHERE account_email = ?",
-            (account_email,)
-        )
-        row = cursor.fetchone()
-        conn.close()
+        with self.storage.read() as conn:
+            row = conn.execute(
+                "SELECT * FROM sync_status WHERE account_email = ?",
+                (account_email,)
+            ).fetchone()
         
         if row:
             return dict(row)
         return None
     
+    def get_cache_version(self) -> Dict[str, Any]:
+        """
+        Версия содержимого кэша для HTTP-валидаторов (ETag / Last-Modified)
+        
+        version увеличивают триггеры на каждую запись в emails и email_meta
+        (см. _create_cache_version), поэтому две записи в одну секунду тоже
+        дают разные версии. Чтение одной строки, без обращения к письмам.
+        
+        Returns:
+            Словарь: version, updated_at (UTC 'YYYY-MM-DD HH:MM:SS')
+        """
+        with self.storage.read() as conn:
+            row = conn.execute("SELECT version, updated_at FROM cache_version WHERE id = 1").fetchone()
+        
+        return dict(row)
+    
     def get_all_sync_statuses(self) -> List[Dict]:
         """
         Получает статусы всех синхронизированных аккаунтов
@@ -556,11 +1155,534 @@ class DatabaseManager:
         Returns:
             Список статусов
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.storage.read() as conn:
+            rows = conn.execute("SELECT * FROM sync_status ORDER BY updated_at DESC").fetchall()
+        
+        return [dict(row) for row in rows]
+    
+    # ==================== UID Sync: Folder State Methods ====================
+    
+    def get_folder_sync_state(self, account_email: str, folder: str) -> Optional[Dict]:
+        """
+        Получает UID-checkpoint папки
+        
+        Args:
+            account_email: Email аккаунта
+            folder: Имя папки IMAP
+        
+        Returns:
+            Словарь с uidvalidity и last_uid или None
+        """
+        with self.storage.read() as conn:
+            row = conn.execute(
+                "SELECT * FROM folder_sync_status WHERE account_email = ? AND folder = ?",
+                (account_email, folder)
+            ).fetchone()
+        
+        if row:
+            return dict(row)
+        return None
+    
+    def update_folder_sync_state(
+        self,
+        account_email: str,
+        folder: str,
+        uidvalidity: int,
+        last_uid: int
+    ) -> bool:
+        """
+        Сохраняет UID-checkpoint папки
+        
+        Args:
+            account_email: Email аккаунта
+            folder: Имя папки IMAP
+            uidvalidity: UIDVALIDITY папки на сервере
+            last_uid: Максимальный синхронизированный UID
+        
+        Returns:
+            True если сохранено успешно
+        """
+        try:
+            with self.storage.write() as conn:
+                conn.execute("""
+                    INSERT INTO folder_sync_status (account_email, folder, uidvalidity, last_uid)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (account_email, folder) DO UPDATE SET
+                        uidvalidity = excluded.uidvalidity,
+                        last_uid = excluded.last_uid,
+                        updated_at = CURRENT_TIMESTAMP
+                """, (account_email, folder, uidvalidity, last_uid))
+            return True
+        except Exception as e:
+            print(f"❌ Ошибка при обновлении folder_sync_status: {e}")
+            return False
+    
+    def reset_folder(self, account_email: str, folder: str) -> int:
+        """
+        Удаляет из кэша письма папки и её checkpoint (при смене UIDVALIDITY)
+        
+        Args:
+            account_email: Email аккаунта
+            folder: Имя папки IMAP
+        
+        Returns:
+            Количество удаленных писем
+        """
+        with self.storage.write() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM email_meta WHERE email_id IN (
+                    SELECT id FROM emails WHERE account_email = ? AND folder = ?
+                )
+            """, (account_email, folder))
+            cursor.execute(
+                "DELETE FROM emails WHERE account_email = ? AND folder = ?",
+                (account_email, folder)
+            )
+            deleted = cursor.rowcount
+            cursor.execute(
+                "DELETE FROM folder_sync_status WHERE account_email = ? AND folder = ?",
+                (account_email, folder)
+            )
+        
+        return deleted
+    
+    def adopt_legacy_uids(self, account_email: str, folder: str) -> Dict[str, int]:
+        """
+        Переводит письма со старым ключом (голый IMAP UID) на ключ make_uid
+        
+        Раньше smart_sync и run сохраняли письма под UID без аккаунта и папки,
+        а UID-синхронизация - под make_uid, поэтому UNIQUE(uid) не замечал,
+        что это одно письмо. Старые строки получают ключ, аккаунт и папку;
+        строка, у которой уже есть двойник с новым ключом, удаляется.
+        
+        Старые строки писал только аккаунт по умолчанию (config.EMAIL) -
+        SolarSync вызывает метод только для него.
+        
+        Args:
+            account_email: Email аккаунта, писавшего старые строки
+            folder: Папка, из которой они загружены (config.SYNC_FOLDER)
+        
+        Returns:
+            Словарь: adopted (переведено), duplicates (удалено дублей)
+        """
+        legacy = "account_email IS NULL AND folder IS NULL AND uid != '' AND uid NOT GLOB '*[^0-9]*'"
+        
+        # Обычно старых строк нет: проверка по индексу idx_emails_folder_uid без блокировки записи
+        with self.storage.read() as conn:
+            if conn.execute(f"SELECT 1 FROM emails WHERE {legacy} LIMIT 1").fetchone() is None:
+                return {'adopted': 0, 'duplicates': 0}
+        
+        with self.storage.write() as conn:
+            cursor = conn.cursor()
+            # В SET везде используется прежнее значение uid
+            cursor.execute(f"""
+                UPDATE OR IGNORE emails
+                SET uid = ? || ':' || ? || ':' || uid,
+                    account_email = ?,
+                    folder = ?,
+                    imap_uid = CAST(uid AS INTEGER)
+                WHERE {legacy}
+            """, (account_email, folder, account_email, folder))
+            adopted = cursor.rowcount
+            
+            # Остались только строки, чей ключ уже занят тем же письмом
+            cursor.execute(f"DELETE FROM email_meta WHERE email_id IN (SELECT id FROM emails WHERE {legacy})")
+            cursor.execute(f"DELETE FROM emails WHERE {legacy}")
+            duplicates = cursor.rowcount
+        
+        if adopted or duplicates:
+            print(f"🔑 Старые UID переведены на ключ {account_email}:{folder}: "
+                  f"{adopted}, удалено дублей: {duplicates}")
+        
+        return {'adopted': adopted, 'duplicates': duplicates}
+    
+    # ==================== Delta Sync: Flags & Expunge ====================
+    
+    def get_folder_flags(
+        self,
+        account_email: str,
+        folder: str,
+        uids: Optional[Iterable[int]] = None
+    ) -> Dict[int, Optional[str]]:
+        """
+        Получает флаги закэшированных писем папки
         
-        cursor.execute("SELECT * FROM sync_status ORDER BY updated_at DESC")
-        rows = cursor.fetchall()
-        conn.close()
+        Args:
+            account_email: Email аккаунта
+            folder: Имя папки IMAP
+            uids: Только эти IMAP UID (например, из ответа CHANGEDSINCE); None - все письма
+        
+        Returns:
+            Словарь {imap_uid: flags}
+        """
+        query = "SELECT imap_uid, flags FROM emails WHERE account_email = ? AND folder = ?"
+        params = [account_email, folder]
+        if uids is not None:
+            # Список UID одним параметром: без ограничения на число переменных SQLite
+            query += " AND imap_uid IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(uids)))
+        
+        with self.storage.read() as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        return {row[0]: row[1] for row in rows}
+    
+    def get_folder_uids(self, account_email: str, folder: str) -> Set[int]:
+        """
+        Получает IMAP UID всех закэшированных писем папки (только по индексу)
+        
+        Args:
+            account_email: Email аккаунта
+            folder: Имя папки IMAP
+        
+        Returns:
+            Множество imap_uid
+        """
+        with self.storage.read() as conn:
+            rows = conn.execute(
+                "SELECT imap_uid FROM emails WHERE account_email = ? AND folder = ?",
+                (account_email, folder)
+            ).fetchall()
+        
+        return {row[0] for row in rows}
+    
+    def apply_folder_changes(
+        self,
+        account_email: str,
+        folder: str,
+        flag_updates: Dict[int, str],
+        vanished_uids: List[int],
+        highest_modseq: Optional[int] = None,
+        vanished_ranges: Optional[List[Tuple[int, int]]] = None
+    ) -> Dict[str, int]:
+        """
+        Применяет изменения флагов и удаления писем одной транзакцией
+        
+        Args:
+            account_email: Email аккаунта
+            folder: Имя папки IMAP
+            flag_updates: Словарь {imap_uid: новые флаги}
+            vanished_uids: UID писем, удаленных на сервере
+            highest_modseq: Новый HIGHESTMODSEQ папки (если известен)
+            vanished_ranges: Диапазоны UID (first, last) из ответа VANISHED;
+                удаляются одним DELETE на диапазон по индексу (folder, imap_uid)
+        
+        Returns:
+            Словарь со статистикой (flags_updated, vanished)
+        """
+        try:
+            with self.storage.write() as conn:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    UPDATE emails SET flags = ?
+                    WHERE account_email = ? AND folder = ? AND imap_uid = ?
+                """, [
+                    (flags, account_email, folder, uid)
+                    for uid, flags in flag_updates.items()
+                ])
+                flags_updated = cursor.rowcount
+                
+                ranges = [(uid, uid) for uid in vanished_uids] + list(vanished_ranges or [])
+                vanished_params = [(account_email, folder, first, last) for first, last in ranges]
+                cursor.executemany("""
+                    DELETE FROM email_meta WHERE email_id IN (
+                        SELECT id FROM emails
+                        WHERE account_email = ? AND folder = ? AND imap_uid BETWEEN ? AND ?
+                    )
+                """, vanished_params)
+                cursor.executemany("""
+                    DELETE FROM emails
+                    WHERE account_email = ? AND folder = ? AND imap_uid BETWEEN ? AND ?
+                """, vanished_params)
+                vanished = cursor.rowcount if vanished_params else 0
+                
+                if highest_modseq is not None:
+                    cursor.execute("""
+                        UPDATE folder_sync_status
+                        SET highest_modseq = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE account_email = ? AND folder = ?
+                    """, (highest_modseq, account_email, folder))
+            
+            return {'flags_updated': max(flags_updated, 0), 'vanished': max(vanished, 0)}
+        except Exception as e:
+            # Транзакция уже откачена storage.write()
+            print(f"❌ Ошибка при применении изменений папки: {e}")
+            raise
+    
+    # ==================== Resumable Sync: Checkpoint Methods ====================
+    
+    def get_sync_checkpoint(self, account_email: str, folder: str) -> Optional[Dict]:
+        """
+        Получает checkpoint незавершенной синхронизации папки
+        
+        Args:
+            account_email: Email аккаунта
+            folder: Имя папки IMAP
+        
+        Returns:
+            Словарь (uidvalidity, since_date, last_uid, emails_committed) или None
+        """
+        with self.storage.read() as conn:
+            row = conn.execute(
+                "SELECT * FROM sync_checkpoints WHERE account_email = ? AND folder = ?",
+                (account_email, folder)
+            ).fetchone()
+        
+        if row:
+            return dict(row)
+        return None
+    
+    def save_sync_checkpoint(
+        self,
+        account_email: str,
+        folder: str,
+        uidvalidity: int,
+        since_date: str,
+        last_uid: int,
+        emails_committed: int
+    ) -> bool:
+        """
+        Сохраняет checkpoint синхронизации (все письма с UID <= last_uid уже в кэше)
+        
+        Args:
+            account_email: Email аккаунта
+            folder: Имя папки IMAP
+            uidvalidity: UIDVALIDITY папки
+            since_date: ISO дата начала синхронизации
+            last_uid: Последний сохраненный UID
+            emails_committed: Сколько писем обработано с начала синхронизации
+        
+        Returns:
+            True если сохранено успешно
+        """
+        try:
+            with self.storage.write() as conn:
+                conn.execute("""
+                    INSERT INTO sync_checkpoints (
+                        account_email, folder, uidvalidity, since_date, last_uid, emails_committed
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (account_email, folder) DO UPDATE SET
+                        uidvalidity = excluded.uidvalidity,
+                        since_date = excluded.since_date,
+                        last_uid = excluded.last_uid,
+                        emails_committed = excluded.emails_committed,
+                        updated_at = CURRENT_TIMESTAMP
+                """, (account_email, folder, uidvalidity, since_date, last_uid, emails_committed))
+            return True
+        except Exception as e:
+            print(f"❌ Ошибка при сохранении checkpoint: {e}")
+            return False
+    
+    def clear_sync_checkpoint(self, account_email: str, folder: str) -> bool:
+        """
+        Удаляет checkpoint после успешного завершения синхронизации
+        
+        Returns:
+            True если checkpoint был
+        """
+        with self.storage.write() as conn:
+            deleted = conn.execute(
+                "DELETE FROM sync_checkpoints WHERE account_email = ? AND folder = ?",
+                (account_email, folder)
+            ).rowcount > 0
+        
+        return deleted
+    
+    # ==================== Reanalysis Methods ====================
+    
+    def get_stale_emails(self, ai_version: str, after_id: int = 0, limit: int = 500) -> List[Dict]:
+        """
+        Письма без AI-метаданных версии ai_version (нет записи или другая версия)
+        
+        Один anti-join по индексу email_meta(email_id), порядок по id:
+        следующая страница начинается после id последнего письма.
+        
+        Args:
+            ai_version: Текущие модель и версия анализатора ("model:version")
+            after_id: Письма с id больше этого
+            limit: Размер страницы
+        
+        Returns:
+            Список словарей (id, subject, body_preview)
+        """
+        with self.storage.read() as conn:
+            rows = conn.execute("""
+                SELECT e.id, e.subject, e.body_preview FROM emails e
+                WHERE e.id > ? AND NOT EXISTS (
+                    SELECT 1 FROM email_meta m WHERE m.email_id = e.id AND m.ai_version = ?
+                )
+                ORDER BY e.id
+                LIMIT ?
+            """, (after_id, ai_version, limit)).fetchall()
         
         return [dict(row) for row in rows]
+    
+    def count_stale_emails(self, ai_version: str, after_id: int = 0) -> int:
+        """Количество писем get_stale_emails (для оценки прогресса)"""
+        with self.storage.read() as conn:
+            return conn.execute("""
+                SELECT COUNT(*) FROM emails e
+                WHERE e.id > ? AND NOT EXISTS (
+                    SELECT 1 FROM email_meta m WHERE m.email_id = e.id AND m.ai_version = ?
+                )
+            """, (after_id, ai_version)).fetchone()[0]
+    
+    def get_reanalysis_checkpoint(self, name: str) -> Optional[Dict]:
+        """
+        Получает checkpoint фонового переанализа
+        
+        Returns:
+            Словарь (ai_version, last_email_id, processed, started_at, finished_at) или None
+        """
+        with self.storage.read() as conn:
+            row = conn.execute("SELECT * FROM reanalysis_jobs WHERE name = ?", (name,)).fetchone()
+        
+        if row:
+            return dict(row)
+        return None
+    
+    def save_reanalysis_checkpoint(
+        self,
+        name: str,
+        ai_version: str,
+        last_email_id: int,
+        processed: int,
+        finished: bool = False
+    ) -> bool:
+        """
+        Сохраняет checkpoint переанализа (письма с id <= last_email_id обработаны)
+        
+        Новая ai_version начинает задание заново (started_at сбрасывается).
+        
+        Args:
+            name: Имя задания
+            ai_version: Модель и версия анализатора
+            last_email_id: id последнего обработанного письма
+            processed: Сколько писем переанализировано с начала задания
+            finished: Задание завершено
+        
+        Returns:
+            True если сохранено успешно
+        """
+        try:
+            with self.storage.write() as conn:
+                conn.execute("""
+                    INSERT INTO reanalysis_jobs (name, ai_version, last_email_id, processed, finished_at)
+                    VALUES (?, ?, ?, ?, CASE WHEN ? THEN CURRENT_TIMESTAMP END)
+                    ON CONFLICT (name) DO UPDATE SET
+                        started_at = CASE WHEN ai_version = excluded.ai_version
+                                          THEN started_at ELSE CURRENT_TIMESTAMP END,
+                        ai_version = excluded.ai_version,
+                        last_email_id = excluded.last_email_id,
+                        processed = excluded.processed,
+                        finished_at = excluded.finished_at,
+                        updated_at = CURRENT_TIMESTAMP
+                """, (name, ai_version, last_email_id, processed, finished))
+            return True
+        except Exception as e:
+            print(f"❌ Ошибка при сохранении checkpoint переанализа: {e}")
+            return False
+    
+    # ==================== Analysis Cache Methods ====================
+    
+    def get_cached_analyses(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Получает закэшированные результаты AI-анализа
+        
+        Args:
+            keys: Ключи AnalysisCache (хэши содержимого писем)
+        
+        Returns:
+            Словарь ключ → (model, version, result); ключей без записи в нем нет
+        """
+        if not keys:
+            return {}
+        
+        placeholders = ','.join('?' * len(keys))
+        with self.storage.read() as conn:
+            rows = conn.execute(
+                f"SELECT key, model, version, result_json FROM analysis_cache WHERE key IN ({placeholders})",
+                list(keys)
+            ).fetchall()
+        
+        return {
+            row['key']: {'model': row['model'], 'version': row['version'], 'result': json.loads(row['result_json'])}
+            for row in rows
+        }
+    
+    def save_cached_analyses(self, model: str, version: str, results: Dict[str, Dict[str, Any]], used_at: float):
+        """
+        Сохраняет результаты AI-анализа в кэш
+        
+        Args:
+            model: Модель анализатора
+            version: Версия модели (настроек анализатора)
+            results: Ключ → словарь с AI-метаданными
+            used_at: Время последнего использования (unix time)
+        """
+        with self.storage.write() as conn:
+            conn.executemany("""
+                INSERT INTO analysis_cache (key, model, version, result_json, last_used)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    result_json = excluded.result_json,
+                    last_used = excluded.last_used
+            """, [
+                (key, model, version, json.dumps(result, ensure_ascii=False), used_at)
+                for key, result in results.items()
+            ])
+    
+    def touch_cached_analyses(self, keys: List[str], used_at: float):
+        """Обновляет время использования записей кэша анализа (для вытеснения)"""
+        if not keys:
+            return
+        
+        placeholders = ','.join('?' * len(keys))
+        with self.storage.write() as conn:
+            conn.execute(
+                f"UPDATE analysis_cache SET last_used = ? WHERE key IN ({placeholders})",
+                [used_at] + list(keys)
+            )
+    
+    def evict_cached_analyses(self, keep: int) -> int:
+        """
+        Вытесняет давно не использованные записи кэша анализа
+        
+        Args:
+            keep: Сколько самых свежих записей оставить
+        
+        Returns:
+            Количество удаленных записей
+        """
+        with self.storage.write() as conn:
+            return conn.execute("""
+                DELETE FROM analysis_cache WHERE key IN (
+                    SELECT key FROM analysis_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (max(0, keep),)).rowcount
+    
+    def invalidate_cached_analyses(self, model: str, keep_version: Optional[str] = None) -> int:
+        """
+        Удаляет записи кэша анализа одной модели
+        
+        Args:
+            model: Модель анализатора
+            keep_version: Версия, записи которой остаются (None - удалить все записи модели)
+        
+        Returns:
+            Количество удаленных записей
+        """
+        with self.storage.write() as conn:
+            if keep_version is None:
+                return conn.execute("DELETE FROM analysis_cache WHERE model = ?", (model,)).rowcount
+            return conn.execute(
+                "DELETE FROM analysis_cache WHERE model = ? AND version != ?",
+                (model, keep_version)
+            ).rowcount
+    
+    def get_cached_analyses_count(self) -> int:
+        """Количество записей в кэше анализа"""
+        with self.storage.read() as conn:
+            return conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
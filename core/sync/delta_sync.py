@@ -0,0 +1,249 @@
+"""
+SolarMail - Delta Sync
+Синхронизация изменений флагов и удалений писем (RFC 7162 CONDSTORE/QRESYNC)
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from imap_tools import MailBox
+from imap_tools.utils import encode_folder
+
+from db_manager import DatabaseManager
+
+
+# Разбор ответов сервера
+FETCH_UID_RE = re.compile(rb'UID (\d+)')
+FETCH_FLAGS_RE = re.compile(rb'FLAGS \(([^)]*)\)')
+STATUS_ITEM_RE = re.compile(rb'([A-Z]+) (\d+)')
+
+
+def normalize_flags(flags) -> str:
+    """
+    Приводит набор флагов к строке для хранения в кэше
+    
+    Args:
+        flags: Итерируемый набор флагов (str или bytes)
+    
+    Returns:
+        Отсортированные флаги через пробел
+    """
+    return ' '.join(sorted(
+        flag.decode() if isinstance(flag, bytes) else flag
+        for flag in flags
+    ))
+
+
+def parse_uid_set(uid_set: str) -> List[Tuple[int, int]]:
+    """
+    Разбирает IMAP sequence-set ("1:5,9,12:14") в список диапазонов
+    
+    Returns:
+        Список кортежей (начало, конец) включительно
+    """
+    ranges = []
+    for part in uid_set.strip().split(','):
+        if not part:
+            continue
+        if ':' in part:
+            start, end = part.split(':', 1)
+            start, end = int(start), int(end)
+            ranges.append((min(start, end), max(start, end)))
+        else:
+            ranges.append((int(part), int(part)))
+    return ranges
+
+
+class DeltaSync:
+    """
+    Движок delta-синхронизации флагов и удалений для одной папки
+    
+    Режимы (выбираются по CAPABILITY сервера):
+    - qresync: CHANGEDSINCE + VANISHED - только изменения, O(changes)
+    - condstore: CHANGEDSINCE для флагов, UID SEARCH для удалений
+    - uid: полный список UID и флагов, сравнение с кэшем
+    """
+    
+    def __init__(self, db: DatabaseManager, account_email: str):
+        """
+        Инициализация DeltaSync
+        
+        Args:
+            db: Менеджер базы данных
+            account_email: Email аккаунта
+        """
+        self.db = db
+        self.account_email = account_email
+        
+        # QRESYNC включается один раз на соединение (например, для IDLE-сессии)
+        self.qresync_enabled = False
+    
+    def detect_mode(self, mailbox: MailBox) -> str:
+        """
+        Определяет режим синхронизации по возможностям сервера
+        
+        Returns:
+            'qresync', 'condstore' или 'uid'
+        """
+        capabilities = set(mailbox.client.capabilities)
+        
+        # ENABLE QRESYNC допустим только до SELECT
+        if 'QRESYNC' in capabilities and (self.qresync_enabled or mailbox.client.state == 'AUTH'):
+            return 'qresync'
+        if 'CONDSTORE' in capabilities:
+            return 'condstore'
+        return 'uid'
+    
+    def enable(self, mailbox: MailBox, mode: str):
+        """Включает расширение QRESYNC на сервере (в состоянии AUTH)"""
+        if mode == 'qresync' and not self.qresync_enabled:
+            typ, _ = mailbox.client.enable('QRESYNC')
+            if typ != 'OK':
+                raise RuntimeError('ENABLE QRESYNC rejected by server')
+            self.qresync_enabled = True
+    
+    def folder_status(self, mailbox: MailBox, folder: str, mode: str) -> Dict[str, int]:
+        """
+        Получает UIDVALIDITY, UIDNEXT и (если доступен) HIGHESTMODSEQ папки
+        
+        Returns:
+            Словарь со значениями STATUS
+        """
+        items = ['UIDVALIDITY', 'UIDNEXT']
+        if mode != 'uid':
+            items.append('HIGHESTMODSEQ')
+        
+        typ, data = mailbox.client._simple_command(
+            'STATUS', encode_folder(folder), f"({' '.join(items)})"
+        )
+        if typ != 'OK':
+            raise RuntimeError(f'STATUS {folder} failed: {data}')
+        _, data = mailbox.client._untagged_response(typ, data, 'STATUS')
+        
+        status_line = b' '.join(item for item in data if isinstance(item, bytes))
+        return {
+            key.decode(): int(value)
+            for key, value in STATUS_ITEM_RE.findall(status_line.split(b'(')[-1])
+        }
+    
+    def _fetch_flags(self, mailbox: MailBox, uid_range: str, modifier: Optional[str] = None) -> Dict[int, str]:
+        """
+        Выполняет UID FETCH (FLAGS) и разбирает ответ
+        
+        Args:
+            mailbox: Объект MailBox с выбранной папкой
+            uid_range: Диапазон UID ("1:500")
+            modifier: Модификатор FETCH, например "(CHANGEDSINCE 123 VANISHED)"
+        
+        Returns:
+            Словарь {imap_uid: flags}
+        """
+        args = ['FETCH', uid_range, '(UID FLAGS)']
+        if modifier:
+            args.append(modifier)
+        
+        typ, data = mailbox.client.uid(*args)
+        if typ != 'OK':
+            raise RuntimeError(f'UID FETCH failed: {data}')
+        
+        flags_by_uid = {}
+        for item in data:
+            line = item[0] if isinstance(item, tuple) else item
+            if not line:
+                continue
+            uid_match = FETCH_UID_RE.search(line)
+            flags_match = FETCH_FLAGS_RE.search(line)
+            if uid_match and flags_match:
+                flags_by_uid[int(uid_match.group(1))] = normalize_flags(flags_match.group(1).split())
+        return flags_by_uid
+    
+    def _pop_vanished(self, mailbox: MailBox) -> List[Tuple[int, int]]:
+        """
+        Собирает диапазоны UID из ответов VANISHED (EARLIER)
+        
+        Returns:
+            Список диапазонов (начало, конец) для удаления из кэша
+        """
+        ranges = []
+        for item in mailbox.client.untagged_responses.pop('VANISHED', []):
+            line = item.decode() if isinstance(item, bytes) else str(item)
+            ranges.extend(parse_uid_set(line.replace('(EARLIER)', '')))
+        return ranges
+    
+    def _search_vanished(self, mailbox: MailBox, folder: str, last_uid: int) -> List[int]:
+        """Находит удаленные письма сравнением UID SEARCH с UID кэша"""
+        server_uids = {int(uid) for uid in mailbox.uids(f'UID 1:{last_uid}')}
+        cached_uids = self.db.get_folder_uids(self.account_email, folder)
+        return sorted(cached_uids - server_uids)
+    
+    def sync_folder(self, mailbox: MailBox, folder: str = 'INBOX') -> Dict[str, int]:
+        """
+        Синхронизирует флаги и удаления для закэшированных писем папки
+        
+        Args:
+            mailbox: Авторизованный MailBox (для QRESYNC - без выбранной папки)
+            folder: Папка IMAP
+        
+        Returns:
+            Словарь со статистикой (mode, flags_updated, vanished)
+        """
+        stats = {'mode': 'none', 'flags_updated': 0, 'vanished': 0}
+        
+        state = self.db.get_folder_sync_state(self.account_email, folder)
+        if not state or not state['last_uid']:
+            # Кэш папки пуст - сверять нечего
+            return stats
+        
+        mode = self.detect_mode(mailbox)
+        self.enable(mailbox, mode)
+        status = self.folder_status(mailbox, folder, mode)
+        
+        if status.get('UIDVALIDITY') != state['uidvalidity']:
+            # Полную ресинхронизацию выполнит uid_sync
+            self.db.reset_folder(self.account_email, folder)
+            stats['mode'] = 'reset'
+            return stats
+        
+        if mode != 'uid' and 'HIGHESTMODSEQ' not in status:
+            # Папка без поддержки MODSEQ (NOMODSEQ)
+            mode = 'uid'
+        
+        stats['mode'] = mode
+        last_uid = state['last_uid']
+        known_modseq = state.get('highest_modseq')
+        
+        mailbox.folder.set(folder, readonly=True)
+        
+        vanished, vanished_ranges = [], []
+        if mode == 'uid' or known_modseq is None:
+            # Первая сверка (или нет MODSEQ): полный список флагов
+            server_flags = self._fetch_flags(mailbox, f'1:{last_uid}')
+            vanished = self._search_vanished(mailbox, folder, last_uid)
+        elif mode == 'qresync':
+            server_flags = self._fetch_flags(
+                mailbox, f'1:{last_uid}', f'(CHANGEDSINCE {known_modseq} VANISHED)'
+            )
+            vanished_ranges = self._pop_vanished(mailbox)
+        else:
+            server_flags = self._fetch_flags(
+                mailbox, f'1:{last_uid}', f'(CHANGEDSINCE {known_modseq})'
+            )
+            vanished = self._search_vanished(mailbox, folder, last_uid)
+        
+        # Из кэша читаем только письма из ответа сервера (после CHANGEDSINCE - изменившиеся)
+        cached_flags = self.db.get_folder_flags(self.account_email, folder, server_flags)
+        flag_updates = {
+            uid: flags for uid, flags in server_flags.items()
+            if uid in cached_flags and cached_flags[uid] != flags
+        }
+        
+        result = self.db.apply_folder_changes(
+            self.account_email,
+            folder,
+            flag_updates,
+            vanished,
+            status.get('HIGHESTMODSEQ'),
+            vanished_ranges
+        )
+        stats.update(result)
+        return stats
@@ -0,0 +1,185 @@
+"""
+SolarMail - Embedding Category Classifier
+Категоризация писем по близости эмбеддинга к прототипам категорий
+
+Вместо zero-shot NLI (forward pass на каждую пару письмо × категория) письмо
+кодируется sentence-энкодером один раз, а категория выбирается одним
+матричным умножением на заранее посчитанные прототипы.
+"""
+
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Try to import NumPy
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+# Кэш прототипов категорий
+DEFAULT_PROTOTYPE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'solarmail', 'prototypes')
+
+# Описание категории для эмбеддинга (как гипотеза zero-shot)
+DESCRIPTION_TEMPLATE = "This email is about {}."
+
+# Примеры писем по категориям: добавляются к описанию в прототип
+DEFAULT_CATEGORY_EXAMPLES = {
+    "Work": [
+        "Meeting tomorrow at 10:00 to discuss the project roadmap",
+        "Please review the quarterly report before the client call",
+        "Встреча по проекту перенесена на четверг",
+    ],
+    "Docs": [
+        "Invoice #1234 attached, payment due within 14 days",
+        "Signed contract and the scanned documents are attached",
+        "Счет на оплату услуг за текущий месяц во вложении",
+    ],
+    "Tasks": [
+        "Ticket assigned to you: fix the login bug by Friday",
+        "Reminder: the task deadline is today",
+        "Необходимо завершить ревью и сделать merge",
+    ],
+    "People": [
+        "Happy birthday! Let's have dinner this weekend",
+        "Thanks for the photos from our trip",
+        "Привет! Как дела, когда увидимся?",
+    ],
+    "News": [
+        "Weekly digest: top stories in tech this week",
+        "Product update: new features released in version 2.0",
+        "Новости недели и анонсы мероприятий",
+    ],
+    "Spam": [
+        "Huge sale! 70% discount on everything, buy now",
+        "You have won a prize, click here to claim it",
+        "Скидки до 50% только сегодня, успейте купить",
+    ],
+}
+
+
+def mean_pooling(hidden_state, attention_mask):
+    """
+    Эмбеддинг предложения: среднее токенов без паддинга, L2-нормализованное
+    
+    Args:
+        hidden_state: torch.Tensor (batch, sequence, hidden) последнего слоя энкодера
+        attention_mask: torch.Tensor (batch, sequence)
+    
+    Returns:
+        torch.Tensor (batch, hidden) единичной длины
+    """
+    import torch
+    
+    mask = attention_mask.unsqueeze(-1).to(hidden_state.dtype)
+    pooled = (hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+    return torch.nn.functional.normalize(pooled, dim=-1)
+
+
+class EmbeddingCategoryClassifier:
+    """
+    Классификатор категорий по прототипам эмбеддингов
+    
+    Прототип категории - нормированное среднее эмбеддингов ее описания и
+    примеров писем. Прототипы считаются один раз и кэшируются на диске
+    (ключ - модель, описания и примеры); классификация батча писем -
+    одно умножение матриц эмбеддингов (N × d) на прототипы (d × C).
+    """
+    
+    def __init__(
+        self,
+        encode: Callable[[List[str]], "np.ndarray"],
+        categories: Dict[str, str],
+        model_name: str,
+        examples: Optional[Dict[str, List[str]]] = None,
+        temperature: float = 0.05,
+        cache_dir: Optional[str] = None
+    ):
+        """
+        Инициализация EmbeddingCategoryClassifier
+        
+        Args:
+            encode: Функция текстов → нормированные эмбеддинги (N × d)
+            categories: Описание категории → стандартная категория (category_mapping)
+            model_name: Модель энкодера (часть ключа кэша прототипов)
+            examples: Примеры писем по стандартным категориям (по умолчанию DEFAULT_CATEGORY_EXAMPLES)
+            temperature: Температура softmax по косинусным близостям
+            cache_dir: Каталог кэша прототипов (None - DEFAULT_PROTOTYPE_DIR)
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy not installed")
+        
+        self.encode = encode
+        self.model_name = model_name
+        self.temperature = temperature
+        self.cache_dir = cache_dir or DEFAULT_PROTOTYPE_DIR
+        self.examples = DEFAULT_CATEGORY_EXAMPLES if examples is None else examples
+        
+        # Порядок строк матрицы прототипов
+        self.descriptions = list(categories)
+        self.labels = [categories[description] for description in self.descriptions]
+        
+        self.prototypes = self._load_prototypes()
+    
+    def classify(self, embeddings: "np.ndarray") -> List[Tuple[str, float]]:
+        """
+        Категории для батча эмбеддингов
+        
+        Args:
+            embeddings: Нормированные эмбеддинги писем (N × d)
+        
+        Returns:
+            Список (category, confidence) в порядке строк embeddings
+        """
+        if len(embeddings) == 0:
+            return []
+        
+        # Косинусные близости ко всем прототипам одним умножением (N × C)
+        scores = embeddings @ self.prototypes.T / self.temperature
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        
+        best = probabilities.argmax(axis=1)
+        confidence = probabilities[np.arange(len(best)), best]
+        return [(self.labels[index], float(score)) for index, score in zip(best, confidence)]
+    
+    def _load_prototypes(self) -> "np.ndarray":
+        """
+        Прототипы из кэша или посчитанные энкодером
+        
+        Returns:
+            Матрица прототипов (C × d), строки единичной длины
+        """
+        path = os.path.join(self.cache_dir, f"{self._cache_key()}.npy")
+        if os.path.exists(path):
+            return np.load(path)
+        
+        texts, owners = [], []
+        for row, (description, label) in enumerate(zip(self.descriptions, self.labels)):
+            for text in [DESCRIPTION_TEMPLATE.format(description)] + list(self.examples.get(label, [])):
+                texts.append(text)
+                owners.append(row)
+        
+        embeddings = np.asarray(self.encode(texts), dtype=np.float32)
+        prototypes = np.zeros((len(self.descriptions), embeddings.shape[1]), dtype=np.float32)
+        np.add.at(prototypes, owners, embeddings)
+        prototypes /= np.linalg.norm(prototypes, axis=1, keepdims=True)
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp.npy"
+        np.save(tmp_path, prototypes)
+        os.replace(tmp_path, path)
+        return prototypes
+    
+    def _cache_key(self) -> str:
+        """Хэш модели, описаний и примеров: прототипы пересчитываются при их изменении"""
+        source = json.dumps(
+            [self.model_name, DESCRIPTION_TEMPLATE, self.descriptions, self.labels, self.examples],
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
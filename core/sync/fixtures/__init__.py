@@ -0,0 +1,9 @@
+"""
+SolarMail - Sync Fixtures
+Локальный IMAP-сервер и синтетические письма для тестов и бенчмарков синхронизации
+"""
+
+from .imap_server import StandInIMAPServer
+from .mail_generator import MailGenerator
+
+__all__ = ["StandInIMAPServer", "MailGenerator"]
@@ -0,0 +1,931 @@
+"""
+SolarMail - Stand-in IMAP Server
+Локальный IMAP4rev1 сервер на asyncio для бенчмарков синхронизации без реального Gmail
+
+Поддерживается подмножество протокола, которое используют SolarSync
+(imap_tools/imaplib), DeltaSync и AsyncSolarSync: CAPABILITY, LOGIN,
+SELECT/EXAMINE, STATUS, UID SEARCH, UID FETCH, IDLE, NOOP, CLOSE, LOGOUT
+и (по флагам condstore/qresync) ENABLE, MODSEQ, CHANGEDSINCE, VANISHED.
+"""
+
+import asyncio
+import email
+import email.message
+import re
+import threading
+from datetime import datetime, timezone
+from email.utils import getaddresses
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .mail_generator import MailGenerator
+
+
+# Элемент FETCH с секцией тела: BODY[1.2]<0.2048>
+BODY_ITEM_RE = re.compile(r'^(BODY(?:\.PEEK)?|BINARY(?:\.PEEK)?)\[([^\]]*)\](?:<(\d+)(?:\.(\d+))?>)?$', re.I)
+LITERAL_RE = re.compile(rb'\{(\d+)(\+?)\}\r\n$')
+
+# Ключи SEARCH по системным флагам (и UN-варианты)
+FLAG_KEYS = {'SEEN': '\\Seen', 'FLAGGED': '\\Flagged', 'ANSWERED': '\\Answered', 'DELETED': '\\Deleted'}
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+class StoredMessage:
+    """Письмо в папке сервера"""
+    
+    def __init__(self, uid: int, raw: bytes, flags: Iterable[str], internaldate: datetime, modseq: int):
+        self.uid = uid
+        self.raw = raw
+        self.flags = set(flags)
+        self.internaldate = internaldate
+        self.modseq = modseq
+        self._parsed = None
+    
+    @property
+    def parsed(self) -> email.message.Message:
+        """Разобранное письмо (лениво, для ENVELOPE/BODYSTRUCTURE)"""
+        if self._parsed is None:
+            self._parsed = email.message_from_bytes(self.raw)
+        return self._parsed
+
+
+class IMAPError(Exception):
+    """Ошибка команды - отправляется клиенту как tagged BAD/NO"""
+    
+    def __init__(self, status: str, text: str):
+        super().__init__(text)
+        self.status = status
+
+
+# ==================== Encoding Helpers ====================
+
+def imap_string(value: Optional[Any]) -> bytes:
+    """
+    Кодирует строку для ответа: NIL, quoted или literal
+    
+    Returns:
+        Байты IMAP-строки
+    """
+    if value is None:
+        return b'NIL'
+    data = value if isinstance(value, bytes) else str(value).encode('utf-8', 'surrogateescape')
+    if any(byte > 127 or byte in (10, 13, 0) for byte in data):
+        return b'{%d}\r\n' % len(data) + data
+    return b'"' + data.replace(b'\\', b'\\\\').replace(b'"', b'\\"') + b'"'
+
+
+def imap_date(value: datetime) -> str:
+    """Форматирует дату в формате INTERNALDATE (17-Oct-2026 10:00:00 +0000)"""
+    offset = value.strftime('%z') or '+0000'
+    return f"{value.day:02d}-{MONTHS[value.month - 1]}-{value.year} {value.strftime('%H:%M:%S')} {offset}"
+
+
+def parse_search_date(value: str) -> datetime:
+    """Разбирает дату SEARCH (1-Oct-2026)"""
+    day, month, year = value.split('-')
+    return datetime(int(year), MONTHS.index(month.capitalize()) + 1, int(day)).date()
+
+
+def _unfold(value: Optional[str]) -> Optional[str]:
+    """Убирает переносы строк из заголовка"""
+    if value is None:
+        return None
+    return re.sub(r'\r?\n[ \t]*', ' ', str(value))
+
+
+def envelope(msg: email.message.Message) -> bytes:
+    """Строит ENVELOPE (RFC 3501 7.4.2)"""
+    def addresses(*headers):
+        values = [msg.get(header) for header in headers if msg.get(header)]
+        if not values:
+            return b'NIL'
+        result = []
+        for name, address in getaddresses([_unfold(value) for value in values]):
+            mailbox, _, host = address.partition('@')
+            result.append(b'(' + b' '.join([
+                imap_string(name or None), b'NIL', imap_string(mailbox or None), imap_string(host or None)
+            ]) + b')')
+        return b'(' + b''.join(result) + b')' if result else b'NIL'
+    
+    sender = addresses('From')
+    reply_to = addresses('Reply-To')
+    return b'(' + b' '.join([
+        imap_string(_unfold(msg.get('Date'))),
+        imap_string(_unfold(msg.get('Subject'))),
+        sender,
+        addresses('Sender') if msg.get('Sender') else sender,
+        reply_to if reply_to != b'NIL' else sender,
+        addresses('To'),
+        addresses('Cc'),
+        addresses('Bcc'),
+        imap_string(_unfold(msg.get('In-Reply-To'))),
+        imap_string(_unfold(msg.get('Message-ID'))),
+    ]) + b')'
+
+
+def part_payload(part: email.message.Message) -> bytes:
+    """Тело MIME-части в transfer-encoding (как хранится в письме)"""
+    payload = part.get_payload(decode=False)
+    if isinstance(payload, list):
+        return b''.join(part_payload(child) for child in payload)
+    return (payload or '').encode('utf-8', 'surrogateescape')
+
+
+def bodystructure(part: email.message.Message) -> bytes:
+    """Строит BODYSTRUCTURE (без расширенных полей)"""
+    if part.is_multipart():
+        children = b''.join(bodystructure(child) for child in part.get_payload())
+        return b'(' + children + b' ' + imap_string(part.get_content_subtype()) + b')'
+    
+    params = part.get_params() or []
+    param_list = [
+        item for key, value in params[1:] for item in (imap_string(key), imap_string(value))
+    ]
+    payload = part_payload(part)
+    fields = [
+        imap_string(part.get_content_maintype()),
+        imap_string(part.get_content_subtype()),
+        b'(' + b' '.join(param_list) + b')' if param_list else b'NIL',
+        imap_string(part.get('Content-ID')),
+        imap_string(part.get('Content-Description')),
+        imap_string((part.get('Content-Transfer-Encoding') or '7bit').lower()),
+        str(len(payload)).encode(),
+    ]
+    if part.get_content_maintype() == 'text':
+        fields.append(str(payload.count(b'\n')).encode())
+    return b'(' + b' '.join(fields) + b')'
+
+
+def split_raw(raw: bytes) -> Tuple[bytes, bytes]:
+    """Делит письмо на заголовок (с пустой строкой) и тело"""
+    for separator in (b'\r\n\r\n', b'\n\n'):
+        index = raw.find(separator)
+        if index != -1:
+            return raw[:index + len(separator)], raw[index + len(separator):]
+    return raw, b''
+
+
+def body_section(message: StoredMessage, section: str) -> bytes:
+    """
+    Возвращает секцию письма для BODY[section]
+    
+    Поддерживаются '', HEADER, TEXT и номера частей (1, 1.2, ...).
+    """
+    section = section.upper()
+    header, text = split_raw(message.raw)
+    if section == '':
+        return message.raw
+    if section == 'HEADER':
+        return header
+    if section == 'TEXT':
+        return text
+    
+    part = message.parsed
+    for index in section.split('.'):
+        if not index.isdigit():
+            raise IMAPError('BAD', f'Unsupported section {section}')
+        if part.is_multipart():
+            children = part.get_payload()
+            number = int(index)
+            if not 1 <= number <= len(children):
+                return b''
+            part = children[number - 1]
+        elif index != '1':
+            return b''
+    return part_payload(part)
+
+
+# ==================== Command Parsing ====================
+
+def tokenize(pieces: List[Any]) -> List[Any]:
+    """
+    Разбирает команду клиента во вложенные списки
+    
+    Args:
+        pieces: Куски строки команды (bytes) и литералы (tuple с bytes)
+    
+    Returns:
+        Список токенов: str (атомы), bytes (строки), list (скобки)
+    """
+    stack = [[]]
+    for piece in pieces:
+        if isinstance(piece, tuple):
+            stack[-1].append(piece[0])
+            continue
+        
+        i, length = 0, len(piece)
+        while i < length:
+            char = piece[i:i + 1]
+            if char in (b' ', b'\r', b'\n'):
+                i += 1
+            elif char == b'(':
+                stack.append([])
+                i += 1
+            elif char == b')':
+                if len(stack) > 1:
+                    finished = stack.pop()
+                    stack[-1].append(finished)
+                i += 1
+            elif char == b'"':
+                i += 1
+                value = bytearray()
+                while i < length and piece[i:i + 1] != b'"':
+                    if piece[i:i + 1] == b'\\':
+                        i += 1
+                    value += piece[i:i + 1]
+                    i += 1
+                i += 1
+                stack[-1].append(bytes(value))
+            else:
+                start, depth = i, 0
+                while i < length:
+                    char = piece[i:i + 1]
+                    if char == b'[':
+                        depth += 1
+                    elif char == b']':
+                        depth -= 1
+                    elif depth == 0 and char in (b' ', b'(', b')', b'\r', b'\n'):
+                        break
+                    i += 1
+                stack[-1].append(piece[start:i].decode(errors='replace'))
+    return stack[0]
+
+
+def as_text(token: Any) -> str:
+    """Приводит токен к строке"""
+    if isinstance(token, bytes):
+        return token.decode('utf-8', errors='replace')
+    if isinstance(token, list):
+        return ' '.join(as_text(item) for item in token)
+    return str(token)
+
+
+def parse_sequence_set(value: str, largest: int) -> List[Tuple[int, int]]:
+    """
+    Разбирает sequence-set ("1:5,9,12:*")
+    
+    '*' означает наибольший номер; "n:*" при n > largest дает largest
+    (RFC 3501 - поэтому клиенты фильтруют UID сами).
+    """
+    ranges = []
+    for part in value.split(','):
+        bounds = [largest if bound == '*' else int(bound) for bound in part.split(':')]
+        start, end = bounds[0], bounds[-1]
+        ranges.append((min(start, end), max(start, end)))
+    return ranges
+
+
+def in_ranges(value: int, ranges: List[Tuple[int, int]]) -> bool:
+    """Проверяет попадание номера в диапазоны"""
+    return any(start <= value <= end for start, end in ranges)
+
+
+def uid_set(uids: Iterable[int]) -> str:
+    """Сворачивает UID в sequence-set ("1:3,7")"""
+    ranges = []
+    for uid in sorted(uids):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ','.join(str(start) if start == end else f'{start}:{end}' for start, end in ranges)
+
+
+# ==================== Server ====================
+
+class StandInIMAPServer:
+    """
+    Локальный IMAP-сервер для бенчмарков и тестов
+    
+    Работает в собственном потоке с отдельным event loop, поэтому подходит
+    и для блокирующего SolarSync, и для AsyncSolarSync в другом loop.
+    Любые логин и пароль принимаются.
+    
+    Пример:
+        with StandInIMAPServer(latency=0.01, qresync=True) as server:
+            server.populate('INBOX', 1000, MailGenerator(seed=1, attachment_ratio=0.3))
+            server.set_flags('INBOX', 5, ['\\Seen', '\\Flagged'])
+            server.expunge('INBOX', [7, 8])
+            sync.imap_host, port = server.address
+    """
+    
+    BASE_CAPABILITIES = ['IMAP4rev1', 'IDLE', 'UIDPLUS', 'LITERAL+']
+    
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.0,
+        condstore: bool = False,
+        qresync: bool = False
+    ):
+        """
+        Инициализация StandInIMAPServer
+        
+        Args:
+            host: Адрес для прослушивания
+            port: Порт (0 - выбрать свободный)
+            latency: Задержка перед ответом на каждую команду (секунды, имитация RTT)
+            condstore: Поддержка CONDSTORE (MODSEQ, HIGHESTMODSEQ, CHANGEDSINCE)
+            qresync: Поддержка QRESYNC (ENABLE QRESYNC, VANISHED); включает condstore
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.condstore = condstore or qresync
+        self.qresync = qresync
+        self.capabilities = list(self.BASE_CAPABILITIES)
+        if self.condstore:
+            self.capabilities += ['ENABLE', 'CONDSTORE']
+        if self.qresync:
+            self.capabilities.append('QRESYNC')
+        
+        self.folders: Dict[str, Dict[str, Any]] = {}
+        self.modseq = 1
+        self.bytes_sent = 0
+        self.commands = 0
+        self.connections = 0
+        self.create_folder('INBOX')
+        
+        self._lock = threading.RLock()
+        self._sessions: List[Dict[str, Any]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+    
+    # ==================== Mailbox Data ====================
+    
+    def create_folder(self, folder: str, uidvalidity: int = 1):
+        """Создает папку (если ее нет)"""
+        self.folders.setdefault(folder, {
+            'uidvalidity': uidvalidity,
+            'uidnext': 1,
+            'highestmodseq': self.modseq,
+            'messages': [],
+            'vanished': {}  # UID удаленного письма -> MODSEQ удаления (для VANISHED)
+        })
+    
+    def _next_modseq(self, state: Dict[str, Any]) -> int:
+        """Новый MODSEQ изменения в папке"""
+        self.modseq += 1
+        state['highestmodseq'] = self.modseq
+        return self.modseq
+    
+    def add_message(
+        self,
+        folder: str,
+        raw: bytes,
+        flags: Iterable[str] = (),
+        internaldate: Optional[datetime] = None
+    ) -> int:
+        """
+        Добавляет письмо в папку (можно вызывать во время работы сервера)
+        
+        Returns:
+            UID нового письма
+        """
+        with self._lock:
+            self.create_folder(folder)
+            state = self.folders[folder]
+            uid = state['uidnext']
+            state['uidnext'] += 1
+            state['messages'].append(StoredMessage(
+                uid, raw, flags, internaldate or datetime.now(timezone.utc), self._next_modseq(state)
+            ))
+            exists = len(state['messages'])
+        
+        self._notify(folder, b'* %d EXISTS\r\n' % exists)
+        return uid
+    
+    def populate(
+        self,
+        folder: str,
+        count: int,
+        generator: Optional[MailGenerator] = None,
+        start: int = 0
+    ) -> List[int]:
+        """
+        Заполняет папку синтетическими письмами
+        
+        Args:
+            folder: Папка
+            count: Количество писем
+            generator: MailGenerator (размеры, вложения, языки); по умолчанию MailGenerator()
+            start: Номер первого письма генератора
+        
+        Returns:
+            Список UID добавленных писем
+        """
+        generator = generator or MailGenerator()
+        return [
+            self.add_message(folder, message['raw'], message['flags'], message['internaldate'])
+            for message in generator.iter_messages(count, start)
+        ]
+    
+    def set_flags(self, folder: str, uid: int, flags: Iterable[str]):
+        """Заменяет флаги письма (как STORE другого клиента) и повышает его MODSEQ"""
+        with self._lock:
+            state = self.folders[folder]
+            for seq, message in enumerate(state['messages'], 1):
+                if message.uid == uid:
+                    message.flags = set(flags)
+                    message.modseq = self._next_modseq(state)
+                    break
+            else:
+                raise KeyError(f'UID {uid} not found in {folder}')
+        
+        line = b'* %d FETCH (UID %d FLAGS (%s))\r\n' % (seq, uid, ' '.join(sorted(flags)).encode())
+        self._notify(folder, line)
+    
+    def expunge(self, folder: str, uids: Iterable[int]) -> List[int]:
+        """
+        Удаляет письма (как EXPUNGE другого клиента)
+        
+        Удаленные UID запоминаются с MODSEQ удаления для VANISHED (EARLIER).
+        
+        Returns:
+            Список действительно удаленных UID
+        """
+        uids = set(uids)
+        with self._lock:
+            state = self.folders[folder]
+            expunged = [(seq, message.uid) for seq, message in enumerate(state['messages'], 1)
+                        if message.uid in uids]
+            if not expunged:
+                return []
+            
+            modseq = self._next_modseq(state)
+            state['messages'] = [message for message in state['messages'] if message.uid not in uids]
+            for _, uid in expunged:
+                state['vanished'][uid] = modseq
+        
+        # EXPUNGE по убыванию номеров: каждый ответ сдвигает следующие письма
+        expunge_lines = b''.join(b'* %d EXPUNGE\r\n' % seq for seq, _ in reversed(expunged))
+        vanished_line = f"* VANISHED {uid_set(uid for _, uid in expunged)}\r\n".encode()
+        self._notify(folder, expunge_lines, vanished_line)
+        return [uid for _, uid in expunged]
+    
+    def _notify(self, folder: str, line: bytes, qresync_line: Optional[bytes] = None):
+        """
+        Отправляет untagged-ответ сессиям, выбравшим папку
+        
+        Сессия в IDLE получает ответ сразу, остальные - в начале следующего
+        IDLE (как обновления, которые сервер отдает со следующей командой).
+        
+        Args:
+            folder: Папка
+            line: Ответ для обычных сессий
+            qresync_line: Ответ для сессий с включенным QRESYNC (VANISHED вместо EXPUNGE)
+        """
+        if self._loop is None:
+            return
+        for session in list(self._sessions):
+            if session['folder'] == folder:
+                data = qresync_line if qresync_line and 'QRESYNC' in session['enabled'] else line
+                self._loop.call_soon_threadsafe(session['updates'].put_nowait, (folder, data))
+    
+    def idling(self, folder: str = 'INBOX') -> bool:
+        """Есть ли сессия, ожидающая в IDLE на папке"""
+        return any(session['idling'] and session['folder'] == folder for session in list(self._sessions))
+    
+    def drop_connections(self):
+        """Обрывает все клиентские соединения (как сбой сети или перезапуск сервера)"""
+        if self._loop is None:
+            return
+        for session in list(self._sessions):
+            self._loop.call_soon_threadsafe(session['writer'].transport.abort)
+    
+    # ==================== Lifecycle ====================
+    
+    @property
+    def address(self) -> Tuple[str, int]:
+        """Адрес (host, port) запущенного сервера"""
+        return self.host, self.port
+    
+    def start(self) -> 'StandInIMAPServer':
+        """Запускает сервер в фоновом потоке и ждет готовности"""
+        ready = threading.Event()
+        
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+            
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+        
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+    
+    def stop(self):
+        """Останавливает сервер"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+    
+    def __enter__(self) -> 'StandInIMAPServer':
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.stop()
+    
+    # ==================== Session ====================
+    
+    async def _read_command(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[List[Any]]:
+        """Читает команду клиента вместе с литералами"""
+        pieces = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                return None
+            match = LITERAL_RE.search(line)
+            if not match:
+                pieces.append(line)
+                return tokenize(pieces)
+            
+            pieces.append(line[:match.start()])
+            if not match.group(2):
+                writer.write(b'+ Ready for literal\r\n')
+                await writer.drain()
+            pieces.append((await reader.readexactly(int(match.group(1))),))
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Обслуживает одно соединение клиента"""
+        session = {
+            'folder': None,
+            'readonly': False,
+            'enabled': set(),
+            'idling': False,
+            'updates': asyncio.Queue(),  # (папка, untagged-ответ) для IDLE (_notify)
+            'writer': writer
+        }
+        self.connections += 1
+        self._sessions.append(session)
+        
+        async def send(data: bytes):
+            self.bytes_sent += len(data)
+            writer.write(data)
+            await writer.drain()
+        
+        await send(b'* OK SolarMail stand-in IMAP ready\r\n')
+        
+        try:
+            while True:
+                tokens = await self._read_command(reader, writer)
+                if tokens is None:
+                    break
+                if len(tokens) < 2:
+                    await send(b'* BAD Empty command\r\n')
+                    continue
+                
+                tag = as_text(tokens[0]).encode()
+                name = as_text(tokens[1]).upper()
+                args = tokens[2:]
+                if name == 'UID' and args:
+                    name = 'UID ' + as_text(args[0]).upper()
+                    args = args[1:]
+                
+                self.commands += 1
+                try:
+                    if name == 'IDLE':
+                        await self._idle(reader, session, send)
+                        status, text = 'OK', 'IDLE terminated'
+                    else:
+                        handler = self.HANDLERS.get(name)
+                        if handler is None:
+                            raise IMAPError('BAD', f'Unknown command {name}')
+                        untagged, text = handler(self, session, args)
+                        if untagged:
+                            await send(b''.join(untagged))
+                        status = 'OK'
+                except IMAPError as e:
+                    status, text = e.status, str(e)
+                
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                await send(tag + f' {status} {text}\r\n'.encode())
+                
+                if name == 'LOGOUT':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._sessions.remove(session)
+            writer.close()
+    
+    async def _idle(self, reader: asyncio.StreamReader, session: Dict, send):
+        """IDLE: пересылает накопленные и новые обновления папки до строки DONE"""
+        if session['folder'] is None:
+            raise IMAPError('BAD', 'No folder selected')
+        
+        session['idling'] = True
+        await send(b'+ idling\r\n')
+        
+        try:
+            done_task = asyncio.ensure_future(reader.readline())
+            while True:
+                # Неполученное обновление остается в очереди до следующего IDLE
+                notify_task = asyncio.ensure_future(session['updates'].get())
+                finished, _ = await asyncio.wait(
+                    {done_task, notify_task}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if notify_task in finished:
+                    folder, data = notify_task.result()
+                    if folder == session['folder']:
+                        await send(data)
+                else:
+                    notify_task.cancel()
+                if done_task in finished:
+                    break
+        finally:
+            session['idling'] = False
+    
+    # ==================== Commands ====================
+    
+    def _folder(self, session: Dict) -> Dict[str, Any]:
+        """Выбранная папка сессии"""
+        if session['folder'] is None:
+            raise IMAPError('BAD', 'No folder selected')
+        return self.folders[session['folder']]
+    
+    def cmd_capability(self, session, args):
+        return [f"* CAPABILITY {' '.join(self.capabilities)}\r\n".encode()], 'CAPABILITY completed'
+    
+    def cmd_noop(self, session, args):
+        return [], 'NOOP completed'
+    
+    def cmd_login(self, session, args):
+        return [], 'LOGIN completed'
+    
+    def cmd_logout(self, session, args):
+        return [b'* BYE Logging out\r\n'], 'LOGOUT completed'
+    
+    def cmd_close(self, session, args):
+        session['folder'] = None
+        return [], 'CLOSE completed'
+    
+    def cmd_enable(self, session, args):
+        if not self.condstore:
+            raise IMAPError('BAD', 'Unknown command ENABLE')
+        if session['folder'] is not None:
+            raise IMAPError('BAD', 'ENABLE must be issued before SELECT')
+        
+        enabled = []
+        for name in (as_text(arg).upper() for arg in args):
+            if name in ('CONDSTORE', 'QRESYNC') and name in self.capabilities:
+                enabled.append(name)
+        session['enabled'].update(enabled)
+        if 'QRESYNC' in enabled:
+            session['enabled'].add('CONDSTORE')
+        return [f"* ENABLED {' '.join(enabled)}\r\n".encode()], 'ENABLE completed'
+    
+    def cmd_select(self, session, args, readonly: bool = False):
+        folder = as_text(args[0]) if args else ''
+        if folder.upper() == 'INBOX':
+            folder = 'INBOX'
+        if folder not in self.folders:
+            raise IMAPError('NO', f'Folder {folder} not found')
+        
+        state = self.folders[folder]
+        session['folder'] = folder
+        session['readonly'] = readonly
+        if self.condstore and len(args) > 1 and isinstance(args[1], list):
+            # SELECT folder (CONDSTORE) включает CONDSTORE для сессии
+            if 'CONDSTORE' in [as_text(item).upper() for item in args[1]]:
+                session['enabled'].add('CONDSTORE')
+        
+        untagged = [
+            b'* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)\r\n',
+            b'* %d EXISTS\r\n' % len(state['messages']),
+            b'* 0 RECENT\r\n',
+            b'* OK [UIDVALIDITY %d] UIDs valid\r\n' % state['uidvalidity'],
+            b'* OK [UIDNEXT %d] Predicted next UID\r\n' % state['uidnext'],
+        ]
+        if self.condstore:
+            untagged.append(b'* OK [HIGHESTMODSEQ %d] Highest\r\n' % state['highestmodseq'])
+        mode = 'READ-ONLY' if readonly else 'READ-WRITE'
+        return untagged, f'[{mode}] {"EXAMINE" if readonly else "SELECT"} completed'
+    
+    def cmd_examine(self, session, args):
+        return self.cmd_select(session, args, readonly=True)
+    
+    def cmd_status(self, session, args):
+        folder = as_text(args[0]) if args else ''
+        if folder.upper() == 'INBOX':
+            folder = 'INBOX'
+        if folder not in self.folders:
+            raise IMAPError('NO', f'Folder {folder} not found')
+        
+        state = self.folders[folder]
+        values = {
+            'MESSAGES': len(state['messages']),
+            'RECENT': 0,
+            'UIDNEXT': state['uidnext'],
+            'UIDVALIDITY': state['uidvalidity'],
+            'UNSEEN': sum(1 for m in state['messages'] if '\\Seen' not in m.flags),
+        }
+        if self.condstore:
+            values['HIGHESTMODSEQ'] = state['highestmodseq']
+        items = args[1] if len(args) > 1 and isinstance(args[1], list) else []
+        pairs = ' '.join(
+            f'{as_text(item).upper()} {values[as_text(item).upper()]}'
+            for item in items if as_text(item).upper() in values
+        )
+        return [b'* STATUS ' + imap_string(folder) + f' ({pairs})\r\n'.encode()], 'STATUS completed'
+    
+    def cmd_uid_search(self, session, args):
+        messages = self._folder(session)['messages']
+        if args and as_text(args[0]).upper() == 'CHARSET':
+            args = args[2:]
+        
+        with self._lock:
+            uids = [message.uid for seq, message in enumerate(messages, 1)
+                    if self._match(message, seq, messages, list(args))]
+        return [b'* SEARCH' + ''.join(f' {uid}' for uid in uids).encode() + b'\r\n'], 'SEARCH completed'
+    
+    def _match(self, message: StoredMessage, seq: int, messages: List[StoredMessage], keys: List[Any]) -> bool:
+        """Проверяет письмо на соответствие критериям SEARCH (AND всех ключей)"""
+        while keys:
+            key = keys.pop(0)
+            if isinstance(key, list):
+                if not self._match(message, seq, messages, list(key)):
+                    return False
+                continue
+            
+            name = as_text(key).upper()
+            if name == 'ALL':
+                continue
+            if name == 'NOT':
+                if self._match(message, seq, messages, [keys.pop(0)]):
+                    return False
+            elif name == 'OR':
+                left, right = keys.pop(0), keys.pop(0)
+                if not (self._match(message, seq, messages, [left]) or
+                        self._match(message, seq, messages, [right])):
+                    return False
+            elif name == 'UID':
+                largest = messages[-1].uid if messages else 0
+                if not in_ranges(message.uid, parse_sequence_set(as_text(keys.pop(0)), largest)):
+                    return False
+            elif name in ('SINCE', 'BEFORE', 'ON'):
+                day = parse_search_date(as_text(keys.pop(0)))
+                date = message.internaldate.date()
+                if ((name == 'SINCE' and date < day) or (name == 'BEFORE' and date >= day)
+                        or (name == 'ON' and date != day)):
+                    return False
+            elif name in FLAG_KEYS:
+                if FLAG_KEYS[name] not in message.flags:
+                    return False
+            elif name.startswith('UN') and name[2:] in FLAG_KEYS:
+                if FLAG_KEYS[name[2:]] in message.flags:
+                    return False
+            elif re.match(r'^[\d:*,]+$', name):
+                if not in_ranges(seq, parse_sequence_set(name, len(messages))):
+                    return False
+            else:
+                raise IMAPError('BAD', f'Unsupported search key {name}')
+        return True
+    
+    def cmd_uid_fetch(self, session, args):
+        if len(args) < 2:
+            raise IMAPError('BAD', 'UID FETCH requires sequence set and items')
+        
+        state = self._folder(session)
+        items = args[1] if isinstance(args[1], list) else [args[1]]
+        items = [as_text(item).upper() for item in items]
+        macros = {
+            'ALL': ['FLAGS', 'INTERNALDATE', 'RFC822.SIZE', 'ENVELOPE'],
+            'FAST': ['FLAGS', 'INTERNALDATE', 'RFC822.SIZE'],
+            'FULL': ['FLAGS', 'INTERNALDATE', 'RFC822.SIZE', 'ENVELOPE', 'BODY'],
+        }
+        if len(items) == 1 and items[0] in macros:
+            items = macros[items[0]]
+        
+        changed_since, vanished = self._fetch_modifiers(session, args[2] if len(args) > 2 else None)
+        if changed_since is not None and 'MODSEQ' not in items:
+            items.append('MODSEQ')
+        
+        with self._lock:
+            messages = list(state['messages'])
+            tombstones = dict(state['vanished'])
+        largest = messages[-1].uid if messages else 0
+        ranges = parse_sequence_set(as_text(args[0]), largest)
+        
+        untagged = []
+        if vanished:
+            # VANISHED (EARLIER) - письма, удаленные после CHANGEDSINCE
+            ranges_all = parse_sequence_set(as_text(args[0]), state['uidnext'] - 1)
+            gone = [uid for uid, modseq in tombstones.items()
+                    if modseq > changed_since and in_ranges(uid, ranges_all)]
+            if gone:
+                untagged.append(f'* VANISHED (EARLIER) {uid_set(gone)}\r\n'.encode())
+        
+        for seq, message in enumerate(messages, 1):
+            if changed_since is not None and message.modseq <= changed_since:
+                continue
+            if in_ranges(message.uid, ranges):
+                untagged.append(self._fetch_message(session, seq, message, items))
+        return untagged, 'FETCH completed'
+    
+    def _fetch_modifiers(self, session: Dict, modifiers: Optional[Any]) -> Tuple[Optional[int], bool]:
+        """
+        Разбирает модификаторы UID FETCH: (CHANGEDSINCE n [VANISHED])
+        
+        Returns:
+            Tuple (CHANGEDSINCE или None, нужен ли VANISHED)
+        """
+        if not isinstance(modifiers, list):
+            return None, False
+        if not self.condstore:
+            raise IMAPError('BAD', 'FETCH modifiers are not supported')
+        
+        names = [as_text(item).upper() for item in modifiers]
+        if 'CHANGEDSINCE' not in names or names.index('CHANGEDSINCE') + 1 >= len(names):
+            raise IMAPError('BAD', 'CHANGEDSINCE value required')
+        changed_since = int(names[names.index('CHANGEDSINCE') + 1])
+        
+        vanished = 'VANISHED' in names
+        if vanished and 'QRESYNC' not in session['enabled']:
+            raise IMAPError('BAD', 'VANISHED requires ENABLE QRESYNC')
+        session['enabled'].add('CONDSTORE')
+        return changed_since, vanished
+    
+    def _fetch_message(self, session: Dict, seq: int, message: StoredMessage, items: List[str]) -> bytes:
+        """Формирует ответ FETCH одного письма (UID первым, литералы последними)"""
+        simple = [b'UID %d' % message.uid]
+        literals = []
+        
+        for item in items:
+            if item == 'UID':
+                continue
+            if item == 'FLAGS':
+                simple.append(b'FLAGS (' + ' '.join(sorted(message.flags)).encode() + b')')
+            elif item == 'INTERNALDATE':
+                simple.append(b'INTERNALDATE "' + imap_date(message.internaldate).encode() + b'"')
+            elif item == 'RFC822.SIZE':
+                simple.append(b'RFC822.SIZE %d' % len(message.raw))
+            elif item == 'MODSEQ':
+                if not self.condstore:
+                    raise IMAPError('BAD', 'MODSEQ is not supported')
+                simple.append(b'MODSEQ (%d)' % message.modseq)
+            elif item == 'ENVELOPE':
+                simple.append(b'ENVELOPE ' + envelope(message.parsed))
+            elif item in ('BODYSTRUCTURE', 'BODY'):
+                simple.append(item.encode() + b' ' + bodystructure(message.parsed))
+            elif item in ('RFC822', 'RFC822.HEADER', 'RFC822.TEXT'):
+                section = {'RFC822': '', 'RFC822.HEADER': 'HEADER', 'RFC822.TEXT': 'TEXT'}[item]
+                literals.append(item.encode() + b' ' + self._literal(body_section(message, section)))
+                if item == 'RFC822' and not session['readonly']:
+                    self._mark_seen(session, message)
+            else:
+                match = BODY_ITEM_RE.match(item)
+                if not match:
+                    raise IMAPError('BAD', f'Unsupported fetch item {item}')
+                
+                name, section, origin, length = match.groups()
+                data = body_section(message, section)
+                label = f"{name.split('.')[0]}[{section}]"
+                if origin is not None:
+                    start = int(origin)
+                    data = data[start:start + int(length)] if length else data[start:]
+                    label += f'<{start}>'
+                literals.append(label.encode() + b' ' + self._literal(data))
+                if '.PEEK' not in name and not session['readonly']:
+                    self._mark_seen(session, message)
+        
+        return b'* %d FETCH (' % seq + b' '.join(simple + literals) + b')\r\n'
+    
+    def _mark_seen(self, session: Dict, message: StoredMessage):
+        """Ставит \\Seen при чтении тела (изменение флагов повышает MODSEQ)"""
+        with self._lock:
+            if '\\Seen' not in message.flags:
+                message.flags.add('\\Seen')
+                message.modseq = self._next_modseq(self._folder(session))
+    
+    @staticmethod
+    def _literal(data: bytes) -> bytes:
+        """Литерал {n}\\r\\n..."""
+        return b'{%d}\r\n' % len(data) + data
+    
+    HANDLERS = {
+        'CAPABILITY': cmd_capability,
+        'NOOP': cmd_noop,
+        'LOGIN': cmd_login,
+        'LOGOUT': cmd_logout,
+        'CLOSE': cmd_close,
+        'ENABLE': cmd_enable,
+        'SELECT': cmd_select,
+        'EXAMINE': cmd_examine,
+        'STATUS': cmd_status,
+        'UID SEARCH': cmd_uid_search,
+        'UID FETCH': cmd_uid_fetch,
+    }
@@ -0,0 +1,336 @@
+"""
+SolarMail - Synthetic Mail Generator
+Генератор реалистичных синтетических писем (RU/EN) для тестов и бенчмарков синхронизации
+
+Письма детерминированы: generate(index) при одинаковом seed всегда дает
+одни и те же байты, поэтому почтовый ящик можно воспроизвести в другом процессе.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from email.header import Header
+from email.mime.application import MIMEApplication
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr, format_datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Распределение размеров текста письма: (вес, мин. байт, макс. байт)
+DEFAULT_SIZE_DISTRIBUTION = [
+    (0.60, 300, 3_000),
+    (0.30, 3_000, 20_000),
+    (0.10, 20_000, 120_000),
+]
+
+# Типы вложений: (вес, content-type, расширение, мин. байт, макс. байт)
+DEFAULT_ATTACHMENT_MIX = [
+    (0.45, 'application/pdf', 'pdf', 20_000, 400_000),
+    (0.25, 'image/jpeg', 'jpg', 50_000, 1_500_000),
+    (0.15, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx', 10_000, 200_000),
+    (0.15, 'application/zip', 'zip', 100_000, 2_000_000),
+]
+
+# Доли категорий писем
+DEFAULT_CATEGORY_WEIGHTS = {
+    'meeting': 0.20,
+    'invoice': 0.15,
+    'task': 0.15,
+    'newsletter': 0.20,
+    'alert': 0.10,
+    'personal': 0.10,
+    'promo': 0.10,
+}
+
+# Отправители по категориям: (имя RU, имя EN, адрес)
+SENDERS = {
+    'meeting': [('Анна Смирнова', 'Anna Smith', 'anna@company.example'),
+                ('Дмитрий Козлов', 'David Cole', 'd.cole@company.example')],
+    'invoice': [('Бухгалтерия', 'Billing', 'billing@vendor.example'),
+                ('ООО Ромашка', 'Acme Corp', 'invoices@acme.example')],
+    'task': [('Jira', 'Jira', 'jira@tracker.example'),
+             ('Игорь Петров', 'Ian Peters', 'ian@company.example')],
+    'newsletter': [('Хабр Дайджест', 'Tech Weekly', 'digest@news.example'),
+                   ('Новости продукта', 'Product Updates', 'updates@saas.example')],
+    'alert': [('Мониторинг', 'Monitoring', 'alerts@monitoring.example'),
+              ('Служба безопасности', 'Security Team', 'security@company.example')],
+    'personal': [('Мама', 'Mom', 'mom@family.example'),
+                 ('Саша Волкова', 'Sasha Wolf', 'sasha@friends.example')],
+    'promo': [('Интернет-магазин', 'Online Store', 'deals@shop.example'),
+              ('Турагентство', 'Travel Deals', 'promo@travel.example')],
+}
+
+# Темы по категориям и языкам ({n} - номер, {day} - день недели)
+SUBJECTS = {
+    'meeting': {
+        'ru': ['Встреча по проекту {n} в {day}', 'Перенос встречи: ревью спринта {n}',
+               'Приглашение: презентация отчета за квартал', 'Созвон по задаче {n}'],
+        'en': ['Project {n} meeting on {day}', 'Sprint {n} review meeting moved',
+               'Invitation: quarterly report presentation', 'Call about task {n}'],
+    },
+    'invoice': {
+        'ru': ['Счет №{n} на оплату', 'Договор и акт №{n} во вложении',
+               'Скан подписанного документа {n}', 'Счет-фактура за октябрь №{n}'],
+        'en': ['Invoice #{n} is ready', 'Contract and agreement #{n} attached',
+               'Scanned document {n}', 'Your invoice for October #{n}'],
+    },
+    'task': {
+        'ru': ['[PROJ-{n}] Назначено на вас: исправить баг', 'Задача {n}: нужно завершить до пятницы',
+               'Тикет {n} обновлен', 'Срочно: дедлайн по задаче {n}'],
+        'en': ['[PROJ-{n}] Assigned to you: fix bug', 'Action item {n}: please complete by Friday',
+               'Issue {n} updated', 'Urgent: deadline for task {n}'],
+    },
+    'newsletter': {
+        'ru': ['Новости недели №{n}', 'Обновление продукта: версия 2.{n}',
+               'Дайджест: лучшие статьи за неделю', 'Объявление: релиз {n}'],
+        'en': ['Weekly newsletter #{n}', 'Product update: version 2.{n}',
+               'Digest: top stories this week', 'Announcement: release {n} changelog'],
+    },
+    'alert': {
+        'ru': ['[CRITICAL] Ошибка на сервере web-{n}', 'Вход в аккаунт с нового устройства',
+               'Проблема с резервным копированием {n}', 'Предупреждение: диск заполнен на 90%'],
+        'en': ['[CRITICAL] Error on server web-{n}', 'New sign-in to your account',
+               'Backup job {n} failed', 'Warning: disk usage at 90%'],
+    },
+    'personal': {
+        'ru': ['Привет! Как дела?', 'С днем рождения!', 'Фотографии с выходных',
+               'Спасибо за помощь'],
+        'en': ['Hello! How are you?', 'Happy birthday!', 'Photos from the weekend',
+               'Thanks for your help'],
+    },
+    'promo': {
+        'ru': ['Скидка {n}% только сегодня', 'Специальное предложение для вас',
+               'Выиграйте приз: нажмите здесь', 'Бесплатная доставка до {day}'],
+        'en': ['{n}% discount today only', 'Special offer just for you',
+               'Win a prize: click here', 'Free shipping until {day}'],
+    },
+}
+
+# Предложения тела по категориям и языкам
+SENTENCES = {
+    'meeting': {
+        'ru': ['Предлагаю обсудить статус проекта на встрече.', 'Подготовьте, пожалуйста, отчет по задачам спринта.',
+               'Презентация будет в переговорной на третьем этаже.', 'Если время неудобно, напишите, перенесем.',
+               'На конференции покажем результаты ревью кода.'],
+        'en': ['Let us discuss the project status at the meeting.', 'Please prepare the sprint task report.',
+               'The presentation will be in the third floor meeting room.', 'If the time does not work, let me know.',
+               'We will show the code review results at the conference.'],
+    },
+    'invoice': {
+        'ru': ['Во вложении счет на оплату услуг за текущий месяц.', 'Просим оплатить счет в течение пяти дней.',
+               'Договор подписан, скан документа приложен.', 'Оригиналы документов отправлены почтой.',
+               'По вопросам оплаты обращайтесь в бухгалтерию.'],
+        'en': ['Please find attached the invoice for this month.', 'Payment is due within five days.',
+               'The contract is signed, a scan of the document is attached.', 'Original documents were sent by mail.',
+               'Contact billing if you have questions about the payment.'],
+    },
+    'task': {
+        'ru': ['Задача назначена на вас, приоритет высокий.', 'Нужно исправить баг до следующего релиза.',
+               'Необходимо завершить ревью и сделать merge.', 'Тикет переведен в статус "В работе".',
+               'Прошу срочно посмотреть, это блокирует деплой.'],
+        'en': ['The task has been assigned to you with high priority.', 'The bug needs a fix before the next release.',
+               'Please complete the review and merge the code.', 'The issue was moved to In Progress.',
+               'Action required: this blocks the deploy.'],
+    },
+    'newsletter': {
+        'ru': ['В этом выпуске - главные новости за неделю.', 'Вышла новая версия с обновлением интерфейса.',
+               'Полный список изменений смотрите в changelog.', 'Спасибо, что читаете нашу рассылку.',
+               'Чтобы отписаться от рассылки, перейдите по ссылке.'],
+        'en': ['In this issue: the top stories of the week.', 'A new version with an updated interface is out.',
+               'See the changelog for the full list of changes.', 'Thank you for reading our newsletter.',
+               'To unsubscribe from this newsletter, follow the link.'],
+    },
+    'alert': {
+        'ru': ['Обнаружена критическая ошибка в работе сервиса.', 'Требуется немедленно проверить состояние сервера.',
+               'Резервное копирование завершилось с ошибкой.', 'Если это были не вы, смените пароль.',
+               'Проблема повторилась три раза за последний час.'],
+        'en': ['A critical error was detected in the service.', 'Please check the server status immediately.',
+               'The backup job failed with an error.', 'If this was not you, change your password.',
+               'The problem happened three times in the last hour.'],
+    },
+    'personal': {
+        'ru': ['Привет! Давно не виделись, как у тебя дела?', 'Поздравляем с днем рождения, всего самого лучшего!',
+               'Отправляю фотографии с выходных, было отлично.', 'Спасибо большое, очень ценю твою помощь.',
+               'Приезжай в гости на следующих выходных.'],
+        'en': ['Hi! Long time no see, how are you?', 'Happy birthday, congratulations and all the best!',
+               'Sending the photos from the weekend, it was great.', 'Thank you so much, I really appreciate your help.',
+               'Come visit us next weekend.'],
+    },
+    'promo': {
+        'ru': ['Только сегодня скидка на все товары.', 'Специальное предложение действует до конца недели.',
+               'Нажмите здесь, чтобы выиграть приз.', 'Бесплатная доставка при заказе от 1000 рублей.',
+               'Чтобы отписаться, нажмите на ссылку внизу письма.'],
+        'en': ['Today only: discount on all products.', 'This special offer is valid until the end of the week.',
+               'Click here to win a prize.', 'Free shipping on orders over $20.',
+               'To unsubscribe, click the link at the bottom of this email.'],
+    },
+}
+
+# Доля вложений по категориям (умножается на attachment_ratio)
+ATTACHMENT_AFFINITY = {
+    'meeting': 1.0, 'invoice': 4.0, 'task': 0.5, 'newsletter': 0.1,
+    'alert': 0.2, 'personal': 1.5, 'promo': 0.1,
+}
+
+DAYS = {
+    'ru': ['понедельник', 'вторник', 'среду', 'четверг', 'пятницу'],
+    'en': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'],
+}
+
+
+def _weighted(rng: random.Random, items: Sequence[Tuple]) -> Tuple:
+    """Выбирает элемент списка по весу в первой позиции"""
+    return rng.choices(items, weights=[item[0] for item in items])[0]
+
+
+class MailGenerator:
+    """
+    Генератор синтетического почтового ящика
+    
+    Пример:
+        generator = MailGenerator(seed=42, attachment_ratio=0.2)
+        for message in generator.iter_messages(1000):
+            server.add_message('INBOX', message['raw'], message['flags'], message['internaldate'])
+    """
+    
+    def __init__(
+        self,
+        seed: int = 0,
+        ru_ratio: float = 0.5,
+        html_ratio: float = 0.6,
+        attachment_ratio: float = 0.15,
+        seen_ratio: float = 0.5,
+        days: int = 2,
+        size_distribution: Optional[List[Tuple[float, int, int]]] = None,
+        attachment_mix: Optional[List[Tuple[float, str, str, int, int]]] = None,
+        category_weights: Optional[Dict[str, float]] = None,
+        now: Optional[datetime] = None
+    ):
+        """
+        Инициализация MailGenerator
+        
+        Args:
+            seed: Зерно генератора (одинаковые seed и now - одинаковые письма)
+            ru_ratio: Доля писем на русском (остальные на английском)
+            html_ratio: Доля писем с HTML-версией (multipart/alternative)
+            attachment_ratio: Средняя доля писем с вложениями
+            seen_ratio: Доля прочитанных писем (флаг \\Seen)
+            days: Письма распределяются по последним N дням
+            size_distribution: Распределение размеров текста (вес, мин., макс. байт)
+            attachment_mix: Типы и размеры вложений (вес, content-type, расширение, мин., макс. байт)
+            category_weights: Доли категорий писем
+            now: Отсчет дат писем (по умолчанию текущее время)
+        """
+        self.seed = seed
+        self.ru_ratio = ru_ratio
+        self.html_ratio = html_ratio
+        self.attachment_ratio = attachment_ratio
+        self.seen_ratio = seen_ratio
+        self.days = days
+        self.size_distribution = size_distribution or DEFAULT_SIZE_DISTRIBUTION
+        self.attachment_mix = attachment_mix or DEFAULT_ATTACHMENT_MIX
+        self.category_weights = category_weights or DEFAULT_CATEGORY_WEIGHTS
+        self.now = (now or datetime.now(timezone.utc)).replace(microsecond=0)
+    
+    def generate(self, index: int) -> Dict[str, Any]:
+        """
+        Генерирует письмо с номером index
+        
+        Args:
+            index: Номер письма (определяет содержимое вместе с seed)
+        
+        Returns:
+            Словарь: raw, flags, internaldate, category, language, attachments
+        """
+        rng = random.Random(self.seed * 1_000_003 + index)
+        
+        categories = list(self.category_weights)
+        category = rng.choices(categories, weights=[self.category_weights[c] for c in categories])[0]
+        language = 'ru' if rng.random() < self.ru_ratio else 'en'
+        
+        # Даты растут с номером письма (по кругу в пределах days), как в папке IMAP
+        spread = self.days * 86_400
+        internaldate = self.now - timedelta(seconds=spread - (index * 37 + rng.randrange(30)) % spread)
+        
+        name_ru, name_en, address = rng.choice(SENDERS[category])
+        subject = rng.choice(SUBJECTS[category][language]).format(
+            n=rng.randrange(1, 1000), day=rng.choice(DAYS[language])
+        )
+        text = self._body_text(rng, category, language)
+        
+        alternative = None
+        if rng.random() < self.html_ratio:
+            alternative = MIMEMultipart('alternative', boundary=f'=_alt_{self.seed}_{index}')
+            alternative.attach(MIMEText(text, 'plain', 'utf-8'))
+            paragraphs = ''.join(f'<p>{line}</p>' for line in text.split('\n') if line)
+            alternative.attach(MIMEText(f'<html><body>{paragraphs}</body></html>', 'html', 'utf-8'))
+        body = alternative or MIMEText(text, 'plain', 'utf-8')
+        
+        attachments = []
+        if rng.random() < min(1.0, self.attachment_ratio * ATTACHMENT_AFFINITY.get(category, 1.0)):
+            for _ in range(rng.choice([1, 1, 1, 2, 3])):
+                attachments.append(self._attachment(rng, len(attachments) + 1))
+        
+        if attachments:
+            msg = MIMEMultipart('mixed', boundary=f'=_mixed_{self.seed}_{index}')
+            msg.attach(body)
+            for part in attachments:
+                msg.attach(part)
+        else:
+            msg = body
+        
+        msg['From'] = formataddr((str(Header(name_ru if language == 'ru' else name_en, 'utf-8')), address))
+        msg['To'] = 'me@example.com'
+        msg['Subject'] = Header(subject, 'utf-8').encode()
+        msg['Date'] = format_datetime(internaldate)
+        msg['Message-ID'] = f'<synthetic-{self.seed}-{index}@solarmail.example>'
+        
+        flags = ['\\Seen'] if rng.random() < self.seen_ratio else []
+        return {
+            'raw': msg.as_bytes(),
+            'flags': flags,
+            'internaldate': internaldate,
+            'category': category,
+            'language': language,
+            'attachments': len(attachments),
+        }
+    
+    def iter_messages(self, count: int, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Генерирует письма с номерами start..start+count-1
+        
+        Yields:
+            Словари писем (см. generate)
+        """
+        for index in range(start, start + count):
+            yield self.generate(index)
+    
+    def _body_text(self, rng: random.Random, category: str, language: str) -> str:
+        """Текст письма размером из size_distribution"""
+        _, low, high = _weighted(rng, self.size_distribution)
+        target = rng.randint(low, high)
+        
+        greeting = 'Добрый день!' if language == 'ru' else 'Hello,'
+        signature = 'С уважением,\nSolarMail' if language == 'ru' else 'Best regards,\nSolarMail'
+        lines = [greeting, '']
+        size = 0
+        sentences = SENTENCES[category][language]
+        while size < target:
+            paragraph = ' '.join(rng.choice(sentences) for _ in range(rng.randint(2, 5)))
+            lines.append(paragraph)
+            size += len(paragraph.encode('utf-8')) + 1
+        lines.extend(['', signature])
+        return '\n'.join(lines)
+    
+    def _attachment(self, rng: random.Random, number: int):
+        """Вложение из attachment_mix (случайные байты не сжимаются, как реальные файлы)"""
+        _, content_type, extension, low, high = _weighted(rng, self.attachment_mix)
+        data = rng.randbytes(rng.randint(low, high))
+        maintype, subtype = content_type.split('/', 1)
+        if maintype == 'image':
+            part = MIMEImage(data, _subtype=subtype)
+        else:
+            part = MIMEApplication(data, _subtype=subtype)
+        part.add_header('Content-Disposition', 'attachment', filename=f'attachment_{number}.{extension}')
+        return part
@@ -0,0 +1,167 @@
+"""
+SolarMail - Folder Pool
+Параллельная синхронизация нескольких папок через ограниченный пул IMAP-соединений
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+from imap_tools import MailBox
+
+
+class MailBoxPool:
+    """
+    Ограниченный пул авторизованных соединений MailBox
+    
+    Соединения создаются лениво (не больше size) и переиспользуются между
+    папками. Соединение, на котором произошла ошибка, закрывается и в пул
+    не возвращается.
+    """
+    
+    def __init__(self, connect: Callable[[], MailBox], size: int = 4):
+        """
+        Инициализация MailBoxPool
+        
+        Args:
+            connect: Функция, возвращающая авторизованный MailBox
+            size: Максимальное количество одновременных соединений
+        """
+        self.connect = connect
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._opened: List[MailBox] = []
+    
+    @contextmanager
+    def acquire(self) -> Iterator[MailBox]:
+        """
+        Выдает соединение из пула (ждет, если заняты все size соединений)
+        
+        Yields:
+            Авторизованный MailBox
+        """
+        self._slots.acquire()
+        mailbox = None
+        try:
+            try:
+                mailbox = self._idle.get_nowait()
+            except queue.Empty:
+                mailbox = self.connect()
+                with self._lock:
+                    self._opened.append(mailbox)
+            
+            yield mailbox
+            
+            self._idle.put(mailbox)
+        except Exception:
+            if mailbox is not None:
+                self._discard(mailbox)
+            raise
+        finally:
+            self._slots.release()
+    
+    def _discard(self, mailbox: MailBox):
+        """Закрывает сломанное соединение"""
+        with self._lock:
+            if mailbox in self._opened:
+                self._opened.remove(mailbox)
+        try:
+            mailbox.logout()
+        except Exception:
+            pass
+    
+    def close(self):
+        """Закрывает все соединения пула"""
+        with self._lock:
+            mailboxes, self._opened = self._opened, []
+        
+        for mailbox in mailboxes:
+            try:
+                mailbox.logout()
+            except Exception:
+                pass
+
+
+class MultiFolderSync:
+    """
+    UID-синхронизация нескольких папок параллельно
+    
+    Папки распределяются по pool_size соединениям: каждая папка загружается
+    через fetch_emails_incremental со своим checkpoint. Результаты передаются
+    через очередь единственному потоку-писателю, который вызывает
+    store_incremental - SQLite пишет только один поток.
+    """
+    
+    def __init__(self, sync, pool_size: int = 4):
+        """
+        Инициализация MultiFolderSync
+        
+        Args:
+            sync: Экземпляр SolarSync (подключение, загрузка и запись в кэш)
+            pool_size: Количество IMAP-соединений
+        """
+        self.sync = sync
+        self.pool_size = max(1, pool_size)
+    
+    def run(self, folders: List[str]) -> Dict[str, Dict]:
+        """
+        Синхронизирует папки и ждет записи всех результатов
+        
+        Args:
+            folders: Список папок IMAP
+        
+        Returns:
+            Словарь {папка: статистика} - для ошибок {'error': текст}
+        """
+        results = {}
+        writes = queue.Queue()
+        
+        writer = threading.Thread(target=self._writer, args=(writes, results), daemon=True)
+        writer.start()
+        
+        pool = MailBoxPool(lambda: self.sync.connect(initial_folder=None), self.pool_size)
+        try:
+            with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+                futures = {
+                    executor.submit(self._fetch_folder, pool, folder, writes): folder
+                    for folder in folders
+                }
+                for future in as_completed(futures):
+                    folder = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # Ошибка одной папки не останавливает остальные
+                        print(f"❌ Папка {folder}: {e}")
+                        results[folder] = {'error': str(e)}
+        finally:
+            writes.put(None)
+            writer.join()
+            pool.close()
+        
+        return results
+    
+    def _fetch_folder(self, pool: MailBoxPool, folder: str, writes: queue.Queue):
+        """Загружает новые письма папки и передает их писателю"""
+        with pool.acquire() as mailbox:
+            emails, checkpoint = self.sync.fetch_emails_incremental(mailbox, folder)
+        writes.put((folder, emails, checkpoint))
+    
+    def _writer(self, writes: queue.Queue, results: Dict[str, Dict]):
+        """Единственный поток записи в кэш"""
+        while True:
+            item = writes.get()
+            if item is None:
+                break
+            
+            folder, emails, checkpoint = item
+            try:
+                stats = self.sync.store_incremental(emails, folder, checkpoint)
+                results[folder] = dict(stats, last_uid=checkpoint['last_uid'])
+            except Exception as e:
+                print(f"❌ Ошибка записи папки {folder}: {e}")
+                results[folder] = {'error': str(e)}
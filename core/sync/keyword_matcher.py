@@ -0,0 +1,172 @@
+"""
+SolarMail - Keyword Matcher
+Поиск ключевых слов всех словарей анализатора за один проход по тексту
+
+Вместо `kw in text` по каждому слову каждого списка (десятки проходов по
+письму) все словари компилируются в одно регулярное выражение в форме
+префиксного дерева. Ключевое слово из одних \\w-символов не может выйти за
+пределы слова текста, поэтому автомат прогоняется только по словам (\\w+),
+которых еще не видел, и результат запоминается: словарь писем повторяется, и
+на письмо остается поиск слов в dict. Поток слов обычно уже есть в
+AnalysisContext письма.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from analysis_context import WORD_RE
+
+
+# Сколько слов текста помнить (при переполнении кэш очищается)
+CHUNK_CACHE_SIZE = 200_000
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """
+    Регулярное выражение префиксного дерева слов
+    
+    На каждой позиции совпадает самое длинное слово, начинающееся с нее:
+    ветки дерева различаются первым символом, а окончания слов - жадные
+    необязательные группы.
+    
+    Returns:
+        Текст регулярного выражения (пустая строка для пустого списка)
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # Слово заканчивается здесь, но может и продолжиться
+        return f"(?:{body})?" if '' in node else body
+    
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Словари ключевых слов, скомпилированные в один автомат
+    
+    Семантика совпадает с `kw in text` для каждого слова: поиск подстрокой,
+    вложенные и перекрывающиеся слова (review / please review) находятся все,
+    слово засчитывается один раз, сколько бы раз оно ни встретилось. Слово
+    из нескольких словарей или классов (urgent - и приоритет, и тональность)
+    учитывается в каждом из них.
+    """
+    
+    def __init__(self, dictionaries: Dict[str, Dict[str, Iterable[str]]]):
+        """
+        Инициализация KeywordMatcher
+        
+        Args:
+            dictionaries: Словарь → класс → ключевые слова (в нижнем регистре),
+                          например {'priority': {'high': [...], 'medium': [...]}}
+        """
+        # Слово → (словарь, класс) для каждого вхождения в списки
+        self.owners: Dict[str, List[Tuple[str, str]]] = {}
+        self._empty = {name: {label: 0 for label in classes} for name, classes in dictionaries.items()}
+        for name, classes in dictionaries.items():
+            for label, keywords in classes.items():
+                for keyword in keywords:
+                    if keyword:
+                        self.owners.setdefault(keyword, []).append((name, label))
+        
+        # Фразы (пробелы, дефисы) ищутся в тексте целиком, слова - автоматом в словах текста
+        self.phrases = [keyword for keyword in self.owners if not WORD_RE.fullmatch(keyword)]
+        keywords = [keyword for keyword in self.owners if WORD_RE.fullmatch(keyword)]
+        pattern = trie_pattern(keywords)
+        self._pattern: Optional[re.Pattern] = re.compile(pattern) if pattern else None
+        
+        # Слова, содержащиеся в найденном (сам поиск находит только самое длинное на позиции)
+        self._contained = {keyword: tuple(other for other in keywords if other in keyword) for keyword in keywords}
+        
+        # Слова, конец которых может быть началом другого слова (text "...urgentask"):
+        # после них поиск продолжается со следующего символа, а не с конца совпадения
+        self._overlapping = {
+            keyword for keyword in keywords
+            if any(
+                other.startswith(keyword[i:]) and len(other) > len(keyword) - i
+                for i in range(1, len(keyword))
+                for other in keywords
+            )
+        }
+        
+        # Слово текста → найденные в нем ключевые слова
+        self._chunk_cache: Dict[str, Tuple[str, ...]] = {}
+    
+    def find(self, text: str, words: Optional[List[str]] = None) -> Set[str]:
+        """
+        Ключевые слова, встречающиеся в тексте
+        
+        Args:
+            text: Текст в нижнем регистре
+            words: WORD_RE.findall(text), если уже есть (AnalysisContext.words)
+        
+        Returns:
+            Множество найденных слов
+        """
+        if words is None:
+            words = WORD_RE.findall(text)
+        
+        found: Set[str] = set()
+        cache = self._chunk_cache
+        for word in words:
+            hits = cache.get(word)
+            if hits is None:
+                hits = self._match_chunk(word)
+            if hits:
+                found.update(hits)
+        
+        for phrase in self.phrases:
+            if phrase in text:
+                found.add(phrase)
+        return found
+    
+    def count(self, text: str, words: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Число найденных ключевых слов по словарям и классам за один проход
+        
+        Args:
+            text: Текст в нижнем регистре
+            words: WORD_RE.findall(text), если уже есть
+        
+        Returns:
+            Словарь → класс → число разных найденных слов (классы без совпадений - 0)
+        """
+        counts = {name: dict(classes) for name, classes in self._empty.items()}
+        for keyword in self.find(text, words):
+            for name, label in self.owners[keyword]:
+                counts[name][label] += 1
+        return counts
+    
+    def __getstate__(self) -> Dict:
+        """Копия для другого процесса (пул analyze_parallel) - без кэша слов"""
+        state = dict(self.__dict__)
+        state['_chunk_cache'] = {}
+        return state
+    
+    def _match_chunk(self, chunk: str) -> Tuple[str, ...]:
+        """Ключевые слова внутри слова текста (проход автомата, результат запоминается)"""
+        found: Set[str] = set()
+        if self._pattern is not None:
+            search = self._pattern.search
+            position = 0
+            while True:
+                match = search(chunk, position)
+                if match is None:
+                    break
+                keyword = match.group()
+                found.update(self._contained[keyword])
+                position = match.start() + 1 if keyword in self._overlapping else match.end()
+        
+        if len(self._chunk_cache) >= CHUNK_CACHE_SIZE:
+            self._chunk_cache.clear()
+        hits = self._chunk_cache[chunk] = tuple(found)
+        return hits
@@ -0,0 +1,217 @@
+"""
+SolarMail - ONNX Runtime Backend
+CPU-инференс моделей transformers через ONNX Runtime (int8 dynamic quantization)
+
+Модель Hugging Face один раз экспортируется в ONNX (нужен torch), квантизуется
+в int8 и кэшируется на диске; дальше для инференса нужны только onnxruntime
+и токенизатор.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+# Try to import ONNX Runtime
+try:
+    import numpy as np
+    import onnxruntime as ort
+    from transformers import AutoConfig, AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+
+# Кэш экспортированных моделей (рядом с кэшем Hugging Face)
+DEFAULT_ONNX_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'solarmail', 'onnx')
+
+# Версия opset для экспорта
+ONNX_OPSET = 17
+
+# Входы модели в ONNX-графе
+ONNX_INPUTS = ['input_ids', 'attention_mask']
+
+# Виды моделей: classifier (выход logits) и encoder (выход embeddings)
+ONNX_OUTPUTS = {'classifier': 'logits', 'encoder': 'embeddings'}
+
+
+def onnx_model_path(
+    model_name: str,
+    cache_dir: Optional[str] = None,
+    quantize: bool = True,
+    kind: str = 'classifier'
+) -> str:
+    """
+    Путь к ONNX-файлу модели в кэше
+    
+    Args:
+        model_name: Название модели Hugging Face или локальный путь
+        cache_dir: Каталог кэша (по умолчанию DEFAULT_ONNX_DIR)
+        quantize: int8-версия вместо fp32
+        kind: 'classifier' или 'encoder'
+    """
+    slug = re.sub(r'[^\w.-]+', '--', model_name.strip('/'))
+    filename = f"{'model' if kind == 'classifier' else kind}{'.int8' if quantize else ''}.onnx"
+    return os.path.join(cache_dir or DEFAULT_ONNX_DIR, slug, filename)
+
+
+def export_onnx(model_name: str, path: str, kind: str = 'classifier'):
+    """
+    Экспортирует модель в ONNX (fp32)
+    
+    Граф принимает input_ids и attention_mask с динамическими batch и
+    sequence и возвращает один выход: logits классификатора или
+    (kind='encoder') эмбеддинги предложений после mean pooling.
+    """
+    import torch
+    from transformers import AutoModel, AutoModelForSequenceClassification
+    from embedding_classifier import mean_pooling
+    
+    model_class = AutoModel if kind == 'encoder' else AutoModelForSequenceClassification
+    model = model_class.from_pretrained(model_name).eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    
+    class SingleOutput(torch.nn.Module):
+        """Обертка: без KV-кэша (BART) и с одним выходом"""
+        
+        def __init__(self, wrapped):
+            super().__init__()
+            self.wrapped = wrapped
+        
+        def forward(self, input_ids, attention_mask):
+            kwargs = {'use_cache': False} if model.config.is_encoder_decoder else {}
+            outputs = self.wrapped(input_ids=input_ids, attention_mask=attention_mask, **kwargs)
+            if kind == 'encoder':
+                return mean_pooling(outputs.last_hidden_state, attention_mask)
+            return outputs.logits
+    
+    sample = tokenizer(["SolarMail export sample", "ONNX"], padding=True, return_tensors='pt')
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            SingleOutput(model),
+            (sample['input_ids'], sample['attention_mask']),
+            tmp_path,
+            input_names=ONNX_INPUTS,
+            output_names=[ONNX_OUTPUTS[kind]],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                ONNX_OUTPUTS[kind]: {0: 'batch'}
+            },
+            opset_version=ONNX_OPSET,
+            dynamo=False
+        )
+    os.replace(tmp_path, path)
+
+
+def quantize_onnx(source_path: str, path: str):
+    """Dynamic int8-квантизация весов (MatMul/Gemm) ONNX-модели"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    
+    tmp_path = f"{path}.tmp"
+    quantize_dynamic(source_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, path)
+
+
+def ensure_onnx_model(
+    model_name: str,
+    cache_dir: Optional[str] = None,
+    quantize: bool = True,
+    kind: str = 'classifier'
+) -> str:
+    """
+    Возвращает путь к ONNX-модели, при необходимости экспортируя и квантизуя ее
+    
+    Returns:
+        Путь к ONNX-файлу (fp32 или int8) в кэше
+    """
+    path = onnx_model_path(model_name, cache_dir, quantize, kind)
+    if os.path.exists(path):
+        return path
+    
+    fp32_path = onnx_model_path(model_name, cache_dir, quantize=False, kind=kind)
+    if not os.path.exists(fp32_path):
+        print(f"📦 Экспорт в ONNX: {model_name}")
+        export_onnx(model_name, fp32_path, kind)
+    
+    if quantize:
+        print(f"🗜️  int8-квантизация: {model_name}")
+        quantize_onnx(fp32_path, path)
+    
+    return path
+
+
+class OnnxClassifier:
+    """
+    Классификатор последовательностей на ONNX Runtime
+    
+    Заменяет pipeline transformers в AIParserTransformer: отдает tokenizer,
+    config (id2label / label2id) и logits для уже токенизированного батча.
+    """
+    
+    kind = 'classifier'
+    
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: Optional[str] = None,
+        quantize: bool = True,
+        threads: Optional[int] = None
+    ):
+        """
+        Инициализация OnnxClassifier
+        
+        Args:
+            model_name: Название модели Hugging Face или локальный путь
+            cache_dir: Каталог кэша ONNX-моделей
+            quantize: Использовать int8-квантизованную модель
+            threads: Потоков ONNX Runtime на один forward pass (None - по числу ядер)
+        """
+        if not ONNX_AVAILABLE:
+            raise RuntimeError("onnxruntime not installed")
+        
+        self.model_name = model_name
+        self.quantize = quantize
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.config = AutoConfig.from_pretrained(model_name)
+        self.path = ensure_onnx_model(model_name, cache_dir, quantize, self.kind)
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        
+        self.session = ort.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+        self.threads = threads
+    
+    def run(self, batch: Dict[str, List[List[int]]]) -> List[List[float]]:
+        """
+        Forward pass паддингованного батча
+        
+        Args:
+            batch: input_ids и attention_mask (списки одинаковой длины)
+        
+        Returns:
+            Логиты по классам (classifier) или эмбеддинги (encoder) для каждой последовательности
+        """
+        feeds = {name: np.asarray(batch[name], dtype=np.int64) for name in ONNX_INPUTS}
+        return self.session.run([ONNX_OUTPUTS[self.kind]], feeds)[0].tolist()
+    
+    def get_info(self) -> Dict[str, Any]:
+        """Информация о загруженной ONNX-модели"""
+        return {
+            'model_name': self.model_name,
+            'path': self.path,
+            'quantized': self.quantize,
+            'threads': self.threads
+        }
+
+
+class OnnxEncoder(OnnxClassifier):
+    """Sentence-энкодер на ONNX Runtime: run() возвращает нормированные эмбеддинги"""
+    
+    kind = 'encoder'
@@ -0,0 +1,411 @@
+"""
+SolarMail - Partial Fetch
+Загрузка только заголовков (ENVELOPE) и начала текстовой части письма
+вместо полного RFC822 с вложениями
+"""
+
+import base64
+import binascii
+import quopri
+import re
+from datetime import datetime
+from email.header import decode_header, make_header
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from imap_tools import MailBox
+
+
+# Токены ответа FETCH
+LITERAL_RE = re.compile(rb'\{(\d+)\}$')
+
+
+class Literal(bytes):
+    """Литерал IMAP ({n}\\r\\n...) - уже прочитанные байты"""
+
+
+def _flatten_response(data: List[Any]) -> List[bytes]:
+    """
+    Превращает ответ imaplib (bytes и кортежи с литералами) в поток кусков
+    
+    Returns:
+        Список кусков; литералы помечены типом Literal
+    """
+    pieces = []
+    for item in data:
+        if isinstance(item, tuple):
+            pieces.append(item[0])
+            pieces.append(Literal(item[1]))
+        elif item:
+            pieces.append(item)
+    return pieces
+
+
+def _tokenize(pieces: List[bytes]) -> Iterator[Any]:
+    """
+    Разбивает поток ответа на токены: '(', ')', атомы (str), строки (bytes)
+    """
+    for piece in pieces:
+        if isinstance(piece, Literal):
+            yield bytes(piece)
+            continue
+        
+        # Маркер литерала {n} в конце куска - сам литерал идет следующим куском
+        piece = LITERAL_RE.sub(b'', piece)
+        
+        i, length = 0, len(piece)
+        while i < length:
+            char = piece[i:i + 1]
+            if char == b' ':
+                i += 1
+            elif char in (b'(', b')'):
+                yield char.decode()
+                i += 1
+            elif char == b'"':
+                i += 1
+                value = bytearray()
+                while i < length and piece[i:i + 1] != b'"':
+                    if piece[i:i + 1] == b'\\':
+                        i += 1
+                    value += piece[i:i + 1]
+                    i += 1
+                i += 1
+                yield bytes(value)
+            else:
+                start = i
+                # Атом может содержать секцию BODY[...]<...>
+                while i < length and piece[i:i + 1] not in (b' ', b'(', b')', b'"'):
+                    if piece[i:i + 1] == b'[':
+                        end = piece.find(b']', i)
+                        i = end if end != -1 else length - 1
+                    i += 1
+                atom = piece[start:i].decode(errors='replace')
+                yield None if atom.upper() == 'NIL' else atom
+
+
+def _parse_tokens(tokens: Iterator[Any]) -> List[Any]:
+    """Собирает токены во вложенные списки"""
+    stack = [[]]
+    for token in tokens:
+        if token == '(':
+            stack.append([])
+        elif token == ')':
+            if len(stack) > 1:
+                finished = stack.pop()
+                stack[-1].append(finished)
+        else:
+            stack[-1].append(token)
+    return stack[0]
+
+
+def parse_fetch_response(data: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Разбирает ответ UID FETCH в список словарей атрибутов
+    
+    Args:
+        data: Второй элемент результата imaplib uid('FETCH', ...)
+    
+    Returns:
+        Список словарей вида {'UID': '12', 'FLAGS': [...], 'ENVELOPE': [...], ...}
+    """
+    parsed = _parse_tokens(_tokenize(_flatten_response(data)))
+    
+    messages = []
+    for item in parsed:
+        if not isinstance(item, list):
+            continue  # Порядковый номер сообщения
+        attributes = {}
+        for i in range(0, len(item) - 1, 2):
+            key = item[i]
+            if isinstance(key, str):
+                attributes[key.upper()] = item[i + 1]
+        messages.append(attributes)
+    return messages
+
+
+def find_text_part(structure: Any, prefix: str = '') -> Optional[Tuple[str, str, str, str]]:
+    """
+    Находит первую текстовую часть письма по BODYSTRUCTURE
+    
+    text/plain имеет приоритет над text/html.
+    
+    Returns:
+        Tuple (секция, encoding, charset, subtype) или None
+    """
+    candidates = []
+    _collect_text_parts(structure, prefix, candidates)
+    
+    for wanted in ('plain', 'html'):
+        for candidate in candidates:
+            if candidate[3] == wanted:
+                return candidate
+    return None
+
+
+def _collect_text_parts(structure: Any, prefix: str, candidates: List[Tuple[str, str, str, str]]):
+    """Обходит BODYSTRUCTURE в глубину и собирает текстовые части"""
+    if not isinstance(structure, list) or not structure:
+        return
+    
+    if isinstance(structure[0], list):
+        # multipart: (часть1)(часть2)... "subtype" ...
+        index = 1
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            section = f"{prefix}.{index}" if prefix else str(index)
+            _collect_text_parts(child, section, candidates)
+            index += 1
+        return
+    
+    body_type = _as_str(structure[0]).lower()
+    subtype = _as_str(structure[1]).lower()
+    if body_type != 'text':
+        return  # Вложения и message/rfc822 не загружаем
+    
+    params = structure[2] if isinstance(structure[2], list) else []
+    charset = 'utf-8'
+    for i in range(0, len(params) - 1, 2):
+        if _as_str(params[i]).lower() == 'charset':
+            charset = _as_str(params[i + 1]) or charset
+    
+    encoding = _as_str(structure[5]).lower() if len(structure) > 5 else '7bit'
+    candidates.append((prefix or '1', encoding, charset, subtype))
+
+
+def _as_str(value: Any) -> str:
+    """Приводит значение из ответа IMAP к строке"""
+    if value is None:
+        return ''
+    if isinstance(value, bytes):
+        return value.decode(errors='replace')
+    return str(value)
+
+
+def decode_partial(raw: bytes, encoding: str, charset: str) -> str:
+    """
+    Декодирует обрезанную (<0.N>) часть письма
+    
+    Args:
+        raw: Первые N байт секции
+        encoding: Content-Transfer-Encoding части
+        charset: Кодировка текста
+    
+    Returns:
+        Текст части
+    """
+    if encoding == 'base64':
+        compact = re.sub(rb'[^A-Za-z0-9+/=]', b'', raw)
+        compact = compact[:len(compact) // 4 * 4]
+        try:
+            raw = base64.b64decode(compact)
+        except (binascii.Error, ValueError):
+            raw = b''
+    elif encoding == 'quoted-printable':
+        # Отрезаем неполную escape-последовательность на границе N
+        raw = re.sub(rb'=[0-9A-Fa-f]?$', b'', raw)
+        raw = quopri.decodestring(raw)
+    
+    try:
+        text = raw.decode(charset, errors='replace')
+    except LookupError:
+        text = raw.decode('utf-8', errors='replace')
+    
+    # Последний символ мог быть обрезан посередине многобайтной последовательности
+    return text.rstrip('\ufffd')
+
+
+def _decode_header_value(value: Any) -> str:
+    """Декодирует encoded-word заголовки (=?UTF-8?B?...?=)"""
+    text = _as_str(value)
+    try:
+        return str(make_header(decode_header(text)))
+    except Exception:
+        return text
+
+
+def envelope_fields(envelope: List[Any]) -> Dict[str, Any]:
+    """
+    Извлекает дату, тему и отправителя из ENVELOPE
+    
+    Отправитель - только адрес, как MailMessage.from_ в режиме 'full':
+    регистр сохраняется, отображаемое имя не хранится ни в одном режиме.
+    
+    Returns:
+        Словарь с ключами date (datetime или None), subject, sender
+    """
+    date = None
+    if envelope and envelope[0]:
+        try:
+            date = parsedate_to_datetime(_as_str(envelope[0]))
+        except (TypeError, ValueError):
+            date = None
+    
+    subject = _decode_header_value(envelope[1]) if len(envelope) > 1 and envelope[1] else ''
+    
+    sender = ''
+    if len(envelope) > 2 and isinstance(envelope[2], list) and envelope[2]:
+        address = envelope[2][0]
+        if isinstance(address, list) and len(address) >= 4 and address[2]:
+            sender = f"{_as_str(address[2])}@{_as_str(address[3])}"
+    
+    return {'date': date, 'subject': subject, 'sender': sender}
+
+
+# Команда первой фазы: конверт, флаги и структура MIME без тела письма
+HEADER_ITEMS = '(UID FLAGS INTERNALDATE ENVELOPE BODYSTRUCTURE)'
+
+
+def section_items(section: str, preview_bytes: int) -> str:
+    """Команда второй фазы: первые preview_bytes байт секции"""
+    return f'(UID BODY.PEEK[{section}]<0.{preview_bytes}>)'
+
+
+def group_text_sections(
+    items: List[Dict[str, Any]]
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[Tuple[str, Tuple[str, str, str, str]]]]]:
+    """
+    Группирует письма первой фазы по номеру текстовой секции
+    
+    Args:
+        items: Результат parse_fetch_response для HEADER_ITEMS
+    
+    Returns:
+        Tuple ({uid: атрибуты}, {секция: [(uid, часть), ...]})
+    """
+    headers = {}
+    sections = {}
+    for item in items:
+        if 'UID' not in item or 'ENVELOPE' not in item:
+            continue  # Незапрошенные FETCH (например, изменения флагов)
+        uid = item['UID']
+        headers[uid] = item
+        part = find_text_part(item.get('BODYSTRUCTURE'))
+        if part:
+            sections.setdefault(part[0], []).append((uid, part))
+    return headers, sections
+
+
+def decode_section_texts(
+    items: List[Dict[str, Any]],
+    parts: List[Tuple[str, Tuple[str, str, str, str]]]
+) -> Dict[str, str]:
+    """
+    Декодирует ответ второй фазы
+    
+    Args:
+        items: Результат parse_fetch_response для section_items
+        parts: Список (uid, часть) этой секции
+    
+    Returns:
+        Словарь {uid: текст}
+    """
+    encodings = {uid: part for uid, part in parts}
+    texts = {}
+    for item in items:
+        uid = item.get('UID')
+        if uid not in encodings:
+            continue
+        raw = next(
+            (value for key, value in item.items() if key.startswith('BODY[') and isinstance(value, bytes)),
+            b''
+        )
+        _, encoding, charset, _ = encodings[uid]
+        texts[uid] = decode_partial(raw, encoding, charset)
+    return texts
+
+
+def build_partial_message(uid: str, item: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """
+    Собирает письмо из атрибутов первой фазы и текста второй
+    
+    Returns:
+        Словарь с полями uid, sender, subject, date, text, flags
+    """
+    fields = envelope_fields(item['ENVELOPE'])
+    if fields['date'] is None and item.get('INTERNALDATE'):
+        try:
+            fields['date'] = datetime.strptime(
+                _as_str(item['INTERNALDATE']), '%d-%b-%Y %H:%M:%S %z'
+            )
+        except ValueError:
+            pass
+    
+    return {
+        'uid': uid,
+        'sender': fields['sender'],
+        'subject': fields['subject'],
+        'date': fields['date'],
+        'text': text,
+        'flags': [_as_str(flag) for flag in item.get('FLAGS') or []]
+    }
+
+
+class PartialFetcher:
+    """
+    Загрузка писем без вложений: ENVELOPE + BODY.PEEK[часть]<0.N>
+    
+    Вместо полного RFC822 сервер передает только заголовки конверта,
+    BODYSTRUCTURE и первые N байт первой текстовой части.
+    """
+    
+    def __init__(self, preview_bytes: int = 2048, batch_size: int = 200):
+        """
+        Инициализация PartialFetcher
+        
+        Args:
+            preview_bytes: Сколько байт текстовой части загружать (N в <0.N>)
+            batch_size: Количество UID в одной команде FETCH
+        """
+        self.preview_bytes = preview_bytes
+        self.batch_size = batch_size
+    
+    def fetch(self, mailbox: MailBox, uids: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Загружает письма по списку UID в выбранной папке
+        
+        Args:
+            mailbox: MailBox с выбранной папкой
+            uids: Список UID
+        
+        Yields:
+            Словари с полями uid, sender, subject, date, text, flags
+        """
+        for start in range(0, len(uids), self.batch_size):
+            batch = uids[start:start + self.batch_size]
+            yield from self._fetch_batch(mailbox, batch)
+    
+    def _fetch_batch(self, mailbox: MailBox, uids: List[str]) -> Iterator[Dict[str, Any]]:
+        """Загружает одну пачку UID: сначала конверты, потом тексты по секциям"""
+        typ, data = mailbox.client.uid('FETCH', ','.join(uids), HEADER_ITEMS)
+        if typ != 'OK':
+            raise RuntimeError(f'UID FETCH ENVELOPE failed: {data}')
+        
+        headers, sections = group_text_sections(parse_fetch_response(data))
+        
+        texts = {}
+        for section, parts in sections.items():
+            texts.update(self._fetch_section(mailbox, section, parts))
+        
+        for uid in uids:
+            if uid in headers:  # Письмо могло быть удалено между SEARCH и FETCH
+                yield build_partial_message(uid, headers[uid], texts.get(uid, ''))
+    
+    def _fetch_section(
+        self,
+        mailbox: MailBox,
+        section: str,
+        parts: List[Tuple[str, Tuple[str, str, str, str]]]
+    ) -> Dict[str, str]:
+        """
+        Загружает первые N байт одной и той же секции для группы писем
+        
+        Returns:
+            Словарь {uid: текст}
+        """
+        uid_set = ','.join(uid for uid, _ in parts)
+        typ, data = mailbox.client.uid('FETCH', uid_set, section_items(section, self.preview_bytes))
+        if typ != 'OK':
+            raise RuntimeError(f'UID FETCH BODY[{section}] failed: {data}')
+        
+        return decode_section_texts(parse_fetch_response(data), parts)
@@ -0,0 +1,197 @@
+"""
+SolarMail - Sync Pipeline
+Потоковый конвейер fetch → store → analyze с ограниченными очередями
+"""
+
+import queue
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import config
+
+
+# Маркер конца потока в очередях
+_DONE = object()
+
+# Маркер checkpoint в очереди анализа: (_CHECKPOINT, last_uid, processed)
+_CHECKPOINT = object()
+
+
+class SyncPipeline:
+    """
+    Потоковая синхронизация: загрузка, запись и AI-анализ идут одновременно
+    
+    Поток IMAP (вызывающий) кладет письма в ограниченную очередь записи.
+    Писатель сохраняет их пачками и передает новые письма (с id из кэша)
+    в ограниченную очередь анализа. Память не зависит от количества писем:
+    в работе находится не больше queue_size писем на каждую стадию.
+    
+    С on_checkpoint конвейер примерно каждые checkpoint_every писем сообщает
+    UID, до которого (включительно) все письма сохранены и проанализированы.
+    Письма должны идти по возрастанию UID (как их отдает UID SEARCH).
+    """
+    
+    def __init__(
+        self,
+        sync,
+        batch_size: int = config.PIPELINE_BATCH_SIZE,
+        queue_size: int = config.PIPELINE_QUEUE_SIZE,
+        flush_interval: float = 0.5,
+        checkpoint_every: int = config.CHECKPOINT_EVERY,
+        on_checkpoint: Optional[Callable[[int, int], None]] = None
+    ):
+        """
+        Инициализация SyncPipeline
+        
+        Args:
+            sync: Экземпляр SolarSync (db, enable_ai, analyze_and_store)
+            batch_size: Максимальный размер пачки записи/анализа
+            queue_size: Емкость очередей между стадиями
+            flush_interval: Сколько ждать добора пачки, прежде чем записать неполную
+            checkpoint_every: Через сколько писем вызывать on_checkpoint
+            on_checkpoint: Функция (last_uid, processed) для сохранения прогресса
+        """
+        self.sync = sync
+        self.db = sync.db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.checkpoint_every = checkpoint_every
+        self.on_checkpoint = on_checkpoint
+        self._uncommitted = 0
+        
+        self._store_queue = queue.Queue(maxsize=queue_size)
+        self._analyze_queue = queue.Queue(maxsize=queue_size)
+        self._error: Optional[BaseException] = None
+        self._closed = set()
+        self._lock = threading.Lock()
+        self.stats = {'total': 0, 'new': 0, 'skipped': 0, 'analyzed': 0}
+    
+    def run(self, emails: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Прогоняет поток писем через конвейер
+        
+        Args:
+            emails: Итератор словарей писем (например, SolarSync.iter_emails_smart)
+        
+        Returns:
+            Словарь со статистикой (total, new, skipped, analyzed)
+        """
+        writer = threading.Thread(
+            target=self._guard,
+            args=(self._store_stage, self._store_queue, self._analyze_queue),
+            daemon=True
+        )
+        analyzer = threading.Thread(
+            target=self._guard,
+            args=(self._analyze_stage, self._analyze_queue, None),
+            daemon=True
+        )
+        writer.start()
+        analyzer.start()
+        
+        try:
+            for email in emails:
+                if self._error is not None:
+                    break  # Стадия упала - дальше не загружаем
+                self._store_queue.put(email)
+                self.stats['total'] += 1
+        finally:
+            # Стадии дорабатывают то, что уже в очередях
+            self._store_queue.put(_DONE)
+            writer.join()
+            analyzer.join()
+        
+        if self._error is not None:
+            raise self._error
+        return self.stats
+    
+    def _guard(self, stage, source: queue.Queue, downstream: Optional[queue.Queue]):
+        """
+        Запускает стадию, сохраняет ее ошибку и закрывает следующую стадию
+        
+        После ошибки стадия дочитывает свою очередь до конца, чтобы
+        предыдущая стадия не зависла на полной очереди.
+        """
+        try:
+            stage()
+        except BaseException as e:
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+            while source not in self._closed:
+                if source.get() is _DONE:
+                    break
+        finally:
+            if downstream is not None:
+                downstream.put(_DONE)
+    
+    def _take_batch(self, source: queue.Queue) -> Tuple[List[Dict], bool]:
+        """
+        Собирает пачку из очереди
+        
+        Ждет первый элемент, затем добирает до batch_size, пока элементы
+        приходят не реже flush_interval - первые письма записываются сразу.
+        
+        Returns:
+            Tuple (пачка, поток закончился)
+        """
+        item = source.get()
+        if item is _DONE:
+            self._closed.add(source)
+            return [], True
+        
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = source.get(timeout=self.flush_interval)
+            except queue.Empty:
+                break
+            if item is _DONE:
+                self._closed.add(source)
+                return batch, True
+            batch.append(item)
+        return batch, False
+    
+    def _store_stage(self):
+        """Стадия записи: пачки писем → кэш, новые письма → анализ"""
+        done = False
+        while not done:
+            batch, done = self._take_batch(self._store_queue)
+            if not batch:
+                continue
+            
+            # Пачка пишется одной транзакцией, новые письма сразу приходят с id
+            batch_stats, new_emails = self.sync.store_emails(batch)
+            self.stats['new'] += batch_stats['new']
+            self.stats['skipped'] += batch_stats['skipped']
+            
+            if self.sync.enable_ai:
+                for email in new_emails:
+                    self._analyze_queue.put(email)
+            
+            self._uncommitted += len(batch)
+            if self.on_checkpoint and self._uncommitted >= self.checkpoint_every:
+                self._uncommitted = 0
+                last_uid = max(int(email.get('imap_uid') or email['uid']) for email in batch)
+                marker = (_CHECKPOINT, last_uid, self.stats['new'] + self.stats['skipped'])
+                if self.sync.enable_ai:
+                    # Checkpoint сдвинется, когда анализ дойдет до маркера
+                    self._analyze_queue.put(marker)
+                else:
+                    self.on_checkpoint(marker[1], marker[2])
+    
+    def _analyze_stage(self):
+        """Стадия AI-анализа новых писем"""
+        done = False
+        while not done:
+            batch, done = self._take_batch(self._analyze_queue)
+            pending = []
+            for email in batch:
+                if isinstance(email, tuple) and email[0] is _CHECKPOINT:
+                    # Письма до маркера должны быть сохранены раньше checkpoint
+                    self.stats['analyzed'] += self.sync.analyze_and_store(pending)
+                    pending = []
+                    self.on_checkpoint(email[1], email[2])
+                    continue
+                pending.append(email)
+            self.stats['analyzed'] += self.sync.analyze_and_store(pending)
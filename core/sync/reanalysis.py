@@ -0,0 +1,305 @@
+"""
+SolarMail - Reanalysis Job
+Фоновый (пере)анализ писем кэша после обновления модели или словарей
+
+Метаданные email_meta хранят модель и версию анализатора (ai_version).
+ReanalysisJob находит письма без метаданных текущей версии одним anti-join
+запросом (DatabaseManager.get_stale_emails), анализирует их пачками и
+заменяет метаданные пачки одной транзакцией. Прежние метаданные остаются
+доступными, пока не заменены, поэтому обновление модели не требует
+блокирующего полного прохода: задание идет в фоне с ограничением скорости,
+печатает прогресс и после перезапуска продолжает с checkpoint.
+
+Запуск:
+    python reanalysis.py --db solar_cache.db --workers 4 --max-rate 2000
+"""
+
+import argparse
+import threading
+import time
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from db_manager import DatabaseManager
+import config
+
+
+# Имя задания по умолчанию (checkpoint в таблице reanalysis_jobs)
+DEFAULT_JOB_NAME = 'default'
+
+
+def analyzer_version(analyzer) -> Optional[str]:
+    """
+    Модель и версия анализатора для email_meta.ai_version
+    
+    Args:
+        analyzer: AIParser или AIParserTransformer (get_cache_identity())
+    
+    Returns:
+        Строка "model:version" или None, если анализатор без моделей
+    """
+    identity = analyzer.get_cache_identity()
+    if identity is None:
+        return None
+    
+    model, version = identity
+    return f"{model}:{version}"
+
+
+class ReanalysisJob:
+    """
+    Возобновляемый переанализ писем с отсутствующими или устаревшими метаданными
+    
+    Письма берутся страницами по возрастанию id, после каждой пачки
+    сохраняется checkpoint (id последнего письма), поэтому прерванное
+    задание продолжается с места остановки, а смена версии анализатора
+    начинает его заново. Эвристика (AIParser) может работать в нескольких
+    процессах (analyze_parallel), остальные анализаторы - через
+    AnalysisCache, если он передан.
+    """
+    
+    def __init__(
+        self,
+        db: DatabaseManager,
+        analyzer,
+        name: str = DEFAULT_JOB_NAME,
+        batch_size: int = config.REANALYSIS_BATCH_SIZE,
+        workers: int = config.REANALYSIS_WORKERS,
+        max_rate: float = config.REANALYSIS_MAX_RATE,
+        progress_interval: float = config.REANALYSIS_PROGRESS_INTERVAL,
+        cache=None
+    ):
+        """
+        Инициализация ReanalysisJob
+        
+        Args:
+            db: DatabaseManager кэша писем
+            analyzer: Анализатор (analyze_emails и get_cache_identity)
+            name: Имя задания (ключ checkpoint)
+            batch_size: Писем в пачке (одна транзакция записи)
+            workers: Процессов для AIParser.analyze_parallel (1 - в текущем процессе)
+            max_rate: Максимум писем в секунду (0 - без ограничения)
+            progress_interval: Как часто печатать прогресс, секунды
+            cache: AnalysisCache для анализа в текущем процессе (необязательно)
+        """
+        self.db = db
+        self.analyzer = analyzer
+        self.name = name
+        self.batch_size = max(1, batch_size)
+        self.workers = workers
+        self.max_rate = max_rate
+        self.progress_interval = progress_interval
+        self.cache = cache
+        
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        self.progress = {
+            'name': name,
+            'ai_version': None,
+            'running': False,
+            'finished': False,
+            'processed': 0,
+            'total': 0,
+            'resumed_from': 0,
+            'rate': 0.0,
+            'eta_seconds': None
+        }
+    
+    def run(self, max_emails: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Переанализирует письма до конца (или до stop() / max_emails)
+        
+        Args:
+            max_emails: Обработать не больше этого числа писем за запуск
+        
+        Returns:
+            Словарь прогресса (get_progress())
+        """
+        version = analyzer_version(self.analyzer)
+        if version is None:
+            print("⚠️  Переанализ: анализатор без моделей, задание не запущено")
+            return self.get_progress()
+        
+        # Продолжаем незавершенное задание той же версии, иначе - сначала
+        checkpoint = self.db.get_reanalysis_checkpoint(self.name)
+        after_id, processed = 0, 0
+        if checkpoint and checkpoint['ai_version'] == version and not checkpoint['finished_at']:
+            after_id, processed = checkpoint['last_email_id'], checkpoint['processed']
+        
+        remaining = self.db.count_stale_emails(version, after_id)
+        self.progress.update({
+            'ai_version': version,
+            'running': True,
+            'finished': False,
+            'processed': processed,
+            'total': processed + remaining,
+            'resumed_from': after_id,
+            'rate': 0.0,
+            'eta_seconds': None
+        })
+        
+        resumed = f", продолжение после id {after_id}" if after_id else ""
+        print(f"🔄 Переанализ {self.name}: {remaining} писем для {version}{resumed}")
+        
+        start = time.time()
+        last_report = start
+        done = 0
+        
+        try:
+            for chunk, results in self._analyzed_chunks(version, after_id, max_emails):
+                self.db.upsert_email_meta_bulk(
+                    (email['id'], dict(meta_data, ai_version=version))
+                    for email, meta_data in zip(chunk, results)
+                )
+                done += len(chunk)
+                after_id = chunk[-1]['id']
+                self.db.save_reanalysis_checkpoint(self.name, version, after_id, processed + done)
+                
+                self._throttle(done, time.time() - start)
+                
+                self._update_progress(processed + done, done, time.time() - start)
+                if time.time() - last_report >= self.progress_interval:
+                    self._print_progress()
+                    last_report = time.time()
+            
+            # Все письма пройдены (а не остановка или лимит запуска)
+            if not self._stop.is_set() and (max_emails is None or done < max_emails):
+                self.db.save_reanalysis_checkpoint(self.name, version, after_id, processed + done, finished=True)
+                self.progress['finished'] = True
+        finally:
+            self.progress['running'] = False
+        
+        self._print_progress()
+        return self.get_progress()
+    
+    def start(self, max_emails: Optional[int] = None) -> threading.Thread:
+        """
+        Запускает run() в фоновом потоке
+        
+        Returns:
+            Поток задания
+        """
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run,
+            kwargs={'max_emails': max_emails},
+            name=f"reanalysis-{self.name}",
+            daemon=True
+        )
+        self._thread.start()
+        return self._thread
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Останавливает задание после текущей пачки (checkpoint сохранен)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+    
+    def get_progress(self) -> Dict[str, Any]:
+        """Прогресс: обработано / всего, скорость (писем/с), оценка оставшегося времени"""
+        return dict(self.progress)
+    
+    def _analyzed_chunks(
+        self,
+        version: str,
+        after_id: int,
+        max_emails: Optional[int]
+    ) -> Iterator[Tuple[List[Dict], List[Dict[str, Any]]]]:
+        """Пары (пачка писем, результаты анализа) в порядке id"""
+        emails = islice(self._iter_stale(version, after_id), max_emails)
+        
+        if self.workers != 1 and hasattr(self.analyzer, 'analyze_parallel'):
+            yield from self.analyzer.analyze_parallel(emails, self.workers, self.batch_size)
+            return
+        
+        for chunk in iter(lambda: list(islice(emails, self.batch_size)), []):
+            texts = [(email['subject'], email['body_preview']) for email in chunk]
+            if self.cache is not None:
+                yield chunk, self.cache.analyze(texts, self.analyzer)
+            else:
+                yield chunk, self.analyzer.analyze_emails(texts)
+    
+    def _iter_stale(self, version: str, after_id: int) -> Iterator[Dict]:
+        """Письма без метаданных версии version страницами по batch_size (до stop())"""
+        while not self._stop.is_set():
+            page = self.db.get_stale_emails(version, after_id, self.batch_size)
+            if not page:
+                return
+            yield from page
+            after_id = page[-1]['id']
+    
+    def _throttle(self, done: int, elapsed: float):
+        """Ждет, если задание обгоняет max_rate (ожидание прерывается stop())"""
+        if self.max_rate <= 0:
+            return
+        
+        delay = done / self.max_rate - elapsed
+        if delay > 0:
+            self._stop.wait(delay)
+    
+    def _update_progress(self, processed: int, done: int, elapsed: float):
+        """Обновляет счетчики, скорость и оценку оставшегося времени"""
+        rate = done / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.progress['total'] - processed)
+        self.progress.update({
+            'processed': processed,
+            'rate': rate,
+            'eta_seconds': remaining / rate if rate else None
+        })
+    
+    def _print_progress(self):
+        """Печатает строку прогресса"""
+        progress = self.progress
+        total = progress['total']
+        percent = progress['processed'] / total * 100 if total else 100.0
+        eta = f", осталось ~{progress['eta_seconds']:.0f} с" if progress['eta_seconds'] else ""
+        status = "✅" if progress['finished'] else "🔄"
+        print(f"{status} Переанализ {self.name}: {progress['processed']}/{total} ({percent:.1f}%), "
+              f"{progress['rate']:.0f} писем/с{eta}")
+
+
+def main():
+    """Точка входа: переанализ кэша выбранным анализатором"""
+    parser = argparse.ArgumentParser(description='Фоновый переанализ писем кэша')
+    parser.add_argument('--db', default='solar_cache.db', help='Файл БД кэша')
+    parser.add_argument('--analyzer', choices=['heuristic', 'transformer'], default='heuristic',
+                        help='Анализатор: эвристика AIParser или AIParserTransformer')
+    parser.add_argument('--name', default=DEFAULT_JOB_NAME, help='Имя задания (checkpoint)')
+    parser.add_argument('--batch-size', type=int, default=config.REANALYSIS_BATCH_SIZE, help='Писем в пачке')
+    parser.add_argument('--workers', type=int, default=config.REANALYSIS_WORKERS,
+                        help='Процессов эвристики (0 - по числу ядер)')
+    parser.add_argument('--max-rate', type=float, default=config.REANALYSIS_MAX_RATE,
+                        help='Максимум писем в секунду (0 - без ограничения)')
+    parser.add_argument('--limit', type=int, default=None, help='Обработать не больше писем за запуск')
+    args = parser.parse_args()
+    
+    db = DatabaseManager(args.db)
+    if args.analyzer == 'transformer':
+        from ai_parser_transformer import AIParserTransformer
+        analyzer = AIParserTransformer()
+    else:
+        from ai_parser import AIParser
+        analyzer = AIParser()
+    
+    job = ReanalysisJob(
+        db,
+        analyzer,
+        name=args.name,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        max_rate=args.max_rate
+    )
+    try:
+        job.run(max_emails=args.limit)
+    except KeyboardInterrupt:
+        print("\n⏹️  Переанализ прерван, следующий запуск продолжит с checkpoint")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
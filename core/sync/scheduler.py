@@ -0,0 +1,303 @@
+"""
+SolarMail - Sync Scheduler
+Планировщик синхронизации множества аккаунтов в одном процессе
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from db_manager import DatabaseManager
+from solar_sync import SolarSync
+import config
+
+
+class HostLimiter:
+    """
+    Лимит одновременных IMAP-соединений на сервер
+    
+    Слоты занимаются без ожидания: планировщик просто пропускает аккаунт,
+    если его сервер уже загружен, и берет следующий по приоритету.
+    """
+    
+    def __init__(self, limits: Dict[str, int], default_limit: int):
+        """
+        Инициализация HostLimiter
+        
+        Args:
+            limits: Словарь {сервер: максимум соединений}
+            default_limit: Лимит для остальных серверов
+        """
+        self.limits = limits
+        self.default_limit = default_limit
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def limit(self, host: str) -> int:
+        """Возвращает лимит соединений сервера"""
+        return self.limits.get(host, self.default_limit)
+    
+    def try_acquire(self, host: str, count: int = 1) -> bool:
+        """
+        Занимает count соединений сервера, если они свободны
+        
+        Returns:
+            True если слоты заняты
+        """
+        with self._lock:
+            in_use = self._in_use.get(host, 0)
+            # Аккаунт, которому нужно больше лимита, получает весь сервер
+            if in_use and in_use + count > self.limit(host):
+                return False
+            self._in_use[host] = in_use + count
+            return True
+    
+    def release(self, host: str, count: int = 1):
+        """Освобождает соединения сервера"""
+        with self._lock:
+            self._in_use[host] = max(0, self._in_use.get(host, 0) - count)
+    
+    def in_use(self, host: str) -> int:
+        """Количество занятых соединений сервера"""
+        with self._lock:
+            return self._in_use.get(host, 0)
+
+
+class SyncScheduler:
+    """
+    Периодическая синхронизация множества аккаунтов
+    
+    Для каждого аккаунта используется свой SolarSync (multi_folder_sync)
+    с общим DatabaseManager. Аккаунты синхронизируются параллельно в
+    пуле потоков с учетом лимита соединений на сервер. Интервалы
+    случайно растянуты на ±jitter, а среди готовых к запуску аккаунтов
+    первыми идут упавшие и дольше всех не синхронизированные.
+    """
+    
+    def __init__(
+        self,
+        accounts: Optional[List[Dict]] = None,
+        interval: int = config.SYNC_INTERVAL,
+        jitter: float = config.SYNC_JITTER,
+        workers: int = config.SCHEDULER_WORKERS,
+        host_limits: Optional[Dict[str, int]] = None,
+        default_host_limit: int = config.DEFAULT_HOST_CONNECTIONS,
+        db: Optional[DatabaseManager] = None,
+        enable_ai: bool = False
+    ):
+        """
+        Инициализация SyncScheduler
+        
+        Args:
+            accounts: Список аккаунтов (по умолчанию config.ACCOUNTS)
+            interval: Интервал синхронизации аккаунта в секундах
+            jitter: Случайный разброс интервала (доля)
+            workers: Сколько аккаунтов синхронизировать одновременно
+            host_limits: Лимиты соединений по серверам (по умолчанию config.HOST_CONNECTION_LIMITS)
+            default_host_limit: Лимит для остальных серверов
+            db: Общий менеджер базы данных
+            enable_ai: Включить AI-анализ новых писем
+        """
+        self.db = db or DatabaseManager()
+        self.interval = interval
+        self.jitter = jitter
+        self.workers = workers
+        self.enable_ai = enable_ai
+        self.limiter = HostLimiter(
+            host_limits if host_limits is not None else config.HOST_CONNECTION_LIMITS,
+            default_host_limit
+        )
+        
+        self.accounts = [
+            {
+                'email': account['email'],
+                'password': account['password'],
+                'imap_host': account.get('imap_host', config.IMAP_HOST),
+                'imap_port': account.get('imap_port'),
+                'use_ssl': account.get('use_ssl'),
+                'folders': account.get('folders') or config.SYNC_FOLDERS,
+                'connections': account.get('connections', 1),
+                'next_run': 0.0,
+                'failures': 0,
+                'running': False,
+                'sync': None
+            }
+            for account in (accounts if accounts is not None else config.ACCOUNTS)
+        ]
+        
+        self._wakeup = threading.Condition()
+    
+    # ==================== Scheduling ====================
+    
+    def _next_delay(self, failures: int) -> float:
+        """
+        Вычисляет задержку до следующей синхронизации
+        
+        После ошибки повтор идет раньше обычного интервала (30 с, 60 с, ...),
+        но не позже него.
+        """
+        if failures:
+            delay = min(self.interval, 30 * 2 ** (failures - 1))
+        else:
+            delay = self.interval
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+    
+    def _due_accounts(self, now: float) -> List[Dict]:
+        """
+        Возвращает готовые к запуску аккаунты в порядке приоритета
+        
+        Приоритет: сначала аккаунты с ошибкой последней синхронизации,
+        затем с самой старой (или отсутствующей) датой синхронизации.
+        """
+        due = [
+            account for account in self.accounts
+            if not account['running'] and account['next_run'] <= now
+        ]
+        if not due:
+            return due
+        
+        statuses = {status['account_email']: status for status in self.db.get_all_sync_statuses()}
+        
+        def priority(account):
+            status = statuses.get(account['email'])
+            if not status:
+                return (0, '')
+            failed = 0 if status['last_sync_success'] == 0 else 1
+            return (failed, status['last_sync_date'] or '')
+        
+        return sorted(due, key=priority)
+    
+    def _dispatch(self, executor: ThreadPoolExecutor) -> int:
+        """
+        Запускает готовые аккаунты, для которых есть свободные соединения
+        
+        Returns:
+            Количество запущенных аккаунтов
+        """
+        started = 0
+        running = sum(1 for account in self.accounts if account['running'])
+        
+        for account in self._due_accounts(time.monotonic()):
+            if running >= self.workers:
+                break
+            if not self.limiter.try_acquire(account['imap_host'], account['connections']):
+                continue  # Сервер загружен - берем следующий аккаунт
+            
+            account['running'] = True
+            running += 1
+            started += 1
+            executor.submit(self._run_account, account)
+        
+        return started
+    
+    # ==================== Account Sync ====================
+    
+    def _get_sync(self, account: Dict) -> SolarSync:
+        """Создает SolarSync аккаунта при первом запуске"""
+        if account['sync'] is None:
+            account['sync'] = SolarSync(
+                enable_ai=self.enable_ai,
+                email=account['email'],
+                password=account['password'],
+                imap_host=account['imap_host'],
+                db=self.db,
+                imap_port=account['imap_port'],
+                use_ssl=account['use_ssl']
+            )
+        return account['sync']
+    
+    def sync_account(self, account: Dict) -> Dict[str, Dict]:
+        """
+        Синхронизирует папки одного аккаунта
+        
+        Returns:
+            Результаты multi_folder_sync
+        
+        Raises:
+            RuntimeError: если хотя бы одна папка не синхронизировалась
+        """
+        sync = self._get_sync(account)
+        results = sync.multi_folder_sync(account['folders'], pool_size=account['connections'])
+        
+        errors = [f"{folder}: {result['error']}" for folder, result in results.items() if 'error' in result]
+        if errors:
+            raise RuntimeError('; '.join(errors))
+        return results
+    
+    def _run_account(self, account: Dict):
+        """Выполняет синхронизацию аккаунта в потоке пула"""
+        try:
+            self.sync_account(account)
+            account['failures'] = 0
+        except Exception as e:
+            account['failures'] += 1
+            print(f"❌ {account['email']}: синхронизация не удалась ({account['failures']} подряд): {e}")
+        finally:
+            self.limiter.release(account['imap_host'], account['connections'])
+            with self._wakeup:
+                account['next_run'] = time.monotonic() + self._next_delay(account['failures'])
+                account['running'] = False
+                self._wakeup.notify_all()
+    
+    # ==================== Run ====================
+    
+    def run_once(self):
+        """
+        Синхронизирует все аккаунты один раз (с учетом лимитов серверов)
+        """
+        for account in self.accounts:
+            account['next_run'] = 0.0
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            with self._wakeup:
+                # После запуска next_run аккаунта уходит на интервал вперед
+                while any(
+                    account['running'] or account['next_run'] <= time.monotonic()
+                    for account in self.accounts
+                ):
+                    self._dispatch(executor)
+                    self._wakeup.wait(timeout=1)
+    
+    def run_forever(self, stop_event: Optional[threading.Event] = None):
+        """
+        Запускает планировщик до остановки (stop_event или Ctrl+C)
+        
+        Args:
+            stop_event: Событие для остановки цикла
+        """
+        stop_event = stop_event or threading.Event()
+        
+        print("🚀 SolarSync - планировщик запущен...")
+        print(f"👥 Аккаунтов: {len(self.accounts)}, потоков: {self.workers}")
+        print(f"🔄 Интервал: {self.interval} с (±{int(self.jitter * 100)}%)")
+        print("-" * 50)
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while not stop_event.is_set():
+                    with self._wakeup:
+                        self._dispatch(executor)
+                        
+                        waiting = [
+                            account['next_run'] for account in self.accounts
+                            if not account['running']
+                        ]
+                        timeout = min(waiting) - time.monotonic() if waiting else 1
+                        self._wakeup.wait(timeout=max(0.1, min(timeout, 1)))
+            except KeyboardInterrupt:
+                print("\n🛑 Планировщик остановлен пользователем")
+            finally:
+                stop_event.set()
+        
+        print("🔌 Планировщик завершен")
+
+
+def main():
+    """Точка входа: синхронизация всех аккаунтов из config.ACCOUNTS"""
+    SyncScheduler().run_forever()
+
+
+if __name__ == "__main__":
+    main()
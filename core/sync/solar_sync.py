@@ -3,60 +3,191 @@ SolarMail - IMAP Sync Core
 Ядро синхронизации почты с IMAP серверами
 """
 
-from imap_tools import MailBox, AND
+from imap_tools import MailBox, MailBoxUnencrypted, AND, U
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
+import threading
 import sys
 import os
 
 # Добавляем путь к модулям проекта
 sys.path.append(os.path.dirname(__file__))
 
-from core.sync.db_manager import DatabaseManager
-from core.sync.ai_parser import AIParser
+from db_manager import DatabaseManager
+from ai_parser import AIParser
+from analysis_cache import AnalysisCache
+from reanalysis import analyzer_version
+from delta_sync import DeltaSync, normalize_flags
+from partial_fetch import PartialFetcher
+from folder_pool import MultiFolderSync
+from pipeline import SyncPipeline
 import config
 
 
 class SolarSync:
     """Основной класс синхронизации писем через IMAP"""
     
-    def __init__(self, enable_ai: bool = False):
+    def __init__(
+        self,
+        enable_ai: bool = False,
+        fetch_mode: str = config.FETCH_MODE,
+        email: Optional[str] = None,
+        password: Optional[str] = None,
+        imap_host: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+        imap_port: Optional[int] = None,
+        use_ssl: Optional[bool] = None
+    ):
         """
         Инициализация SolarSync
         
         Args:
             enable_ai: Включить AI-анализ писем (по умолчанию выключен)
+            fetch_mode: 'full' - полный RFC822, 'partial' - ENVELOPE + первые
+                        PREVIEW_BYTES байт текстовой части (без вложений)
+            email: Email аккаунта (по умолчанию config.EMAIL)
+            password: Пароль аккаунта (по умолчанию config.PASSWORD)
+            imap_host: IMAP сервер (по умолчанию config.IMAP_HOST)
+            db: Общий DatabaseManager (для планировщика нескольких аккаунтов)
+            imap_port: Порт IMAP (по умолчанию config.IMAP_PORT)
+            use_ssl: IMAP через SSL (по умолчанию config.IMAP_SSL)
         """
-        self.db = DatabaseManager()
-        self.imap_host = config.IMAP_HOST
-        self.email = config.EMAIL
-        self.password = config.PASSWORD
+        self.db = db or DatabaseManager()
+        self.imap_host = imap_host or config.IMAP_HOST
+        self.imap_port = imap_port or config.IMAP_PORT
+        self.use_ssl = config.IMAP_SSL if use_ssl is None else use_ssl
+        self.email = email or config.EMAIL
+        self.password = password or config.PASSWORD
         self.sync_days = 3  # Синхронизация за последние 3 дня
         self.enable_ai = enable_ai
+        self.fetch_mode = fetch_mode
+        self.partial_fetcher = PartialFetcher(preview_bytes=config.PREVIEW_BYTES)
         
         # Инициализируем AI parser если включен
         if self.enable_ai:
             self.ai_parser = AIParser()
+            self.analysis_cache = AnalysisCache(
+                self.db,
+                memory_size=config.ANALYSIS_CACHE_MEMORY_SIZE,
+                max_entries=config.ANALYSIS_CACHE_MAX_ENTRIES
+            )
         
         # Инициализируем sync_status если его нет
         self.db.init_sync_status(self.email, self.sync_days)
         
-    def connect(self) -> MailBox:
+        # Все режимы хранят письма под ключом make_uid (аккаунт:папка:UID).
+        # Строки с голым UID писали прежние smart_sync/run аккаунта по умолчанию:
+        # на новый ключ их переводит только он, а не первый созданный SolarSync
+        # общей базы (планировщик, API)
+        if self.email == config.EMAIL:
+            self.db.adopt_legacy_uids(self.email, config.SYNC_FOLDER)
+    
+    def connect(self, initial_folder: Optional[str] = 'INBOX') -> MailBox:
         """
         Подключается к IMAP серверу
         
+        Args:
+            initial_folder: Папка для выбора после входа (None - остаться в состоянии AUTH)
+        
         Returns:
             Объект MailBox для работы с почтой
         """
         try:
-            mailbox = MailBox(self.imap_host)
-            mailbox.login(self.email, self.password)
+            mailbox_class = MailBox if self.use_ssl else MailBoxUnencrypted
+            mailbox = mailbox_class(self.imap_host, self.imap_port)
+            mailbox.login(self.email, self.password, initial_folder=initial_folder)
             print(f"✅ Подключено к {self.imap_host} как {self.email}")
             return mailbox
         except Exception as e:
             print(f"❌ Ошибка подключения к IMAP: {e}")
             raise
     
+    def _message_to_dict(self, msg, folder: Optional[str] = None) -> Dict:
+        """
+        Преобразует MailMessage в словарь для сохранения в кэш
+        
+        Args:
+            msg: Объект MailMessage из imap_tools
+            folder: Папка IMAP (для UID-синхронизации ключ включает аккаунт и папку)
+        
+        Returns:
+            Словарь с данными письма
+        """
+        return self._build_email_dict(
+            msg.uid, msg.from_, msg.subject, msg.date,
+            msg.text or msg.html or "", msg.flags, folder
+        )
+    
+    def _build_email_dict(
+        self,
+        uid: str,
+        sender: Optional[str],
+        subject: Optional[str],
+        date: Optional[datetime],
+        body_text: str,
+        flags,
+        folder: Optional[str] = None
+    ) -> Dict:
+        """
+        Собирает словарь письма для кэша из полей IMAP
+        
+        Returns:
+            Словарь с данными письма
+        """
+        # Извлекаем первые 200 символов текста письма
+        body_preview = body_text[:200].replace('\n', ' ').strip()
+        
+        email_data = {
+            'uid': uid,
+            'sender': sender or "Unknown",
+            'subject': subject or "(No Subject)",
+            'date': date.isoformat() if date else datetime.now().isoformat(),
+            'body_preview': body_preview
+        }
+        
+        if folder is not None:
+            email_data.update({
+                'uid': self.db.make_uid(self.email, folder, int(uid)),
+                'account_email': self.email,
+                'folder': folder,
+                'imap_uid': int(uid),
+                'flags': normalize_flags(flags)
+            })
+        
+        return email_data
+    
+    def fetch_messages(
+        self,
+        mailbox: MailBox,
+        criteria,
+        folder: Optional[str] = None,
+        min_uid: int = 0
+    ) -> Iterator[Dict]:
+        """
+        Загружает письма выбранной папки в режиме self.fetch_mode
+        
+        Args:
+            mailbox: MailBox с выбранной папкой
+            criteria: Критерий поиска imap_tools
+            folder: Папка IMAP (для UID-ключей)
+            min_uid: Пропускать письма с UID <= min_uid
+        
+        Yields:
+            Словари с данными писем
+        """
+        if self.fetch_mode == 'partial':
+            uids = [uid for uid in mailbox.uids(criteria) if int(uid) > min_uid]
+            for item in self.partial_fetcher.fetch(mailbox, uids):
+                yield self._build_email_dict(
+                    item['uid'], item['sender'], item['subject'], item['date'],
+                    item['text'], item['flags'], folder
+                )
+        else:
+            for msg in mailbox.fetch(criteria, mark_seen=False):
+                if int(msg.uid) <= min_uid:
+                    continue
+                yield self._message_to_dict(msg, folder)
+    
     def fetch_emails(self, mailbox: MailBox, days: int = 3) -> List[Dict]:
         """
         Получает письма за последние N дней
@@ -74,34 +205,16 @@ class SolarSync:
         emails_data = []
         
         try:
-            # Выбираем папку INBOX
-            mailbox.folder.set('INBOX')
-            
-            # Получаем письма за последние N дней
-            messages = mailbox.fetch(
-                criteria=AND(date_gte=since_date.date()),
-                mark_seen=False  # Не помечаем письма как прочитанные
-            )
+            # Выбираем папку синхронизации
+            mailbox.folder.set(config.SYNC_FOLDER)
             
             print(f"📥 Загрузка писем с {since_date.strftime('%Y-%m-%d')}...")
             
-            for msg in messages:
-                # Извлекаем первые 200 символов текста письма
-                body_text = msg.text or msg.html or ""
-                body_preview = body_text[:200].replace('\n', ' ').strip()
-                
-                email_data = {
-                    'uid': msg.uid,
-                    'sender': msg.from_ or "Unknown",
-                    'subject': msg.subject or "(No Subject)",
-                    'date': msg.date.isoformat() if msg.date else datetime.now().isoformat(),
-                    'body_preview': body_preview
-                }
-                
-                emails_data.append(email_data)
+            # Получаем письма за последние N дней (без пометки прочитанными)
+            emails_data.extend(self.fetch_messages(mailbox, AND(date_gte=since_date.date()), config.SYNC_FOLDER))
             
             print(f"✅ Получено {len(emails_data)} писем")
-            
+        
         except Exception as e:
             print(f"❌ Ошибка при получении писем: {e}")
             raise
@@ -118,19 +231,27 @@ class SolarSync:
         Returns:
             Словарь со статистикой синхронизации
         """
-        stats = {
-            'new': 0,
-            'skipped': 0,
-            'total': len(emails)
-        }
+        stats, _ = self.store_emails(emails)
+        return stats
+    
+    def store_emails(self, emails: List[Dict]) -> Tuple[Dict[str, int], List[Dict]]:
+        """
+        Записывает письма в кэш одной транзакцией
         
-        for email in emails:
-            if self.db.insert_email(email):
-                stats['new'] += 1
-            else:
-                stats['skipped'] += 1
+        Args:
+            emails: Список словарей с данными писем
         
-        return stats
+        Returns:
+            Tuple (статистика total/new/skipped, новые письма с полем 'id' для AI-анализа)
+        """
+        stats = self.db.insert_emails_bulk(emails)
+        new_ids = stats.pop('new_ids')
+        
+        new_emails = []
+        for email in emails:
+            if email['uid'] in new_ids:
+                new_emails.append(dict(email, id=new_ids.pop(email['uid'])))
+        return stats, new_emails
     
     # ==================== Sprint 0.2: Smart Cache Methods ====================
     
@@ -143,6 +264,27 @@ class SolarSync:
         """
         return self.db.get_last_sync_date(self.email)
     
+    def get_smart_since_date(self) -> datetime:
+        """
+        Вычисляет дату начала smart-синхронизации
+        
+        Returns:
+            last_sync_date + 1 секунда или (при первой синхронизации) now - sync_days
+        """
+        last_sync = self.get_last_sync_date()
+        
+        if last_sync:
+            # Парсим ISO дату и добавляем 1 секунду чтобы не загружать уже синхронизированное письмо
+            since_date = datetime.fromisoformat(last_sync.replace('Z', '+00:00'))
+            since_date = since_date + timedelta(seconds=1)
+            print(f"🔄 Smart Cache: синхронизация с {since_date.strftime('%Y-%m-%d %H:%M:%S')}")
+        else:
+            # Первая синхронизация - берем за последние N дней
+            since_date = datetime.now() - timedelta(days=self.sync_days)
+            print(f"📥 Первая синхронизация: последние {self.sync_days} дней")
+        
+        return since_date
+    
     def fetch_emails_smart(self, mailbox: MailBox, since_date: Optional[datetime] = None) -> List[Dict]:
         """
         Получает письма с учетом smart cache (только новые)
@@ -154,54 +296,449 @@ class SolarSync:
         Returns:
             Список словарей с данными писем
         """
-        # Если дата не указана, пытаемся получить last_sync_date
+        try:
+            emails_data = list(self.iter_emails_smart(mailbox, since_date))
+            print(f"✅ Получено {len(emails_data)} писем")
+        
+        except Exception as e:
+            print(f"❌ Ошибка при получении писем: {e}")
+            raise
+        
+        return emails_data
+    
+    def iter_emails_smart(
+        self,
+        mailbox: MailBox,
+        since_date: Optional[datetime] = None,
+        min_uid: int = 0
+    ) -> Iterator[Dict]:
+        """
+        Потоковая версия fetch_emails_smart: отдает письма по мере загрузки
+        
+        Args:
+            mailbox: Объект MailBox
+            since_date: Дата начала синхронизации (если None, используется last_sync_date или sync_days)
+            min_uid: Продолжить после этого UID (checkpoint прерванной синхронизации)
+        
+        Yields:
+            Словари с данными писем
+        """
         if since_date is None:
-            last_sync = self.get_last_sync_date()
-            
-            if last_sync:
-                # Парсим ISO дату и добавляем 1 секунду чтобы не загружать уже синхронизированное письмо
-                since_date = datetime.fromisoformat(last_sync.replace('Z', '+00:00'))
-                since_date = since_date + timedelta(seconds=1)
-                print(f"🔄 Smart Cache: синхронизация с {since_date.strftime('%Y-%m-%d %H:%M:%S')}")
-            else:
-                # Первая синхронизация - берем за последние N дней
-                since_date = datetime.now() - timedelta(days=self.sync_days)
-                print(f"📥 Первая синхронизация: последние {self.sync_days} дней")
+            since_date = self.get_smart_since_date()
+        
+        # Выбираем папку синхронизации
+        mailbox.folder.set(config.SYNC_FOLDER)
+        
+        # Получаем письма новее указанной даты (и после checkpoint)
+        criteria = AND(date_gte=since_date.date())
+        if min_uid:
+            criteria = AND(date_gte=since_date.date(), uid=U(min_uid + 1, '*'))
+        yield from self.fetch_messages(mailbox, criteria, config.SYNC_FOLDER, min_uid)
+    
+    # ==================== Resumable Smart Sync: checkpoints ====================
+    
+    def load_smart_checkpoint(self, uidvalidity: int, folder: str = config.SYNC_FOLDER) -> Dict:
+        """
+        Возвращает checkpoint smart-синхронизации: сохраненный или новый
+        
+        Если прошлая синхронизация оборвалась, продолжаем с того же since_date
+        после последнего сохраненного UID. Новый checkpoint сразу сохраняется,
+        чтобы since_date не сдвинулся при обрыве до первой пачки.
+        
+        Args:
+            uidvalidity: UIDVALIDITY папки на сервере
+            folder: Папка IMAP
+        
+        Returns:
+            Словарь {'folder', 'uidvalidity', 'since_date', 'last_uid', 'emails_committed'}
+        """
+        saved = self.db.get_sync_checkpoint(self.email, folder)
+        
+        if saved and saved['uidvalidity'] == uidvalidity:
+            print(f"⏯️  Продолжение прерванной синхронизации с UID {saved['last_uid'] + 1} "
+                  f"(уже обработано {saved['emails_committed']})")
+            return {
+                'folder': folder,
+                'uidvalidity': uidvalidity,
+                'since_date': datetime.fromisoformat(saved['since_date']),
+                'last_uid': saved['last_uid'],
+                'emails_committed': saved['emails_committed']
+            }
+        
+        if saved:
+            # UID старого поколения больше ничего не значат
+            print(f"♻️  UIDVALIDITY папки {folder} изменился: checkpoint сброшен")
+        
+        checkpoint = {
+            'folder': folder,
+            'uidvalidity': uidvalidity,
+            'since_date': self.get_smart_since_date(),
+            'last_uid': 0,
+            'emails_committed': 0
+        }
+        self.save_smart_checkpoint(checkpoint, 0, 0)
+        return checkpoint
+    
+    def save_smart_checkpoint(self, checkpoint: Dict, last_uid: int, processed: int):
+        """
+        Сохраняет прогресс smart-синхронизации
+        
+        Args:
+            checkpoint: Checkpoint из load_smart_checkpoint
+            last_uid: Все письма с UID <= last_uid уже в кэше
+            processed: Сколько писем обработано в текущем запуске
+        """
+        committed = checkpoint['emails_committed'] + processed
+        self.db.save_sync_checkpoint(
+            self.email,
+            checkpoint['folder'],
+            checkpoint['uidvalidity'],
+            checkpoint['since_date'].isoformat(),
+            last_uid,
+            committed
+        )
+        if last_uid:
+            print(f"💾 Checkpoint: UID {last_uid} ({committed} писем)")
+    
+    # ==================== UID Sync: UIDVALIDITY / UIDNEXT ====================
+    
+    def fetch_emails_incremental(self, mailbox: MailBox, folder: str = config.SYNC_FOLDER) -> Tuple[List[Dict], Dict]:
+        """
+        Получает только письма с UID больше последнего синхронизированного
+        
+        Первая синхронизация папки берет письма за последние sync_days дней,
+        дальше запрашивается только диапазон UID n+1:*. При смене UIDVALIDITY
+        выполняется полная ресинхронизация, а кэш папки сбрасывает
+        store_incremental (checkpoint['reset']) - в кэш пишет только он.
+        
+        Args:
+            mailbox: Объект MailBox
+            folder: Папка IMAP
+        
+        Returns:
+            Tuple (список писем, новый checkpoint {'uidvalidity', 'last_uid', 'reset'})
+        """
+        status = mailbox.folder.status(folder, ['UIDVALIDITY', 'UIDNEXT'])
+        uidvalidity = status['UIDVALIDITY']
+        
+        state = self.db.get_folder_sync_state(self.email, folder)
+        reset = bool(state) and state['uidvalidity'] != uidvalidity
         
+        if reset:
+            # UID старого поколения больше ничего не значат
+            print(f"♻️  UIDVALIDITY папки {folder} изменился: полная ресинхронизация")
+            state = None
+        
+        last_uid = state['last_uid'] if state else 0
         emails_data = []
         
         try:
-            # Выбираем папку INBOX
-            mailbox.folder.set('INBOX')
-            
-            # Получаем письма новее указанной даты
-            messages = mailbox.fetch(
-                criteria=AND(date_gte=since_date.date()),
-                mark_seen=False
-            )
+            mailbox.folder.set(folder)
             
-            for msg in messages:
-                # Извлекаем первые 200 символов текста письма
-                body_text = msg.text or msg.html or ""
-                body_preview = body_text[:200].replace('\n', ' ').strip()
-                
-                email_data = {
-                    'uid': msg.uid,
-                    'sender': msg.from_ or "Unknown",
-                    'subject': msg.subject or "(No Subject)",
-                    'date': msg.date.isoformat() if msg.date else datetime.now().isoformat(),
-                    'body_preview': body_preview
-                }
+            if state:
+                print(f"🔄 UID Sync: {folder} с UID {last_uid + 1}")
+                criteria = AND(uid=U(last_uid + 1, '*'))
                 
+                # "n:*" всегда включает последнее письмо папки, даже если его UID < n,
+                # поэтому сначала проверяем, есть ли действительно новые UID
+                new_uids = [uid for uid in mailbox.uids(criteria) if int(uid) > last_uid]
+                messages = self.fetch_messages(mailbox, criteria, folder, last_uid) if new_uids else []
+            else:
+                since_date = datetime.now() - timedelta(days=self.sync_days)
+                print(f"📥 Первая UID-синхронизация {folder}: последние {self.sync_days} дней")
+                messages = self.fetch_messages(mailbox, AND(date_gte=since_date.date()), folder)
+            
+            max_uid = last_uid
+            for email_data in messages:
+                max_uid = max(max_uid, email_data['imap_uid'])
                 emails_data.append(email_data)
             
             print(f"✅ Получено {len(emails_data)} писем")
-            
+        
         except Exception as e:
             print(f"❌ Ошибка при получении писем: {e}")
             raise
         
-        return emails_data
+        # Все UID до UIDNEXT-1 на момент STATUS уже просмотрены
+        checkpoint = {
+            'uidvalidity': uidvalidity,
+            'last_uid': max(max_uid, status['UIDNEXT'] - 1),
+            'reset': reset
+        }
+        
+        return emails_data, checkpoint
+    
+    def store_incremental(self, emails: List[Dict], folder: str, checkpoint: Dict) -> Dict[str, int]:
+        """
+        Сохраняет письма UID-синхронизации, сдвигает checkpoint и запускает AI
+        
+        Args:
+            emails: Письма из fetch_emails_incremental
+            folder: Папка IMAP
+            checkpoint: Новый checkpoint {'uidvalidity', 'last_uid', 'reset'}
+        
+        Returns:
+            Словарь со статистикой синхронизации
+        """
+        if checkpoint.get('reset'):
+            removed = self.db.reset_folder(self.email, folder)
+            print(f"♻️  Кэш папки {folder} сброшен (удалено {removed})")
+        
+        stats, new_emails = self.store_emails(emails)
+        
+        # Checkpoint сдвигаем только после записи писем в кэш
+        self.db.update_folder_sync_state(
+            self.email,
+            folder,
+            checkpoint['uidvalidity'],
+            checkpoint['last_uid']
+        )
+        
+        if new_emails and self.enable_ai:
+            self.analyze_emails_with_ai(new_emails)
+        
+        return stats
+    
+    def uid_sync(self, folder: str = config.SYNC_FOLDER, with_delta: bool = False):
+        """
+        Запускает инкрементальную синхронизацию по UID
+        
+        В отличие от smart_sync не перезагружает письма за последний день:
+        checkpoint (UIDVALIDITY + последний UID) хранится для каждой папки.
+        
+        Args:
+            folder: Папка IMAP
+            with_delta: Сначала синхронизировать флаги и удаления (CONDSTORE/QRESYNC)
+        """
+        print("🚀 SolarSync - UID Sync запущен...")
+        print(f"📧 Email: {self.email}")
+        print(f"📁 Папка: {folder}")
+        print("-" * 50)
+        
+        sync_start_time = datetime.now()
+        
+        try:
+            # Папку не выбираем: ENABLE QRESYNC допустим только до SELECT
+            mailbox = self.connect(initial_folder=None)
+            
+            if with_delta:
+                delta_stats = DeltaSync(self.db, self.email).sync_folder(mailbox, folder)
+                print(f"🔁 Delta Sync ({delta_stats['mode']}): "
+                      f"флагов обновлено {delta_stats['flags_updated']}, "
+                      f"удалено {delta_stats['vanished']}")
+            
+            emails, checkpoint = self.fetch_emails_incremental(mailbox, folder)
+            mailbox.logout()
+            print("🔌 Отключено от IMAP сервера")
+            
+            print("\n💾 Синхронизация с локальным кэшем...")
+            stats = self.store_incremental(emails, folder, checkpoint)
+            
+            self.db.update_sync_status(
+                self.email,
+                sync_start_time.isoformat(),
+                stats,
+                success=True
+            )
+            
+            print("-" * 50)
+            print(f"📊 Статистика синхронизации:")
+            print(f"   • Новых писем: {stats['new']}")
+            print(f"   • Пропущено (дубли): {stats['skipped']}")
+            print(f"   • Последний UID: {checkpoint['last_uid']} (UIDVALIDITY {checkpoint['uidvalidity']})")
+            print(f"   • Всего в кэше: {self.db.get_emails_count()}")
+            print("-" * 50)
+            print("✅ UID Sync завершен успешно!")
+        
+        except Exception as e:
+            print(f"\n❌ UID Sync прерван с ошибкой: {e}")
+            
+            self.db.update_sync_status(
+                self.email,
+                datetime.now().isoformat(),
+                {'total': 0, 'new': 0, 'skipped': 0},
+                success=False,
+                error_message=str(e)
+            )
+            raise
+    
+    # ==================== Multi-Folder Sync ====================
+    
+    def multi_folder_sync(
+        self,
+        folders: Optional[List[str]] = None,
+        pool_size: int = config.SYNC_POOL_SIZE
+    ) -> Dict[str, Dict]:
+        """
+        Параллельная UID-синхронизация нескольких папок
+        
+        Папки распределяются по ограниченному пулу IMAP-соединений, у каждой
+        папки свой checkpoint, а запись в кэш выполняет один поток. Полная
+        ресинхронизация аккаунта длится примерно как синхронизация самой
+        большой папки, а не как сумма всех папок.
+        
+        Args:
+            folders: Список папок IMAP (по умолчанию config.SYNC_FOLDERS)
+            pool_size: Количество одновременных IMAP-соединений
+        
+        Returns:
+            Словарь {папка: статистика}
+        """
+        folders = folders or config.SYNC_FOLDERS
+        
+        print("🚀 SolarSync - Multi-Folder Sync запущен...")
+        print(f"📧 Email: {self.email}")
+        print(f"📁 Папки: {', '.join(folders)} (соединений: {pool_size})")
+        print("-" * 50)
+        
+        sync_start_time = datetime.now()
+        results = MultiFolderSync(self, pool_size).run(folders)
+        
+        stats = {'total': 0, 'new': 0, 'skipped': 0}
+        errors = []
+        for folder in folders:
+            result = results.get(folder, {'error': 'not synced'})
+            if 'error' in result:
+                errors.append(f"{folder}: {result['error']}")
+                continue
+            for key in stats:
+                stats[key] += result[key]
+        
+        self.db.update_sync_status(
+            self.email,
+            sync_start_time.isoformat(),
+            stats,
+            success=not errors,
+            error_message='; '.join(errors) if errors else None
+        )
+        
+        print("-" * 50)
+        print(f"📊 Статистика синхронизации:")
+        for folder in folders:
+            result = results.get(folder, {'error': 'not synced'})
+            if 'error' in result:
+                print(f"   • {folder}: ошибка - {result['error']}")
+            else:
+                print(f"   • {folder}: новых {result['new']}, последний UID {result['last_uid']}")
+        print(f"   • Всего новых писем: {stats['new']}")
+        print(f"   • Всего в кэше: {self.db.get_emails_count()}")
+        print("-" * 50)
+        print("✅ Multi-Folder Sync завершен" + (" с ошибками" if errors else " успешно!"))
+        
+        return results
+    
+    # ==================== IMAP IDLE: Push Mode ====================
+    
+    def idle_sync(
+        self,
+        folder: str = config.SYNC_FOLDER,
+        with_delta: bool = True,
+        idle_timeout: int = config.IDLE_TIMEOUT,
+        stop_event: Optional[threading.Event] = None
+    ):
+        """
+        Долгоживущая синхронизация через IMAP IDLE (RFC 2177)
+        
+        Держит одно авторизованное соединение. На EXISTS загружает только
+        новые UID через store_incremental, на EXPUNGE/FETCH - применяет
+        delta-синхронизацию флагов и удалений. IDLE перезапускается
+        каждые idle_timeout секунд (сервер разрывает IDLE через 30 минут).
+        
+        Args:
+            folder: Папка IMAP
+            with_delta: Обрабатывать EXPUNGE и изменения флагов
+            idle_timeout: Период перезапуска IDLE в секундах (< 29 минут)
+            stop_event: Событие для остановки цикла (по умолчанию - до Ctrl+C)
+        """
+        print("🚀 SolarSync - IDLE режим запущен...")
+        print(f"📧 Email: {self.email}")
+        print(f"📁 Папка: {folder}")
+        print("-" * 50)
+        
+        stop_event = stop_event or threading.Event()
+        reconnect_delay = 1
+        
+        while not stop_event.is_set():
+            mailbox = None
+            try:
+                mailbox = self.connect(initial_folder=None)
+                delta = DeltaSync(self.db, self.email) if with_delta else None
+                
+                # Догоняем всё, что пришло пока соединения не было
+                if delta:
+                    delta.sync_folder(mailbox, folder)
+                self._idle_fetch_new(mailbox, folder)
+                reconnect_delay = 1
+                
+                while not stop_event.is_set():
+                    responses = self._idle_wait(mailbox, idle_timeout)
+                    if not responses:
+                        continue  # Таймаут - просто перезапускаем IDLE
+                    
+                    if delta and any(b'EXPUNGE' in r or b'VANISHED' in r or b'FETCH' in r for r in responses):
+                        delta_stats = delta.sync_folder(mailbox, folder)
+                        if delta_stats['flags_updated'] or delta_stats['vanished']:
+                            print(f"🔁 Флагов обновлено {delta_stats['flags_updated']}, "
+                                  f"удалено {delta_stats['vanished']}")
+                    
+                    if any(b'EXISTS' in r for r in responses):
+                        self._idle_fetch_new(mailbox, folder)
+                
+                mailbox.logout()
+            
+            except KeyboardInterrupt:
+                print("\n🛑 IDLE остановлен пользователем")
+                break
+            except Exception as e:
+                print(f"⚠️  IDLE соединение потеряно: {e}. Переподключение через {reconnect_delay} с")
+                if mailbox is not None:
+                    try:
+                        mailbox.logout()
+                    except Exception:
+                        pass
+                self.db.update_sync_status(
+                    self.email,
+                    datetime.now().isoformat(),
+                    {'total': 0, 'new': 0, 'skipped': 0},
+                    success=False,
+                    error_message=str(e)
+                )
+                stop_event.wait(reconnect_delay)
+                reconnect_delay = min(reconnect_delay * 2, 300)
+        
+        print("🔌 IDLE режим завершен")
+    
+    @staticmethod
+    def _idle_wait(mailbox: MailBox, timeout: int) -> List[bytes]:
+        """
+        Один цикл IDLE: ждет ответов сервера до timeout и завершает IDLE
+        
+        В отличие от mailbox.idle.wait() не теряет ответы, пришедшие вместе
+        с "+ idling" или пока IDLE завершался (их возвращает idle.stop()).
+        
+        Returns:
+            Untagged-ответы сервера (b'* 5 EXISTS', ...)
+        """
+        mailbox.idle.start()
+        responses = mailbox.idle.poll(timeout=timeout)
+        _, pending = mailbox.idle.stop()
+        return responses + [response for response in pending if response]
+    
+    def _idle_fetch_new(self, mailbox: MailBox, folder: str) -> Dict[str, int]:
+        """Загружает новые UID в рамках IDLE-сессии и обновляет sync_status"""
+        emails, checkpoint = self.fetch_emails_incremental(mailbox, folder)
+        stats = self.store_incremental(emails, folder, checkpoint)
+        
+        if emails:
+            self.db.update_sync_status(
+                self.email,
+                datetime.now().isoformat(),
+                stats,
+                success=True
+            )
+            print(f"📬 IDLE: новых писем {stats['new']} (UID до {checkpoint['last_uid']})")
+        
+        return stats
     
     def analyze_emails_with_ai(self, emails: List[Dict]) -> int:
         """
@@ -217,27 +754,49 @@ class SolarSync:
             return 0
         
         print("\n🧠 AI-анализ писем...")
-        analyzed_count = 0
         
-        for email in emails:
-            # Проверяем, есть ли уже метаданные
-            existing_meta = self.db.get_email_meta(email['id'])
-            if existing_meta:
-                continue  # Пропускаем уже проанализированные
-            
-            # Анализируем письмо
-            meta_data = self.ai_parser.analyze_email(
-                email.get('subject', ''),
-                email.get('body_preview', '')
-            )
-            
-            # Сохраняем метаданные
-            if self.db.insert_email_meta(email['id'], meta_data):
-                analyzed_count += 1
+        # Пропускаем уже проанализированные
+        pending = [email for email in emails if not self.db.get_email_meta(email['id'])]
+        analyzed_count = self.analyze_and_store(pending)
         
         print(f"✅ Проанализировано: {analyzed_count} писем")
         return analyzed_count
     
+    def analyze_and_store(self, emails: List[Dict]) -> int:
+        """
+        Анализирует письма через кэш анализа и сохраняет метаданные
+        
+        Повторяющиеся письма (рассылки, уведомления) берутся из
+        AnalysisCache, в анализатор попадают только новые тексты.
+        Метаданные всех писем записываются одной транзакцией.
+        
+        Args:
+            emails: Письма из базы данных (с полем 'id') без метаданных
+        
+        Returns:
+            Количество сохраненных метаданных
+        """
+        if not emails:
+            return 0
+        
+        results = self.analysis_cache.analyze(
+            [(email.get('subject', ''), email.get('body_preview', '')) for email in emails],
+            self.ai_parser
+        )
+        # Версия анализатора: письма с другой версией переанализирует ReanalysisJob
+        version = analyzer_version(self.ai_parser)
+        try:
+            return self.db.upsert_email_meta_bulk(
+                (email['id'], dict(meta_data, ai_version=version)) for email, meta_data in zip(emails, results)
+            )
+        except Exception as e:
+            # AI-анализ не должен прерывать синхронизацию. Письма уже в кэше,
+            # и следующая синхронизация их не загрузит и не проанализирует:
+            # недостающие метаданные восстанавливает ReanalysisJob
+            ids = [email['id'] for email in emails]
+            print(f"⚠️  Метаданные не сохранены для {len(ids)} писем (id: {ids}): {e}")
+            return 0
+    
     def smart_sync(self):
         """
         Запускает умную синхронизацию с использованием cache и AI
@@ -250,29 +809,36 @@ class SolarSync:
         print("-" * 50)
         
         sync_start_time = datetime.now()
+        pipeline = None
         
         try:
             # Подключаемся к IMAP
             mailbox = self.connect()
             
-            # Получаем письма с учетом smart cache
-            emails = self.fetch_emails_smart(mailbox)
-            
-            # Закрываем соединение
-            mailbox.logout()
-            print("🔌 Отключено от IMAP сервера")
-            
-            # Синхронизируем в базу данных
-            print("\n💾 Синхронизация с локальным кэшем...")
-            stats = self.sync_to_database(emails)
-            
-            # Если были добавлены новые письма и включен AI
-            if stats['new'] > 0 and self.enable_ai:
-                # Получаем только что добавленные письма для анализа
-                recent_emails = self.db.get_all_emails(limit=stats['new'])
-                self.analyze_emails_with_ai(recent_emails)
+            try:
+                # Checkpoint прерванной синхронизации (или новый)
+                status = mailbox.folder.status(config.SYNC_FOLDER, ['UIDVALIDITY'])
+                checkpoint = self.load_smart_checkpoint(status['UIDVALIDITY'])
+                
+                # Загрузка, запись в кэш и AI-анализ идут одновременно:
+                # письма пишутся пачками, пока IMAP еще отдает следующие,
+                # прогресс сохраняется каждые CHECKPOINT_EVERY писем
+                print("\n💾 Потоковая синхронизация с локальным кэшем...")
+                pipeline = SyncPipeline(
+                    self,
+                    on_checkpoint=lambda last_uid, processed: self.save_smart_checkpoint(
+                        checkpoint, last_uid, processed
+                    )
+                )
+                stats = pipeline.run(self.iter_emails_smart(
+                    mailbox, checkpoint['since_date'], checkpoint['last_uid']
+                ))
+            finally:
+                # Закрываем соединение
+                mailbox.logout()
+                print("🔌 Отключено от IMAP сервера")
             
-            # Обновляем sync_status
+            # Обновляем sync_status, checkpoint больше не нужен
             last_sync_date = sync_start_time.isoformat()
             self.db.update_sync_status(
                 self.email,
@@ -280,6 +846,7 @@ class SolarSync:
                 stats,
                 success=True
             )
+            self.db.clear_sync_checkpoint(self.email, config.SYNC_FOLDER)
             
             # Выводим статистику
             print("-" * 50)
@@ -287,6 +854,8 @@ class SolarSync:
             print(f"   • Всего обработано: {stats['total']}")
             print(f"   • Новых писем: {stats['new']}")
             print(f"   • Пропущено (дубли): {stats['skipped']}")
+            if self.enable_ai:
+                print(f"   • Проанализировано AI: {stats['analyzed']}")
             print(f"   • Всего в кэше: {self.db.get_emails_count()}")
             
             # Получаем общий статус синхронизации
@@ -296,15 +865,17 @@ class SolarSync:
             
             print("-" * 50)
             print("✅ Smart Sync завершен успешно!")
-            
+        
         except Exception as e:
             print(f"\n❌ Smart Sync прерван с ошибкой: {e}")
             
-            # Записываем ошибку в sync_status
+            # Записываем ошибку в sync_status. last_sync_date не сдвигаем:
+            # следующий запуск продолжит с checkpoint, а сохраненные письма
+            # уже учтены в статистике
             self.db.update_sync_status(
                 self.email,
-                datetime.now().isoformat(),
-                {'total': 0, 'new': 0, 'skipped': 0},
+                self.get_last_sync_date(),
+                pipeline.stats if pipeline else {'total': 0, 'new': 0, 'skipped': 0},
                 success=False,
                 error_message=str(e)
             )
@@ -343,7 +914,7 @@ class SolarSync:
             print(f"   • Всего в кэше: {self.db.get_emails_count()}")
             print("-" * 50)
             print("✅ Синхронизация завершена успешно!")
-            
+        
         except Exception as e:
             print(f"\n❌ Синхронизация прервана с ошибкой: {e}")
             raise
@@ -0,0 +1,139 @@
+"""
+SolarMail - SQLite Storage
+Долгоживущие подключения SQLite для DatabaseManager: один писатель и пул читателей
+"""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+
+
+# Размер memory-mapped I/O (байт) и кэша страниц (отрицательное значение - КиБ)
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE = -64 * 1024
+
+# Кэш подготовленных выражений на подключение (sqlite3 кэширует по тексту SQL)
+CACHED_STATEMENTS = 256
+
+# Сколько ждать блокировку БД другим процессом (мс)
+BUSY_TIMEOUT = 5000
+
+
+class SQLiteStorage:
+    """
+    Пул подключений к одному файлу SQLite
+    
+    - WAL: читатели не блокируют писателя и видят последние закоммиченные данные
+    - synchronous=NORMAL: fsync только на checkpoint WAL; при сбое питания
+      могут потеряться последние транзакции, но не целостность БД
+    - mmap_size / cache_size: чтение страниц без лишних системных вызовов
+    
+    Запись идет через единственное подключение под блокировкой (SQLite
+    допускает одного писателя), чтение - через пул подключений, по одному
+    на поток. Подключения открываются лениво и живут до close().
+    """
+    
+    def __init__(self, db_path: str, readers: int = 4):
+        """
+        Инициализация SQLiteStorage
+        
+        Args:
+            db_path: Путь к файлу базы данных
+            readers: Максимальное количество подключений для чтения
+        """
+        self.db_path = db_path
+        self.readers = max(1, readers)
+        
+        # ':memory:' у каждого подключения своя - читаем через писателя
+        self.shared = db_path == ':memory:'
+        
+        self._write_lock = threading.RLock()
+        self._pool_lock = threading.Lock()
+        self._writer = self._connect()
+        self._idle_readers: queue.LifoQueue = queue.LifoQueue()
+        self._all_readers: List[sqlite3.Connection] = []
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает подключение и настраивает pragma"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,  # Подключение переходит между потоками через пул
+            cached_statements=CACHED_STATEMENTS,
+            timeout=BUSY_TIMEOUT / 1000
+        )
+        conn.row_factory = sqlite3.Row  # Для доступа к полям по имени
+        
+        if not self.shared:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size={CACHE_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT}")
+        return conn
+    
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Подключение писателя на время одной транзакции
+        
+        При выходе изменения коммитятся, при исключении - откатываются.
+        
+        Yields:
+            Подключение для записи
+        """
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+    
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """
+        Подключение из пула читателей (ждет свободное, если пул исчерпан)
+        
+        Yields:
+            Подключение для чтения
+        """
+        if self.shared:
+            # Без commit/rollback: чтение внутри write() того же потока
+            # не должно закоммитить или откатить его транзакцию
+            with self._write_lock:
+                yield self._writer
+            return
+        
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            # Завершаем неявную транзакцию, чтобы не держать снимок WAL
+            conn.rollback()
+            self._idle_readers.put(conn)
+    
+    def _acquire_reader(self) -> sqlite3.Connection:
+        """Берет свободного читателя или открывает нового в пределах лимита"""
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._pool_lock:
+            if len(self._all_readers) < self.readers:
+                conn = self._connect()
+                self._all_readers.append(conn)
+                return conn
+        return self._idle_readers.get()
+    
+    def close(self):
+        """Закрывает все подключения"""
+        with self._write_lock, self._pool_lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers.clear()
+            self._idle_readers = queue.LifoQueue()
+            self._writer.close()
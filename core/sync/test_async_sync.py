@@ -0,0 +1,174 @@
+"""
+SolarMail - Async Sync Test
+AsyncSolarSync на локальном IMAP-сервере: smart_sync, uid_sync и idle_sync
+дают тот же кэш, что и SolarSync
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+from core.sync.async_sync import AsyncSolarSync
+from core.sync.db_manager import DatabaseManager
+from core.sync.fixtures import MailGenerator, StandInIMAPServer
+from core.sync.solar_sync import SolarSync
+
+
+ACCOUNT = 'user@example.com'
+
+
+def wait_for(condition, timeout: float = 15.0) -> bool:
+    """Ждет, пока condition() станет истинным"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def make_sync(server: StandInIMAPServer, path: str, fetch_mode: str = 'full') -> SolarSync:
+    """SolarSync с отдельным кэшем для локального сервера"""
+    host, port = server.address
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = DatabaseManager(path)
+        return SolarSync(email=ACCOUNT, password='password', imap_host=host, imap_port=port,
+                         use_ssl=False, db=db, fetch_mode=fetch_mode)
+
+
+def cached_rows(sync: SolarSync) -> list:
+    """Содержимое кэша для сравнения движков"""
+    return sorted(
+        (row['imap_uid'], row['sender'], row['subject'], row['date'], row['body_preview'], row['flags'])
+        for row in sync.db.iter_emails()
+    )
+
+
+def check_smart_sync(tmp: str):
+    """smart_sync: async и blocking движки в режимах full и partial"""
+    with StandInIMAPServer() as server:
+        server.populate('INBOX', 30, MailGenerator(seed=1))
+        
+        for fetch_mode in ('full', 'partial'):
+            blocking = make_sync(server, os.path.join(tmp, f'smart-{fetch_mode}.db'), fetch_mode)
+            engine = AsyncSolarSync(make_sync(server, os.path.join(tmp, f'smart-async-{fetch_mode}.db'), fetch_mode),
+                                    chunk_size=7)
+            with contextlib.redirect_stdout(io.StringIO()):
+                blocking.smart_sync()
+                stats = asyncio.run(engine.smart_sync())
+            
+            assert stats['new'] == 30, stats
+            assert cached_rows(engine.sync) == cached_rows(blocking)
+            blocking.db.close()
+            engine.db.close()
+            print(f"   ✅ {fetch_mode}: 30 писем, кэш совпадает с SolarSync.smart_sync")
+
+
+def check_uid_sync(tmp: str):
+    """uid_sync: первая загрузка и догрузка новых UID"""
+    generator = MailGenerator(seed=2)
+    with StandInIMAPServer(condstore=True) as server:
+        server.populate('INBOX', 20, generator)
+        blocking = make_sync(server, os.path.join(tmp, 'uid.db'))
+        engine = AsyncSolarSync(make_sync(server, os.path.join(tmp, 'uid-async.db')), chunk_size=6)
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            blocking.uid_sync()
+            asyncio.run(engine.uid_sync())
+            
+            server.populate('INBOX', 5, generator, start=20)
+            blocking.uid_sync()
+            stats = asyncio.run(engine.uid_sync())
+        
+        assert stats['new'] == 5, stats
+        assert cached_rows(engine.sync) == cached_rows(blocking)
+        assert (engine.db.get_folder_sync_state(ACCOUNT, 'INBOX')['last_uid']
+                == blocking.db.get_folder_sync_state(ACCOUNT, 'INBOX')['last_uid'] == 25)
+        blocking.db.close()
+        engine.db.close()
+        print("   ✅ 20 + 5 писем, кэш и checkpoint совпадают с SolarSync.uid_sync")
+
+
+def check_idle(capabilities: dict, tmp: str, name: str):
+    """idle_sync: EXISTS, FETCH и EXPUNGE, итоговый кэш как у SolarSync.uid_sync"""
+    generator = MailGenerator(seed=3)
+    with StandInIMAPServer(**capabilities) as server:
+        server.populate('INBOX', 10, generator)
+        engine = AsyncSolarSync(make_sync(server, os.path.join(tmp, f'idle-{name}.db')))
+        db = engine.db
+        
+        # Свой event loop в потоке; stop_event создается внутри loop
+        running = {}
+        
+        async def run():
+            running['loop'] = asyncio.get_running_loop()
+            running['stop'] = asyncio.Event()
+            await engine.idle_sync(idle_timeout=1, stop_event=running['stop'])
+        
+        thread = threading.Thread(target=asyncio.run, args=(run(),), daemon=True)
+        thread.start()
+        try:
+            assert wait_for(lambda: db.get_emails_count() == 10 and server.idling())
+            print(f"   ✅ {name}: начальная загрузка 10 писем, сессия в IDLE")
+            
+            # EXISTS -> загрузка только новых UID
+            server.populate('INBOX', 2, generator, start=10)
+            assert wait_for(lambda: db.get_emails_count() == 12)
+            print(f"   ✅ {name}: EXISTS -> загружены UID 11-12")
+            
+            # FETCH (флаги другого клиента) -> delta_sync
+            server.set_flags('INBOX', 1, ['\\Flagged'])
+            assert wait_for(lambda: db.get_folder_flags(ACCOUNT, 'INBOX')[1] == '\\Flagged')
+            print(f"   ✅ {name}: FETCH -> флаги UID 1 обновлены")
+            
+            # EXPUNGE -> удаление из кэша
+            server.expunge('INBOX', [2, 3])
+            assert wait_for(lambda: db.get_emails_count() == 10)
+            assert not {2, 3} & set(db.get_folder_flags(ACCOUNT, 'INBOX'))
+            print(f"   ✅ {name}: EXPUNGE -> UID 2-3 удалены из кэша")
+        finally:
+            running['loop'].call_soon_threadsafe(running['stop'].set)
+            thread.join(timeout=10)
+        
+        assert not thread.is_alive()
+        
+        blocking = make_sync(server, os.path.join(tmp, f'idle-{name}-blocking.db'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            blocking.uid_sync()
+        assert cached_rows(engine.sync) == cached_rows(blocking)
+        print(f"   ✅ {name}: итоговый кэш совпадает с SolarSync.uid_sync")
+        blocking.db.close()
+        db.close()
+
+
+def test_async_sync():
+    """AsyncSolarSync дает тот же кэш, что и SolarSync"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест AsyncSolarSync")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        print("\n1️⃣ smart_sync...")
+        check_smart_sync(tmp)
+        
+        print("\n2️⃣ uid_sync...")
+        check_uid_sync(tmp)
+        
+        print("\n3️⃣ idle_sync, сервер с CONDSTORE...")
+        check_idle({'condstore': True}, tmp, 'condstore')
+        
+        print("\n4️⃣ idle_sync, сервер без CONDSTORE (режим uid)...")
+        check_idle({}, tmp, 'uid')
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_async_sync()
@@ -4,6 +4,7 @@ SolarMail - Database Test Script
 """
 
 from core.sync.db_manager import DatabaseManager
+from core.sync.ai_parser import AIParser
 from datetime import datetime, timedelta
 import random
 
@@ -112,6 +113,39 @@ def test_database():
         print(f"      Дата: {email['date'][:19]}")
         print(f"      UID: {email['uid']}")
     
+    # Постраничный обход по курсору
+    print("\n7️⃣ Постраничный обход (по 4 письма)...")
+    page = db.get_emails_page(limit=4)
+    pages = 1
+    while page['next_cursor']:
+        page = db.get_emails_page(limit=4, cursor=page['next_cursor'])
+        pages += 1
+    
+    streamed = [email['uid'] for email in db.iter_emails(chunk_size=4)]
+    ordered = [email['uid'] for email in db.get_all_emails()]
+    if streamed == ordered:
+        print(f"   ✅ Страниц: {pages}, порядок совпадает с get_all_emails")
+    else:
+        print("   ❌ ОШИБКА: порядок писем при постраничном обходе отличается!")
+    
+    # Параллельный AI-анализ с пакетной записью метаданных
+    print("\n8️⃣ Анализ в 2 процессах пачками по 4 письма + пакетная запись...")
+    parser = AIParser()
+    emails = db.get_all_emails()
+    written = 0
+    for chunk, results in parser.analyze_parallel(iter(emails), workers=2, chunk_size=4):
+        written += db.upsert_email_meta_bulk((email['id'], meta) for email, meta in zip(chunk, results))
+    
+    serial = parser.batch_analyze(emails)
+    stored = [db.get_email_meta(email['id']) for email in emails]
+    if written == len(emails) and all(
+        meta['category'] == expected['category'] and meta['keywords_json'] == expected['keywords_json']
+        for meta, expected in zip(stored, serial)
+    ):
+        print(f"   ✅ Записано: {written}, результаты совпадают с последовательным анализом")
+    else:
+        print("   ❌ ОШИБКА: метаданные параллельного анализа отличаются!")
+    
     # Итоговая статистика
     print("\n" + "=" * 60)
     print("✅ Тест успешно завершен!")
@@ -0,0 +1,107 @@
+"""
+SolarMail - Delta Sync Test
+Флаги, удаления и смена UIDVALIDITY в режимах qresync / condstore / uid
+на локальном IMAP-сервере
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+
+from core.sync.db_manager import DatabaseManager
+from core.sync.delta_sync import DeltaSync
+from core.sync.fixtures import MailGenerator, StandInIMAPServer
+from core.sync.solar_sync import SolarSync
+
+
+ACCOUNT = 'user@example.com'
+
+# Режим DeltaSync -> расширения сервера
+MODES = {
+    'qresync': {'qresync': True},
+    'condstore': {'condstore': True},
+    'uid': {},
+}
+
+
+def delta(sync: SolarSync) -> dict:
+    """Один проход DeltaSync в новом соединении (как uid_sync с with_delta)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        mailbox = sync.connect(initial_folder=None)
+    try:
+        return DeltaSync(sync.db, ACCOUNT).sync_folder(mailbox, 'INBOX')
+    finally:
+        mailbox.logout()
+
+
+def check_mode(mode: str, tmp: str):
+    """Сценарий delta-синхронизации для одного режима"""
+    with StandInIMAPServer(**MODES[mode]) as server:
+        server.populate('INBOX', 20, MailGenerator(seed=1))
+        host, port = server.address
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, f'{mode}.db'))
+            sync = SolarSync(email=ACCOUNT, password='password', imap_host=host,
+                             imap_port=port, use_ssl=False, db=db)
+            sync.uid_sync()
+        
+        # Первая сверка запоминает HIGHESTMODSEQ, изменений еще нет
+        stats = delta(sync)
+        assert stats == {'mode': mode, 'flags_updated': 0, 'vanished': 0}, stats
+        
+        server.set_flags('INBOX', 3, ['\\Seen', '\\Flagged'])
+        server.set_flags('INBOX', 8, [])
+        expunged = server.expunge('INBOX', [5, 6])
+        assert expunged == [5, 6]
+        
+        # Какие UID DeltaSync читает из кэша
+        looked_up = []
+        get_folder_flags = db.get_folder_flags
+        
+        def recording(account_email, folder, uids=None):
+            looked_up.append(None if uids is None else sorted(uids))
+            return get_folder_flags(account_email, folder, uids)
+        
+        db.get_folder_flags = recording
+        stats = delta(sync)
+        del db.get_folder_flags
+        assert stats == {'mode': mode, 'flags_updated': 2, 'vanished': 2}, stats
+        if mode != 'uid':
+            # CHANGEDSINCE: только изменившиеся письма, а не вся папка
+            assert looked_up == [[3, 8]], looked_up
+        flags = db.get_folder_flags(ACCOUNT, 'INBOX')
+        assert flags[3] == '\\Flagged \\Seen' and flags[8] == ''
+        assert 5 not in flags and 6 not in flags and len(flags) == 18
+        print(f"   ✅ {mode}: флаги 2 писем обновлены, UID 5-6 удалены")
+        
+        # Повторная сверка: изменений нет
+        assert delta(sync) == {'mode': mode, 'flags_updated': 0, 'vanished': 0}
+        
+        server.folders['INBOX']['uidvalidity'] = 7
+        stats = delta(sync)
+        assert stats['mode'] == 'reset'
+        assert db.get_folder_sync_state(ACCOUNT, 'INBOX') is None and db.get_emails_count() == 0
+        print(f"   ✅ {mode}: смена UIDVALIDITY сбрасывает кэш папки и checkpoint")
+        db.close()
+
+
+def test_delta_sync():
+    """DeltaSync применяет флаги и удаления во всех режимах"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест DeltaSync")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for number, mode in zip(('1️⃣', '2️⃣', '3️⃣'), MODES):
+            print(f"\n{number} Режим {mode}...")
+            check_mode(mode, tmp)
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_delta_sync()
@@ -0,0 +1,152 @@
+"""
+SolarMail - Folder Pool Test
+MailBoxPool (ограничение и переиспользование соединений) и MultiFolderSync
+на локальном IMAP-сервере
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+from core.sync.db_manager import DatabaseManager
+from core.sync.fixtures import MailGenerator, StandInIMAPServer
+from core.sync.folder_pool import MailBoxPool
+from core.sync.solar_sync import SolarSync
+
+
+ACCOUNT = 'user@example.com'
+
+# Папка -> количество писем
+FOLDERS = {'INBOX': 24, 'Archive': 15, 'Sent': 9, 'Drafts': 3, 'Spam': 0}
+
+
+class FakeMailBox:
+    """Соединение-заглушка: считает logout"""
+    
+    def __init__(self, number: int):
+        self.number = number
+        self.logged_out = False
+    
+    def logout(self):
+        self.logged_out = True
+
+
+def test_mailbox_pool():
+    """Пул не открывает больше size соединений и не возвращает сломанные"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест MailBoxPool")
+    print("=" * 60)
+    
+    print("\n1️⃣ 8 потоков на пул из 3 соединений...")
+    opened = []
+    lock = threading.Lock()
+    state = {'in_use': 0, 'peak': 0}
+    
+    def connect():
+        with lock:
+            opened.append(FakeMailBox(len(opened)))
+            return opened[-1]
+    
+    pool = MailBoxPool(connect, size=3)
+    
+    def work():
+        for _ in range(5):
+            with pool.acquire():
+                with lock:
+                    state['in_use'] += 1
+                    state['peak'] = max(state['peak'], state['in_use'])
+                time.sleep(0.002)
+                with lock:
+                    state['in_use'] -= 1
+    
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert state['peak'] == 3 and len(opened) == 3
+    print("   ✅ Одновременно не больше 3, открыто 3 соединения на 40 выдач")
+    
+    print("\n2️⃣ Ошибка на соединении...")
+    try:
+        with pool.acquire() as broken:
+            raise RuntimeError('connection reset')
+    except RuntimeError:
+        pass
+    assert broken.logged_out
+    with pool.acquire() as mailbox:
+        assert mailbox is not broken
+    print("   ✅ Сломанное соединение закрыто и больше не выдается")
+    
+    pool.close()
+    assert all(mailbox.logged_out for mailbox in opened)
+    print("   ✅ close() закрывает все соединения")
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+def test_multi_folder_sync():
+    """Папки синхронизируются параллельно, ошибка одной не мешает остальным"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест MultiFolderSync")
+    print("=" * 60)
+    
+    with StandInIMAPServer() as server, tempfile.TemporaryDirectory() as tmp:
+        generator = MailGenerator(seed=1)
+        start = 0
+        for folder, count in FOLDERS.items():
+            server.create_folder(folder)
+            server.populate(folder, count, generator, start=start)
+            start += count
+        host, port = server.address
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, 'folders.db'))
+            sync = SolarSync(email=ACCOUNT, password='password', imap_host=host,
+                             imap_port=port, use_ssl=False, db=db)
+        
+        print("\n1️⃣ 5 папок на 2 соединениях...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = sync.multi_folder_sync(list(FOLDERS), pool_size=2)
+        
+        for folder, count in FOLDERS.items():
+            assert results[folder] == {'total': count, 'new': count, 'skipped': 0, 'last_uid': count}, results[folder]
+            assert db.get_folder_sync_state(ACCOUNT, folder)['last_uid'] == count
+            assert len(db.get_folder_flags(ACCOUNT, folder)) == count
+        assert db.get_emails_count() == sum(FOLDERS.values())
+        # Соединения переиспользуются между папками
+        assert server.connections == 2
+        print("   ✅ Статистика и checkpoint каждой папки верны, открыто 2 соединения")
+        
+        print("\n2️⃣ Несуществующая папка среди обычных...")
+        server.populate('Archive', 2, generator, start=start)
+        connections = server.connections
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = sync.multi_folder_sync(['INBOX', 'Missing', 'Archive', 'Sent'], pool_size=2)
+        
+        assert 'error' in results['Missing']
+        assert results['Archive']['new'] == 2 and results['Archive']['last_uid'] == 17
+        assert results['INBOX']['new'] == 0 and results['Sent']['new'] == 0
+        # Новый пул: 2 соединения и не больше одного взамен закрытого после ошибки
+        assert server.connections - connections <= 3
+        status = db.get_sync_status(ACCOUNT)
+        assert not status['last_sync_success'] and 'Missing' in status['last_error_message']
+        print("   ✅ Остальные папки синхронизированы, ошибка записана в sync_status")
+        db.close()
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_mailbox_pool()
+    test_multi_folder_sync()
@@ -0,0 +1,106 @@
+"""
+SolarMail - IDLE Sync Test
+idle_sync на локальном IMAP-сервере: EXISTS, EXPUNGE/VANISHED/FETCH и переподключение
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+from core.sync.db_manager import DatabaseManager
+from core.sync.fixtures import MailGenerator, StandInIMAPServer
+from core.sync.solar_sync import SolarSync
+
+
+ACCOUNT = 'user@example.com'
+
+
+def wait_for(condition, timeout: float = 15.0) -> bool:
+    """Ждет, пока condition() станет истинным"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def check_idle(capabilities: dict, tmp: str, name: str):
+    """Сценарий IDLE-сессии для сервера с заданными расширениями"""
+    generator = MailGenerator(seed=1)
+    with StandInIMAPServer(**capabilities) as server:
+        server.populate('INBOX', 10, generator)
+        host, port = server.address
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, f'{name}.db'))
+        sync = SolarSync(email=ACCOUNT, password='password', imap_host=host,
+                         imap_port=port, use_ssl=False, db=db)
+        
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=sync.idle_sync,
+            kwargs={'idle_timeout': 1, 'stop_event': stop_event},
+            daemon=True
+        )
+        thread.start()
+        try:
+            # Догоняющая синхронизация при подключении, затем IDLE
+            assert wait_for(lambda: db.get_emails_count() == 10 and server.idling())
+            print(f"   ✅ {name}: начальная загрузка 10 писем, сессия в IDLE")
+            
+            # EXISTS -> загрузка только новых UID
+            server.populate('INBOX', 2, generator, start=10)
+            assert wait_for(lambda: db.get_emails_count() == 12)
+            assert db.get_folder_sync_state(ACCOUNT, 'INBOX')['last_uid'] == 12
+            print(f"   ✅ {name}: EXISTS -> загружены UID 11-12")
+            
+            # FETCH (флаги другого клиента) -> delta-синхронизация
+            server.set_flags('INBOX', 1, ['\\Flagged'])
+            assert wait_for(lambda: db.get_folder_flags(ACCOUNT, 'INBOX')[1] == '\\Flagged')
+            print(f"   ✅ {name}: FETCH -> флаги UID 1 обновлены")
+            
+            # EXPUNGE (или VANISHED при QRESYNC) -> удаление из кэша
+            server.expunge('INBOX', [2, 3])
+            assert wait_for(lambda: db.get_emails_count() == 10)
+            assert not {2, 3} & set(db.get_folder_flags(ACCOUNT, 'INBOX'))
+            print(f"   ✅ {name}: EXPUNGE -> UID 2-3 удалены из кэша")
+            
+            # Обрыв соединения -> переподключение и догоняющая синхронизация
+            connections = server.connections
+            server.drop_connections()
+            server.add_message('INBOX', next(generator.iter_messages(1, start=12))['raw'])
+            assert wait_for(lambda: server.connections > connections and db.get_emails_count() == 11)
+            assert wait_for(server.idling)
+            print(f"   ✅ {name}: после обрыва соединения - переподключение, письмо UID 13 загружено")
+        finally:
+            stop_event.set()
+            thread.join(timeout=10)
+        
+        assert not thread.is_alive()
+        db.close()
+
+
+def test_idle_sync():
+    """idle_sync реагирует на EXISTS, EXPUNGE/VANISHED/FETCH и переживает обрыв соединения"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест IDLE-синхронизации")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        print("\n1️⃣ Сервер с CONDSTORE (EXPUNGE)...")
+        check_idle({'condstore': True}, tmp, 'condstore')
+        
+        print("\n2️⃣ Сервер с QRESYNC (VANISHED)...")
+        check_idle({'qresync': True}, tmp, 'qresync')
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_idle_sync()
@@ -0,0 +1,62 @@
+"""
+SolarMail - Keyword Matcher Test
+Проверка KeywordMatcher против прежней семантики `kw in text`
+"""
+
+import random
+
+from core.sync.ai_parser import AIParser
+from core.sync.keyword_matcher import KeywordMatcher
+
+
+def count_naive(dictionaries, text):
+    """Эталон: `kw in text` по каждому слову каждого списка"""
+    return {
+        name: {label: sum(1 for kw in keywords if kw in text) for label, keywords in classes.items()}
+        for name, classes in dictionaries.items()
+    }
+
+
+def test_keyword_matcher():
+    """Совпадения по словарям AIParser и по словарям с перекрывающимися словами"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест KeywordMatcher")
+    print("=" * 60)
+    
+    parser = AIParser()
+    dictionaries = {
+        'priority': parser.priority_keywords,
+        'category': parser.category_keywords,
+        'sentiment': parser.sentiment_keywords
+    }
+    keywords = [kw for classes in dictionaries.values() for words in classes.values() for kw in words]
+    rng = random.Random(42)
+    
+    print("\n1️⃣ Письма из кусков ключевых слов, склеенных без пробелов...")
+    for _ in range(2000):
+        parts = []
+        for _ in range(rng.randint(1, 8)):
+            keyword = rng.choice(keywords)
+            cut = rng.randint(0, len(keyword))
+            parts.append(rng.choice([keyword, keyword[cut:], keyword[:cut]]))
+            parts.append(rng.choice(['', ' ', '.', '\n', 'x']))
+        text = ''.join(parts)
+        assert parser.keyword_matcher.count(text) == count_naive(dictionaries, text), text
+    print("   ✅ Совпадает с `kw in text`")
+    
+    print("\n2️⃣ Вложенные, перекрывающиеся и повторяющиеся слова...")
+    overlapping = {'x': {'a': ['ab', 'abc', 'b c', 'ca', 'ab'], 'b': ['bca', 'c', ' a']}}
+    matcher = KeywordMatcher(overlapping)
+    for _ in range(2000):
+        text = ''.join(rng.choice('abc ') for _ in range(rng.randint(0, 20)))
+        assert matcher.count(text) == count_naive(overlapping, text), text
+    print("   ✅ Совпадает с `kw in text`")
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_keyword_matcher()
@@ -0,0 +1,172 @@
+"""
+SolarMail - Partial Fetch Test
+Разбор ответов UID FETCH (литералы, NIL, encoded-word, вложенный BODYSTRUCTURE)
+и совпадение полей режимов 'partial' и 'full'
+"""
+
+import base64
+import contextlib
+import io
+import os
+import tempfile
+
+from core.sync.db_manager import DatabaseManager
+from core.sync.fixtures import MailGenerator, StandInIMAPServer
+from core.sync.partial_fetch import (
+    build_partial_message,
+    decode_partial,
+    decode_section_texts,
+    envelope_fields,
+    find_text_part,
+    group_text_sections,
+    parse_fetch_response
+)
+from core.sync.solar_sync import SolarSync
+
+
+# Ответы в том виде, в каком их отдает imaplib: строки и кортежи (строка с {n}, литерал)
+ENVELOPE_LITERAL = [
+    (b'1 (UID 41 FLAGS (\\Seen $Forwarded) INTERNALDATE "05-Mar-2025 09:15:00 +0300" '
+     b'ENVELOPE ("Wed, 05 Mar 2025 09:15:00 +0300" {25}',
+     '"Отчет" (итоги)'.encode()),
+    b' (("=?UTF-8?B?0JjQstCw0L0=?=" NIL "Ivan.Petrov" "Example.COM")) NIL NIL NIL NIL NIL NIL '
+    b'"<a1@example.com>") BODYSTRUCTURE ("TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "BASE64" 120 2 NIL NIL NIL NIL))',
+]
+
+ENVELOPE_NIL = [
+    b'2 (UID 42 FLAGS () INTERNALDATE "06-Mar-2025 10:00:00 +0000" '
+    b'ENVELOPE (NIL NIL NIL NIL NIL NIL NIL NIL NIL NIL) '
+    b'BODYSTRUCTURE ("APPLICATION" "PDF" ("NAME" "a.pdf") NIL NIL "BASE64" 5000 NIL NIL NIL NIL))',
+]
+
+ENVELOPE_ENCODED = [
+    b'3 (UID 43 FLAGS (\\Flagged) ENVELOPE ("Thu, 06 Mar 2025 12:00:00 +0000" '
+    b'"=?UTF-8?B?0J/RgNC40LLQtdGCLCA=?= =?UTF-8?Q?=D0=BC=D0=B8=D1=80?=" '
+    b'(("Bob \\"The Builder\\"" NIL "bob" "example.com")) NIL NIL NIL NIL NIL NIL NIL) '
+    b'BODYSTRUCTURE ('
+    # multipart/mixed: [multipart/alternative: text/plain, text/html], message/rfc822, вложение
+    b'(("TEXT" "PLAIN" ("CHARSET" "koi8-r") NIL NIL "QUOTED-PRINTABLE" 300 10 NIL NIL NIL NIL)'
+    b'("TEXT" "HTML" ("CHARSET" "utf-8") NIL NIL "7BIT" 800 20 NIL NIL NIL NIL) "ALTERNATIVE" ("BOUNDARY" "b2") NIL NIL NIL)'
+    b'("MESSAGE" "RFC822" NIL NIL NIL "7BIT" 900 (NIL "inner" NIL NIL NIL NIL NIL NIL NIL NIL) '
+    b'("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 100 3 NIL NIL NIL NIL) 30 NIL NIL NIL NIL)'
+    b'("APPLICATION" "OCTET-STREAM" ("NAME" "x.bin") NIL NIL "BASE64" 4000 NIL ("ATTACHMENT" ("FILENAME" "x.bin")) NIL NIL)'
+    b' "MIXED" ("BOUNDARY" "b1") NIL NIL NIL))',
+]
+
+# Вторая фаза: текст секции литералом, несколько писем в одном ответе, литерал {0}
+SECTION_TEXTS = [
+    (b'1 (UID 41 BODY[1]<0> {20}', base64.b64encode('Привет, мир!'.encode())[:20]),
+    b')',
+    (b'4 (UID 44 BODY[1]<0> {0}', b''),
+    b')',
+    b'5 (UID 45 FLAGS (\\Seen))',
+]
+
+
+def test_parse_fetch_response():
+    """Токенизатор и разбор ответов FETCH на литеральных фикстурах"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест разбора ответов FETCH")
+    print("=" * 60)
+    
+    print("\n1️⃣ Тема литералом {n}, отправитель с encoded-word именем...")
+    [item] = parse_fetch_response(ENVELOPE_LITERAL)
+    assert item['UID'] == '41' and item['FLAGS'] == ['\\Seen', '$Forwarded']
+    fields = envelope_fields(item['ENVELOPE'])
+    assert fields['subject'] == '"Отчет" (итоги)'
+    assert fields['sender'] == 'Ivan.Petrov@Example.COM'
+    assert fields['date'].isoformat() == '2025-03-05T09:15:00+03:00'
+    assert find_text_part(item['BODYSTRUCTURE']) == ('1', 'base64', 'UTF-8', 'plain')
+    print("   ✅ Литерал прочитан целиком, скобки и кавычки внутри не ломают разбор")
+    
+    print("\n2️⃣ ENVELOPE из NIL, письмо без текстовой части...")
+    [item] = parse_fetch_response(ENVELOPE_NIL)
+    assert item['FLAGS'] == []
+    assert envelope_fields(item['ENVELOPE']) == {'date': None, 'subject': '', 'sender': ''}
+    assert find_text_part(item['BODYSTRUCTURE']) is None
+    message = build_partial_message('42', item, '')
+    assert message['date'].isoformat() == '2025-03-06T10:00:00+00:00'
+    print("   ✅ Пустые поля, дата из INTERNALDATE")
+    
+    print("\n3️⃣ Encoded-word тема, экранированные кавычки, вложенный BODYSTRUCTURE...")
+    [item] = parse_fetch_response(ENVELOPE_ENCODED)
+    fields = envelope_fields(item['ENVELOPE'])
+    assert fields['subject'] == 'Привет, мир'
+    assert item['ENVELOPE'][2][0][0] == b'Bob "The Builder"'
+    assert fields['sender'] == 'bob@example.com'
+    # text/plain внутри multipart/alternative важнее text/html; message/rfc822 не загружается
+    assert find_text_part(item['BODYSTRUCTURE']) == ('1.1', 'quoted-printable', 'koi8-r', 'plain')
+    assert find_text_part(item['BODYSTRUCTURE'][1]) is None
+    print("   ✅ Тема декодирована, выбрана секция 1.1 (text/plain)")
+    
+    print("\n4️⃣ Группировка по секциям и тексты второй фазы...")
+    items = parse_fetch_response(ENVELOPE_LITERAL + ENVELOPE_NIL + ENVELOPE_ENCODED)
+    headers, sections = group_text_sections(items)
+    assert sorted(headers) == ['41', '42', '43']
+    assert {section: [uid for uid, _ in parts] for section, parts in sections.items()} == {'1': ['41'], '1.1': ['43']}
+    
+    parts = sections['1'] + [('44', ('1', '7bit', 'utf-8', 'plain'))]
+    texts = decode_section_texts(parse_fetch_response(SECTION_TEXTS), parts)
+    # UID 45 - незапрошенный FETCH с флагами, его нет в ответе
+    assert texts == {'41': 'Привет, ', '44': ''}
+    print("   ✅ Литерал {0} и незапрошенный FETCH не мешают разбору")
+    
+    print("\n5️⃣ Декодирование обрезанных частей...")
+    assert decode_partial('Привет'.encode()[:5], '8bit', 'utf-8') == 'Пр'
+    assert decode_partial(b'caf=C3=A9 =C3', 'quoted-printable', 'utf-8') == 'café '
+    assert decode_partial(base64.b64encode(b'hello world')[:7], 'base64', 'utf-8') == 'hel'
+    assert decode_partial('Тест'.encode('koi8-r'), '8bit', 'koi8-r') == 'Тест'
+    assert decode_partial(b'abc', '7bit', 'x-unknown') == 'abc'
+    print("   ✅ base64, quoted-printable и многобайтные символы на границе N байт")
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+def test_partial_matches_full():
+    """Режимы 'partial' и 'full' сохраняют одинаковых отправителя, тему и дату"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест режимов partial и full")
+    print("=" * 60)
+    
+    with StandInIMAPServer() as server, tempfile.TemporaryDirectory() as tmp:
+        server.populate('INBOX', 40, MailGenerator(seed=3, attachment_ratio=0.3))
+        # Отправитель с отображаемым именем и адресом в смешанном регистре
+        server.add_message('INBOX', (
+            'From: =?UTF-8?B?0JjQstCw0L0=?= <Ivan.Petrov@Example.COM>\r\n'
+            'Subject: =?UTF-8?B?0J7RgtGH0LXRgg==?=\r\n'
+            'Date: Wed, 05 Mar 2025 09:15:00 +0300\r\n'
+            'Content-Type: text/plain; charset=utf-8\r\n'
+            '\r\n'
+            'Текст письма\r\n'
+        ).encode())
+        host, port = server.address
+        
+        rows = {}
+        for mode in ('full', 'partial'):
+            with contextlib.redirect_stdout(io.StringIO()):
+                db = DatabaseManager(os.path.join(tmp, f'{mode}.db'))
+                SolarSync(email='user@example.com', password='password', imap_host=host, imap_port=port,
+                          use_ssl=False, db=db, fetch_mode=mode).uid_sync()
+            rows[mode] = {
+                email['uid']: (email['sender'], email['subject'], email['date'], email['flags'])
+                for email in db.iter_emails()
+            }
+            db.close()
+        
+        assert len(rows['full']) == 41
+        assert rows['partial'] == rows['full']
+        assert rows['full']['user@example.com:INBOX:41'][:2] == ('Ivan.Petrov@Example.COM', 'Отчет')
+        print("   ✅ 41 письмо: отправитель (адрес без имени), тема, дата и флаги совпадают")
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_parse_fetch_response()
+    test_partial_matches_full()
@@ -0,0 +1,138 @@
+"""
+SolarMail - Reanalysis Job Test
+Переанализ писем без метаданных текущей версии: возобновление, смена версии, фон
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+from core.sync.ai_parser import AIParser
+from core.sync.db_manager import DatabaseManager
+from core.sync.reanalysis import ReanalysisJob, analyzer_version
+
+
+class CountingParser(AIParser):
+    """AIParser, запоминающий проанализированные темы"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seen = []
+    
+    def analyze_emails(self, emails):
+        self.seen.extend(subject for subject, _ in emails)
+        return super().analyze_emails(emails)
+
+
+def meta_rows(db: DatabaseManager):
+    """email_id → список версий его записей email_meta"""
+    with db.storage.read() as conn:
+        rows = conn.execute("SELECT email_id, ai_version FROM email_meta").fetchall()
+    versions = {}
+    for email_id, version in rows:
+        versions.setdefault(email_id, []).append(version)
+    return versions
+
+
+def test_reanalysis():
+    """Устаревшие и отсутствующие метаданные заменяются, задание продолжается с checkpoint"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест ReanalysisJob")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'reanalysis.db'))
+        emails = [
+            {'uid': f"test/{i}", 'sender': 'alice@example.com', 'subject': f"Срочно: отчет {i}",
+             'date': f"2025-01-{i + 1:02d}", 'body_preview': f"Письмо {i} про проект и дедлайн"}
+            for i in range(23)
+        ]
+        new_ids = db.insert_emails_bulk(emails)['new_ids']
+        ids = [new_ids[email['uid']] for email in emails]
+        
+        parser = CountingParser()
+        version = analyzer_version(parser)
+        
+        print("\n1️⃣ Старые метаданные без версии, актуальные и отсутствующие...")
+        for email_id in ids[:10]:
+            db.insert_email_meta(email_id, {'category': 'Old', 'ai_model': 'legacy'})
+        # Повторная запись заменяет прежнюю, а не добавляет вторую
+        db.insert_email_meta(ids[0], {'category': 'Older', 'ai_model': 'legacy'})
+        assert meta_rows(db)[ids[0]] == [None]
+        assert db.get_email_meta(ids[0])['category'] == 'Older'
+        current = parser.analyze_emails([(email['subject'], email['body_preview']) for email in emails[10:15]])
+        db.upsert_email_meta_bulk((email_id, dict(meta, ai_version=version)) for email_id, meta in zip(ids[10:15], current))
+        parser.seen.clear()
+        
+        assert db.count_stale_emails(version) == 18
+        assert [email['id'] for email in db.get_stale_emails(version, limit=100)] == ids[:10] + ids[15:]
+        print("   ✅ Anti-join: 18 писем без метаданных текущей версии")
+        
+        print("\n2️⃣ Прерванный запуск (8 писем) и продолжение с checkpoint...")
+        first = ReanalysisJob(db, parser, batch_size=4).run(max_emails=8)
+        assert first['processed'] == 8 and not first['finished']
+        assert db.get_reanalysis_checkpoint('default')['last_email_id'] == ids[7]
+        
+        second = ReanalysisJob(db, parser, batch_size=4).run()
+        assert second['finished'] and second['processed'] == 18 and second['resumed_from'] == ids[7]
+        assert sorted(parser.seen) == sorted(email['subject'] for email in emails[:10] + emails[15:])
+        
+        versions = meta_rows(db)
+        assert all(versions[email_id] == [version] for email_id in ids)
+        print("   ✅ Каждое письмо проанализировано один раз, по одной записи текущей версии")
+        
+        print("\n3️⃣ Новая версия анализатора: полный переанализ в 2 процессах...")
+        upgraded = CountingParser(model_name="dashka-solar-mini-2")
+        new_version = analyzer_version(upgraded)
+        assert db.count_stale_emails(new_version) == 23
+        result = ReanalysisJob(db, upgraded, batch_size=5, workers=2).run()
+        assert result['finished'] and result['processed'] == 23
+        assert all(versions == [new_version] for versions in meta_rows(db).values())
+        assert db.count_stale_emails(new_version) == 0
+        print("   ✅ Все 23 письма переанализированы новой версией")
+        
+        print("\n4️⃣ Фоновое задание с ограничением скорости и остановка...")
+        throttled = ReanalysisJob(db, CountingParser(model_name="dashka-solar-mini-3"), batch_size=2, max_rate=20)
+        throttled.start()
+        deadline = time.time() + 10
+        while throttled.get_progress()['processed'] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        throttled.stop(timeout=10)
+        progress = throttled.get_progress()
+        assert not progress['running'] and not progress['finished'] and progress['processed'] < 23
+        checkpoint = db.get_reanalysis_checkpoint('default')
+        assert checkpoint['processed'] == progress['processed'] and not checkpoint['finished_at']
+        print(f"   ✅ Остановлено на {progress['processed']}/23, checkpoint сохранен")
+        db.close()
+        
+        print("\n5️⃣ Старая база с дублями email_meta...")
+        path = os.path.join(tmp, 'legacy.db')
+        DatabaseManager(path).close()
+        # Прежняя схема: неуникальный индекс и несколько записей у письма
+        with sqlite3.connect(path) as conn:
+            conn.execute("DROP INDEX idx_email_meta_email_id_unique")
+            conn.execute("CREATE INDEX idx_email_meta_email_id ON email_meta(email_id)")
+            conn.executemany(
+                "INSERT INTO email_meta (email_id, category) VALUES (?, ?)",
+                [(1, 'Old'), (2, 'Work'), (1, 'Newer'), (1, 'Latest')]
+            )
+        conn.close()
+        
+        db = DatabaseManager(path)
+        assert meta_rows(db) == {1: [None], 2: [None]}
+        assert db.get_email_meta(1)['category'] == 'Latest'
+        with db.storage.read() as conn:
+            indexes = {row['name'] for row in conn.execute("PRAGMA index_list(email_meta)")}
+        assert 'idx_email_meta_email_id_unique' in indexes and 'idx_email_meta_email_id' not in indexes
+        print("   ✅ Осталась последняя запись каждого письма, индекс email_id уникален")
+        db.close()
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_reanalysis()
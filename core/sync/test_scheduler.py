@@ -0,0 +1,177 @@
+"""
+SolarMail - Scheduler Test
+HostLimiter, приоритет и backoff SyncScheduler, run_once на локальном IMAP-сервере
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+from core.sync.db_manager import DatabaseManager
+from core.sync.fixtures import MailGenerator, StandInIMAPServer
+from core.sync.scheduler import HostLimiter, SyncScheduler
+
+
+STATS = {'total': 0, 'new': 0, 'skipped': 0}
+
+
+def account(email: str, **kwargs) -> dict:
+    """Аккаунт в формате config.ACCOUNTS"""
+    return dict({'email': email, 'password': 'password', 'imap_host': 'imap.example.com'}, **kwargs)
+
+
+def test_host_limiter():
+    """try_acquire не превышает лимит сервера"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест HostLimiter")
+    print("=" * 60)
+    
+    limiter = HostLimiter({'imap.yandex.ru': 2}, default_limit=1)
+    
+    print("\n1️⃣ Лимит 2 соединения...")
+    assert limiter.try_acquire('imap.yandex.ru')
+    assert limiter.try_acquire('imap.yandex.ru')
+    assert not limiter.try_acquire('imap.yandex.ru')
+    assert limiter.in_use('imap.yandex.ru') == 2
+    print("   ✅ Третье соединение не выдано")
+    
+    print("\n2️⃣ Остальные серверы - default_limit...")
+    assert limiter.try_acquire('imap.mail.ru')
+    assert not limiter.try_acquire('imap.mail.ru')
+    print("   ✅ Лимиты серверов независимы")
+    
+    print("\n3️⃣ Освобождение и аккаунт больше лимита...")
+    limiter.release('imap.yandex.ru', 2)
+    assert limiter.try_acquire('imap.yandex.ru', 3)
+    assert limiter.in_use('imap.yandex.ru') == 3
+    # Пока сервер занят целиком, другим аккаунтам слотов нет
+    assert not limiter.try_acquire('imap.yandex.ru')
+    limiter.release('imap.yandex.ru', 3)
+    limiter.release('imap.yandex.ru', 3)
+    assert limiter.in_use('imap.yandex.ru') == 0
+    print("   ✅ Свободный сервер отдается целиком, счетчик не уходит в минус")
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+def test_due_accounts_and_backoff():
+    """Порядок готовых аккаунтов и задержка повтора после ошибок"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест приоритета и backoff планировщика")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, 'scheduler.db'))
+        scheduler = SyncScheduler(
+            accounts=[account(f'{name}@example.com') for name in ('recent', 'failed', 'old', 'new', 'busy', 'later')],
+            interval=300,
+            jitter=0,
+            db=db
+        )
+        
+        print("\n1️⃣ Порядок готовых аккаунтов...")
+        for email, date, success in (
+            ('recent@example.com', '2025-03-05T12:00:00', True),
+            ('failed@example.com', '2025-03-05T13:00:00', False),
+            ('old@example.com', '2025-03-01T12:00:00', True),
+            ('busy@example.com', '2025-01-01T00:00:00', False),
+            ('later@example.com', '2025-01-01T00:00:00', False),
+        ):
+            db.init_sync_status(email)
+            db.update_sync_status(email, date, STATS, success=success)
+        
+        accounts = {item['email']: item for item in scheduler.accounts}
+        accounts['busy@example.com']['running'] = True
+        accounts['later@example.com']['next_run'] = 100.0
+        
+        due = [item['email'] for item in scheduler._due_accounts(now=50.0)]
+        # Новый аккаунт без статуса и упавший - раньше, затем по давности синхронизации
+        assert due == ['new@example.com', 'failed@example.com', 'old@example.com', 'recent@example.com'], due
+        print("   ✅ Без статуса, упавший, затем самый старый; занятые и отложенные пропущены")
+        
+        print("\n2️⃣ Задержка после ошибок...")
+        delays = [scheduler._next_delay(failures) for failures in range(7)]
+        assert delays == [300, 30, 60, 120, 240, 300, 300], delays
+        scheduler.jitter = 0.1
+        assert all(270 <= scheduler._next_delay(0) <= 330 for _ in range(100))
+        assert all(27 <= scheduler._next_delay(1) <= 33 for _ in range(100))
+        print("   ✅ 30 с, 60 с, 120 с... но не дольше интервала; разброс ±jitter")
+        db.close()
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+def test_run_once_host_limit():
+    """run_once синхронизирует два аккаунта одного сервера по очереди при лимите 1"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест run_once с лимитом сервера")
+    print("=" * 60)
+    
+    with StandInIMAPServer() as server, tempfile.TemporaryDirectory() as tmp:
+        server.populate('INBOX', 10, MailGenerator(seed=1))
+        server.create_folder('Sent')
+        server.populate('Sent', 4, MailGenerator(seed=2))
+        host, port = server.address
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, 'run_once.db'))
+        scheduler = SyncScheduler(
+            accounts=[
+                account(email, imap_host=host, imap_port=port, use_ssl=False, folders=['INBOX', 'Sent'])
+                for email in ('first@example.com', 'second@example.com')
+            ],
+            workers=2,
+            host_limits={host: 1},
+            db=db
+        )
+        
+        lock = threading.Lock()
+        state = {'in_use': 0, 'peak': 0}
+        sync_account = scheduler.sync_account
+        
+        def counted(item):
+            with lock:
+                state['in_use'] += 1
+                state['peak'] = max(state['peak'], state['in_use'])
+            try:
+                time.sleep(0.05)
+                return sync_account(item)
+            finally:
+                with lock:
+                    state['in_use'] -= 1
+        
+        scheduler.sync_account = counted
+        
+        print("\n1️⃣ Два аккаунта, 2 потока, лимит сервера 1...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            scheduler.run_once()
+        
+        assert state['peak'] == 1
+        assert db.get_emails_count() == 28
+        for item in scheduler.accounts:
+            assert item['failures'] == 0 and not item['running']
+            assert db.get_folder_sync_state(item['email'], 'Sent')['last_uid'] == 4
+        assert scheduler.limiter.in_use(host) == 0
+        print("   ✅ Аккаунты синхронизированы по очереди: 2 x 14 писем, слоты освобождены")
+        db.close()
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_host_limiter()
+    test_due_accounts_and_backoff()
+    test_run_once_host_limit()
@@ -0,0 +1,102 @@
+"""
+SolarMail - Smart Sync Resume Test
+Прерванный smart_sync продолжается с checkpoint без дублей и пропусков
+"""
+
+import contextlib
+import functools
+import io
+import os
+import tempfile
+from unittest import mock
+
+from core.sync import solar_sync
+from core.sync.db_manager import DatabaseManager
+from core.sync.fixtures import MailGenerator, StandInIMAPServer
+from core.sync.pipeline import SyncPipeline
+
+
+ACCOUNT = 'user@example.com'
+
+# Маленькие пачки: checkpoint после каждой записанной пачки
+SMALL_PIPELINE = functools.partial(SyncPipeline, batch_size=10, checkpoint_every=10)
+
+
+def test_smart_sync_resume():
+    """Обрыв записи на N-й пачке, повторный запуск загружает только UID после checkpoint"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест продолжения smart_sync")
+    print("=" * 60)
+    
+    with StandInIMAPServer() as server, tempfile.TemporaryDirectory() as tmp, \
+            mock.patch.object(solar_sync, 'SyncPipeline', SMALL_PIPELINE):
+        server.populate('INBOX', 50, MailGenerator(seed=1))
+        host, port = server.address
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, 'resume.db'))
+            sync = solar_sync.SolarSync(email=ACCOUNT, password='password', imap_host=host,
+                                        imap_port=port, use_ssl=False, db=db)
+        
+        # Загруженные с сервера UID (до записи в кэш)
+        fetched = []
+        fetch_messages = sync.fetch_messages
+        
+        def recording(*args, **kwargs):
+            for email in fetch_messages(*args, **kwargs):
+                fetched.append(email['imap_uid'])
+                yield email
+        
+        sync.fetch_messages = recording
+        
+        print("\n1️⃣ Запись падает на 3-й пачке...")
+        store_emails = sync.store_emails
+        calls = {'count': 0}
+        
+        def failing(batch):
+            calls['count'] += 1
+            if calls['count'] == 3:
+                raise OSError('disk I/O error')
+            return store_emails(batch)
+        
+        sync.store_emails = failing
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                sync.smart_sync()
+                raise AssertionError('smart_sync должен был упасть')
+            except OSError:
+                pass
+        
+        checkpoint = db.get_sync_checkpoint(ACCOUNT, 'INBOX')
+        last_uid = checkpoint['last_uid']
+        stored = sorted(email['imap_uid'] for email in db.iter_emails())
+        # В кэше ровно письма до checkpoint: две записанные пачки
+        assert 0 < last_uid < 50 and stored == list(range(1, last_uid + 1))
+        assert checkpoint['emails_committed'] == last_uid
+        status = db.get_sync_status(ACCOUNT)
+        assert not status['last_sync_success'] and 'disk I/O error' in status['last_error_message']
+        print(f"   ✅ Checkpoint: UID {last_uid}, в кэше UID 1-{last_uid}, ошибка записана")
+        
+        print("\n2️⃣ Повторный запуск...")
+        sync.store_emails = store_emails
+        fetched.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync.smart_sync()
+        
+        # Загружены только письма после checkpoint, каждое один раз
+        assert fetched == list(range(last_uid + 1, 51)), fetched
+        keys = [email['uid'] for email in db.iter_emails()]
+        assert len(keys) == len(set(keys)) == 50
+        assert sorted(email['imap_uid'] for email in db.iter_emails()) == list(range(1, 51))
+        assert db.get_sync_checkpoint(ACCOUNT, 'INBOX') is None
+        assert db.get_sync_status(ACCOUNT)['last_sync_success']
+        print(f"   ✅ Загружены UID {last_uid + 1}-50, в кэше 50 писем без дублей и пропусков")
+        db.close()
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_smart_sync_resume()
@@ -0,0 +1,64 @@
+"""
+SolarMail - Storage Test
+Транзакции SQLiteStorage при чтении внутри записи
+"""
+
+import os
+import tempfile
+
+from core.sync.storage import SQLiteStorage
+
+
+def check_read_inside_write(storage: SQLiteStorage):
+    """Чтение внутри write() не коммитит и не откатывает его транзакцию"""
+    with storage.write() as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS items (name TEXT)")
+    
+    try:
+        with storage.write() as conn:
+            conn.execute("INSERT INTO items VALUES ('rolled back')")
+            with storage.read() as reader:
+                reader.execute("SELECT COUNT(*) FROM items").fetchone()
+            # Транзакция записи все еще открыта
+            assert conn.in_transaction
+            raise RuntimeError('abort')
+    except RuntimeError:
+        pass
+    
+    with storage.write() as conn:
+        conn.execute("INSERT INTO items VALUES ('kept')")
+        with storage.read() as reader:
+            reader.execute("SELECT COUNT(*) FROM items").fetchone()
+    
+    with storage.read() as reader:
+        rows = reader.execute("SELECT name FROM items").fetchall()
+    assert [row['name'] for row in rows] == ['kept'], [tuple(row) for row in rows]
+
+
+def test_storage_transactions():
+    """write() откатывается целиком, даже если внутри было чтение"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест транзакций SQLiteStorage")
+    print("=" * 60)
+    
+    print("\n1️⃣ База в памяти (чтение через подключение писателя)...")
+    storage = SQLiteStorage(':memory:')
+    check_read_inside_write(storage)
+    storage.close()
+    print("   ✅ Откат после чтения отменил вставку")
+    
+    print("\n2️⃣ Файл (пул читателей)...")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, 'storage.db'))
+        check_read_inside_write(storage)
+        storage.close()
+    print("   ✅ Откат после чтения отменил вставку")
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_storage_transactions()
@@ -257,6 +257,43 @@ def test_batch_analysis(mock, transformer, transformer_ready):
         print(f"   {subject:40} | {category:10} | {priority:8}")
 
 
+def test_cascade(transformer_ready):
+    """Тест каскада: эвристика для уверенных писем, transformer для остальных"""
+    print("\n" + "=" * 70)
+    print("🧪 Тест 8: Каскад эвристика → transformer")
+    print("=" * 70)
+    
+    if not transformer_ready:
+        print("\n⏭️  Пропущен: transformer не загружен")
+        return
+    
+    cascade = AIParserTransformer(cascade=True)
+    
+    emails = [
+        {'subject': 'Newsletter: weekly updates', 'body_preview': 'New release announcement. Unsubscribe here'},
+        {'subject': 'Huge discount offer', 'body_preview': 'Free prize, click here. Unsubscribe'},
+        {'subject': 'Quick question', 'body_preview': 'Can you call me when you have a minute?'},
+        {'subject': 'Hmm', 'body_preview': 'See below'}
+    ]
+    
+    start = time.time()
+    results = cascade.batch_analyze(emails)
+    elapsed = (time.time() - start) * 1000
+    
+    print(f"\n   {'Subject':30} | {'Category':10} | Уровень")
+    print(f"   {'-'*30}-+-{'-'*10}-+-{'-'*20}")
+    for email, result in zip(emails, results):
+        tier = result['ai_model'].split('/')[0]
+        print(f"   {email['subject'][:30]:30} | {result['category']:10} | {tier}")
+    
+    stats = cascade.get_model_info()['cascade_stats']
+    print(f"\n   Эвристика: {stats['heuristic']}, transformer: {stats['transformer']}, время: {elapsed:.0f} ms")
+    
+    assert results[0]['ai_model'].startswith('cascade:heuristic/')
+    assert results[1]['ai_model'].startswith('cascade:heuristic/')
+    assert results[3]['ai_model'].startswith('cascade:transformer/')
+
+
 def main():
     """Запускает все тесты"""
     print("\n🌞 SolarMail - Transformer Parser Tests")
@@ -283,6 +320,9 @@ def main():
     # Тест 7: Batch analysis
     test_batch_analysis(mock, transformer, transformer_ready)
     
+    # Тест 8: Cascade
+    test_cascade(transformer_ready)
+    
     # Итоговая сводка
     print("\n" + "=" * 70)
     print("✅ Все тесты завершены!")
@@ -0,0 +1,185 @@
+"""
+SolarMail - UID Sync Test
+smart_sync и uid_sync на локальном IMAP-сервере: общий ключ писем в кэше
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from core.sync.db_manager import DatabaseManager
+from core.sync.fixtures import MailGenerator, StandInIMAPServer
+from core.sync.solar_sync import SolarSync, config
+
+
+ACCOUNT = 'user@example.com'
+
+
+def make_sync(server: StandInIMAPServer, db: DatabaseManager, **kwargs) -> SolarSync:
+    """SolarSync, подключенный к локальному серверу без SSL"""
+    host, port = server.address
+    return SolarSync(
+        email=ACCOUNT,
+        password='password',
+        imap_host=host,
+        imap_port=port,
+        use_ssl=False,
+        db=db,
+        **kwargs
+    )
+
+
+def cached_uids(db: DatabaseManager):
+    """Ключи писем в кэше"""
+    return sorted(email['uid'] for email in db.iter_emails())
+
+
+def test_mixed_sync_modes():
+    """smart_sync, run и uid_sync по одной базе не дублируют письма"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест смешанных режимов синхронизации")
+    print("=" * 60)
+    
+    with StandInIMAPServer() as server, tempfile.TemporaryDirectory() as tmp:
+        server.populate('INBOX', 30, MailGenerator(seed=1))
+        expected = [DatabaseManager.make_uid(ACCOUNT, 'INBOX', uid) for uid in range(1, 31)]
+        
+        print("\n1️⃣ smart_sync (API), затем uid_sync (планировщик)...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, 'mixed.db'))
+            sync = make_sync(server, db)
+            sync.smart_sync()
+            sync.uid_sync()
+        assert db.get_emails_count() == 30
+        assert cached_uids(db) == sorted(expected)
+        print("   ✅ 30 писем, один ключ аккаунт:папка:UID")
+        
+        print("\n2️⃣ Новые письма через run, smart_sync и uid_sync в partial-режиме...")
+        server.populate('INBOX', 5, MailGenerator(seed=2))
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync.run()
+            make_sync(server, db, fetch_mode='partial').uid_sync()
+            sync.smart_sync()
+        assert db.get_emails_count() == 35
+        print("   ✅ 35 писем без дублей")
+        db.close()
+        
+        print("\n3️⃣ Старая база с голыми UID от прежнего smart_sync...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, 'legacy.db'))
+        db.insert_emails_bulk(
+            {'uid': str(uid), 'sender': 'old@example.com', 'subject': f'Old {uid}',
+             'date': '2025-01-01T00:00:00', 'body_preview': ''}
+            for uid in range(1, 11)
+        )
+        # Письмо 10 уже успели загрузить и под новым ключом
+        db.insert_emails_bulk([{
+            'uid': DatabaseManager.make_uid(ACCOUNT, 'INBOX', 10), 'sender': 'old@example.com',
+            'subject': 'Old 10', 'date': '2025-01-01T00:00:00', 'account_email': ACCOUNT,
+            'folder': 'INBOX', 'imap_uid': 10
+        }])
+        
+        # Другой аккаунт общей базы (планировщик, API) старые строки не забирает
+        with contextlib.redirect_stdout(io.StringIO()):
+            other = SolarSync(email='other@example.com', password='password', imap_host='localhost', db=db)
+        assert other.email != config.EMAIL
+        assert cached_uids(db)[:10] == sorted(str(uid) for uid in range(1, 11))
+        
+        # Старые строки писал аккаунт по умолчанию - их переводит он
+        with contextlib.redirect_stdout(io.StringIO()), mock.patch.object(config, 'EMAIL', ACCOUNT):
+            sync = make_sync(server, db)
+            sync.uid_sync()
+        assert db.get_emails_count() == 35
+        assert cached_uids(db) == sorted(expected + [
+            DatabaseManager.make_uid(ACCOUNT, 'INBOX', uid) for uid in range(31, 36)
+        ])
+        old = db.get_emails_by_uids([DatabaseManager.make_uid(ACCOUNT, 'INBOX', 1)])
+        assert old[0]['subject'] == 'Old 1' and old[0]['imap_uid'] == 1
+        print("   ✅ Старые строки переведены на новый ключ, дубль удален, повторной загрузки нет")
+        db.close()
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+def test_uid_sync_incremental():
+    """uid_sync запрашивает только UID n+1:*, сдвигает checkpoint и сбрасывает кэш при смене UIDVALIDITY"""
+    
+    print("=" * 60)
+    print("🧪 SolarMail - Тест инкрементальной UID-синхронизации")
+    print("=" * 60)
+    
+    with StandInIMAPServer() as server, tempfile.TemporaryDirectory() as tmp:
+        server.populate('INBOX', 20, MailGenerator(seed=1))
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, 'uid.db'))
+            sync = make_sync(server, db)
+        
+        print("\n1️⃣ Первая синхронизация папки...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync.uid_sync()
+        state = db.get_folder_sync_state(ACCOUNT, 'INBOX')
+        assert db.get_emails_count() == 20
+        assert state['uidvalidity'] == 1 and state['last_uid'] == 20
+        print("   ✅ 20 писем, checkpoint: UID 20 (UIDVALIDITY 1)")
+        
+        print("\n2️⃣ Новых писем нет: диапазон 21:* пуст...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            mailbox = sync.connect(initial_folder=None)
+            emails, checkpoint = sync.fetch_emails_incremental(mailbox, 'INBOX')
+            mailbox.logout()
+        # "21:*" на сервере совпадает с последним письмом (UID 20) - его отбрасываем
+        assert emails == [] and checkpoint == {'uidvalidity': 1, 'last_uid': 20, 'reset': False}
+        print("   ✅ Писем не загружено, checkpoint не изменился")
+        
+        print("\n3️⃣ Новые письма, одно из них старше sync_days...")
+        generator = MailGenerator(seed=2)
+        server.populate('INBOX', 3, generator)
+        old = next(generator.iter_messages(1, start=10))
+        server.add_message('INBOX', old['raw'], internaldate=datetime.now(timezone.utc) - timedelta(days=30))
+        with contextlib.redirect_stdout(io.StringIO()):
+            mailbox = sync.connect(initial_folder=None)
+            emails, checkpoint = sync.fetch_emails_incremental(mailbox, 'INBOX')
+            mailbox.logout()
+        # Выборка по UID, а не по дате: письмо 30-дневной давности тоже загружено
+        assert sorted(email['imap_uid'] for email in emails) == [21, 22, 23, 24]
+        assert checkpoint == {'uidvalidity': 1, 'last_uid': 24, 'reset': False}
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = sync.store_incremental(emails, 'INBOX', checkpoint)
+        assert stats['new'] == 4 and db.get_folder_sync_state(ACCOUNT, 'INBOX')['last_uid'] == 24
+        print("   ✅ Загружены только UID 21-24, checkpoint сдвинут до 24")
+        
+        print("\n4️⃣ Повторный uid_sync без изменений...")
+        ids_before = {email['uid']: email['id'] for email in db.iter_emails()}
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync.uid_sync()
+        assert {email['uid']: email['id'] for email in db.iter_emails()} == ids_before
+        print("   ✅ Кэш не тронут, полной ресинхронизации нет")
+        
+        print("\n5️⃣ Смена UIDVALIDITY на сервере...")
+        server.folders['INBOX']['uidvalidity'] = 2
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync.uid_sync()
+        state = db.get_folder_sync_state(ACCOUNT, 'INBOX')
+        ids_after = {email['uid']: email['id'] for email in db.iter_emails()}
+        # Кэш папки сброшен и загружен заново за sync_days (без письма 30-дневной давности)
+        assert state['uidvalidity'] == 2 and state['last_uid'] == 24
+        assert db.get_emails_count() == 23
+        assert not set(ids_after.values()) & set(ids_before.values())
+        print("   ✅ Кэш папки перезагружен, checkpoint нового поколения: UID 24 (UIDVALIDITY 2)")
+        db.close()
+    
+    print("\n" + "=" * 60)
+    print("✅ Тест успешно завершен!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_mixed_sync_modes()
+    test_uid_sync_incremental()